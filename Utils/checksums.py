@@ -0,0 +1,81 @@
+# Utils/checksums.py
+"""
+Incremental checksums for download verification
+CRC32 (zlib), CRC16-CCITT (binascii.crc_hqx) and SHA-256 (hashlib), all
+implemented in C and updated block by block while the image is framed,
+so the digest for RequestTransferExit and the checkMemory routine costs
+no second pass over the image.
+"""
+
+import zlib
+import hashlib
+import binascii
+from typing import Dict, Optional
+
+class CRC32Checksum:
+    """CRC-32 (ISO-HDLC, as zlib/Ethernet), 4-byte big-endian digest"""
+
+    name = "crc32"
+    size = 4
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(self.size, 'big')
+
+class CRC16Checksum:
+    """CRC-16/CCITT-FALSE (polynomial 0x1021, initial 0xFFFF), 2-byte big-endian digest"""
+
+    name = "crc16"
+    size = 2
+
+    def __init__(self, initial: int = 0xFFFF):
+        self.value = initial
+
+    def update(self, data):
+        self.value = binascii.crc_hqx(data, self.value)
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(self.size, 'big')
+
+class SHA256Checksum:
+    """SHA-256, 32-byte digest"""
+
+    name = "sha256"
+    size = 32
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def update(self, data):
+        self.hash.update(data)
+
+    def digest(self) -> bytes:
+        return self.hash.digest()
+
+# Reference methods; any class with name, size, update() and digest() can be used
+CHECKSUMS = {cls.name: cls for cls in (CRC32Checksum, CRC16Checksum, SHA256Checksum)}
+
+# The ECU side tells the methods apart by digest length
+CHECKSUMS_BY_SIZE: Dict[int, type] = {cls.size: cls for cls in CHECKSUMS.values()}
+
+def get_checksum(name: str):
+    """Checksum class by name"""
+    try:
+        return CHECKSUMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown checksum {name!r}, expected one of {', '.join(CHECKSUMS)}")
+
+def checksum_of(data, method=CRC32Checksum) -> bytes:
+    """Digest of a complete buffer"""
+    checksum = method()
+    checksum.update(data)
+    return checksum.digest()
+
+def checksum_for_digest(digest: bytes) -> Optional[type]:
+    """Checksum class matching the length of a received digest"""
+    return CHECKSUMS_BY_SIZE.get(len(digest))
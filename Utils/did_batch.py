@@ -0,0 +1,200 @@
+# Utils/did_batch.py
+"""
+Batched ReadDataByIdentifier (0x22)
+Packs as many DIDs into one request as the ECU's maximum response length
+allows. Multi-DID responses carry no record lengths, so they are split with
+a DID length catalog learned from single reads and cached per ECU software
+version. Batches the ECU rejects are halved until the offending DIDs are
+read on their own.
+"""
+
+import os
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from uds_validator_extended import UDSValidator
+from Utils.result_cache import DEFAULT_CACHE_DIR
+from Utils.flash_engine import MAX_RETRANSMISSIONS, final_response
+
+DEFAULT_DID_LENGTHS = os.path.join(DEFAULT_CACHE_DIR, "did_lengths.json")
+
+# Longest response of an ISO-TP transport (DoIP ECUs often allow more)
+DEFAULT_MAX_RESPONSE_LENGTH = 4095
+
+# Response SID, and the DID in front of every record
+RESPONSE_HEADER = 1
+RECORD_HEADER = 2
+
+class DIDLengthCatalog:
+    """Data length of every DID read so far, persisted per ECU software version.
+
+    With path None the catalog lives in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_DID_LENGTHS, software_version: str = ""):
+        self.path = path
+        self.software_version = software_version or ""
+        self.entries = self._load() if path else {}
+        stored = self.entries.get(self.software_version, {})
+        self.lengths: Dict[int, int] = {int(did, 16): length for did, length in stored.items()}
+        self.changed = False
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def learn(self, did: int, length: int):
+        if self.lengths.get(did) != length:
+            self.lengths[did] = length
+            self.changed = True
+
+    def forget(self, did: int):
+        if self.lengths.pop(did, None) is not None:
+            self.changed = True
+
+    def save(self):
+        if not self.path or not self.changed:
+            return
+        self.entries[self.software_version] = {f"{did:04X}": length for did, length in sorted(self.lengths.items())}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temporary, self.path)
+        self.changed = False
+
+class BatchReport:
+    """Result of one batched read"""
+
+    def __init__(self, dids: List[int]):
+        self.dids = dids
+        self.values: Dict[int, bytes] = {}
+        self.unsupported: List[int] = []
+        # DID -> NRC (None: no response) for DIDs rejected for other reasons
+        self.errors: Dict[int, Optional[int]] = {}
+        self.requests = 0
+        self.single_reads = 0
+        self.splits = 0
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'dids': len(self.dids),
+            'read': len(self.values),
+            'unsupported': [f"{did:04X}" for did in self.unsupported],
+            'errors': {f"{did:04X}": nrc for did, nrc in self.errors.items()},
+            'requests': self.requests,
+            'single_reads': self.single_reads,
+            'splits': self.splits,
+            'duration': self.duration,
+        }
+
+    def print_summary(self):
+        print(f"Read {len(self.values)} of {len(self.dids)} DIDs in {self.requests} requests "
+              f"({self.single_reads} single reads, {self.splits} split batches) in {self.duration:.3f}s")
+        if self.unsupported:
+            print(f"Unsupported: {', '.join(f'0x{did:04X}' for did in self.unsupported)}")
+        for did, nrc in self.errors.items():
+            print(f"  0x{did:04X}: {'no response' if nrc is None else f'NRC 0x{nrc:02X}'}")
+
+class BatchDIDReader:
+    """Reads many DIDs with as few 0x22 requests as the response length allows.
+
+    DIDs of unknown length are read on their own first; their lengths are
+    learned into the catalog, so later runs on the same software version
+    batch them right away. max_dids limits the DIDs per request for ECUs
+    with a fixed limit. receive_response (e.g. DoIPHandler.receive_diagnostic_message)
+    reads the final response after 0x78 response pending.
+    """
+
+    def __init__(self, send_request, validator: Optional[UDSValidator] = None,
+                 catalog: Optional[DIDLengthCatalog] = None,
+                 max_response_length: int = DEFAULT_MAX_RESPONSE_LENGTH, max_dids: Optional[int] = None,
+                 max_retransmissions: int = MAX_RETRANSMISSIONS, receive_response=None):
+        self.send_request = send_request
+        self.receive_response = receive_response
+        self.validator = validator or UDSValidator()
+        self.catalog = catalog if catalog is not None else DIDLengthCatalog(None)
+        self.max_response_length = max_response_length
+        self.max_dids = max_dids
+        self.max_retransmissions = max_retransmissions
+
+    def plan_batches(self, dids: List[int]) -> List[List[int]]:
+        """Pack DIDs of known length into batches whose response fits max_response_length"""
+        lengths = self.catalog.lengths
+        batches, batch, size = [], [], RESPONSE_HEADER
+        for did in dids:
+            record = RECORD_HEADER + lengths[did]
+            if batch and (size + record > self.max_response_length or len(batch) == self.max_dids):
+                batches.append(batch)
+                batch, size = [], RESPONSE_HEADER
+            batch.append(did)
+            size += record
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _exchange(self, request: bytes, report: BatchReport) -> Optional[bytes]:
+        """Send a request, again if the response was lost"""
+        for _ in range(self.max_retransmissions + 1):
+            report.requests += 1
+            response = final_response(self.send_request(request), request[0], self.receive_response)
+            if response is not None:
+                return response
+        return None
+
+    def _read_single(self, did: int, report: BatchReport):
+        report.single_reads += 1
+        response = self._exchange(b"\x22" + did.to_bytes(2, 'big'), report)
+        result = self.validator.validate_read_data_by_identifier(response, did)
+        if result['valid']:
+            data = result.get('data', b"")
+            report.values[did] = data
+            self.catalog.learn(did, len(data))
+        elif result['nrc'] == 0x31:
+            report.unsupported.append(did)
+            self.catalog.forget(did)
+        else:
+            report.errors[did] = result['nrc']
+
+    def _read_batch(self, batch: List[int], report: BatchReport) -> bool:
+        """Read a batch; False if the ECU rejected it or the records did not match the catalog"""
+        request = b"\x22" + b"".join(did.to_bytes(2, 'big') for did in batch)
+        response = self._exchange(request, report)
+        result = self.validator.validate_read_multiple_data_by_identifier(response, batch, self.catalog.lengths)
+        if not result['valid']:
+            return False
+        report.values.update(result['data'])
+        # Supported DIDs always answer, so left-out DIDs are not supported
+        report.unsupported += result['missing']
+        return True
+
+    def read(self, dids: List[int]) -> BatchReport:
+        """Read DIDs; values are returned in request order"""
+        start = time.perf_counter()
+        dids = list(dict.fromkeys(dids))
+        report = BatchReport(dids)
+        for did in dids:
+            if did not in self.catalog.lengths:
+                self._read_single(did, report)
+        known = [did for did in dids if did in self.catalog.lengths and did not in report.values]
+        pending = deque(self.plan_batches(known))
+        while pending:
+            batch = pending.popleft()
+            if len(batch) == 1:
+                self._read_single(batch[0], report)
+            elif not self._read_batch(batch, report):
+                # Rejected (too long, too many DIDs, unsupported DID on a strict ECU) or stale lengths
+                half = len(batch) // 2
+                pending.extendleft((batch[half:], batch[:half]))
+                report.splits += 1
+        self.catalog.save()
+        report.values = {did: report.values[did] for did in dids if did in report.values}
+        report.unsupported = [did for did in dids if did in report.unsupported]
+        report.duration = time.perf_counter() - start
+        return report
@@ -0,0 +1,272 @@
+# Utils/did_catalog.py
+"""
+Compiled DID decoder catalog
+Describes the fields of each DID (bit offset, bit length, type, scale,
+offset, enum) in an ODX-lite JSON file and compiles every DID once into a
+struct.Struct for single records and, when NumPy is installed, a structured
+dtype that decodes a batch of records of the same DID in one call.
+"""
+
+import json
+import struct
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Batches are decoded with struct.iter_unpack instead
+    np = None
+
+FIELD_TYPES = ('unsigned', 'signed', 'float', 'ascii', 'bytes')
+
+# struct codes of byte-aligned fields; other bit lengths are extracted as bit fields
+STRUCT_CODES = {
+    'unsigned': {8: 'B', 16: 'H', 32: 'I', 64: 'Q'},
+    'signed': {8: 'b', 16: 'h', 32: 'i', 64: 'q'},
+    'float': {32: 'f', 64: 'd'},
+}
+DTYPE_KINDS = {'unsigned': 'u', 'signed': 'i', 'float': 'f'}
+
+# Enum fields up to this many bits are mapped through a lookup table in batches
+ENUM_TABLE_BITS = 16
+
+# Fixed-length identification DIDs (ISO 14229-1 Annex C) known without a catalog file
+DEFAULT_DEFINITIONS = {
+    "F186": {"name": "ActiveDiagnosticSession", "fields": [
+        {"name": "session", "bit_offset": 0, "bit_length": 8,
+         "enum": {"0x01": "Default", "0x02": "Programming", "0x03": "Extended"}}]},
+    "F190": {"name": "VIN", "fields": [
+        {"name": "vin", "bit_offset": 0, "bit_length": 136, "type": "ascii"}]},
+}
+
+class FieldDefinition:
+    """One signal of a DID record.
+
+    bit_offset counts from the most significant bit of the first record
+    byte; physical = raw * scale + offset, and enum maps raw values to labels.
+    """
+
+    def __init__(self, name: str, bit_offset: int, bit_length: int, field_type: str = 'unsigned',
+                 scale: float = 1.0, offset: float = 0.0, enum: Optional[Dict[int, str]] = None,
+                 unit: Optional[str] = None):
+        if field_type not in FIELD_TYPES:
+            raise ValueError(f"Field {name}: unknown type {field_type!r}, expected one of {', '.join(FIELD_TYPES)}")
+        if field_type in ('ascii', 'bytes', 'float') and (bit_offset % 8 or bit_length % 8):
+            raise ValueError(f"Field {name}: {field_type} fields must be byte aligned")
+        if field_type == 'float' and bit_length not in STRUCT_CODES['float']:
+            raise ValueError(f"Field {name}: float fields are 32 or 64 bits")
+        self.name = name
+        self.bit_offset = bit_offset
+        self.bit_length = bit_length
+        self.type = field_type
+        self.scale = scale
+        self.offset = offset
+        self.enum = enum or {}
+        self.unit = unit
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FieldDefinition':
+        enum = {int(raw, 0) if isinstance(raw, str) else raw: label for raw, label in data.get('enum', {}).items()}
+        return cls(data['name'], data['bit_offset'], data['bit_length'], data.get('type', 'unsigned'),
+                   data.get('scale', 1.0), data.get('offset', 0.0), enum, data.get('unit'))
+
+    @property
+    def end(self) -> int:
+        """First bit after the field"""
+        return self.bit_offset + self.bit_length
+
+    @property
+    def scaled(self) -> bool:
+        return self.scale != 1.0 or self.offset != 0.0
+
+    def struct_code(self) -> Optional[str]:
+        """struct code if the field can be unpacked directly, None for bit fields"""
+        if self.type in ('ascii', 'bytes'):
+            return f"{self.bit_length // 8}s"
+        if self.bit_offset % 8:
+            return None
+        return STRUCT_CODES[self.type].get(self.bit_length)
+
+    def converter(self) -> Optional[Callable[[Any], Any]]:
+        """Raw to physical value (or enum label), None where the raw value is the physical one"""
+        if self.type == 'ascii':
+            return lambda raw: raw.decode('ascii', errors='ignore').rstrip('\x00 ')
+        if self.enum:
+            labels = self.enum
+            return lambda raw: labels.get(raw, raw)
+        if self.scaled:
+            scale, offset = self.scale, self.offset
+            return lambda raw: raw * scale + offset
+        return None
+
+class DIDDecoder:
+    """Decoder of one DID compiled from its field definitions.
+
+    Byte-aligned fields are unpacked by one struct.Struct (and one NumPy
+    structured dtype for batches); other bit lengths are shifted out of the
+    record read as one big-endian integer (in batches, out of the bytes
+    each field spans).
+    """
+
+    def __init__(self, did: int, name: str, fields: List[FieldDefinition], length: Optional[int] = None,
+                 byte_order: str = 'big'):
+        self.did = did
+        self.name = name
+        self.fields = fields
+        self.length = length or -(-max(field.end for field in fields) // 8)
+        self.byte_order = '>' if byte_order == 'big' else '<'
+        self.aligned: List[FieldDefinition] = []
+        self.bit_fields: List[FieldDefinition] = []
+        position, codes = 0, [self.byte_order]
+        for field in sorted(fields, key=lambda item: item.bit_offset):
+            code = field.struct_code()
+            start = field.bit_offset // 8
+            if code is None or start < position:
+                if field.type in ('ascii', 'bytes', 'float'):
+                    raise ValueError(f"DID 0x{did:04X}: field {field.name} overlaps another field")
+                self.bit_fields.append(field)
+                continue
+            if start > position:
+                codes.append(f"{start - position}x")
+            codes.append(code)
+            position = field.end // 8
+            self.aligned.append(field)
+        self.names = [field.name for field in self.aligned]
+        # Bit fields are shifted out of the record read as one big-endian integer: (name, shift, mask, sign bit)
+        self.bit_specs = [(field.name, self.length * 8 - field.end, (1 << field.bit_length) - 1,
+                           1 << (field.bit_length - 1) if field.type == 'signed' else 0) for field in self.bit_fields]
+        self.conversions = [(field.name, convert) for field in self.aligned + self.bit_fields
+                            for convert in [field.converter()] if convert is not None]
+        if position > self.length or any(field.end > self.length * 8 for field in self.bit_fields):
+            raise ValueError(f"DID 0x{did:04X}: fields exceed the record length of {self.length} bytes")
+        if self.length > position:
+            codes.append(f"{self.length - position}x")
+        self.struct = struct.Struct("".join(codes))
+        self.dtype = self._dtype() if np is not None else None
+
+    def _dtype(self):
+        """Structured dtype of the byte-aligned fields at their record offsets"""
+        formats = []
+        for field in self.aligned:
+            if field.type in ('ascii', 'bytes'):
+                formats.append(f"S{field.bit_length // 8}" if field.type == 'ascii' else f"V{field.bit_length // 8}")
+            else:
+                formats.append(f"{self.byte_order}{DTYPE_KINDS[field.type]}{field.bit_length // 8}")
+        return np.dtype({'names': [field.name for field in self.aligned], 'formats': formats,
+                         'offsets': [field.bit_offset // 8 for field in self.aligned], 'itemsize': self.length})
+
+    def _check(self, data: bytes):
+        if len(data) != self.length:
+            raise ValueError(f"DID 0x{self.did:04X}: expected {self.length} bytes, got {len(data)}")
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        """Physical values of one record by field name"""
+        self._check(data)
+        values = dict(zip(self.names, self.struct.unpack(data)))
+        if self.bit_specs:
+            word = int.from_bytes(data, 'big')
+            for name, shift, mask, sign in self.bit_specs:
+                raw = word >> shift & mask
+                values[name] = raw - (sign << 1) if raw & sign else raw
+        for name, convert in self.conversions:
+            values[name] = convert(values[name])
+        return values
+
+    def decode_batch(self, records: List[bytes]) -> Dict[str, Any]:
+        """Physical values of many records of this DID, as NumPy arrays (lists without NumPy)"""
+        for record in records:
+            self._check(record)
+        buffer = b"".join(records)
+        if np is None:
+            columns = zip(*self.struct.iter_unpack(buffer)) if records else [()] * len(self.names)
+            values = {name: list(column) for name, column in zip(self.names, columns)}
+            if self.bit_specs:
+                words = [int.from_bytes(record, 'big') for record in records]
+                for name, shift, mask, sign in self.bit_specs:
+                    column = [word >> shift & mask for word in words]
+                    values[name] = [raw - (sign << 1) if raw & sign else raw for raw in column] if sign else column
+            for name, convert in self.conversions:
+                values[name] = list(map(convert, values[name]))
+            return values
+
+        table = np.frombuffer(buffer, dtype=self.dtype, count=len(records))
+        values = {field.name: self._physical_array(field, table[field.name]) for field in self.aligned}
+        if self.bit_fields:
+            matrix = np.frombuffer(buffer, dtype=np.uint8).reshape(len(records), self.length)
+            for field in self.bit_fields:
+                values[field.name] = self._physical_array(field, self._bit_array(field, matrix))
+        return values
+
+    @staticmethod
+    def _bit_array(field: FieldDefinition, matrix):
+        """Raw values of a bit field for every row: its bytes as a big-endian word, shifted and masked"""
+        start, end = field.bit_offset // 8, -(-field.end // 8)
+        if end - start > 8:
+            raise ValueError(f"Field {field.name}: bit fields may span at most 8 bytes")
+        words = np.zeros((matrix.shape[0], 8), dtype=np.uint8)
+        words[:, 8 - (end - start):] = matrix[:, start:end]
+        raw = (words.view('>u8')[:, 0] >> np.uint64(end * 8 - field.end)) & np.uint64((1 << field.bit_length) - 1)
+        if field.type == 'signed':
+            raw = raw.astype(np.int64)
+            raw = np.where(raw >> (field.bit_length - 1) & 1, raw - (1 << field.bit_length), raw)
+        return raw
+
+    @staticmethod
+    def _physical_array(field: FieldDefinition, raw):
+        if field.type == 'ascii':
+            return np.char.rstrip(np.char.decode(raw, 'ascii', errors='ignore'), ' ')
+        if field.type == 'bytes':
+            return [item.tobytes() for item in raw]
+        if field.enum:
+            if field.bit_length <= ENUM_TABLE_BITS and field.type == 'unsigned':
+                labels = np.array([field.enum.get(value, value) for value in range(1 << field.bit_length)],
+                                  dtype=object)
+                return labels[raw]
+            return np.array([field.enum.get(value, value) for value in raw.tolist()], dtype=object)
+        return raw * field.scale + field.offset if field.scaled else raw
+
+class DIDCatalog:
+    """DID definitions with decoders compiled on first use and cached.
+
+    Catalog files are JSON: {"dids": {"F190": {"name": ..., "length": ...,
+    "byte_order": "big", "fields": [{"name", "bit_offset", "bit_length",
+    "type", "scale", "offset", "enum", "unit"}]}}}.
+    """
+
+    def __init__(self, definitions: Optional[Dict[str, Dict]] = None, defaults: bool = True):
+        self.definitions: Dict[int, Dict] = {}
+        self.decoders: Dict[int, DIDDecoder] = {}
+        for did, definition in {**(DEFAULT_DEFINITIONS if defaults else {}), **(definitions or {})}.items():
+            self.add(int(did, 16) if isinstance(did, str) else did, definition)
+
+    @classmethod
+    def load(cls, path: str, defaults: bool = True) -> 'DIDCatalog':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get('dids', {}), defaults)
+
+    def add(self, did: int, definition: Dict):
+        self.definitions[did] = definition
+        self.decoders.pop(did, None)
+
+    def __contains__(self, did: int) -> bool:
+        return did in self.definitions
+
+    def decoder(self, did: int) -> DIDDecoder:
+        """Compiled decoder of a DID (KeyError if the catalog does not describe it)"""
+        decoder = self.decoders.get(did)
+        if decoder is None:
+            definition = self.definitions[did]
+            fields = [FieldDefinition.from_dict(field) for field in definition['fields']]
+            decoder = DIDDecoder(did, definition.get('name', f"DID_{did:04X}"), fields, definition.get('length'),
+                                 definition.get('byte_order', 'big'))
+            self.decoders[did] = decoder
+        return decoder
+
+    def decode(self, did: int, data: bytes) -> Dict[str, Any]:
+        return self.decoder(did).decode(data)
+
+    def decode_batch(self, did: int, records: List[bytes]) -> Dict[str, Any]:
+        return self.decoder(did).decode_batch(records)
+
+    def decode_values(self, values: Dict[int, bytes]) -> Dict[int, Dict[str, Any]]:
+        """Decode the DIDs of a read (e.g. BatchReport.values) the catalog describes"""
+        return {did: self.decode(did, data) for did, data in values.items() if did in self.definitions}
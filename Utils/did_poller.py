@@ -0,0 +1,223 @@
+# Utils/did_poller.py
+"""
+Multi-rate DID polling across many ECUs
+Issues ReadDataByIdentifier (0x22) requests at configured periods from one
+timer heap. Each ECU has at most one outstanding request; due polls of a
+busy ECU queue behind it. Requests are scheduled on a fixed time grid, so
+late polls do not shift later ones, and ECUs answering 0x21 (busy repeat
+request) are polled again after an exponential backoff. A 0x78 response
+pending is followed to the final response before the ECU is polled again.
+"""
+
+import math
+import time
+import heapq
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+
+from uds_validator_extended import UDSValidator
+from Utils.flash_engine import final_response
+
+BUSY_NRC = 0x21
+
+# First retry delay after a busy response, doubled per further busy response of the ECU
+DEFAULT_BACKOFF = 0.005
+DEFAULT_MAX_BACKOFF = 0.5
+
+class PollStats:
+    """Actual rate and timing of one polled DID"""
+
+    def __init__(self, ecu: str, did: int, period: float):
+        self.ecu = ecu
+        self.did = did
+        self.period = period
+        self.samples = 0
+        self.busy = 0
+        self.lost = 0
+        # NRC -> count of other negative responses
+        self.errors: Dict[int, int] = {}
+        # Grid slots skipped because the ECU could not keep up
+        self.missed = 0
+        self.max_lateness = 0.0
+        self.last_sample: Optional[float] = None
+        # Running mean and sum of squared deviations of the sample intervals (Welford)
+        self.intervals = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+
+    def record(self, timestamp: float, lateness: float):
+        self.samples += 1
+        self.max_lateness = max(self.max_lateness, lateness)
+        if self.last_sample is not None:
+            interval = timestamp - self.last_sample
+            self.intervals += 1
+            delta = interval - self.interval_mean
+            self.interval_mean += delta / self.intervals
+            self.interval_m2 += delta * (interval - self.interval_mean)
+        self.last_sample = timestamp
+
+    @property
+    def target_rate(self) -> float:
+        return 1.0 / self.period
+
+    @property
+    def actual_rate(self) -> float:
+        """Samples per second over the sample intervals"""
+        return 1.0 / self.interval_mean if self.interval_mean else 0.0
+
+    @property
+    def jitter(self) -> float:
+        """Standard deviation of the sample intervals in seconds"""
+        return math.sqrt(self.interval_m2 / self.intervals) if self.intervals > 1 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'ecu': self.ecu,
+            'did': f"{self.did:04X}",
+            'target_rate': self.target_rate,
+            'actual_rate': self.actual_rate,
+            'jitter': self.jitter,
+            'max_lateness': self.max_lateness,
+            'samples': self.samples,
+            'busy': self.busy,
+            'lost': self.lost,
+            'missed': self.missed,
+            'errors': {f"0x{nrc:02X}": count for nrc, count in self.errors.items()},
+        }
+
+class PollReport:
+    """Result of a polling run"""
+
+    def __init__(self, stats: List[PollStats]):
+        self.stats = stats
+        self.requests = 0
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict:
+        return {'requests': self.requests, 'duration': self.duration, 'dids': [item.to_dict() for item in self.stats]}
+
+    def print_summary(self):
+        print(f"Polled {len(self.stats)} DIDs with {self.requests} requests in {self.duration:.3f}s")
+        print(f"{'ECU':<12} {'DID':<6} {'Target/s':>9} {'Actual/s':>9} {'Jitter':>9} {'Late max':>9} "
+              f"{'Busy':>6} {'Lost':>6} {'Missed':>6}")
+        for item in self.stats:
+            print(f"{item.ecu:<12} {item.did:04X}   {item.target_rate:>9.1f} {item.actual_rate:>9.1f} "
+                  f"{item.jitter * 1e3:>7.2f}ms {item.max_lateness * 1e3:>7.2f}ms "
+                  f"{item.busy:>6} {item.lost:>6} {item.missed:>6}")
+
+class DIDPoller:
+    """Polls DIDs of several ECUs at their own periods.
+
+    ecus maps an ECU name to its send_request (e.g. one DoIPHandler per
+    ECU); every ECU gets a worker thread, so slow ECUs do not delay others.
+    receive_responses maps ECU names to the function reading the final
+    response after 0x78 (e.g. DoIPHandler.receive_diagnostic_message).
+    on_sample(ecu, did, timestamp, data) receives every value.
+    """
+
+    def __init__(self, ecus: Dict[str, Callable[[bytes], bytes]], validator: Optional[UDSValidator] = None,
+                 on_sample: Optional[Callable[[str, int, float, bytes], None]] = None,
+                 backoff: float = DEFAULT_BACKOFF, max_backoff: float = DEFAULT_MAX_BACKOFF,
+                 receive_responses: Optional[Dict[str, Callable[[], bytes]]] = None):
+        self.ecus = ecus
+        self.receive_responses = receive_responses or {}
+        self.validator = validator or UDSValidator()
+        self.on_sample = on_sample
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats: List[PollStats] = []
+        # Latest value of every (ECU, DID)
+        self.values: Dict[Tuple[str, int], bytes] = {}
+
+    def add(self, ecu: str, dids: List[int], period: float):
+        """Poll DIDs of an ECU every period seconds"""
+        if ecu not in self.ecus:
+            raise KeyError(f"Unknown ECU {ecu!r}")
+        if period <= 0:
+            raise ValueError(f"Period must be positive, got {period}")
+        self.stats += [PollStats(ecu, did, period) for did in dids]
+
+    def _poll(self, stats: PollStats) -> Tuple[float, Optional[bytes]]:
+        started = time.perf_counter()
+        # The final response of a 0x78 is read here, so the ECU has no second request outstanding
+        response = self.ecus[stats.ecu](b"\x22" + stats.did.to_bytes(2, 'big'))
+        return started, final_response(response, 0x22, self.receive_responses.get(stats.ecu))
+
+    def _next_due(self, stats: PollStats, due: float, now: float) -> float:
+        """Next slot of the fixed grid; slots already past are skipped and counted as missed"""
+        due += stats.period
+        if due < now:
+            skipped = math.ceil((now - due) / stats.period)
+            stats.missed += skipped
+            due += skipped * stats.period
+        return due
+
+    def run(self, duration: float) -> PollReport:
+        """Poll for duration seconds"""
+        report = PollReport(self.stats)
+        start = time.perf_counter()
+        end = start + duration
+        # (grid slot, sequence, stats); due polls move to their ECU's queue until the ECU is free
+        heap = [(start, index, stats) for index, stats in enumerate(self.stats)]
+        heapq.heapify(heap)
+        sequence = len(heap)
+        queued = {ecu: deque() for ecu in self.ecus}
+        backoffs = {ecu: 0.0 for ecu in self.ecus}
+        resume_at = {ecu: 0.0 for ecu in self.ecus}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.ecus))) as pool:
+            while True:
+                now = time.perf_counter()
+                while heap and heap[0][0] <= now:
+                    slot, _, stats = heapq.heappop(heap)
+                    queued[stats.ecu].append((slot, stats))
+                active = {stats.ecu for _, stats in running.values()}
+                if now < end:
+                    for ecu, waiting in queued.items():
+                        if waiting and ecu not in active and resume_at[ecu] <= now:
+                            slot, stats = waiting.popleft()
+                            running[pool.submit(self._poll, stats)] = (slot, stats)
+                            active.add(ecu)
+                            report.requests += 1
+                    # Sleep until a response, the next due poll, the end of a backoff or the end of the run
+                    wake = [end] + [slot for slot, _, _ in heap[:1]] + \
+                           [resume_at[ecu] for ecu, waiting in queued.items() if waiting and ecu not in active]
+                    timeout = max(0.0, min(wake) - now)
+                elif running:
+                    timeout = None  # Only the outstanding responses are collected
+                else:
+                    break
+                if running:
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(timeout)
+                    done = ()
+                for future in done:
+                    slot, stats = running.pop(future)
+                    started, response = future.result()
+                    finished = time.perf_counter()
+                    result = self.validator.validate_read_data_by_identifier(response, stats.did)
+                    if result['nrc'] == BUSY_NRC:
+                        # The ECU is left alone for the backoff; the poll goes first once it ends
+                        stats.busy += 1
+                        backoffs[stats.ecu] = min(self.max_backoff, backoffs[stats.ecu] * 2 or self.backoff)
+                        resume_at[stats.ecu] = finished + backoffs[stats.ecu]
+                        queued[stats.ecu].appendleft((slot, stats))
+                        continue
+                    backoffs[stats.ecu] = 0.0
+                    if result['valid']:
+                        data = result.get('data', b"")
+                        stats.record(started, started - slot)
+                        self.values[(stats.ecu, stats.did)] = data
+                        if self.on_sample:
+                            self.on_sample(stats.ecu, stats.did, started, data)
+                    elif result['nrc'] is None:
+                        stats.lost += 1
+                    else:
+                        stats.errors[result['nrc']] = stats.errors.get(result['nrc'], 0) + 1
+                    heapq.heappush(heap, (self._next_due(stats, slot, finished), sequence, stats))
+                    sequence += 1
+        report.duration = time.perf_counter() - start
+        return report
@@ -45,6 +45,20 @@ class DoIPHandler:
             self.socket.close()
             self.connected = False
     
+    def reconnect(self) -> bool:
+        """Open a new connection after the link was lost"""
+        self.disconnect()
+        return self.connect()
+    
+    def cancel(self):
+        """Abort pending I/O from another thread (shutdown unblocks a waiting recv)"""
+        self.connected = False
+        if self.socket:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
     def _create_doip_header(self, payload_type: int, payload_length: int) -> bytes:
         """Create DoIP header"""
         return struct.pack('>BBHI', 
@@ -70,26 +84,102 @@ class DoIPHandler:
         try:
             # Send DoIP message
             self.socket.send(header + payload)
+            return self._receive_diagnostic_response()
             
-            # Receive response
-            response_header = self.socket.recv(self.DOIP_HEADER_SIZE)
+        except Exception as e:
+            print(f"DoIP communication error: {e}")
+            return None
+    
+    def send_diagnostic_message_parts(self, parts) -> Optional[bytes]:
+        """Send a UDS message given as several buffers (e.g. a memoryview slice) without joining them"""
+        if not self.connected:
+            return None
+        
+        prefix = self._create_doip_header(self.DOIP_DIAG_MESSAGE, 4 + sum(len(part) for part in parts)) + \
+            struct.pack('>HH', self.source_addr, self.target_addr)
+        
+        try:
+            self._send_buffers([prefix, *parts])
+            return self._receive_diagnostic_response()
+        except Exception as e:
+            print(f"DoIP communication error: {e}")
+            return None
+    
+    def receive_diagnostic_message(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Receive a further response without sending (e.g. after 0x78 response pending, or periodic data).
+        
+        With a timeout, None is returned quietly when nothing arrives in time.
+        """
+        if not self.connected:
+            return None
+        previous = self.socket.gettimeout()
+        try:
+            if timeout is not None:
+                self.socket.settimeout(timeout)
+            return self._receive_diagnostic_response()
+        except Exception as e:
+            if timeout is None or not isinstance(e, socket.timeout):
+                print(f"DoIP communication error: {e}")
+            return None
+        finally:
+            self.socket.settimeout(previous)
+    
+    def _send_buffers(self, buffers):
+        """Scatter-send buffers, continuing after partial sends"""
+        if not hasattr(self.socket, 'sendmsg'):  # e.g. Windows
+            self.socket.sendall(b"".join(buffers))
+            return
+        buffers = [memoryview(buffer).cast('B') for buffer in buffers]
+        while buffers:
+            sent = self.socket.sendmsg(buffers)
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                buffers.pop(0)
+            if buffers and sent:
+                buffers[0] = buffers[0][sent:]
+    
+    def _receive_exact(self, size: int) -> bytes:
+        """Receive size bytes, continuing after partial reads (fewer only if the peer closed)"""
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.socket.recv_into(view[received:])
+            if count == 0:
+                break
+            received += count
+        return bytes(buffer[:received])
+    
+    def _receive_diagnostic_response(self) -> Optional[bytes]:
+        """Receive the next diagnostic message (0x8001) and return its UDS data.
+        
+        This is the response to a request, the final response after 0x78 or an
+        unsolicited (e.g. periodic) message. Acknowledgements (0x8002) are skipped
+        and alive check requests answered on the way; a negative acknowledgement
+        (0x8003) or a connection closed mid-message returns None.
+        """
+        while True:
+            response_header = self._receive_exact(self.DOIP_HEADER_SIZE)
             if len(response_header) != self.DOIP_HEADER_SIZE:
                 return None
             
             version, payload_type, payload_length = self._parse_doip_header(response_header)
+            # The whole payload is read, whatever its type, so the next message starts at its header
+            response_payload = self._receive_exact(payload_length)
+            if len(response_payload) != payload_length:
+                return None
             
-            if payload_type == self.DOIP_DIAG_MESSAGE_ACK:
-                # Receive diagnostic response
-                response_payload = self.socket.recv(payload_length)
-                if len(response_payload) >= 4:
-                    # Skip source/target addresses, return UDS data
-                    return response_payload[4:]
-            
-            return None
-            
-        except Exception as e:
-            print(f"DoIP communication error: {e}")
-            return None
+            if payload_type == self.DOIP_DIAG_MESSAGE:
+                # Skip source/target addresses, return UDS data
+                return response_payload[4:] if len(response_payload) >= 4 else None
+            if payload_type == self.DOIP_DIAG_MESSAGE_NACK:
+                code = response_payload[4] if len(response_payload) > 4 else None
+                print(f"DoIP diagnostic message rejected (NACK code {'n/a' if code is None else f'0x{code:02X}'})")
+                return None
+            if payload_type == self.DOIP_ALIVE_CHECK_REQUEST:
+                self.socket.sendall(self._create_doip_header(self.DOIP_ALIVE_CHECK_RESPONSE, 2) +
+                                    struct.pack('>H', self.source_addr))
+            # Positive acknowledgements (0x8002) and other messages are skipped
 
 class DoSOADHandler:
     """DoSOAD (Diagnostic over Service Oriented Architecture Daemon) handler"""
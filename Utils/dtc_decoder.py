@@ -0,0 +1,190 @@
+# Utils/dtc_decoder.py
+"""
+Structured DTC decoding for ReadDTCInformation (0x19)
+Decodes the DTC records of a response in one pass into a NumPy structured
+array (dtc, status and, for severity reports, severity and functional
+unit), filters them by status bits without a Python loop and formats
+DTCs in their P/C/B/U display form. Without NumPy the records are columns
+of plain lists with the same field names.
+"""
+
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Records are decoded into lists instead
+    np = None
+
+# DTC status bits (ISO 14229-1 D.2)
+TEST_FAILED = 0x01
+TEST_FAILED_THIS_OPERATION_CYCLE = 0x02
+PENDING_DTC = 0x04
+CONFIRMED_DTC = 0x08
+TEST_NOT_COMPLETED_SINCE_LAST_CLEAR = 0x10
+TEST_FAILED_SINCE_LAST_CLEAR = 0x20
+TEST_NOT_COMPLETED_THIS_OPERATION_CYCLE = 0x40
+WARNING_INDICATOR_REQUESTED = 0x80
+
+STATUS_BITS = {
+    TEST_FAILED: "testFailed",
+    TEST_FAILED_THIS_OPERATION_CYCLE: "testFailedThisOperationCycle",
+    PENDING_DTC: "pendingDTC",
+    CONFIRMED_DTC: "confirmedDTC",
+    TEST_NOT_COMPLETED_SINCE_LAST_CLEAR: "testNotCompletedSinceLastClear",
+    TEST_FAILED_SINCE_LAST_CLEAR: "testFailedSinceLastClear",
+    TEST_NOT_COMPLETED_THIS_OPERATION_CYCLE: "testNotCompletedThisOperationCycle",
+    WARNING_INDICATOR_REQUESTED: "warningIndicatorRequested",
+}
+
+# Sub-functions by response layout
+REPORT_NUMBER_OF_DTC = (0x01, 0x07, 0x11, 0x12)
+REPORT_DTC_RECORDS = (0x02, 0x0A, 0x0B, 0x0C, 0x0D, 0x0E, 0x0F, 0x13, 0x15)
+REPORT_DTC_EXT_DATA = 0x06
+REPORT_SEVERITY_RECORDS = (0x08, 0x09)
+
+# Bytes per record: DTC (3) + status, and severity + functional unit in front for severity reports
+DTC_RECORD_LENGTH = 4
+SEVERITY_RECORD_LENGTH = 6
+
+DTC_FIELDS = ('dtc', 'status')
+SEVERITY_FIELDS = ('severity', 'functional_unit', 'dtc', 'status')
+
+# Display form letter per top two DTC bits (SAE J2012: powertrain, chassis, body, network)
+SYSTEM_LETTERS = "PCBU"
+
+if np is not None:
+    DTC_DTYPE = np.dtype([('dtc', np.uint32), ('status', np.uint8)])
+    SEVERITY_DTC_DTYPE = np.dtype([('severity', np.uint8), ('functional_unit', np.uint8),
+                                   ('dtc', np.uint32), ('status', np.uint8)])
+else:
+    DTC_DTYPE = SEVERITY_DTC_DTYPE = None
+
+class DTCReport:
+    """Decoded 0x19 response.
+
+    records is a structured array (a dict of lists without NumPy) with the
+    fields dtc and status, plus severity and functional_unit for severity
+    reports. Count reports (0x01) carry the count and no records.
+    """
+
+    def __init__(self, sub_function: int, availability_mask: Optional[int], records,
+                 count: Optional[int] = None, dtc_format: Optional[int] = None,
+                 extended_data: Optional[bytes] = None):
+        self.sub_function = sub_function
+        self.availability_mask = availability_mask
+        self.records = records
+        self.count = len(records['dtc']) if count is None else count
+        self.dtc_format = dtc_format
+        # 0x06: extended data records following the DTC, undecoded (their layout is manufacturer specific)
+        self.extended_data = extended_data
+
+    def __len__(self) -> int:
+        return len(self.records['dtc'])
+
+    def filter(self, mask: int, all_bits: bool = False):
+        return filter_by_status(self.records, mask, all_bits)
+
+    def display_codes(self) -> List[str]:
+        return display_codes(self.records['dtc'])
+
+    def to_dict(self) -> Dict:
+        fields = SEVERITY_FIELDS if 'severity' in _fields(self.records) else DTC_FIELDS
+        return {
+            'sub_function': self.sub_function,
+            'availability_mask': self.availability_mask,
+            'count': self.count,
+            'dtc_format': self.dtc_format,
+            'dtcs': [dict(zip(fields, values), code=code)
+                     for *values, code in zip(*(_column(self.records, name) for name in fields),
+                                              self.display_codes())],
+        }
+
+def _fields(records) -> tuple:
+    return records.dtype.names if np is not None else tuple(records)
+
+def _column(records, name: str) -> list:
+    """Column as a list of Python ints"""
+    return records[name].tolist() if np is not None else list(records[name])
+
+def decode_records(payload: bytes, severity: bool = False):
+    """DTC records of a response body in one pass (structured array, or columns of lists)"""
+    length = SEVERITY_RECORD_LENGTH if severity else DTC_RECORD_LENGTH
+    if len(payload) % length:
+        raise ValueError(f"DTC records are {length} bytes, got {len(payload)} bytes")
+    dtc_start = 2 if severity else 0
+    if np is not None:
+        raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, length).astype(np.uint32)
+        records = np.empty(len(raw), dtype=SEVERITY_DTC_DTYPE if severity else DTC_DTYPE)
+        records['dtc'] = raw[:, dtc_start] << 16 | raw[:, dtc_start + 1] << 8 | raw[:, dtc_start + 2]
+        records['status'] = raw[:, dtc_start + 3]
+        if severity:
+            records['severity'] = raw[:, 0]
+            records['functional_unit'] = raw[:, 1]
+        return records
+    records = {
+        'dtc': [int.from_bytes(payload[i + dtc_start:i + dtc_start + 3], 'big') for i in range(0, len(payload), length)],
+        'status': list(payload[dtc_start + 3::length]),
+    }
+    if severity:
+        records = {'severity': list(payload[0::length]), 'functional_unit': list(payload[1::length]), **records}
+    return records
+
+def decode_dtc_response(response: bytes) -> DTCReport:
+    """Decode a positive 0x19 response (ValueError for negative, unsupported or malformed ones)"""
+    if not response or len(response) < 2 or response[0] != 0x59:
+        raise ValueError(f"Not a positive ReadDTCInformation response: {bytes(response or b'').hex().upper()}")
+    sub_function = response[1]
+    if sub_function in REPORT_NUMBER_OF_DTC:
+        # 59 01 availabilityMask formatIdentifier count(2)
+        if len(response) != 6:
+            raise ValueError(f"Count response of sub-function 0x{sub_function:02X} must be 6 bytes, got {len(response)}")
+        return DTCReport(sub_function, response[2], decode_records(b""),
+                         count=int.from_bytes(response[4:6], 'big'), dtc_format=response[3])
+    if sub_function in REPORT_DTC_RECORDS:
+        # 59 02 availabilityMask {DTC(3) status}*
+        if len(response) < 3:
+            raise ValueError(f"Response of sub-function 0x{sub_function:02X} lacks the status availability mask")
+        return DTCReport(sub_function, response[2], decode_records(response[3:]))
+    if sub_function in REPORT_SEVERITY_RECORDS:
+        # 59 08 availabilityMask {severity functionalUnit DTC(3) status}*
+        if len(response) < 3:
+            raise ValueError(f"Response of sub-function 0x{sub_function:02X} lacks the status availability mask")
+        return DTCReport(sub_function, response[2], decode_records(response[3:], severity=True))
+    if sub_function == REPORT_DTC_EXT_DATA:
+        # 59 06 DTC(3) status {recordNumber data...}*
+        if len(response) < 2 + DTC_RECORD_LENGTH:
+            raise ValueError("Extended data response lacks the DTC and status")
+        return DTCReport(sub_function, None, decode_records(response[2:2 + DTC_RECORD_LENGTH]),
+                         extended_data=bytes(response[2 + DTC_RECORD_LENGTH:]))
+    raise ValueError(f"Decoding sub-function 0x{sub_function:02X} is not supported")
+
+def filter_by_status(records, mask: int, all_bits: bool = False):
+    """Records with any (all_bits: all) of the status bits in mask set"""
+    if np is not None:
+        selected = records['status'] & mask
+        return records[selected == mask if all_bits else selected != 0]
+    keep = [(status & mask) == mask if all_bits else bool(status & mask) for status in records['status']]
+    return {name: [value for value, kept in zip(column, keep) if kept] for name, column in records.items()}
+
+def dtc_display(dtc: int) -> str:
+    """Display form of a 3-byte DTC, e.g. 0x012345 -> 'P0123-45' (the last byte is the failure type)"""
+    return f"{SYSTEM_LETTERS[dtc >> 22 & 0x03]}{dtc >> 20 & 0x03}{dtc >> 8 & 0xFFF:03X}-{dtc & 0xFF:02X}"
+
+_display_tables = None
+
+def display_codes(dtcs) -> List[str]:
+    """Display forms of many DTCs; with NumPy through lookup tables of the code and failure type"""
+    global _display_tables
+    if np is None or not len(dtcs):
+        return [dtc_display(dtc) for dtc in dtcs]
+    if _display_tables is None:
+        codes = np.array([f"{SYSTEM_LETTERS[code >> 14]}{code >> 12 & 0x03}{code & 0xFFF:03X}" for code in range(0x10000)])
+        failure_types = np.array([f"-{failure_type:02X}" for failure_type in range(0x100)])
+        _display_tables = codes, failure_types
+    codes, failure_types = _display_tables
+    dtcs = np.asarray(dtcs, dtype=np.uint32)
+    return np.char.add(codes[dtcs >> 8], failure_types[dtcs & 0xFF]).tolist()
+
+def status_names(status: int) -> List[str]:
+    """Names of the status bits set"""
+    return [name for bit, name in STATUS_BITS.items() if status & bit]
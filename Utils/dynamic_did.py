@@ -0,0 +1,190 @@
+# Utils/dynamic_did.py
+"""
+Signal polling through DynamicallyDefineDataIdentifier (0x2C)
+Groups the byte spans of the wanted signals into as few dynamic DIDs as the
+ECU's length limits allow, defines them by identifier, reads each with one
+0x22 request and decodes the records back into the individual signals.
+ECUs drop dynamic DIDs on session changes and resets, so definitions are
+cleared and redefined before the next read after either.
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+from uds_validator_extended import UDSValidator
+from Utils.did_catalog import DIDCatalog, DIDDecoder
+from Utils.flash_engine import MAX_RETRANSMISSIONS, final_response
+
+# First dynamically definable DID (ISO 14229-1 Annex C: 0xF200-0xF3FF)
+FIRST_DYNAMIC_DID = 0xF200
+DYNAMIC_DID_COUNT = 0x200
+
+# Bytes and source elements one dynamic DID may carry (the ECU's limits may be lower)
+DEFAULT_MAX_DYNAMIC_LENGTH = 64
+DEFAULT_MAX_ELEMENTS = 16
+
+DEFINE_BY_IDENTIFIER = 0x01
+CLEAR_DYNAMIC_DID = 0x03
+
+class DynamicDIDError(Exception):
+    """The ECU refused to define a dynamic DID"""
+
+class SourceSpan:
+    """Contiguous bytes of one source DID carrying one or more wanted signals"""
+
+    def __init__(self, did: int, start: int, end: int, byte_order: str):
+        self.did = did
+        self.start = start
+        self.end = end
+        self.byte_order = byte_order
+        self.fields = []
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+class DynamicDID:
+    """One dynamic DID: its source spans in record order and the decoder of the composed record"""
+
+    def __init__(self, did: int, spans: List[SourceSpan]):
+        self.did = did
+        self.spans = spans
+        self.length = sum(span.size for span in spans)
+        self.signals: Dict[str, Tuple[int, str]] = {}
+        fields, position = [], 0
+        for span in spans:
+            for field in span.fields:
+                relocated = copy.copy(field)
+                relocated.name = f"{span.did:04X}.{field.name}"
+                relocated.bit_offset = field.bit_offset + (position - span.start) * 8
+                fields.append(relocated)
+                self.signals[relocated.name] = (span.did, field.name)
+            position += span.size
+        self.decoder = DIDDecoder(did, f"Dynamic_{did:04X}", fields, self.length, spans[0].byte_order)
+
+    def define_request(self) -> bytes:
+        """2C 01 with (source DID, 1-based position, size) per span"""
+        elements = b"".join(span.did.to_bytes(2, 'big') + bytes([span.start + 1, span.size]) for span in self.spans)
+        return bytes([0x2C, DEFINE_BY_IDENTIFIER]) + self.did.to_bytes(2, 'big') + elements
+
+    def decode(self, data: bytes) -> Dict[Tuple[int, str], Any]:
+        return {self.signals[name]: value for name, value in self.decoder.decode(data).items()}
+
+def signal_spans(catalog: DIDCatalog, signals: List[Tuple[int, str]], max_length: int) -> List[SourceSpan]:
+    """Byte spans of the signals; spans of one DID that overlap or touch are merged up to max_length"""
+    spans: List[SourceSpan] = []
+    by_did: Dict[int, List] = {}
+    for did, name in dict.fromkeys(signals):
+        decoder = catalog.decoder(did)
+        field = next((field for field in decoder.fields if field.name == name), None)
+        if field is None:
+            raise KeyError(f"DID 0x{did:04X} has no signal {name!r}")
+        by_did.setdefault(did, []).append(field)
+    for did, fields in by_did.items():
+        byte_order = 'big' if catalog.decoder(did).byte_order == '>' else 'little'
+        span = None
+        for field in sorted(fields, key=lambda item: item.bit_offset):
+            start, end = field.bit_offset // 8, -(-field.end // 8)
+            if end - start > max_length:
+                raise ValueError(f"Signal {field.name!r} of DID 0x{did:04X} is longer than {max_length} bytes")
+            if span is not None and start <= span.end and max(end, span.end) - span.start <= max_length:
+                span.end = max(end, span.end)
+            else:
+                span = SourceSpan(did, start, end, byte_order)
+                spans.append(span)
+            span.fields.append(field)
+    return spans
+
+def plan_dynamic_dids(catalog: DIDCatalog, signals: List[Tuple[int, str]], dids: Optional[List[int]] = None,
+                      max_length: int = DEFAULT_MAX_DYNAMIC_LENGTH,
+                      max_elements: int = DEFAULT_MAX_ELEMENTS) -> List[DynamicDID]:
+    """Pack the signal spans into as few dynamic DIDs as possible (first-fit decreasing)"""
+    dids = list(dids) if dids is not None else list(range(FIRST_DYNAMIC_DID, FIRST_DYNAMIC_DID + DYNAMIC_DID_COUNT))
+    bins: List[List[SourceSpan]] = []
+    for span in sorted(signal_spans(catalog, signals, max_length), key=lambda item: -item.size):
+        target = next((spans for spans in bins if len(spans) < max_elements and spans[0].byte_order == span.byte_order
+                       and sum(other.size for other in spans) + span.size <= max_length), None)
+        if target is None:
+            target = []
+            bins.append(target)
+        target.append(span)
+    if len(bins) > len(dids):
+        raise ValueError(f"Signals need {len(bins)} dynamic DIDs, only {len(dids)} available")
+    # Spans keep their source order inside a dynamic DID
+    return [DynamicDID(did, sorted(spans, key=lambda item: (item.did, item.start))) for did, spans in zip(dids, bins)]
+
+class DynamicDIDReader:
+    """Reads signals through dynamic DIDs defined on first use.
+
+    With an ECUStateController the definitions are renewed after every
+    session change or reset it makes; a dynamic DID the ECU no longer knows
+    (0x31) is redefined once per read anyway, which covers state changes
+    made behind the controller's back. receive_response reads the final
+    response after 0x78 response pending.
+    """
+
+    def __init__(self, send_request, catalog: DIDCatalog, signals: List[Tuple[int, str]], controller=None,
+                 validator: Optional[UDSValidator] = None, dids: Optional[List[int]] = None,
+                 max_length: int = DEFAULT_MAX_DYNAMIC_LENGTH, max_elements: int = DEFAULT_MAX_ELEMENTS,
+                 max_retransmissions: int = MAX_RETRANSMISSIONS, receive_response=None):
+        self.send_request = send_request
+        self.receive_response = receive_response
+        self.validator = validator or UDSValidator()
+        self.max_retransmissions = max_retransmissions
+        self.plan = plan_dynamic_dids(catalog, signals, dids, max_length, max_elements)
+        self.source_dids = len({did for did, _ in signals})
+        self.defined = False
+        self.requests = 0
+        self.definitions = 0
+        if controller is not None:
+            controller.add_listener(self._state_changed)
+
+    def _state_changed(self, event: str, state: Tuple):
+        self.defined = False
+
+    def invalidate(self):
+        """Force redefinition before the next read (e.g. after a reset the controller did not see)"""
+        self.defined = False
+
+    def _exchange(self, request: bytes) -> Optional[bytes]:
+        """Send a request, again if the response was lost"""
+        for _ in range(self.max_retransmissions + 1):
+            self.requests += 1
+            response = final_response(self.send_request(request), request[0], self.receive_response)
+            if response is not None:
+                return response
+        return None
+
+    def define(self):
+        """Clear the planned dynamic DIDs and define them again"""
+        for dynamic in self.plan:
+            # Clearing a DID that is not defined may be refused; the definition below decides
+            self._exchange(bytes([0x2C, CLEAR_DYNAMIC_DID]) + dynamic.did.to_bytes(2, 'big'))
+            result = self.validator.validate_dynamically_define_data_identifier(
+                self._exchange(dynamic.define_request()), DEFINE_BY_IDENTIFIER, dynamic.did)
+            if not result['valid']:
+                raise DynamicDIDError(f"Defining DID 0x{dynamic.did:04X} failed: {result['message']}")
+        self.definitions += 1
+        self.defined = True
+
+    def read(self) -> Dict[Tuple[int, str], Any]:
+        """Physical value of every signal by (source DID, signal name)"""
+        if not self.defined:
+            self.define()
+        values, redefined = {}, False
+        for dynamic in self.plan:
+            while True:
+                response = self._exchange(b"\x22" + dynamic.did.to_bytes(2, 'big'))
+                result = self.validator.validate_read_data_by_identifier(response, dynamic.did)
+                if result['valid'] and len(result.get('data', b"")) != dynamic.length:
+                    raise DynamicDIDError(f"DID 0x{dynamic.did:04X}: expected {dynamic.length} bytes, "
+                                          f"got {len(result['data'])}")
+                if result['valid']:
+                    break
+                if result['nrc'] != 0x31 or redefined:
+                    raise DynamicDIDError(f"Reading DID 0x{dynamic.did:04X} failed: {result['message']}")
+                # The ECU dropped the definitions (session change or reset we were not told about)
+                self.define()
+                redefined = True
+            values.update(dynamic.decode(result['data']))
+        return values
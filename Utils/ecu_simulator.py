@@ -0,0 +1,565 @@
+# Utils/ecu_simulator.py
+"""
+Stateful local ECU simulator
+Tracks diagnostic session, security access and resets so runner features
+(scheduling, caching, flashing) can be exercised without a real ECU.
+"""
+
+import time
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from Utils.flash_compression import ZlibCompression, LzmaCompression
+from Utils.flash_engine import ROUTINE_ERASE_MEMORY, ROUTINE_CHECK_MEMORY, ROUTINE_REGION_HASHES
+from Utils.checksums import checksum_for_digest
+
+# Identification data served through 0x22 (matches the 0x22 suite mock ECU)
+DEFAULT_DIDS = {
+    0xF190: b"1HGBH41JXMN109186",   # VIN
+    0xF187: b"37820-RBB-003",       # Vehicle manufacturer spare part number
+    0xF188: b"39990-TBA-A030",      # Vehicle manufacturer ECU software number
+}
+
+SUPPORTED_SESSIONS = (0x01, 0x02, 0x03)
+SUPPORTED_RESETS = (0x01, 0x02, 0x03)
+PROGRAMMING_SESSION = 0x02
+
+# maxNumberOfBlockLength reported by RequestDownload (includes SID and block sequence counter)
+DEFAULT_MAX_BLOCK_LENGTH = 4096
+
+# Value of erased flash
+ERASED_BYTE = 0xFF
+
+# Largest memorySize accepted by ReadMemoryByAddress
+DEFAULT_MAX_READ_LENGTH = 1024
+
+# Longest response the transport carries (ISO-TP); longer responses are rejected with 0x14
+DEFAULT_MAX_RESPONSE_LENGTH = 4095
+
+# DynamicallyDefineDataIdentifier: DID range (ISO 14229-1 Annex C), bytes and source elements per dynamic DID
+DYNAMIC_DID_RANGE = range(0xF200, 0xF400)
+DEFAULT_MAX_DYNAMIC_DID_LENGTH = 64
+DEFAULT_MAX_DYNAMIC_DID_ELEMENTS = 16
+
+# ReadDataByPeriodicIdentifier: seconds between frames per transmissionMode (slow, medium, fast; manufacturer
+# specific) and stopSending. Periodic DIDs are 0xF2xx, addressed by their low byte.
+DEFAULT_PERIODIC_PERIODS = {0x01: 1.0, 0x02: 0.2, 0x03: 0.025}
+STOP_SENDING = 0x04
+PERIODIC_DID_BASE = 0xF200
+
+def default_key_function(seed: bytes, level: int) -> bytes:
+    """Demo seed/key algorithm used by the mock ECUs (seed XOR 0xFF)"""
+    return bytes(b ^ 0xFF for b in seed)
+
+class ECUSimulator:
+    """Simulated ECU answering UDS requests with session and security state"""
+
+    def __init__(self, dids: Optional[Dict[int, bytes]] = None, key_function=default_key_function,
+                 max_block_length: int = DEFAULT_MAX_BLOCK_LENGTH, latency: float = 0.0,
+                 data_decoders: Optional[Dict[int, Callable[[], Callable[[bytes], bytes]]]] = None):
+        self.dids = dict(DEFAULT_DIDS if dids is None else dids)
+        self.max_block_length = max_block_length
+        # Injected round-trip time per request (sleeps, so a waiting tester thread releases the GIL)
+        self.latency = latency
+        # dataFormatIdentifier -> factory of a stateful decoder applied to TransferData payloads in order.
+        # Compression (high nibble) and encryption (low nibble) registered separately are combined.
+        self.data_decoders = {0x00: None, ZlibCompression.method << 4: ZlibCompression.decompressor,
+                              LzmaCompression.method << 4: LzmaCompression.decompressor, **(data_decoders or {})}
+        # Fault injection for TransferData: every Nth block (0 disables)
+        self.response_pending_every = 0    # answer 0x78 first; the final response comes from receive_response()
+        self.wrong_sequence_every = 0      # reject once with 0x73 without storing the block
+        self.lose_response_every = 0       # store the block but lose the response (None)
+        self.link_drop_every = 0           # store the block, then drop the link until reconnect()
+        self.link_up = True
+        self.transfer_requests = 0
+        # ReadMemoryByAddress: larger reads are rejected with read_length_nrc (0x31 or 0x14), reads touching
+        # a protected (address, length) range with protected_range_nrc (0x33 or 0x31); every Nth read
+        # response is lost (0 disables)
+        self.max_read_length = DEFAULT_MAX_READ_LENGTH
+        self.read_length_nrc = 0x31
+        self.protected_ranges: List[Tuple[int, int]] = []
+        self.protected_range_nrc = 0x33
+        self.lose_read_every = 0
+        self.read_requests = 0
+        # ReadDataByIdentifier with several DIDs: unsupported DIDs are left out of the response unless
+        # reject_partial_reads (then the request is rejected with 0x31); more than max_dids_per_request
+        # DIDs (0: no limit) are rejected with 0x13
+        self.max_response_length = DEFAULT_MAX_RESPONSE_LENGTH
+        self.max_dids_per_request = 0
+        self.reject_partial_reads = False
+        # Dynamic DID -> [(source DID, 1-based position, size)]; cleared on session changes and resets
+        self.dynamic_dids: Dict[int, List[Tuple[int, int, int]]] = {}
+        self.max_dynamic_did_length = DEFAULT_MAX_DYNAMIC_DID_LENGTH
+        self.max_dynamic_did_elements = DEFAULT_MAX_DYNAMIC_DID_ELEMENTS
+        self.max_dynamic_dids = 16
+        # Periodic DID -> (period, next due time); streaming stops on session changes and resets.
+        # Transmission modes outside periodic_modes are rejected with 0x31; after periodic_stop_after
+        # frames (0 disables) the ECU stops streaming once, as if it had dropped the schedule
+        self.periodic: Dict[int, List[float]] = {}
+        self.periodic_periods = dict(DEFAULT_PERIODIC_PERIODS)
+        self.periodic_modes = tuple(DEFAULT_PERIODIC_PERIODS)
+        self.max_periodic_dids = 8
+        self.periodic_stop_after = 0
+        self.periodic_frames = 0
+        # Every Nth request (0 disables) is answered with 0x21 busy repeat request
+        self.busy_every = 0
+        self.pending_response = None
+        # Flash contents as segments by start address (unwritten memory reads as erased), and the transfer in progress
+        self.memory: Dict[int, bytearray] = {}
+        self.transfer = None
+        self.key_function = key_function
+        self.session = 0x01
+        self.security_level = 0
+        self.pending_seed_level = None
+        self.reset_count = 0
+        self.request_count = 0
+        self.handlers = {
+            0x10: self._diagnostic_session_control,
+            0x11: self._ecu_reset,
+            0x22: self._read_data_by_identifier,
+            0x23: self._read_memory_by_address,
+            0x2A: self._read_data_by_periodic_identifier,
+            0x2C: self._dynamically_define_data_identifier,
+            0x27: self._security_access,
+            0x31: self._routine_control,
+            0x34: self._request_download,
+            0x35: self._request_upload,
+            0x36: self._transfer_data,
+            0x37: self._request_transfer_exit,
+            0x3E: self._tester_present,
+        }
+
+    @staticmethod
+    def negative(sid: int, nrc: int) -> bytes:
+        """Build a negative response"""
+        return bytes([0x7F, sid, nrc])
+
+    def send_request(self, request: bytes) -> bytes:
+        """Process a UDS request and return the response"""
+        self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.link_up:
+            return None
+        if not request:
+            return self.negative(0x00, 0x13)
+        if self.busy_every and self.request_count % self.busy_every == 0:
+            return self.negative(request[0], 0x21)
+        handler = self.handlers.get(request[0])
+        if handler is None:
+            return self.negative(request[0], 0x11)  # Service not supported
+        if request[0] == 0x36:
+            return self._inject_transfer_faults(request, handler)
+        return handler(request)
+
+    def receive_response(self) -> Optional[bytes]:
+        """Final response after a 0x78 response pending (None if nothing is pending)"""
+        response, self.pending_response = self.pending_response, None
+        if not self.link_up:
+            return None
+        if response is not None and self.latency:
+            time.sleep(self.latency)
+        return response
+
+    def receive_message(self, timeout: float = 0.0) -> Optional[bytes]:
+        """Next unsolicited periodic frame (6A pDID data), waiting up to timeout; None if none is due"""
+        if not self.link_up or not self.periodic:
+            time.sleep(timeout)
+            return None
+        did, schedule = min(self.periodic.items(), key=lambda item: item[1][1])
+        period, due = schedule
+        wait = due - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return None
+        if wait > 0:
+            time.sleep(wait)
+        # A late frame does not cause a burst of catch-up frames
+        schedule[1] = max(due + period, time.monotonic())
+        self.periodic_frames += 1
+        if self.periodic_stop_after and self.periodic_frames >= self.periodic_stop_after:
+            self.periodic_stop_after = 0
+            self.periodic.clear()
+        data = self._did_data(did)
+        return None if data is None else bytes([0x6A, did & 0xFF]) + data
+
+    def _inject_transfer_faults(self, request: bytes, handler) -> Optional[bytes]:
+        self.transfer_requests += 1
+        count = self.transfer_requests
+        if self.wrong_sequence_every and count % self.wrong_sequence_every == 0:
+            return self.negative(0x36, 0x73)
+        response = handler(request)
+        if self.lose_response_every and count % self.lose_response_every == 0:
+            return None
+        if self.link_drop_every and count % self.link_drop_every == 0:
+            self.link_up = False
+            return None
+        if self.response_pending_every and count % self.response_pending_every == 0:
+            self.pending_response = response
+            return self.negative(0x36, 0x78)
+        return response
+
+    def write_memory(self, address: int, data: bytes):
+        """Write into the segment containing address (extending it) or start a new segment"""
+        for start, segment in self.memory.items():
+            if start <= address <= start + len(segment):
+                segment[address - start:address - start + len(data)] = data
+                return
+        self.memory[address] = bytearray(data)
+
+    def read_memory(self, address: int, size: int) -> bytes:
+        """Memory contents of a range, erased bytes where nothing was written"""
+        data = bytearray([ERASED_BYTE]) * size
+        for start, segment in self.memory.items():
+            low, high = max(start, address), min(start + len(segment), address + size)
+            if low < high:
+                data[low - address:high - address] = segment[low - start:high - start]
+        return bytes(data)
+
+    def erase_memory(self, address: int, size: int):
+        for start, segment in self.memory.items():
+            low, high = max(start, address), min(start + len(segment), address + size)
+            if low < high:
+                segment[low - start:high - start] = bytes([ERASED_BYTE]) * (high - low)
+
+    def reconnect(self):
+        """Restore a dropped link; the ECU has meanwhile left its session (S3 timeout)"""
+        if not self.link_up:
+            self.link_up = True
+            self.power_cycle()
+        return True
+
+    def power_cycle(self):
+        """Return to the default session with security locked"""
+        self.session = 0x01
+        self.security_level = 0
+        self.pending_seed_level = None
+        self.transfer = None
+        self.dynamic_dids.clear()
+        self.periodic.clear()
+
+    def _diagnostic_session_control(self, request: bytes) -> bytes:
+        if len(request) != 2:
+            return self.negative(0x10, 0x13)
+        session = request[1]
+        if session not in SUPPORTED_SESSIONS:
+            return self.negative(0x10, 0x12)
+        # Any session transition relocks security access, drops dynamically defined DIDs and stops streaming
+        self.session = session
+        self.security_level = 0
+        self.pending_seed_level = None
+        self.transfer = None
+        self.dynamic_dids.clear()
+        self.periodic.clear()
+        return bytes([0x50, session, 0x00, 0x32, 0x01, 0xF4])
+
+    def _ecu_reset(self, request: bytes) -> bytes:
+        if len(request) != 2:
+            return self.negative(0x11, 0x13)
+        if request[1] not in SUPPORTED_RESETS:
+            return self.negative(0x11, 0x12)
+        self.reset_count += 1
+        self.power_cycle()
+        return bytes([0x51, request[1]])
+
+    def _did_data(self, did: int) -> Optional[bytes]:
+        """Current data record of a DID, None if not supported"""
+        if did == 0xF186:
+            return bytes([self.session])
+        if did in self.dynamic_dids:
+            return b"".join(self.dids[source][position - 1:position - 1 + size]
+                            for source, position, size in self.dynamic_dids[did])
+        return self.dids.get(did)
+
+    def _read_data_by_identifier(self, request: bytes) -> bytes:
+        if len(request) < 3 or len(request) % 2 == 0:
+            return self.negative(0x22, 0x13)
+        dids = [int.from_bytes(request[i:i + 2], 'big') for i in range(1, len(request), 2)]
+        if self.max_dids_per_request and len(dids) > self.max_dids_per_request:
+            return self.negative(0x22, 0x13)
+        records = []
+        for did in dids:
+            data = self._did_data(did)
+            if data is not None:
+                records.append(did.to_bytes(2, 'big') + data)
+            elif self.reject_partial_reads:
+                return self.negative(0x22, 0x31)
+        if not records:
+            return self.negative(0x22, 0x31)
+        response = b"\x62" + b"".join(records)
+        if len(response) > self.max_response_length:
+            return self.negative(0x22, 0x14)
+        return response
+
+    def _read_data_by_periodic_identifier(self, request: bytes) -> bytes:
+        if len(request) < 2:
+            return self.negative(0x2A, 0x13)
+        mode = request[1]
+        dids = [PERIODIC_DID_BASE | pdid for pdid in request[2:]]
+        if mode == STOP_SENDING:  # Without periodic DIDs all are stopped
+            if not dids:
+                self.periodic.clear()
+            for did in dids:
+                self.periodic.pop(did, None)
+            return bytes([0x6A])
+        if not dids:
+            return self.negative(0x2A, 0x13)
+        if mode not in self.periodic_periods or mode not in self.periodic_modes:
+            return self.negative(0x2A, 0x31)
+        if any(self._did_data(did) is None for did in dids) \
+                or len(set(self.periodic) | set(dids)) > self.max_periodic_dids:
+            return self.negative(0x2A, 0x31)
+        period = self.periodic_periods[mode]
+        start = time.monotonic()
+        for did in dids:
+            self.periodic[did] = [period, start]
+        return bytes([0x6A])
+
+    def _dynamically_define_data_identifier(self, request: bytes) -> bytes:
+        if len(request) < 2:
+            return self.negative(0x2C, 0x13)
+        sub_function = request[1] & 0x7F
+        if sub_function == 0x03:  # clearDynamicallyDefinedDataIdentifier (all without a DID)
+            if len(request) not in (2, 4):
+                return self.negative(0x2C, 0x13)
+            if len(request) == 2:
+                self.dynamic_dids.clear()
+            else:
+                self.dynamic_dids.pop(int.from_bytes(request[2:4], 'big'), None)
+            return bytes([0x6C, 0x03]) + request[2:4]
+        if sub_function != 0x01:  # Only defineByIdentifier
+            return self.negative(0x2C, 0x12)
+        if len(request) < 8 or (len(request) - 4) % 4:
+            return self.negative(0x2C, 0x13)
+        did = int.from_bytes(request[2:4], 'big')
+        elements = [(int.from_bytes(request[i:i + 2], 'big'), request[i + 2], request[i + 3])
+                    for i in range(4, len(request), 4)]
+        for source, position, size in elements:
+            data = self.dids.get(source)
+            if data is None or not position or not size or position - 1 + size > len(data):
+                return self.negative(0x2C, 0x31)
+        # Further definitions of a DID append to it
+        elements = self.dynamic_dids.get(did, []) + elements
+        if did not in DYNAMIC_DID_RANGE or len(elements) > self.max_dynamic_did_elements \
+                or sum(size for _, _, size in elements) > self.max_dynamic_did_length \
+                or (did not in self.dynamic_dids and len(self.dynamic_dids) >= self.max_dynamic_dids):
+            return self.negative(0x2C, 0x31)
+        self.dynamic_dids[did] = elements
+        return bytes([0x6C, 0x01]) + request[2:4]
+
+    def _read_memory_by_address(self, request: bytes) -> Optional[bytes]:
+        parameters = self._parse_memory_parameters(request[1:])
+        if parameters is None or parameters[2]:
+            return self.negative(0x23, 0x13)
+        address, size, _ = parameters
+        self.read_requests += 1
+        if self.lose_read_every and self.read_requests % self.lose_read_every == 0:
+            return None
+        if not size:
+            return self.negative(0x23, 0x31)
+        if size > self.max_read_length:
+            return self.negative(0x23, self.read_length_nrc)
+        if any(start < address + size and address < start + length for start, length in self.protected_ranges):
+            return self.negative(0x23, self.protected_range_nrc)
+        return b"\x63" + self.read_memory(address, size)
+
+    def _security_access(self, request: bytes) -> bytes:
+        if len(request) < 2:
+            return self.negative(0x27, 0x13)
+        sub_function = request[1]
+        if self.session == 0x01:
+            return self.negative(0x27, 0x7F)  # Not supported in default session
+        level = (sub_function + 1) // 2
+
+        if sub_function % 2 == 1:  # requestSeed
+            self.pending_seed_level = level
+            if self.security_level == level:
+                return bytes([0x67, sub_function, 0x00, 0x00, 0x00, 0x00])  # Already unlocked
+            return bytes([0x67, sub_function]) + self._seed(level)
+
+        if self.pending_seed_level != level:  # sendKey without seed
+            return self.negative(0x27, 0x24)
+        self.pending_seed_level = None
+        if request[2:] != self.key_function(self._seed(level), level):
+            return self.negative(0x27, 0x35)
+        self.security_level = level
+        return bytes([0x67, sub_function])
+
+    def _seed(self, level: int) -> bytes:
+        return bytes([0x12, 0x34, 0x56, 0x78 + level - 1])
+
+    def _tester_present(self, request: bytes) -> bytes:
+        if len(request) != 2 or request[1] not in (0x00, 0x80):
+            return self.negative(0x3E, 0x12 if len(request) == 2 else 0x13)
+        return bytes([0x7E, 0x00]) if request[1] == 0x00 else b""
+
+    @staticmethod
+    def _parse_memory_parameters(data: bytes):
+        """(address, size, remaining bytes) after an addressAndLengthFormatIdentifier, None if malformed"""
+        if not data:
+            return None
+        address_bytes, size_bytes = data[0] & 0x0F, data[0] >> 4
+        end = 1 + address_bytes + size_bytes
+        if not address_bytes or not size_bytes or len(data) < end:
+            return None
+        return (int.from_bytes(data[1:1 + address_bytes], 'big'),
+                int.from_bytes(data[1 + address_bytes:end], 'big'), data[end:])
+
+    def _routine_control(self, request: bytes) -> bytes:
+        if len(request) < 4:
+            return self.negative(0x31, 0x13)
+        routine_id = int.from_bytes(request[2:4], 'big')
+        if routine_id not in (ROUTINE_ERASE_MEMORY, ROUTINE_CHECK_MEMORY, ROUTINE_REGION_HASHES):
+            return self.negative(0x31, 0x31)
+        if request[1] != 0x01:
+            return self.negative(0x31, 0x12)  # Only startRoutine
+        if self.session != PROGRAMMING_SESSION:
+            return self.negative(0x31, 0x22)
+        parameters = self._parse_memory_parameters(request[4:])
+        if parameters is None:
+            return self.negative(0x31, 0x13)
+        address, size, rest = parameters
+        prefix = bytes([0x71, 0x01]) + request[2:4]
+
+        if routine_id == ROUTINE_ERASE_MEMORY:
+            if rest:
+                return self.negative(0x31, 0x13)
+            if not self.security_level:
+                return self.negative(0x31, 0x33)
+            self.erase_memory(address, size)
+            return prefix + b"\x00"  # routineStatus: erased
+
+        if routine_id == ROUTINE_CHECK_MEMORY:
+            # Expected digest after the memory range; the method follows from its length
+            method = checksum_for_digest(rest)
+            if method is None:
+                return self.negative(0x31, 0x31)
+            return prefix + (b"\x00" if self._checksum_matches(address, size, rest) else b"\x01")
+
+        # Region hashes: 4-byte sector size, answered with one SHA-256 digest per sector
+        if len(rest) != 4 or not int.from_bytes(rest, 'big'):
+            return self.negative(0x31, 0x13)
+        sector_size = int.from_bytes(rest, 'big')
+        data = self.read_memory(address, size)
+        return prefix + b"".join(hashlib.sha256(data[offset:offset + sector_size]).digest()
+                                 for offset in range(0, size, sector_size))
+
+    def _checksum_matches(self, address: int, size: int, digest: bytes) -> bool:
+        checksum = checksum_for_digest(digest)()
+        checksum.update(self.read_memory(address, size))
+        return checksum.digest() == digest
+
+    def _request_download(self, request: bytes) -> bytes:
+        if len(request) < 3:
+            return self.negative(0x34, 0x13)
+        address_bytes = request[2] & 0x0F
+        size_bytes = request[2] >> 4
+        if not address_bytes or not size_bytes or len(request) != 3 + address_bytes + size_bytes:
+            return self.negative(0x34, 0x13)
+        if self.session != PROGRAMMING_SESSION:
+            return self.negative(0x34, 0x22)
+        if not self.security_level:
+            return self.negative(0x34, 0x33)
+        if self.transfer is not None:
+            return self.negative(0x34, 0x70)  # Download already active
+        decode = self._data_decoder(request[1])
+        if decode is False:
+            return self.negative(0x34, 0x31)  # Unsupported compression/encryption method
+        address = int.from_bytes(request[3:3 + address_bytes], 'big')
+        size = int.from_bytes(request[3 + address_bytes:], 'big')
+        self.transfer = {'address': address, 'size': size, 'written': 0, 'expected_bsc': 1, 'last_bsc': None,
+                         'decode': decode, 'upload': False}
+        length_bytes = (self.max_block_length.bit_length() + 7) // 8
+        return bytes([0x74, length_bytes << 4]) + self.max_block_length.to_bytes(length_bytes, 'big')
+
+    def _request_upload(self, request: bytes) -> bytes:
+        if len(request) < 3:
+            return self.negative(0x35, 0x13)
+        parameters = self._parse_memory_parameters(request[2:])
+        if parameters is None or parameters[2]:
+            return self.negative(0x35, 0x13)
+        if self.session != PROGRAMMING_SESSION:
+            return self.negative(0x35, 0x22)
+        if not self.security_level:
+            return self.negative(0x35, 0x33)
+        if self.transfer is not None:
+            return self.negative(0x35, 0x70)
+        if request[1] != 0x00:
+            return self.negative(0x35, 0x31)  # Uploads are plain data only
+        address, size, _ = parameters
+        # 'written' counts the bytes sent to the tester; the last block is kept for a repeated counter
+        self.transfer = {'address': address, 'size': size, 'written': 0, 'expected_bsc': 1, 'last_bsc': None,
+                         'decode': None, 'upload': True, 'last_block': b""}
+        length_bytes = (self.max_block_length.bit_length() + 7) // 8
+        return bytes([0x75, length_bytes << 4]) + self.max_block_length.to_bytes(length_bytes, 'big')
+
+    def _upload_block(self, request: bytes) -> bytes:
+        transfer = self.transfer
+        bsc = request[1]
+        if len(request) != 2:
+            return self.negative(0x36, 0x13)
+        if bsc == transfer['last_bsc']:
+            return bytes([0x76, bsc]) + transfer['last_block']  # Response was lost: send the block again
+        if bsc != transfer['expected_bsc']:
+            return self.negative(0x36, 0x73)
+        if transfer['written'] >= transfer['size']:
+            return self.negative(0x36, 0x24)  # Everything was uploaded already
+        length = min(self.max_block_length - 2, transfer['size'] - transfer['written'])
+        block = self.read_memory(transfer['address'] + transfer['written'], length)
+        transfer.update(written=transfer['written'] + length, last_bsc=bsc, expected_bsc=(bsc + 1) & 0xFF,
+                        last_block=block)
+        return bytes([0x76, bsc]) + block
+
+    def _data_decoder(self, data_format: int):
+        """Payload decoder for a dataFormatIdentifier, None for plain data, False if unsupported"""
+        if data_format in self.data_decoders:
+            factory = self.data_decoders[data_format]
+            return factory() if factory else None
+        compression, encryption = data_format & 0xF0, data_format & 0x0F
+        if compression not in self.data_decoders or encryption not in self.data_decoders:
+            return False
+        # The tester compresses, then encrypts: decrypt first
+        decrypt, decompress = self.data_decoders[encryption](), self.data_decoders[compression]()
+        return lambda payload: decompress(decrypt(payload))
+
+    def _transfer_data(self, request: bytes) -> bytes:
+        if len(request) < 2:
+            return self.negative(0x36, 0x13)
+        if self.transfer is None:
+            return self.negative(0x36, 0x24)  # No download active
+        if self.transfer['upload']:
+            return self._upload_block(request)
+        if len(request) > self.max_block_length:
+            return self.negative(0x36, 0x13)
+        transfer = self.transfer
+        bsc = request[1]
+        if bsc == transfer['last_bsc']:
+            return bytes([0x76, bsc])  # Repeated block (lost response): acknowledged, not written again
+        if bsc != transfer['expected_bsc']:
+            return self.negative(0x36, 0x73)
+        payload = request[2:]
+        if transfer['decode'] is not None:
+            payload = transfer['decode'](payload)
+        if transfer['written'] + len(payload) > transfer['size']:
+            return self.negative(0x36, 0x71)
+        # Blocks are programmed as they arrive, so an aborted download keeps what was acknowledged
+        self.write_memory(transfer['address'] + transfer['written'], payload)
+        transfer['written'] += len(payload)
+        transfer['last_bsc'] = bsc
+        transfer['expected_bsc'] = (bsc + 1) & 0xFF
+        return bytes([0x76, bsc])
+
+    def _request_transfer_exit(self, request: bytes) -> bytes:
+        if self.transfer is None:
+            return self.negative(0x37, 0x24)
+        transfer = self.transfer
+        if transfer['written'] != transfer['size']:
+            return self.negative(0x37, 0x24)  # Not all announced data was transferred
+        # A CRC16/CRC32/SHA-256 transferRequestParameterRecord is verified against the programmed range
+        parameters = request[1:]
+        if not transfer['upload'] and checksum_for_digest(parameters) is not None and \
+                not self._checksum_matches(transfer['address'], transfer['size'], parameters):
+            self.transfer = None
+            return self.negative(0x37, 0x72)  # General programming failure
+        self.transfer = None
+        return bytes([0x77])
@@ -0,0 +1,150 @@
+# Utils/flash_compression.py
+"""
+Streaming compression stage for downloads
+The image is compressed on a worker thread (zlib and lzma release the GIL)
+into a bounded queue and re-cut into TransferData payloads, so the
+transfer loop never waits for a whole-image compression pass. The
+compression method is announced in the high nibble of the
+dataFormatIdentifier of RequestDownload.
+"""
+
+import lzma
+import zlib
+import queue
+import threading
+from typing import Callable, Iterator, Optional
+
+# Input consumed per compressor call and compressed chunks buffered ahead of the transfer
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_QUEUE_DEPTH = 16
+
+_END = object()
+
+class ZlibCompression:
+    """compressionMethod 1: zlib/deflate stream"""
+
+    method = 0x1
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compressor(self):
+        return zlib.compressobj(self.level)
+
+    @staticmethod
+    def decompressor():
+        return zlib.decompressobj().decompress
+
+class LzmaCompression:
+    """compressionMethod 2: LZMA (xz container)"""
+
+    method = 0x2
+    name = "lzma"
+
+    def __init__(self, preset: int = 6):
+        self.preset = preset
+
+    def compressor(self):
+        return lzma.LZMACompressor(preset=self.preset)
+
+    @staticmethod
+    def decompressor():
+        return lzma.LZMADecompressor().decompress
+
+# Reference methods; any object with method, compressor() and decompressor() can be used
+COMPRESSION_METHODS = {cls.name: cls for cls in (ZlibCompression, LzmaCompression)}
+
+def get_compression(name: str, level: Optional[int] = None):
+    """Instantiate a compression method by name"""
+    try:
+        cls = COMPRESSION_METHODS[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression {name!r}, expected one of {', '.join(COMPRESSION_METHODS)}")
+    return cls() if level is None else cls(level)
+
+class CompressionStage:
+    """Compresses a buffer on a worker thread into a bounded queue of chunks"""
+
+    def __init__(self, data: memoryview, compression, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 queue_depth: int = DEFAULT_QUEUE_DEPTH, on_chunk: Optional[Callable[[memoryview], None]] = None):
+        self.data = data
+        self.compression = compression
+        # Sees every uncompressed chunk on the worker thread, e.g. an incremental checksum
+        self.on_chunk = on_chunk
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.consumed = 0  # Uncompressed bytes handed to the compressor
+        self.produced = 0  # Compressed bytes queued
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="flash-compressor", daemon=True)
+
+    def start(self) -> "CompressionStage":
+        self._thread.start()
+        return self
+
+    def _put(self, item) -> bool:
+        # Bounded queue: wait for the transfer to catch up, but give up once closed
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            compressor = self.compression.compressor()
+            for offset in range(0, len(self.data), self.chunk_size):
+                if self._stop.is_set():
+                    return
+                # Released right away: an error raised with this frame must not keep the input exported
+                with self.data[offset:offset + self.chunk_size] as chunk:
+                    if self.on_chunk is not None:
+                        self.on_chunk(chunk)
+                    output = compressor.compress(chunk)
+                    self.consumed = offset + len(chunk)
+                if output:
+                    self.produced += len(output)
+                    if not self._put(output):
+                        return
+            output = compressor.flush()
+            self.produced += len(output)
+            if output and not self._put(output):
+                return
+            self._put(_END)
+        except BaseException as e:
+            self._put(e)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            item = self.queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self):
+        """Stop the worker (e.g. after a failed transfer) and wait until it released the input"""
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(0.05)
+
+def rechunk(chunks: Iterator[bytes], block_size: int) -> Iterator[bytes]:
+    """Cut a stream of chunks into payloads of exactly block_size (the last one may be shorter)"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= block_size:
+            full = len(buffer) - len(buffer) % block_size
+            for offset in range(0, full, block_size):
+                yield bytes(buffer[offset:offset + block_size])
+            del buffer[:full]
+    if buffer:
+        yield bytes(buffer)
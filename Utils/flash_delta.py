@@ -0,0 +1,195 @@
+# Utils/flash_delta.py
+"""
+Delta flashing
+Compares the new image sector by sector with the previous image, or with
+per-sector SHA-256 digests read back from the ECU through a routine, and
+erases and downloads only the changed regions through the flash engine.
+"""
+
+import os
+import time
+import hashlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from Utils.flash_engine import (FlashEngine, FlashError, FlashReport, DEFAULT_DATA_FORMAT,
+                                DEFAULT_ADDRESS_LENGTH_FORMAT, ROUTINE_REGION_HASHES, with_mapped_files)
+
+# Erase granularity of the target flash
+DEFAULT_SECTOR_SIZE = 4096
+
+# Sector digests requested per region hash routine call (32 bytes each)
+DEFAULT_HASH_BATCH = 64
+
+class DeltaPlan:
+    """Changed regions of an image as (offset, length), sector aligned"""
+
+    def __init__(self, size: int, sector_size: int, regions: List[Tuple[int, int]], source: str):
+        self.size = size
+        self.sector_size = sector_size
+        self.regions = regions
+        # 'image' (compared with the previous image) or 'ecu' (compared with ECU digests)
+        self.source = source
+
+    @property
+    def changed(self) -> int:
+        return sum(length for _, length in self.regions)
+
+    @property
+    def skipped(self) -> int:
+        return self.size - self.changed
+
+def changed_sectors(data: memoryview, previous: memoryview, sector_size: int) -> Iterator[int]:
+    """Offsets of sectors that differ from the previous image (or lie beyond its end)"""
+    for offset in range(0, len(data), sector_size):
+        # bytes comparison is a memcmp; comparing memoryviews goes element by element
+        if data[offset:offset + sector_size].tobytes() != previous[offset:offset + sector_size].tobytes():
+            yield offset
+
+def changed_sectors_from_digests(data: memoryview, digests: List[bytes], sector_size: int) -> Iterator[int]:
+    """Offsets of sectors whose SHA-256 differs from the digest the ECU reported"""
+    for index, offset in enumerate(range(0, len(data), sector_size)):
+        if index >= len(digests) or hashlib.sha256(data[offset:offset + sector_size]).digest() != digests[index]:
+            yield offset
+
+def merge_sectors(offsets: Iterator[int], sector_size: int, size: int, merge_gap: int = 0) -> List[Tuple[int, int]]:
+    """Merge changed sector offsets into regions.
+
+    Regions separated by at most merge_gap unchanged sectors are joined, as
+    every region costs an erase, a RequestDownload and a RequestTransferExit.
+    """
+    regions = []
+    start = end = None
+    for offset in offsets:
+        if start is not None and offset - end <= merge_gap * sector_size:
+            end = offset + sector_size
+            continue
+        if start is not None:
+            regions.append((start, min(end, size) - start))
+        start, end = offset, offset + sector_size
+    if start is not None:
+        regions.append((start, min(end, size) - start))
+    return regions
+
+class DeltaReport:
+    """Result of a delta flash"""
+
+    def __init__(self, plan: DeltaPlan, address: int):
+        self.plan = plan
+        self.address = address
+        self.regions: List[FlashReport] = []
+        self.plan_duration = 0.0
+        self.duration = 0.0
+
+    @property
+    def downloaded(self) -> int:
+        return sum(report.size for report in self.regions)
+
+    @property
+    def skipped(self) -> int:
+        return self.plan.size - self.downloaded
+
+    def to_dict(self) -> Dict:
+        return {
+            'address': self.address,
+            'size': self.plan.size,
+            'sector_size': self.plan.sector_size,
+            'source': self.plan.source,
+            'downloaded': self.downloaded,
+            'skipped': self.skipped,
+            'plan_duration': self.plan_duration,
+            'duration': self.duration,
+            'regions': [report.to_dict() for report in self.regions],
+        }
+
+    def print_summary(self):
+        size = self.plan.size
+        print(f"Delta flash of {size} bytes to 0x{self.address:08X} ({self.plan.sector_size} byte sectors, "
+              f"compared with {'ECU digests' if self.plan.source == 'ecu' else 'previous image'})")
+        print(f"Regions: {len(self.regions)}  Downloaded: {self.downloaded} bytes  "
+              f"Skipped: {self.skipped} bytes ({100.0 * self.skipped / size if size else 0:.1f}% of a full flash)")
+        print(f"Duration: {self.duration:.3f}s (planning {self.plan_duration:.3f}s)")
+        for report in self.regions:
+            print(f"  0x{report.address:08X} +{report.size}: {report.blocks} blocks, {report.throughput:.2f} MB/s")
+
+class DeltaFlasher:
+    """Plans and runs delta downloads through a FlashEngine"""
+
+    def __init__(self, engine: FlashEngine, sector_size: int = DEFAULT_SECTOR_SIZE, merge_gap: int = 0,
+                 erase: bool = True, hash_batch: int = DEFAULT_HASH_BATCH):
+        self.engine = engine
+        self.sector_size = sector_size
+        self.merge_gap = merge_gap
+        # Erase each region before downloading it (eraseMemory routine)
+        self.erase = erase
+        self.hash_batch = hash_batch
+
+    def read_digests(self, address: int, size: int,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> List[bytes]:
+        """Per-sector SHA-256 digests of the ECU's memory, hash_batch sectors per routine call"""
+        digests = []
+        span = self.sector_size * self.hash_batch
+        for offset in range(0, size, span):
+            length = min(span, size - offset)
+            option = bytes([address_length_format]) + \
+                (address + offset).to_bytes(address_length_format & 0x0F, 'big') + \
+                length.to_bytes(address_length_format >> 4, 'big') + self.sector_size.to_bytes(4, 'big')
+            record = self.engine.routine_control(ROUTINE_REGION_HASHES, option, "RegionHashes")
+            expected = -(-length // self.sector_size)
+            if len(record) != expected * 32:
+                raise FlashError("RegionHashes", f"Expected {expected} digests, got {len(record)} bytes")
+            digests += [record[i:i + 32] for i in range(0, len(record), 32)]
+        return digests
+
+    def plan(self, data, address: int, previous=None,
+             address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> DeltaPlan:
+        """Changed regions against the previous image, or against ECU digests when previous is None"""
+        view = memoryview(data).cast('B')
+        try:
+            if previous is not None:
+                with memoryview(previous).cast('B') as old:
+                    offsets = list(changed_sectors(view, old, self.sector_size))
+                source = 'image'
+            else:
+                digests = self.read_digests(address, len(view), address_length_format)
+                offsets = changed_sectors_from_digests(view, digests, self.sector_size)
+                source = 'ecu'
+            regions = merge_sectors(offsets, self.sector_size, len(view), self.merge_gap)
+            return DeltaPlan(len(view), self.sector_size, regions, source)
+        finally:
+            view.release()
+
+    def flash_buffer(self, data, address: int, previous=None, data_format: int = DEFAULT_DATA_FORMAT,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> DeltaReport:
+        """Erase and download the regions of data that differ from the ECU's current contents"""
+        start = time.perf_counter()
+        plan = self.plan(data, address, previous, address_length_format)
+        report = DeltaReport(plan, address)
+        report.plan_duration = time.perf_counter() - start
+        view = memoryview(data).cast('B')
+        try:
+            for offset, length in plan.regions:
+                if self.erase:
+                    self.engine.erase_memory(address + offset, length, address_length_format)
+                with view[offset:offset + length] as region:
+                    report.regions.append(self.engine.flash_buffer(region, address + offset, data_format,
+                                                                   address_length_format))
+        finally:
+            view.release()
+        report.duration = time.perf_counter() - start
+        return report
+
+    def flash_file(self, path: str, address: int, previous_path: Optional[str] = None,
+                   data_format: int = DEFAULT_DATA_FORMAT,
+                   address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> DeltaReport:
+        """Memory-map the image (and the previous image) and delta flash it"""
+        if os.path.getsize(path) == 0:
+            raise FlashError("RequestDownload", f"{path} is empty")
+        if previous_path is None:
+            return with_mapped_files([path], lambda image: self.flash_buffer(image, address, None, data_format,
+                                                                             address_length_format))
+        if os.path.getsize(previous_path) == 0:
+            # Empty files cannot be mapped; every sector differs
+            return with_mapped_files([path], lambda image: self.flash_buffer(image, address, b"", data_format,
+                                                                             address_length_format))
+        return with_mapped_files([path, previous_path], lambda image, previous: self.flash_buffer(
+            image, address, previous, data_format, address_length_format))
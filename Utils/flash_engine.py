@@ -0,0 +1,447 @@
+# Utils/flash_engine.py
+"""
+Streaming flash engine
+Downloads an image with RequestDownload (0x34), TransferData (0x36) and
+RequestTransferExit (0x37). The image is memory-mapped and every block is
+a memoryview slice of the mapping, so multi-megabyte images are never read
+into memory as a whole. In pipelined mode block N+1 is framed (and
+transformed, e.g. encrypted) on a worker thread while block N is in flight.
+With a compression method the image is compressed on its own worker thread
+(Utils/flash_compression.py) and streamed into the blocks.
+"""
+
+import os
+import mmap
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from uds_validator_extended import UDSValidator
+from Utils.uds_utils import distribution
+from Utils.flash_compression import CompressionStage, rechunk
+
+# RequestDownload defaults: plain data, 4-byte memory size and 4-byte address
+DEFAULT_DATA_FORMAT = 0x00
+DEFAULT_ADDRESS_LENGTH_FORMAT = 0x44
+
+# TransferData request overhead inside maxNumberOfBlockLength: SID + block sequence counter
+TRANSFER_DATA_HEADER = 2
+
+# Bounds for 0x78 response pending per request and retransmissions per block
+MAX_RESPONSE_PENDING = 50
+MAX_RETRANSMISSIONS = 3
+
+NRC_RESPONSE_PENDING = 0x78
+NRC_WRONG_BLOCK_SEQUENCE_COUNTER = 0x73
+
+# dataFormatIdentifier of the demo encryption (encryptingMethod 1, no compression)
+DEMO_ENCRYPTION_FORMAT = 0x01
+
+# RoutineControl identifiers: eraseMemory (ISO 14229-1), checkMemory and the per-sector
+# SHA-256 routine used for delta flashing (vehicle manufacturer specific)
+ROUTINE_ERASE_MEMORY = 0xFF00
+ROUTINE_CHECK_MEMORY = 0x0202
+ROUTINE_REGION_HASHES = 0xF0A0
+
+class FlashError(Exception):
+    """A flash step was rejected by the ECU"""
+
+    def __init__(self, stage: str, message: str, nrc: Optional[int] = None):
+        super().__init__(f"{stage}: {message}")
+        self.stage = stage
+        self.nrc = nrc
+
+class FlashReport:
+    """Result of one download"""
+
+    def __init__(self, address: int, size: int, block_size: int):
+        self.address = address
+        self.size = size
+        self.block_size = block_size
+        self.blocks = 0
+        self.block_latencies: List[float] = []
+        self.duration = 0.0
+        self.pipelined = False
+        self.retransmissions = 0
+        self.response_pending = 0
+        self.compression = None
+        # Bytes sent in TransferData payloads (differs from size when compressed)
+        self.transferred = 0
+        # Image bytes from address on acknowledged by the ECU and the last acknowledged counter;
+        # compressed blocks do not end on image offsets, so acknowledged stays 0 for them
+        self.acknowledged = 0
+        self.last_bsc = None
+        # Resumed downloads (new RequestDownload after a link drop) and the checkpoint offset started from
+        self.resumes = 0
+        self.resumed_from = 0
+        # Resumes restarted the download at offset 0 (compressed downloads)
+        self.restarted = False
+        # Digest of the downloaded range, sent with RequestTransferExit
+        self.checksum_method = None
+        self.checksum: Optional[bytes] = None
+        self.memory_checked = False
+
+    @property
+    def throughput(self) -> float:
+        """Image throughput in MB/s"""
+        return self.size / self.duration / 1e6 if self.duration else 0.0
+
+    @property
+    def wire_throughput(self) -> float:
+        """Transferred payload throughput in MB/s"""
+        return self.transferred / self.duration / 1e6 if self.duration else 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.size / self.transferred if self.transferred else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'address': self.address,
+            'size': self.size,
+            'block_size': self.block_size,
+            'blocks': self.blocks,
+            'duration': self.duration,
+            'throughput_mb_s': self.throughput,
+            'block_latency': distribution(self.block_latencies),
+            'pipelined': self.pipelined,
+            'retransmissions': self.retransmissions,
+            'response_pending': self.response_pending,
+            'compression': self.compression,
+            'transferred': self.transferred,
+            'compression_ratio': self.compression_ratio,
+            'wire_throughput_mb_s': self.wire_throughput,
+            'resumes': self.resumes,
+            'resumed_from': self.resumed_from,
+            'restarted': self.restarted,
+            'checksum_method': self.checksum_method,
+            'checksum': self.checksum.hex() if self.checksum is not None else None,
+            'memory_checked': self.memory_checked,
+        }
+
+    def print_summary(self):
+        latency = distribution(self.block_latencies)
+        print(f"Flashed {self.size} bytes to 0x{self.address:08X} in {self.blocks} blocks of {self.block_size} bytes")
+        mode = "pipelined" if self.pipelined else "serial"
+        print(f"Duration: {self.duration:.3f}s  Throughput: {self.throughput:.2f} MB/s ({mode})")
+        if self.compression:
+            print(f"Compression: {self.compression}  Transferred: {self.transferred} bytes  "
+                  f"Ratio: {self.compression_ratio:.2f}  Wire throughput: {self.wire_throughput:.2f} MB/s")
+        if self.checksum is not None:
+            checked = " (checkMemory passed)" if self.memory_checked else ""
+            print(f"Checksum: {self.checksum_method} {self.checksum.hex().upper()}{checked}")
+        if self.restarted:
+            print(f"Restarted: {self.resumes} time(s) from offset 0 (compressed downloads cannot resume)")
+        elif self.resumes or self.resumed_from:
+            print(f"Resumed: {self.resumes} time(s) after link loss, started at offset {self.resumed_from}")
+        if self.retransmissions or self.response_pending:
+            print(f"Retransmissions: {self.retransmissions}  Response pending (0x78): {self.response_pending}")
+        print(f"Block latency (ms): p50={latency['p50'] * 1e3:.3f} p90={latency['p90'] * 1e3:.3f} "
+              f"p99={latency['p99'] * 1e3:.3f} max={latency['max'] * 1e3:.3f}")
+
+def encode_memory_parameters(address: int, size: int, address_length_format: int) -> bytes:
+    """memoryAddress and memorySize fields for the given addressAndLengthFormatIdentifier"""
+    size_bytes, address_bytes = address_length_format >> 4, address_length_format & 0x0F
+    return address.to_bytes(address_bytes, 'big') + size.to_bytes(size_bytes, 'big')
+
+def demo_cipher(key: bytes = b"UDS demo key") -> Callable[[bytes], bytes]:
+    """Stateful keystream XOR used as encryptingMethod 1 by the simulator (encrypting == decrypting).
+
+    Demo only, like the seed/key algorithm of the mock ECUs.
+    """
+    offset = 0
+
+    def apply(data) -> bytes:
+        nonlocal offset
+        data = bytes(data)
+        first_block, skip = divmod(offset, 32)
+        keystream = b"".join(
+            hashlib.sha256(key + counter.to_bytes(8, 'big')).digest()
+            for counter in range(first_block, first_block + (skip + len(data) + 31) // 32)
+        )[skip:skip + len(data)]
+        offset += len(data)
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(len(data), 'big')
+    return apply
+
+def is_response_pending(response: Optional[bytes], sid: int) -> bool:
+    return response is not None and len(response) >= 3 and response[0] == 0x7F \
+        and response[1] == sid and response[2] == NRC_RESPONSE_PENDING
+
+def final_response(response: Optional[bytes], sid: int, receive_response: Optional[Callable[[], bytes]],
+                   report=None, on_give_up: Optional[Callable[[int], None]] = None) -> Optional[bytes]:
+    """Follow 0x78 response pending to the final response; None (a lost response) if it does not come.
+
+    Without receive_response the final response stays unread on the transport.
+    report (anything with a response_pending counter) counts the 0x78 followed;
+    on_give_up(pending) runs before giving up, e.g. to raise instead.
+    """
+    pending = 0
+    while is_response_pending(response, sid):
+        pending += 1
+        if receive_response is None or pending > MAX_RESPONSE_PENDING:
+            if on_give_up is not None:
+                on_give_up(pending)
+            return None
+        if report is not None:
+            report.response_pending += 1
+        response = receive_response()
+    return response
+
+def with_mapped_files(paths: List[str], use: Callable):
+    """Call use() with read-only memory maps of the files, returning its result.
+
+    use must release every memoryview of the maps it creates, also when it
+    fails: a slice still referenced by a traceback frame would make closing
+    the map raise BufferError instead of the original error.
+    """
+    with ExitStack() as stack:
+        maps = [stack.enter_context(mmap.mmap(stack.enter_context(open(path, 'rb')).fileno(), 0,
+                                              access=mmap.ACCESS_READ)) for path in paths]
+        return use(*maps)
+
+class FlashEngine:
+    """Flashes memory-mapped images over a UDS send function.
+
+    receive_response reads the final response after 0x78 response pending
+    (DoIPHandler.receive_diagnostic_message, ECUSimulator.receive_response).
+    block_transform is a factory of a stateful transform (like the simulator's
+    data_decoders) created for every RequestDownload and applied to every
+    payload in order, e.g. encryption matching the dataFormatIdentifier. compression (ZlibCompression,
+    LzmaCompression or any object with method and compressor()) sets the
+    compressionMethod nibble and is applied before block_transform.
+    checksum (a class from Utils/checksums.py) is updated with the image data
+    while blocks are framed and its digest is sent with RequestTransferExit
+    and, with verify_memory, to the checkMemory routine.
+    """
+
+    def __init__(self, send_request: Callable[[bytes], bytes], validator: Optional[UDSValidator] = None,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 send_request_parts: Optional[Callable[[List], bytes]] = None,
+                 receive_response: Optional[Callable[[], bytes]] = None,
+                 block_transform: Optional[Callable[[], Callable[[memoryview], bytes]]] = None,
+                 pipelined: bool = False, max_retransmissions: int = MAX_RETRANSMISSIONS,
+                 compression=None, checksum=None, verify_memory: bool = False):
+        self.send_request = send_request
+        # Scatter-send variant (e.g. DoIPHandler.send_diagnostic_message_parts): blocks are never copied
+        self.send_request_parts = send_request_parts
+        self.receive_response = receive_response
+        self.block_transform = block_transform
+        self.compression = compression
+        self.checksum = checksum
+        self.verify_memory = verify_memory
+        self.pipelined = pipelined
+        self.max_retransmissions = max_retransmissions
+        self.validator = validator or UDSValidator()
+        # progress(bytes_sent, total_bytes) after every block
+        self.progress = progress
+
+    def _wait_final(self, response: Optional[bytes], sid: int, report: Optional[FlashReport] = None) -> Optional[bytes]:
+        """Follow 0x78 response pending until the final response (bounded, FlashError when giving up)"""
+        def give_up(pending: int):
+            raise FlashError(f"Service 0x{sid:02X}", f"Gave up after {pending} response pending (0x78)",
+                             NRC_RESPONSE_PENDING)
+        return final_response(response, sid, self.receive_response, report, give_up)
+
+    def _exchange(self, request: bytes) -> Optional[bytes]:
+        return self._wait_final(self.send_request(request), request[0])
+
+    def request_download(self, address: int, size: int, data_format: int = DEFAULT_DATA_FORMAT,
+                         address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> int:
+        """Send RequestDownload and return the payload bytes allowed per TransferData block"""
+        request = bytes([0x34, data_format, address_length_format]) + \
+            encode_memory_parameters(address, size, address_length_format)
+        result = self.validator.validate_request_download(self._exchange(request))
+        if not result['valid'] or 'max_block_length' not in result:
+            raise FlashError("RequestDownload", result['message'], result['nrc'])
+        block_size = result['max_block_length'] - TRANSFER_DATA_HEADER
+        if block_size < 1:
+            raise FlashError("RequestDownload", f"Unusable max block length {result['max_block_length']}")
+        return block_size
+
+    def data_format_identifier(self, data_format: int = DEFAULT_DATA_FORMAT) -> int:
+        """dataFormatIdentifier announcing the compression method unless data_format sets one"""
+        if self.compression is not None and not data_format & 0xF0:
+            data_format |= self.compression.method << 4
+        return data_format
+
+    @staticmethod
+    def _slice_payloads(data: memoryview, block_size: int, checksum=None) -> Iterator[Tuple[memoryview, int]]:
+        # A slice is released once the block after next is requested (one block may be in flight while
+        # the next is framed) and when the generator is closed, so failures leave no export of the image
+        total = len(data)
+        previous = payload = None
+        try:
+            for offset in range(0, total, block_size):
+                if previous is not None:
+                    previous.release()
+                previous, payload = payload, data[offset:offset + block_size]
+                if checksum is not None:
+                    checksum.update(payload)
+                yield payload, min(offset + block_size, total)
+        finally:
+            for item in (previous, payload):
+                if item is not None:
+                    item.release()
+
+    @staticmethod
+    def _compressed_payloads(stage: CompressionStage, block_size: int) -> Iterator[Tuple[bytes, int]]:
+        # Progress is reported in image bytes: what the compressor has consumed so far
+        for payload in rechunk(stage, block_size):
+            yield payload, stage.consumed
+
+    def _frame_blocks(self, payloads: Iterator[Tuple[bytes, int]], report: FlashReport) -> Iterator[Tuple[int, tuple, int]]:
+        """Yield (bsc, request parts, end offset); the counter starts at 1 and wraps 0xFF -> 0x00"""
+        transform = self.block_transform() if self.block_transform else None
+        join = self.send_request_parts is None
+        bsc = 1
+        for payload, end in payloads:
+            report.transferred += len(payload)
+            if transform is not None:
+                payload = transform(payload)
+            parts = (bytes((0x36, bsc)), payload)
+            # Without scatter-send the request is joined here, i.e. off the critical path when pipelined
+            yield bsc, (b"".join(parts),) if join else parts, end
+            bsc = (bsc + 1) & 0xFF
+
+    def _send_block(self, bsc: int, parts: tuple, report: FlashReport):
+        """Send one framed block; retransmit on lost responses and 0x73 (bounded)"""
+        attempts = 0
+        while True:
+            start = time.perf_counter()
+            if len(parts) == 1:
+                response = self.send_request(parts[0])
+            else:
+                response = self.send_request_parts(parts)
+            response = self._wait_final(response, 0x36, report)
+            report.block_latencies.append(time.perf_counter() - start)
+            result = self.validator.validate_transfer_data(response, bsc)
+            if result['valid']:
+                return
+            # The ECU ignores a repeated counter it already acknowledged, so resending is safe
+            retry = response is None or result['nrc'] == NRC_WRONG_BLOCK_SEQUENCE_COUNTER
+            if not retry or attempts >= self.max_retransmissions:
+                raise FlashError(f"TransferData block {report.blocks + 1}", result['message'], result['nrc'])
+            attempts += 1
+            report.retransmissions += 1
+
+    def _block_acknowledged(self, report: FlashReport, bsc: int, sent: int, total: int,
+                            on_acknowledged: Optional[Callable[[FlashReport], None]]):
+        report.blocks += 1
+        report.last_bsc = bsc
+        if self.compression is None:
+            report.acknowledged = sent
+        if on_acknowledged:
+            on_acknowledged(report)
+        if self.progress:
+            self.progress(sent, total)
+
+    def transfer_data(self, data: memoryview, block_size: int, report: FlashReport,
+                      on_acknowledged: Optional[Callable[[FlashReport], None]] = None):
+        """Send all TransferData blocks, serially or with the next block prepared in the background.
+
+        on_acknowledged(report) runs after every block the ECU confirmed, e.g. to checkpoint.
+        """
+        stage = None
+        # Checksummed where the image is read anyway: by the framer or the compressor thread
+        checksum = self.checksum() if self.checksum is not None else None
+        if self.compression is not None:
+            stage = CompressionStage(data, self.compression,
+                                     on_chunk=checksum.update if checksum is not None else None).start()
+            payloads = self._compressed_payloads(stage, block_size)
+            report.compression = getattr(self.compression, 'name', type(self.compression).__name__)
+        else:
+            payloads = self._slice_payloads(data, block_size, checksum)
+        blocks = self._frame_blocks(payloads, report)
+        report.pipelined = self.pipelined
+        try:
+            if self.pipelined:
+                self._transfer_pipelined(blocks, len(data), report, on_acknowledged)
+            else:
+                for bsc, parts, sent in blocks:
+                    self._send_block(bsc, parts, report)
+                    self._block_acknowledged(report, bsc, sent, len(data), on_acknowledged)
+        finally:
+            # Release the generators' slices and stop the compressor so the image mapping can be closed
+            blocks.close()
+            payloads.close()
+            if stage is not None:
+                stage.close()
+        if checksum is not None:
+            report.checksum_method = getattr(checksum, 'name', type(checksum).__name__)
+            report.checksum = checksum.digest()
+
+    def _transfer_pipelined(self, blocks: Iterator, total: int, report: FlashReport,
+                            on_acknowledged: Optional[Callable[[FlashReport], None]]):
+        # Double buffering: one block in flight, the next one being framed by the worker
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="flash-framer") as framer:
+            following = framer.submit(next, blocks, None)
+            while True:
+                block = following.result()
+                if block is None:
+                    break
+                following = framer.submit(next, blocks, None)
+                bsc, parts, sent = block
+                self._send_block(bsc, parts, report)
+                self._block_acknowledged(report, bsc, sent, total, on_acknowledged)
+
+    def routine_control(self, routine_id: int, option: bytes = b"", stage: Optional[str] = None) -> bytes:
+        """Start a routine and return the routine status record"""
+        request = bytes([0x31, 0x01]) + routine_id.to_bytes(2, 'big') + option
+        response = self._exchange(request)
+        result = self.validator.validate_routine_control(response, routine_id, 0x01)
+        if not result['valid']:
+            raise FlashError(stage or f"Routine 0x{routine_id:04X}", result['message'], result['nrc'])
+        return response[4:]
+
+    def erase_memory(self, address: int, size: int,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT):
+        """Erase a memory range with the eraseMemory routine (0x78 while erasing is followed)"""
+        option = bytes([address_length_format]) + encode_memory_parameters(address, size, address_length_format)
+        self.routine_control(ROUTINE_ERASE_MEMORY, option, "EraseMemory")
+
+    def check_memory(self, address: int, size: int, digest: bytes,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT):
+        """Let the ECU verify a memory range against a digest (checkMemory routine)"""
+        option = bytes([address_length_format]) + encode_memory_parameters(address, size, address_length_format)
+        status = self.routine_control(ROUTINE_CHECK_MEMORY, option + digest, "CheckMemory")
+        if status[:1] != b"\x00":
+            raise FlashError("CheckMemory", f"ECU reported a checksum mismatch (status {status.hex().upper()})")
+
+    def request_transfer_exit(self, parameters: bytes = b""):
+        result = self.validator.validate_request_transfer_exit(self._exchange(bytes([0x37]) + parameters))
+        if not result['valid']:
+            raise FlashError("RequestTransferExit", result['message'], result['nrc'])
+
+    def flash_buffer(self, data, address: int, data_format: int = DEFAULT_DATA_FORMAT,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT, offset: int = 0,
+                     on_acknowledged: Optional[Callable[[FlashReport], None]] = None) -> FlashReport:
+        """Download any buffer (bytes, mmap, memoryview) to address.
+
+        With an offset only data[offset:] is requested and sent, to address + offset.
+        """
+        view = memoryview(data).cast('B')
+        try:
+            start = time.perf_counter()
+            block_size = self.request_download(address + offset, len(view) - offset,
+                                               self.data_format_identifier(data_format), address_length_format)
+            report = FlashReport(address + offset, len(view) - offset, block_size)
+            with view[offset:] as remaining:
+                self.transfer_data(remaining, block_size, report, on_acknowledged)
+            self.request_transfer_exit(report.checksum or b"")
+            if self.verify_memory and report.checksum is not None:
+                self.check_memory(report.address, report.size, report.checksum, address_length_format)
+                report.memory_checked = True
+            report.duration = time.perf_counter() - start
+            return report
+        finally:
+            view.release()
+
+    def flash_file(self, path: str, address: int, data_format: int = DEFAULT_DATA_FORMAT,
+                   address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> FlashReport:
+        """Memory-map an image file and download it to address"""
+        if os.path.getsize(path) == 0:
+            raise FlashError("RequestDownload", f"{path} is empty")
+        return with_mapped_files([path], lambda image: self.flash_buffer(image, address, data_format,
+                                                                         address_length_format))
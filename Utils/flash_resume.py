@@ -0,0 +1,206 @@
+# Utils/flash_resume.py
+"""
+Resumable downloads
+Persists the last block the ECU acknowledged (byte offset and block
+sequence counter) while an image is transferred. After a link drop the
+flasher reconnects, optionally resets the ECU, re-enters the programming
+session and continues with a new RequestDownload for the remaining range.
+The checkpoint survives the tester process, so a rerun resumes as well.
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Callable, Dict, List, Optional
+
+from Utils.flash_engine import (FlashEngine, FlashError, FlashReport, DEFAULT_DATA_FORMAT, DEFAULT_ADDRESS_LENGTH_FORMAT,
+                                NRC_RESPONSE_PENDING, with_mapped_files)
+from Utils.test_scheduler import ECUStateController
+
+# Acknowledged blocks between checkpoint writes (a failure always writes the exact position)
+DEFAULT_CHECKPOINT_EVERY = 16
+MAX_RESUMES = 3
+
+# Transient NRCs worth a resume (busy, response pending given up); other rejections are final
+RESUMABLE_NRCS = (0x21, NRC_RESPONSE_PENDING)
+
+# Image fingerprint: size plus a sample of every MiB, so identifying the image needs no full pass
+FINGERPRINT_STRIDE = 1024 * 1024
+FINGERPRINT_SAMPLE = 4096
+
+def image_fingerprint(view: memoryview) -> str:
+    """Sampled SHA-256 identifying an image for resuming (detects a different build, not tampering)"""
+    digest = hashlib.sha256(len(view).to_bytes(8, 'big'))
+    for offset in range(0, len(view), FINGERPRINT_STRIDE):
+        digest.update(view[offset:offset + FINGERPRINT_SAMPLE])
+    digest.update(view[-FINGERPRINT_SAMPLE:])
+    return digest.hexdigest()
+
+class FlashCheckpoint:
+    """Last acknowledged position of a download, persisted as a JSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def resume_offset(self, fingerprint: str, address: int, data_format: int) -> int:
+        """Offset to continue from, 0 unless the checkpoint belongs to this image and target"""
+        state = self.state
+        if state.get('fingerprint') == fingerprint and state.get('address') == address \
+                and state.get('data_format') == data_format:
+            return state.get('offset', 0)
+        return 0
+
+    def begin(self, fingerprint: str, size: int, address: int, data_format: int, offset: int):
+        self.state = {'fingerprint': fingerprint, 'size': size, 'address': address, 'data_format': data_format,
+                      'offset': offset, 'bsc': None, 'resumes': 0, 'updated': time.time()}
+
+    def update(self, offset: int, bsc: Optional[int]):
+        self.state.update(offset=offset, bsc=bsc, updated=time.time())
+
+    def save(self):
+        # Write and rename, so a crash never leaves a truncated checkpoint
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        self.state = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def resumable(error: Exception) -> bool:
+    """Link loss, a missing response or a transient NRC"""
+    return isinstance(error, OSError) or error.nrc is None or error.nrc in RESUMABLE_NRCS
+
+def merge_reports(address: int, size: int, reports: List[FlashReport]) -> FlashReport:
+    """Combine the reports of a download and its resumed continuations"""
+    merged = FlashReport(address, size, reports[-1].block_size)
+    for report in reports:
+        merged.blocks += report.blocks
+        merged.block_latencies += report.block_latencies
+        merged.retransmissions += report.retransmissions
+        merged.response_pending += report.response_pending
+        merged.transferred += report.transferred
+    merged.pipelined = reports[-1].pipelined
+    merged.compression = reports[-1].compression
+    merged.restarted = reports[-1].restarted
+    merged.acknowledged = size
+    merged.last_bsc = reports[-1].last_bsc
+    return merged
+
+class ResumableFlasher:
+    """Runs FlashEngine downloads with checkpoints and resumes after link loss.
+
+    reconnect() re-establishes the transport (DoIPHandler.reconnect,
+    ECUSimulator.reconnect). With reset_type the ECU is reset (0x11) before
+    re-entering the programming session; ECUs rejecting the reset are
+    resumed without it. Only link loss, missing responses and transient
+    NRCs (RESUMABLE_NRCS) are resumed. Compressed downloads restart from
+    the start of the image and keep no checkpoint, as compressed blocks do
+    not end on image offsets.
+    """
+
+    def __init__(self, engine: FlashEngine, checkpoint_path: str, controller: Optional[ECUStateController] = None,
+                 reconnect: Optional[Callable[[], bool]] = None, reset_type: Optional[int] = None,
+                 security_level: int = 1, max_resumes: int = MAX_RESUMES,
+                 checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY, reset_delay: float = 0.0):
+        self.engine = engine
+        self.checkpoint = FlashCheckpoint(checkpoint_path)
+        self.controller = controller or ECUStateController(engine.send_request)
+        self.reconnect = reconnect
+        self.reset_type = reset_type
+        self.security_level = security_level
+        self.max_resumes = max_resumes
+        self.checkpoint_every = checkpoint_every
+        # Time for the ECU to restart after the reset
+        self.reset_delay = reset_delay
+
+    def recover(self):
+        """Reconnect, optionally reset and re-enter the programming session with security access"""
+        if self.reconnect is not None and not self.reconnect():
+            raise FlashError("Resume", "Reconnect failed")
+        # The session may have timed out while the link was down
+        self.controller.notify_unknown()
+        if self.reset_type is not None:
+            response = self.engine.send_request(bytes([0x11, self.reset_type]))
+            if self.engine.validator.validate_ecu_reset(response, self.reset_type)['valid']:
+                self.controller.notify_reset()
+                time.sleep(self.reset_delay)
+        if not self.controller.transition_to((0x02, self.security_level)):
+            raise FlashError("Resume", "Could not re-enter the programming session")
+
+    def flash_buffer(self, data, address: int, data_format: int = DEFAULT_DATA_FORMAT,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> FlashReport:
+        """Download data to address, continuing from a matching checkpoint"""
+        view = memoryview(data).cast('B')
+        checkpoint = self.checkpoint
+        try:
+            start = time.perf_counter()
+            data_format = self.engine.data_format_identifier(data_format)
+            fingerprint = image_fingerprint(view)
+            # Compressed blocks do not end on image offsets: such downloads restart at 0 and keep no checkpoint
+            checkpointing = self.engine.compression is None
+            # Always send at least the last byte again, so RequestTransferExit has a download to close
+            offset = min(checkpoint.resume_offset(fingerprint, address, data_format), max(len(view) - 1, 0)) \
+                if checkpointing else 0
+            resumed_from = offset
+            checkpoint.begin(fingerprint, len(view), address, data_format, offset)
+            reports: List[FlashReport] = []
+            resumes = 0
+            while True:
+                base, started = offset, []
+
+                def acknowledged(report: FlashReport, base=base, started=started):
+                    if not started:
+                        started.append(report)
+                    if checkpointing and report.blocks % self.checkpoint_every == 0:
+                        checkpoint.update(base + report.acknowledged, report.last_bsc)
+                        checkpoint.save()
+
+                try:
+                    reports.append(self.engine.flash_buffer(view, address, data_format, address_length_format,
+                                                            offset, acknowledged))
+                    break
+                except (FlashError, OSError) as e:
+                    if started:
+                        reports.append(started[0])
+                        offset = min(base + started[0].acknowledged, max(len(view) - 1, 0))
+                        checkpoint.update(offset, started[0].last_bsc)
+                    resumes += 1
+                    checkpoint.state['resumes'] += 1
+                    if checkpointing:
+                        checkpoint.save()
+                    if resumes > self.max_resumes or not resumable(e):
+                        raise
+                    action = f"resuming at offset {offset}" if checkpointing else "restarting compressed download at offset 0"
+                    print(f"Download interrupted ({e}); {action} of {len(view)}")
+                    self.recover()
+            checkpoint.clear()
+            report = merge_reports(address, len(view), reports) if len(reports) > 1 else reports[0]
+            report.resumes = resumes
+            report.resumed_from = resumed_from
+            report.restarted = bool(resumes) and not checkpointing
+            report.duration = time.perf_counter() - start
+            return report
+        finally:
+            view.release()
+
+    def flash_file(self, path: str, address: int, data_format: int = DEFAULT_DATA_FORMAT,
+                   address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> FlashReport:
+        """Memory-map an image file and download it with checkpoints"""
+        if os.path.getsize(path) == 0:
+            raise FlashError("RequestDownload", f"{path} is empty")
+        return with_mapped_files([path], lambda image: self.flash_buffer(image, address, data_format,
+                                                                         address_length_format))
@@ -0,0 +1,328 @@
+# Utils/memory_reader.py
+"""
+Adaptive bulk reads with ReadMemoryByAddress (0x23)
+Probes the largest memorySize the ECU accepts once, caches it per ECU
+software version, and reads large ranges in chunks of that size with one
+outstanding request per connection. Chunks the ECU rejects are split and
+retried down to a minimum size; what still fails is reported as unreadable.
+"""
+
+import os
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+
+from uds_validator_extended import UDSValidator
+from Utils.uds_utils import distribution
+from Utils.result_cache import DEFAULT_CACHE_DIR
+from Utils.memory_upload import _pwrite
+from Utils.flash_engine import (FlashError, encode_memory_parameters, final_response, DEFAULT_ADDRESS_LENGTH_FORMAT,
+                                MAX_RETRANSMISSIONS, NRC_RESPONSE_PENDING)
+
+DEFAULT_READ_SIZE_CACHE = os.path.join(DEFAULT_CACHE_DIR, "read_sizes.json")
+
+# Upper bound of the probe (ISO-TP carries at most 4095 bytes, one of them the response SID)
+DEFAULT_MAX_PROBE = 4094
+
+# Rejected chunks are halved down to this size before a range is reported unreadable
+DEFAULT_MIN_CHUNK = 16
+
+# requestOutOfRange, responseTooLong and securityAccessDenied: a smaller read may still be accepted
+SPLIT_NRCS = (0x31, 0x14, 0x33)
+
+NRC_RESPONSE_TOO_LONG = 0x14
+NRC_REQUEST_OUT_OF_RANGE = 0x31
+
+class ReadSizeCache:
+    """Largest accepted read size per ECU software version, persisted as a JSON file"""
+
+    def __init__(self, path: str = DEFAULT_READ_SIZE_CACHE):
+        self.path = path
+        self.entries = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, software_version: str) -> Optional[int]:
+        entry = self.entries.get(software_version)
+        return entry['max_read_size'] if entry else None
+
+    def store(self, software_version: str, max_read_size: int):
+        self.entries[software_version] = {'max_read_size': max_read_size, 'timestamp': time.time()}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temporary, self.path)
+
+class ReadReport:
+    """Result of one bulk read"""
+
+    def __init__(self, address: int, size: int, chunk_size: int, connections: int):
+        self.address = address
+        self.size = size
+        self.chunk_size = chunk_size
+        self.connections = connections
+        # 'probe', 'cache' or 'fixed'
+        self.chunk_source = None
+        self.probe_requests = 0
+        self.received = 0
+        self.splits = 0
+        self.retransmissions = 0
+        self.response_pending = 0
+        self.latencies: List[float] = []
+        # (offset, length) ranges still rejected at the minimum chunk size
+        self.unreadable: List[Tuple[int, int]] = []
+        self.duration = 0.0
+
+    @property
+    def requests(self) -> int:
+        """Read requests sent after the probe"""
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Received MB/s"""
+        return self.received / self.duration / 1e6 if self.duration else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'address': self.address,
+            'size': self.size,
+            'received': self.received,
+            'chunk_size': self.chunk_size,
+            'chunk_source': self.chunk_source,
+            'probe_requests': self.probe_requests,
+            'connections': self.connections,
+            'requests': self.requests,
+            'splits': self.splits,
+            'retransmissions': self.retransmissions,
+            'response_pending': self.response_pending,
+            'unreadable': [list(item) for item in self.unreadable],
+            'duration': self.duration,
+            'throughput_mb_s': self.throughput,
+            'latency': distribution(self.latencies),
+        }
+
+    def print_summary(self):
+        latency = distribution(self.latencies)
+        print(f"Read {self.received} of {self.size} bytes from 0x{self.address:08X} in {self.requests} requests "
+              f"of up to {self.chunk_size} bytes ({self.chunk_source}, {self.connections} connection(s))")
+        print(f"Duration: {self.duration:.3f}s  Throughput: {self.throughput:.2f} MB/s")
+        if self.probe_requests:
+            print(f"Probe: {self.probe_requests} requests")
+        if self.splits or self.retransmissions or self.response_pending:
+            print(f"Split chunks: {self.splits}  Retransmissions: {self.retransmissions}  "
+                  f"Response pending (0x78): {self.response_pending}")
+        for offset, length in self.unreadable:
+            print(f"  Unreadable: 0x{self.address + offset:08X} +{length}")
+        print(f"Request latency (ms): p50={latency['p50'] * 1e3:.3f} p90={latency['p90'] * 1e3:.3f} "
+              f"p99={latency['p99'] * 1e3:.3f} max={latency['max'] * 1e3:.3f}")
+
+class ChunkResult:
+    """Outcome of one chunk read in a worker thread, merged into the report by the reading thread"""
+
+    def __init__(self):
+        self.response: Optional[bytes] = None
+        # NRC of a rejected read (None if accepted or lost)
+        self.nrc: Optional[int] = None
+        self.latencies: List[float] = []
+        self.retransmissions = 0
+        self.response_pending = 0
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort (offset, length) ranges and join adjacent ones"""
+    merged = []
+    for offset, length in sorted(ranges):
+        if merged and merged[-1][0] + merged[-1][1] == offset:
+            merged[-1] = (merged[-1][0], merged[-1][1] + length)
+        else:
+            merged.append((offset, length))
+    return merged
+
+class MemoryReader:
+    """Reads memory ranges with 0x23 over one or more connections to the same ECU.
+
+    UDS allows one outstanding request per connection, so requests run
+    concurrently only across connections (e.g. DoIP connections with
+    different tester addresses). receive_responses, in the same order as
+    send_requests, follow 0x78 response pending. With a cache and the ECU's
+    software_version (DID F188) the probe runs once per software version;
+    only a size the ECU limits by length is cached.
+    """
+
+    def __init__(self, send_requests: List[Callable[[bytes], bytes]],
+                 receive_responses: Optional[List[Callable[[], bytes]]] = None,
+                 validator: Optional[UDSValidator] = None, progress: Optional[Callable[[int, int], None]] = None,
+                 cache: Optional[ReadSizeCache] = None, software_version: Optional[str] = None,
+                 chunk_size: Optional[int] = None, max_probe: int = DEFAULT_MAX_PROBE,
+                 min_chunk: int = DEFAULT_MIN_CHUNK, max_retransmissions: int = MAX_RETRANSMISSIONS):
+        self.validator = validator or UDSValidator()
+        receive_responses = receive_responses or [None] * len(send_requests)
+        # (send_request, receive_response) per connection
+        self.links = list(zip(send_requests, receive_responses))
+        self.progress = progress
+        self.cache = cache
+        self.software_version = software_version
+        # A fixed chunk size skips probing
+        self.chunk_size = chunk_size
+        self.max_probe = max_probe
+        self.min_chunk = min_chunk
+        self.max_retransmissions = max_retransmissions
+
+    def _read_chunk(self, link: Tuple, address: int, size: int, address_length_format: int) -> ChunkResult:
+        """One read; response stays None if the ECU rejected the size or range"""
+        send_request, receive_response = link
+        request = bytes([0x23, address_length_format]) + encode_memory_parameters(address, size,
+                                                                                   address_length_format)
+        result = ChunkResult()
+
+        def give_up(pending: int):
+            raise FlashError(f"ReadMemoryByAddress 0x{address:08X}", f"Gave up after {pending} response pending (0x78)",
+                             NRC_RESPONSE_PENDING)
+
+        while True:
+            start = time.perf_counter()
+            response = final_response(send_request(request), 0x23, receive_response, result, give_up)
+            result.latencies.append(time.perf_counter() - start)
+            validation = self.validator.validate_read_memory_by_address(response, size)
+            if validation['valid']:
+                result.response = response
+                return result
+            if validation['nrc'] in SPLIT_NRCS:
+                result.nrc = validation['nrc']
+                return result
+            # Lost or truncated responses are sent again; other NRCs end the read
+            if validation['nrc'] is not None:
+                raise FlashError(f"ReadMemoryByAddress 0x{address:08X}", validation['message'], validation['nrc'])
+            if result.retransmissions >= self.max_retransmissions:
+                return result
+            result.retransmissions += 1
+
+    def probe(self, address: int, size: Optional[int] = None,
+              address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> Tuple[int, int, bool]:
+        """Largest read size accepted at address, up to max_probe and size.
+
+        Returns the size, the requests it took and whether it is the ECU's
+        length limit: max_probe, or the next size rejected with 0x14, or with
+        0x31 while the byte beyond is readable on its own. A size bounded by
+        a protected or unmapped range only applies to reads at this address.
+        """
+        link = self.links[0]
+        upper = min(self.max_probe, size) if size else self.max_probe
+        requests = 1
+        first = self._read_chunk(link, address, upper, address_length_format)
+        if first.response is not None:
+            return upper, requests, upper == self.max_probe
+        # Bisect between an accepted size (0: none yet) and a rejected one, keeping the NRC of the rejection
+        accepted, rejected, nrc = 0, upper, first.nrc
+        while rejected - accepted > 1:
+            size = (accepted + rejected) // 2
+            requests += 1
+            result = self._read_chunk(link, address, size, address_length_format)
+            if result.response is not None:
+                accepted = size
+            else:
+                rejected, nrc = size, result.nrc
+        if not accepted:
+            raise FlashError(f"ReadMemoryByAddress 0x{address:08X}", "No read size was accepted")
+        limit = nrc == NRC_RESPONSE_TOO_LONG
+        if nrc == NRC_REQUEST_OUT_OF_RANGE:
+            requests += 1
+            limit = self._read_chunk(link, address + accepted, 1, address_length_format).response is not None
+        return accepted, requests, limit
+
+    def read_size(self, address: int, report: ReadReport,
+                  address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> int:
+        """Chunk size: fixed, cached for the software version, or probed (and cached)"""
+        if self.chunk_size:
+            report.chunk_source = 'fixed'
+            return self.chunk_size
+        cached = self.cache.get(self.software_version) if self.cache and self.software_version else None
+        if cached:
+            report.chunk_source = 'cache'
+            return cached
+        size, report.probe_requests, limit = self.probe(address, report.size, address_length_format)
+        report.chunk_source = 'probe'
+        if limit and self.cache is not None and self.software_version:
+            self.cache.store(self.software_version, size)
+            self.cache.save()
+        return size
+
+    def read(self, address: int, size: int, write: Callable[[int, memoryview], None],
+             address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> ReadReport:
+        """Read size bytes from address, handing every chunk to write(offset, data) as it arrives"""
+        start = time.perf_counter()
+        report = ReadReport(address, size, 0, len(self.links))
+        chunk = report.chunk_size = self.read_size(address, report, address_length_format)
+        ranges = ((offset, min(chunk, size - offset)) for offset in range(0, size, chunk))
+        retry = deque()
+        idle = list(self.links)
+        running = {}
+        with ThreadPoolExecutor(max_workers=len(self.links)) as pool:
+            while True:
+                while idle:
+                    item = retry.popleft() if retry else next(ranges, None)
+                    if item is None:
+                        break
+                    link = idle.pop()
+                    future = pool.submit(self._read_chunk, link, address + item[0], item[1],
+                                         address_length_format)
+                    running[future] = (link, item)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    link, (offset, length) = running.pop(future)
+                    idle.append(link)
+                    result = future.result()
+                    report.latencies += result.latencies
+                    report.retransmissions += result.retransmissions
+                    report.response_pending += result.response_pending
+                    if result.response is not None:
+                        write(offset, memoryview(result.response)[1:])
+                        report.received += length
+                        if self.progress:
+                            self.progress(report.received, size)
+                    elif length > self.min_chunk:
+                        half = length // 2
+                        retry.extend(((offset, half), (offset + half, length - half)))
+                        report.splits += 1
+                    else:
+                        report.unreadable.append((offset, length))
+        report.unreadable = merge_ranges(report.unreadable)
+        report.duration = time.perf_counter() - start
+        return report
+
+    def read_into(self, buffer, address: int,
+                  address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> ReadReport:
+        """Read len(buffer) bytes into a writable buffer (bytearray, mmap); unreadable ranges are left as they were"""
+        view = memoryview(buffer).cast('B')
+        try:
+            def write(offset: int, data: memoryview):
+                view[offset:offset + len(data)] = data
+            return self.read(address, len(view), write, address_length_format)
+        finally:
+            view.release()
+
+    def read_to_file(self, path: str, address: int, size: int,
+                     address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> ReadReport:
+        """Read into a file pre-sized to size bytes; unreadable ranges stay zero-filled"""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.ftruncate(fd, size)
+            report = self.read(address, size, _pwrite(fd), address_length_format)
+        except BaseException:
+            os.close(fd)
+            os.remove(path)
+            raise
+        os.close(fd)
+        return report
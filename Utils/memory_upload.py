@@ -0,0 +1,183 @@
+# Utils/memory_upload.py
+"""
+Streaming memory dump with RequestUpload (0x35)
+Sends RequestUpload, then TransferData requests whose responses carry the
+memory contents, and writes every block at its offset into a pre-sized
+output file (os.pwrite) or buffer as it arrives, so a dump of several MB
+is never collected in memory.
+"""
+
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from uds_validator_extended import UDSValidator
+from Utils.uds_utils import distribution
+from Utils.flash_engine import (FlashEngine, FlashError, encode_memory_parameters, DEFAULT_DATA_FORMAT,
+                                DEFAULT_ADDRESS_LENGTH_FORMAT, MAX_RETRANSMISSIONS, TRANSFER_DATA_HEADER,
+                                NRC_WRONG_BLOCK_SEQUENCE_COUNTER)
+
+class UploadReport:
+    """Result of one upload"""
+
+    def __init__(self, address: int, size: int, block_size: int):
+        self.address = address
+        self.size = size
+        self.block_size = block_size
+        self.received = 0
+        self.blocks = 0
+        self.block_latencies: List[float] = []
+        self.duration = 0.0
+        self.retransmissions = 0
+        self.response_pending = 0
+        self.checksum_method = None
+        self.checksum: Optional[bytes] = None
+
+    @property
+    def throughput(self) -> float:
+        """Received MB/s"""
+        return self.received / self.duration / 1e6 if self.duration else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'address': self.address,
+            'size': self.size,
+            'received': self.received,
+            'block_size': self.block_size,
+            'blocks': self.blocks,
+            'duration': self.duration,
+            'throughput_mb_s': self.throughput,
+            'block_latency': distribution(self.block_latencies),
+            'retransmissions': self.retransmissions,
+            'response_pending': self.response_pending,
+            'checksum_method': self.checksum_method,
+            'checksum': self.checksum.hex() if self.checksum is not None else None,
+        }
+
+    def print_summary(self):
+        latency = distribution(self.block_latencies)
+        print(f"Uploaded {self.received} bytes from 0x{self.address:08X} in {self.blocks} blocks of up to "
+              f"{self.block_size} bytes")
+        print(f"Duration: {self.duration:.3f}s  Throughput: {self.throughput:.2f} MB/s")
+        if self.checksum is not None:
+            print(f"Checksum: {self.checksum_method} {self.checksum.hex().upper()}")
+        if self.retransmissions or self.response_pending:
+            print(f"Retransmissions: {self.retransmissions}  Response pending (0x78): {self.response_pending}")
+        print(f"Block latency (ms): p50={latency['p50'] * 1e3:.3f} p90={latency['p90'] * 1e3:.3f} "
+              f"p99={latency['p99'] * 1e3:.3f} max={latency['max'] * 1e3:.3f}")
+
+def _pwrite(fd: int) -> Callable[[int, memoryview], None]:
+    """Positional writer for a file descriptor (seek + write where os.pwrite is missing, e.g. Windows)"""
+    if hasattr(os, 'pwrite'):
+        def write(offset: int, data: memoryview):
+            while data:
+                written = os.pwrite(fd, data, offset)
+                data, offset = data[written:], offset + written
+        return write
+
+    def write(offset: int, data: memoryview):
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            data = data[os.write(fd, data):]
+    return write
+
+class UploadEngine(FlashEngine):
+    """Dumps ECU memory over a UDS send function (0x35/0x36/0x37).
+
+    Shares 0x78 handling, retransmission limits and RequestTransferExit with
+    FlashEngine; checksum (a class from Utils/checksums.py) is updated with
+    every received block.
+    """
+
+    def __init__(self, send_request: Callable[[bytes], bytes], validator: Optional[UDSValidator] = None,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 receive_response: Optional[Callable[[], bytes]] = None,
+                 max_retransmissions: int = MAX_RETRANSMISSIONS, checksum=None):
+        super().__init__(send_request, validator, progress, receive_response=receive_response,
+                         max_retransmissions=max_retransmissions, checksum=checksum)
+
+    def request_upload(self, address: int, size: int, data_format: int = DEFAULT_DATA_FORMAT,
+                       address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> int:
+        """Send RequestUpload and return the data bytes per TransferData response"""
+        request = bytes([0x35, data_format, address_length_format]) + \
+            encode_memory_parameters(address, size, address_length_format)
+        result = self.validator.validate_request_upload(self._exchange(request))
+        if not result['valid'] or 'max_block_length' not in result:
+            raise FlashError("RequestUpload", result['message'], result['nrc'])
+        block_size = result['max_block_length'] - TRANSFER_DATA_HEADER
+        if block_size < 1:
+            raise FlashError("RequestUpload", f"Unusable max block length {result['max_block_length']}")
+        return block_size
+
+    def _receive_block(self, bsc: int, report: UploadReport) -> bytes:
+        """Request one block; a repeated counter makes the ECU send the same block again"""
+        request = bytes((0x36, bsc))
+        attempts = 0
+        while True:
+            start = time.perf_counter()
+            response = self._wait_final(self.send_request(request), 0x36, report)
+            report.block_latencies.append(time.perf_counter() - start)
+            result = self.validator.validate_transfer_data(response, bsc)
+            if result['valid']:
+                return response
+            retry = response is None or result['nrc'] == NRC_WRONG_BLOCK_SEQUENCE_COUNTER
+            if not retry or attempts >= self.max_retransmissions:
+                raise FlashError(f"TransferData block {report.blocks + 1}", result['message'], result['nrc'])
+            attempts += 1
+            report.retransmissions += 1
+
+    def upload(self, address: int, size: int, write: Callable[[int, memoryview], None],
+               data_format: int = DEFAULT_DATA_FORMAT,
+               address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> UploadReport:
+        """Upload size bytes from address, handing every block to write(offset, data)"""
+        start = time.perf_counter()
+        block_size = self.request_upload(address, size, data_format, address_length_format)
+        report = UploadReport(address, size, block_size)
+        checksum = self.checksum() if self.checksum is not None else None
+        bsc = 1
+        while report.received < size:
+            data = memoryview(self._receive_block(bsc, report))[TRANSFER_DATA_HEADER:]
+            # Length check against the requested memory size before anything is written
+            if not data or len(data) > block_size or report.received + len(data) > size:
+                raise FlashError(f"TransferData block {report.blocks + 1}",
+                                 f"{len(data)} bytes received at offset {report.received} of {size} "
+                                 f"(max {block_size} per block)")
+            write(report.received, data)
+            if checksum is not None:
+                checksum.update(data)
+            report.received += len(data)
+            report.blocks += 1
+            bsc = (bsc + 1) & 0xFF
+            if self.progress:
+                self.progress(report.received, size)
+        self.request_transfer_exit()
+        if checksum is not None:
+            report.checksum_method = getattr(checksum, 'name', type(checksum).__name__)
+            report.checksum = checksum.digest()
+        report.duration = time.perf_counter() - start
+        return report
+
+    def upload_into(self, buffer, address: int, data_format: int = DEFAULT_DATA_FORMAT,
+                    address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> UploadReport:
+        """Upload len(buffer) bytes into a writable buffer (bytearray, mmap)"""
+        view = memoryview(buffer).cast('B')
+        try:
+            def write(offset: int, data: memoryview):
+                view[offset:offset + len(data)] = data
+            return self.upload(address, len(view), write, data_format, address_length_format)
+        finally:
+            view.release()
+
+    def upload_to_file(self, path: str, address: int, size: int, data_format: int = DEFAULT_DATA_FORMAT,
+                       address_length_format: int = DEFAULT_ADDRESS_LENGTH_FORMAT) -> UploadReport:
+        """Upload into a file pre-sized to size bytes; a failed upload leaves no partial dump"""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.ftruncate(fd, size)
+            report = self.upload(address, size, _pwrite(fd), data_format, address_length_format)
+        except BaseException:
+            os.close(fd)
+            os.remove(path)
+            raise
+        os.close(fd)
+        return report
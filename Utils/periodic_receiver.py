@@ -0,0 +1,248 @@
+# Utils/periodic_receiver.py
+"""
+ReadDataByPeriodicIdentifier (0x2A) streaming receiver
+Starts periodic transmission at slow, medium or fast rate and receives the
+unsolicited periodic frames (6A pDID data) without a matching request.
+Samples go with their receive timestamps into preallocated per-DID ring
+buffers (NumPy arrays when installed). DIDs that stop streaming are
+requested again, and at the next slower rate when that does not help.
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from uds_validator_extended import UDSValidator
+from Utils.did_catalog import DIDCatalog, np
+from Utils.flash_engine import MAX_RETRANSMISSIONS
+
+# transmissionMode per rate, fastest first, and stopSending
+RATES = {'fast': 0x03, 'medium': 0x02, 'slow': 0x01}
+STOP_SENDING = 0x04
+
+# Seconds between frames per rate (manufacturer specific; used to detect stalled DIDs)
+DEFAULT_PERIODS = {'fast': 0.025, 'medium': 0.2, 'slow': 1.0}
+
+# Periodic DIDs are 0xF200-0xF2FF; requests and frames carry the low byte only
+PERIODIC_DID_BASE = 0xF200
+
+DEFAULT_CAPACITY = 10000
+
+# A DID is stalled after this many periods without a frame, and the rate is lowered
+# after this many requests in a row that brought no frame
+STALL_PERIODS = 5
+MAX_RESTARTS = 2
+
+class PeriodicError(Exception):
+    """The ECU refused periodic transmission at every rate"""
+
+class SampleRing:
+    """Preallocated ring buffer of timestamped records of one DID; the oldest samples are overwritten"""
+
+    def __init__(self, capacity: int, length: int):
+        self.capacity = capacity
+        self.length = length
+        self.count = 0
+        if np is not None:
+            self.timestamps = np.zeros(capacity, dtype=np.float64)
+            self.records = np.zeros((capacity, length), dtype=np.uint8)
+        else:
+            self.timestamps = [0.0] * capacity
+            self.records = bytearray(capacity * length)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """Samples overwritten before they were read"""
+        return max(0, self.count - self.capacity)
+
+    def append(self, timestamp: float, data: bytes):
+        index = self.count % self.capacity
+        self.timestamps[index] = timestamp
+        if np is not None:
+            self.records[index] = np.frombuffer(data, dtype=np.uint8)
+        else:
+            self.records[index * self.length:(index + 1) * self.length] = data
+        self.count += 1
+
+    def samples(self) -> Tuple:
+        """(timestamps, records) oldest first: NumPy arrays, or a list of floats and a list of bytes"""
+        size = len(self)
+        start = self.count % self.capacity if self.count > self.capacity else 0
+        if np is not None:
+            if not start:
+                return self.timestamps[:size].copy(), self.records[:size].copy()
+            return (np.concatenate((self.timestamps[start:], self.timestamps[:start])),
+                    np.concatenate((self.records[start:], self.records[:start])))
+        order = list(range(start, size)) + list(range(start))
+        return ([self.timestamps[index] for index in order],
+                [bytes(self.records[index * self.length:(index + 1) * self.length]) for index in order])
+
+class PeriodicReport:
+    """Result of a streaming run"""
+
+    def __init__(self, dids: List[int]):
+        self.dids = dids
+        self.rate: Optional[str] = None
+        self.samples: Dict[int, int] = {did: 0 for did in dids}
+        self.restarts = 0
+        self.rate_changes = 0
+        # Frames of the wrong length, and frames of DIDs not requested
+        self.malformed = 0
+        self.unexpected = 0
+        self.duration = 0.0
+
+    def achieved_rates(self) -> Dict[int, float]:
+        """Samples per second of every DID"""
+        return {did: count / self.duration if self.duration else 0.0 for did, count in self.samples.items()}
+
+    def to_dict(self) -> Dict:
+        return {
+            'rate': self.rate,
+            'samples': {f"{did:04X}": count for did, count in self.samples.items()},
+            'achieved_rates': {f"{did:04X}": rate for did, rate in self.achieved_rates().items()},
+            'restarts': self.restarts,
+            'rate_changes': self.rate_changes,
+            'malformed': self.malformed,
+            'unexpected': self.unexpected,
+            'duration': self.duration,
+        }
+
+    def print_summary(self):
+        print(f"Streamed {sum(self.samples.values())} samples of {len(self.dids)} DIDs at {self.rate} rate "
+              f"in {self.duration:.3f}s ({self.restarts} restarts, {self.rate_changes} rate changes)")
+        for did, rate in self.achieved_rates().items():
+            print(f"  0x{did:04X}: {self.samples[did]} samples, {rate:.1f}/s")
+
+class PeriodicReceiver:
+    """Streams periodic DIDs into ring buffers.
+
+    receive_message(timeout) returns the next unsolicited message of the
+    transport or None (e.g. DoIPHandler.receive_diagnostic_message). The
+    ring of a DID is allocated when its first frame fixes the record length.
+    """
+
+    def __init__(self, send_request, receive_message: Callable[[float], Optional[bytes]], dids: List[int],
+                 rate: str = 'fast', periods: Optional[Dict[str, float]] = None, capacity: int = DEFAULT_CAPACITY,
+                 validator: Optional[UDSValidator] = None, stall_periods: int = STALL_PERIODS,
+                 max_restarts: int = MAX_RESTARTS, max_retransmissions: int = MAX_RETRANSMISSIONS):
+        if rate not in RATES:
+            raise ValueError(f"Unknown rate {rate!r}, expected one of {', '.join(RATES)}")
+        for did in dids:
+            if did & 0xFF00 != PERIODIC_DID_BASE:
+                raise ValueError(f"DID 0x{did:04X} is not a periodic DID (0xF200-0xF2FF)")
+        self.send_request = send_request
+        self.receive_message = receive_message
+        self.dids = list(dict.fromkeys(dids))
+        self.requested_rate = rate
+        self.periods = {**DEFAULT_PERIODS, **(periods or {})}
+        self.capacity = capacity
+        self.validator = validator or UDSValidator()
+        self.stall_periods = stall_periods
+        self.max_restarts = max_restarts
+        self.max_retransmissions = max_retransmissions
+        self.buffers: Dict[int, SampleRing] = {}
+        self.report = PeriodicReport(self.dids)
+        self.rate: Optional[str] = None
+        self.last_seen: Dict[int, float] = {}
+        self.silent_restarts: Dict[int, int] = {}
+
+    def _exchange(self, request: bytes) -> Optional[bytes]:
+        """Send a request, again if the response was lost"""
+        for _ in range(self.max_retransmissions + 1):
+            response = self.send_request(request)
+            if response is not None:
+                return response
+        return None
+
+    def _request(self, mode: int, dids: List[int]) -> Dict:
+        request = bytes([0x2A, mode]) + bytes(did & 0xFF for did in dids)
+        return self.validator.validate_read_data_by_periodic_identifier(self._exchange(request))
+
+    def start(self, rate: Optional[str] = None) -> str:
+        """Start streaming at the rate or, where the ECU rejects it (0x31), the next slower one"""
+        names = list(RATES)
+        for name in names[names.index(rate or self.requested_rate):]:
+            result = self._request(RATES[name], self.dids)
+            if result['valid']:
+                if name != (self.rate or self.requested_rate):
+                    self.report.rate_changes += 1
+                self.rate = self.report.rate = name
+                now = time.perf_counter()
+                self.last_seen = {did: now for did in self.dids}
+                return name
+            if result['nrc'] != 0x31:
+                break
+        raise PeriodicError(f"Periodic transmission refused: {result['message']}")
+
+    def stop(self):
+        """Stop all periodic DIDs of this receiver"""
+        self._request(STOP_SENDING, self.dids)
+        self.rate = None
+
+    def _store(self, frame: bytes, timestamp: float):
+        did = PERIODIC_DID_BASE | frame[1]
+        if did not in self.report.samples:
+            self.report.unexpected += 1
+            return
+        data = frame[2:]
+        ring = self.buffers.get(did)
+        if ring is None:
+            ring = self.buffers[did] = SampleRing(self.capacity, len(data))
+        elif len(data) != ring.length:
+            self.report.malformed += 1
+            return
+        ring.append(timestamp, data)
+        self.report.samples[did] += 1
+        self.last_seen[did] = timestamp
+        self.silent_restarts[did] = 0
+
+    def _restart_stalled(self, now: float):
+        """Request stalled DIDs again; lower the rate when requests stop helping"""
+        limit = self.stall_periods * self.periods[self.rate]
+        stalled = [did for did in self.dids if now - self.last_seen[did] > limit]
+        if not stalled:
+            return
+        self.report.restarts += 1
+        for did in stalled:
+            self.silent_restarts[did] = self.silent_restarts.get(did, 0) + 1
+        names = list(RATES)
+        if max(self.silent_restarts[did] for did in stalled) > self.max_restarts and self.rate != names[-1]:
+            self._request(STOP_SENDING, self.dids)
+            self.silent_restarts.clear()
+            self.start(names[names.index(self.rate) + 1])
+            return
+        result = self._request(RATES[self.rate], stalled)
+        if not result['valid']:
+            raise PeriodicError(f"Restarting periodic transmission failed: {result['message']}")
+        for did in stalled:
+            self.last_seen[did] = now
+
+    def run(self, duration: float) -> PeriodicReport:
+        """Receive for duration seconds, starting transmission first if needed"""
+        if self.rate is None:
+            self.start()
+        start = time.perf_counter()
+        end = start + duration
+        next_check = start + self.periods[self.rate]
+        now = start
+        while now < end:
+            frame = self.receive_message(min(self.periods[self.rate], end - now))
+            now = time.perf_counter()
+            if frame is not None and len(frame) > 2 and frame[0] == 0x6A:
+                self._store(frame, now)
+            if now >= next_check:
+                self._restart_stalled(now)
+                next_check = now + self.periods[self.rate]
+        self.report.duration += now - start
+        return self.report
+
+    def decode(self, catalog: DIDCatalog) -> Dict[int, Tuple]:
+        """(timestamps, values by signal name) of every buffered DID the catalog describes"""
+        decoded = {}
+        for did, ring in self.buffers.items():
+            if did in catalog and len(ring):
+                timestamps, records = ring.samples()
+                decoded[did] = (timestamps, catalog.decode_batch(did, records))
+        return decoded
@@ -0,0 +1,168 @@
+# Utils/report_sinks.py
+"""
+Streaming report sinks for the test runners
+Results are written as the run progresses (one JSON line per test result
+and suite summary, or JUnit XML elements), so CI can tail them live and a
+crashed run keeps everything written so far.
+"""
+
+import json
+import time
+from typing import Dict, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+class ReportSink:
+    """Base class for report sinks; all hooks are optional"""
+
+    # Sinks that record the ECU identity make the runner read it even without the result cache
+    needs_ecu_identity = False
+
+    def on_run_start(self, info: Dict):
+        """Called before the first suite runs with the ECU identity, shard and start time"""
+
+    def on_test_result(self, suite: Optional[str], record: Dict):
+        """Called for every logged test result"""
+
+    def on_suite_summary(self, suite: str, summary: Dict):
+        """Called once a suite has finished (or was served from cache)"""
+
+    def on_run_summary(self, summary: Dict):
+        """Called at the end of the run"""
+
+    def close(self):
+        """Flush and release resources"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class JSONLReportSink(ReportSink):
+    """Writes one JSON object per line with buffered I/O.
+
+    The file is truncated, so it always holds one run: readers such as the
+    run diff take every line of a file as part of the same run.
+    """
+
+    # The ECU identity in the start line keys results for run-to-run diffs
+    needs_ecu_identity = True
+
+    def __init__(self, path: Optional[str] = None, buffer_size: int = DEFAULT_BUFFER_SIZE, flush_every: int = 0,
+                 stream=None):
+        self.path = path
+        # An already open text stream (e.g. a socket file) can be used instead of a path
+        self.file = stream if stream is not None else open(path, 'w', encoding='utf-8', buffering=buffer_size)
+        # Results are always flushed at suite boundaries; flush_every adds intermediate flushes
+        self.flush_every = flush_every
+        self._unflushed = 0
+
+    def _write(self, obj: Dict):
+        self.file.write(json.dumps(obj, separators=(',', ':'), default=str))
+        self.file.write('\n')
+
+    def on_run_start(self, info: Dict):
+        self._write({'type': 'start', 'timestamp': time.time(), **info})
+
+    def on_test_result(self, suite: Optional[str], record: Dict):
+        self._write({'type': 'test', 'suite': suite, **record})
+        self._unflushed += 1
+        if self.flush_every and self._unflushed >= self.flush_every:
+            self.file.flush()
+            self._unflushed = 0
+
+    def on_suite_summary(self, suite: str, summary: Dict):
+        self._write({'type': 'suite', 'suite': suite, 'timestamp': time.time(), **summary})
+        self.file.flush()
+        self._unflushed = 0
+
+    def on_run_summary(self, summary: Dict):
+        self._write({'type': 'run', 'timestamp': time.time(), **summary})
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+class JUnitXMLReportSink(ReportSink):
+    """Streams JUnit XML to disk suite by suite instead of building a DOM.
+
+    Test cases are buffered per suite and written as one <testsuite> with
+    its counts when the suite completes, so suites interleaved by
+    --schedule still appear once each.
+    """
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, name: str = "UDS Test Suite"):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8', buffering=buffer_size)
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write(f'<testsuites name={quoteattr(name)}>\n')
+        self.file.flush()
+        # suite -> buffered test cases, counts and start timestamp of the suites not yet written
+        self.open_suites: Dict[str, Dict] = {}
+
+    def _suite(self, suite: str) -> Dict:
+        if suite not in self.open_suites:
+            self.open_suites[suite] = {'cases': [], 'tests': 0, 'failures': 0, 'errors': 0, 'time': 0.0,
+                                       'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"), 'last_timestamp': None}
+        return self.open_suites[suite]
+
+    def _end_suite(self, suite: str, system_out: str = ""):
+        state = self.open_suites.pop(suite, None)
+        if state is None:
+            return
+        self.file.write(f'  <testsuite name={quoteattr(suite)} tests="{state["tests"]}" '
+                        f'failures="{state["failures"]}" errors="{state["errors"]}" time="{state["time"]:.6f}" '
+                        f'timestamp={quoteattr(state["timestamp"])}>\n')
+        self.file.writelines(state['cases'])
+        if system_out:
+            self.file.write(f'    <system-out>{escape(system_out)}</system-out>\n')
+        self.file.write('  </testsuite>\n')
+        self.file.flush()
+
+    def on_test_result(self, suite: Optional[str], record: Dict):
+        state = self._suite(suite or "UDS")
+
+        if 'duration' in record:
+            elapsed = record['duration']
+        elif state['last_timestamp'] is not None:
+            elapsed = record['timestamp'] - state['last_timestamp']
+        else:
+            elapsed = 0.0
+        state['last_timestamp'] = record.get('timestamp')
+        state['tests'] += 1
+        state['time'] += elapsed
+
+        attrs = f'classname={quoteattr(suite or "UDS")} name={quoteattr(record["test"])} time="{elapsed:.6f}"'
+        if record['passed']:
+            state['cases'].append(f'    <testcase {attrs}/>\n')
+        else:
+            message = record.get('details', '')
+            state['failures'] += 1
+            state['cases'].append(f'    <testcase {attrs}>\n'
+                                  f'      <failure message={quoteattr(message)}>{escape(message)}</failure>\n'
+                                  '    </testcase>\n')
+
+    def on_suite_summary(self, suite: str, summary: Dict):
+        # Suites without streamed results (cached or failed before any test) still get an element
+        state = self._suite(suite)
+        if summary.get('status') == 'ERROR' and not state['tests']:
+            state['tests'] = state['errors'] = 1
+            state['cases'].append(f'    <testcase classname={quoteattr(suite)} name="suite setup" time="0">\n'
+                                  f'      <error message={quoteattr(str(summary.get("error")))}/>\n'
+                                  '    </testcase>\n')
+        self._end_suite(
+            suite,
+            f"status={summary.get('status')} total={summary.get('total')} passed={summary.get('passed')} "
+            f"failed={summary.get('failed')} duration={summary.get('duration', 0):.3f}s"
+        )
+
+    def close(self):
+        if self.file.closed:
+            return
+        for suite in list(self.open_suites):
+            self._end_suite(suite)
+        self.file.write('</testsuites>\n')
+        self.file.close()
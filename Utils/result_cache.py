@@ -0,0 +1,185 @@
+# Utils/result_cache.py
+"""
+On-disk result cache for UDS test suites
+Passing suite results are keyed by ECU identity (VIN, software number,
+spare part number) plus a hash of the suite source and the project
+modules it imports, so unchanged suites on unchanged ECUs can be skipped
+on the next run.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import importlib.util
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, ".uds_cache")
+
+# Identification DIDs read once per run to identify the ECU software
+IDENTITY_DIDS = {
+    'vin': 0xF190,
+    'software_number': 0xF188,
+    'spare_part_number': 0xF187,
+}
+
+# Modules every suite depends on; a change here invalidates all cached results
+# (project modules a suite imports are found from its source as well)
+SHARED_SOURCES = [
+    os.path.join(PROJECT_ROOT, "uds_validator.py"),
+    os.path.join(PROJECT_ROOT, "uds_validator_extended.py"),
+    os.path.join(PROJECT_ROOT, "Utils", "uds_utils.py"),
+]
+
+def read_ecu_identity(send_request: Callable[[bytes], bytes]) -> Dict[str, Optional[str]]:
+    """Read VIN (F190), software number (F188) and spare part number (F187)"""
+    identity = {}
+    for field, did in IDENTITY_DIDS.items():
+        request = bytes([0x22]) + did.to_bytes(2, 'big')
+        response = send_request(request)
+        expected_prefix = bytes([0x62]) + did.to_bytes(2, 'big')
+        if response and response.startswith(expected_prefix):
+            identity[field] = response[3:].decode('ascii', errors='ignore').strip()
+        else:
+            identity[field] = None
+    return identity
+
+# Import statements at any indentation (lazy imports inside functions count); a match in a
+# string only adds a file to the hash
+IMPORT_PATTERN = re.compile(r'^[ \t]*(?:from[ \t]+([\w.]+)[ \t]+import[ \t]+\(?([\w, \t]*)|import[ \t]+([\w., \t]+))',
+                            re.MULTILINE)
+
+# (path, modification time) -> project modules it imports; suites share most of them
+_imports_by_file: Dict[Tuple[str, int], List[str]] = {}
+
+def _local_imports(path: str) -> List[str]:
+    """Source files of the project modules a file imports, including imports inside functions"""
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+        if key in _imports_by_file:
+            return _imports_by_file[key]
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            source = f.read()
+    except OSError:
+        return []
+    names = []
+    for module, imported, modules in IMPORT_PATTERN.findall(source):
+        if module:
+            # "from package import module" names a module as well
+            names += [module] + [f"{module}.{item.split()[0]}" for item in imported.split(",") if item.strip()]
+        else:
+            names += [item.split()[0] for item in modules.split(",") if item.strip()]
+    paths = []
+    for name in names:
+        if name.startswith("."):
+            continue
+        base = os.path.join(PROJECT_ROOT, *name.split("."))
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(candidate):
+                paths.append(candidate)
+                break
+    _imports_by_file[key] = paths
+    return paths
+
+def source_closure(path: str) -> List[str]:
+    """A source file and every project module it imports directly or indirectly, sorted"""
+    seen = {path}
+    pending = [path]
+    while pending:
+        for dependency in _local_imports(pending.pop()):
+            if dependency not in seen:
+                seen.add(dependency)
+                pending.append(dependency)
+    return sorted(seen)
+
+def suite_source_hash(module_name: str) -> str:
+    """Hash the suite source file, the project modules it imports and the shared modules without importing them"""
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin:
+        raise ImportError(f"Cannot locate source for {module_name}")
+
+    digest = hashlib.sha256()
+    for path in sorted(set(source_closure(spec.origin) + SHARED_SOURCES)):
+        if os.path.exists(path):
+            digest.update(os.path.relpath(path, PROJECT_ROOT).encode('utf-8') + b"\0")
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+class ResultCache:
+    """JSON-backed cache of passing suite results per ECU identity"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, "results.json")
+        self.entries = self._load()
+        self.dirty = False
+
+    def _load(self) -> Dict:
+        """Load cache entries, treating a missing or corrupt file as empty"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def make_key(suite_name: str, identity: Dict[str, Optional[str]], source_hash: str) -> str:
+        """Build the cache key for a suite on a given ECU"""
+        parts = [suite_name, source_hash] + [identity.get(field) or "" for field in IDENTITY_DIDS]
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable(identity: Dict[str, Optional[str]]) -> bool:
+        """Only cache when the ECU could be identified"""
+        return all(identity.get(field) for field in IDENTITY_DIDS)
+
+    def lookup(self, suite_name: str, identity: Dict[str, Optional[str]], source_hash: str) -> Optional[Dict]:
+        """Return the cached passing summary for a suite, if any"""
+        if not self.is_cacheable(identity):
+            return None
+        entry = self.entries.get(self.make_key(suite_name, identity, source_hash))
+        return dict(entry['summary']) if entry else None
+
+    def store(self, suite_name: str, identity: Dict[str, Optional[str]], source_hash: str, summary: Dict) -> bool:
+        """Cache a suite summary if the suite completed without failures"""
+        if not self.is_cacheable(identity):
+            return False
+        if summary.get('status') != 'COMPLETED' or summary.get('failed', 0) != 0 or summary.get('total', 0) == 0:
+            return False
+
+        self.entries[self.make_key(suite_name, identity, source_hash)] = {
+            'suite': suite_name,
+            'ecu': dict(identity),
+            'source_hash': source_hash,
+            'summary': {k: summary[k] for k in ('total', 'passed', 'failed', 'pass_rate', 'duration')},
+            'timestamp': time.time(),
+        }
+        self.dirty = True
+        return True
+
+    def invalidate(self, vin: Optional[str] = None) -> int:
+        """Drop cached results (all, or only those of one VIN); return number removed"""
+        if vin is None:
+            removed = len(self.entries)
+            self.entries = {}
+        else:
+            stale = [key for key, entry in self.entries.items() if entry['ecu'].get('vin') == vin]
+            for key in stale:
+                del self.entries[key]
+            removed = len(stale)
+        self.dirty = self.dirty or removed > 0
+        return removed
+
+    def save(self):
+        """Write the cache atomically if it changed"""
+        if not self.dirty:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
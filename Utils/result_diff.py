@@ -0,0 +1,201 @@
+# Utils/result_diff.py
+"""
+Run-to-run regression diff
+Compares two runs read from results documents (--results-json), JSONL
+reports (--jsonl) or the SQLite history (--db). Results are keyed by
+(ECU, suite, test, occurrence), or (suite, test, occurrence) when a run
+does not know its ECU; the older run is loaded into a hash index and the
+newer run is streamed against it, so memory holds one run and the work is
+linear in the number of records.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import itertools
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from Utils.sharding import load_results
+
+UNKNOWN_ECU = "unknown ECU"
+
+# (ecu, suite, test, passed, nrc)
+Record = Tuple[str, str, str, bool, Optional[int]]
+
+def ecu_label(ecu: Optional[Dict]) -> str:
+    """VIN, else software number, identifying the ECU a result belongs to"""
+    ecu = ecu or {}
+    return ecu.get('vin') or ecu.get('software_number') or UNKNOWN_ECU
+
+def _iter_results_document(path: str) -> Iterator[Record]:
+    doc = load_results(path)
+    ecu = ecu_label(doc.get('ecu'))
+    for suite in doc['suites']:
+        for test in suite.get('tests', []):
+            yield ecu, suite['name'], test['test'], bool(test['passed']), test.get('nrc')
+
+def _iter_jsonl(path: str) -> Iterator[Record]:
+    ecu = UNKNOWN_ECU
+    # raw_decode skips the whitespace checks json.loads adds around every line
+    decode = json.JSONDecoder().raw_decode
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            # Cheap prefix test first: most lines are test results
+            if line.startswith('{"type":"test"'):
+                entry = decode(line)[0]
+                yield ecu, entry['suite'], entry['test'], entry['passed'], entry.get('nrc')
+            elif line.startswith('{"type":"start"'):
+                ecu = ecu_label(decode(line)[0].get('ecu'))
+
+def _iter_store(path: str, run_id: Optional[int]) -> Iterator[Record]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if run_id is None:
+            run_id = conn.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+        cursor = conn.execute(
+            "SELECT COALESCE(runs.vin, runs.software_number, ?), results.suite, results.test, "
+            "results.passed, results.nrc FROM results JOIN runs ON runs.id = results.run_id "
+            "WHERE results.run_id = ? ORDER BY results.rowid", (UNKNOWN_ECU, run_id))
+        for ecu, suite, test, passed, nrc in cursor:
+            yield ecu, suite, test, bool(passed), nrc
+    finally:
+        conn.close()
+
+def iter_source(source: str) -> Iterator[Record]:
+    """Records of a run: results JSON, JSONL report, 'history.db[@RUN_ID]' or a directory of reports"""
+    path, _, run_id = source.partition('@')
+    if os.path.isdir(path):
+        return itertools.chain.from_iterable(
+            iter_source(os.path.join(path, name)) for name in sorted(os.listdir(path))
+            if name.endswith(('.json', '.jsonl')))
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    if head.startswith(b"SQLite format 3"):
+        return _iter_store(path, int(run_id) if run_id else None)
+    if path.endswith('.jsonl'):
+        return _iter_jsonl(path)
+    return _iter_results_document(path)
+
+class RunDiff:
+    """Changes between two runs, grouped by (ECU, suite)"""
+
+    CATEGORIES = ('newly_failing', 'newly_passing', 'changed_nrc', 'added', 'removed')
+
+    def __init__(self):
+        self.groups: Dict[Tuple[str, str], Dict[str, List]] = {}
+        self.counts = {category: 0 for category in self.CATEGORIES}
+        self.compared = 0
+        self.old_records = 0
+        self.new_records = 0
+
+    def add(self, category: str, key: Tuple, old, new):
+        ecu, suite, test, occurrence = key
+        group = self.groups.setdefault((ecu, suite), {c: [] for c in self.CATEGORIES})
+        group[category].append({'test': test, 'occurrence': occurrence, 'old': old, 'new': new})
+        self.counts[category] += 1
+
+    @property
+    def regressed(self) -> bool:
+        return self.counts['newly_failing'] > 0
+
+    @property
+    def disjoint(self) -> bool:
+        """Both runs have results but none of them matched"""
+        return self.compared == 0 and self.old_records > 0 and self.new_records > 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'compared': self.compared,
+            'old_records': self.old_records,
+            'new_records': self.new_records,
+            'counts': self.counts,
+            'groups': [{'ecu': ecu, 'suite': suite, **changes}
+                       for (ecu, suite), changes in sorted(self.groups.items())],
+        }
+
+def diff_runs(old: Iterator[Record], new: Iterator[Record]) -> RunDiff:
+    """Hash-join two runs on (ECU, suite, test, occurrence).
+
+    The occurrence number keeps repeated test names (soak runs) distinct.
+    Results of an unknown ECU (no identity read) match any ECU of the
+    other run.
+    """
+    intern = sys.intern
+    index = {}
+    seen: Dict[Tuple, int] = {}
+    seen_get = seen.get
+    result = RunDiff()
+    for ecu, suite, test, passed, nrc in old:
+        # Interned names keep the index of a million-record run compact
+        base = (None if ecu == UNKNOWN_ECU else intern(ecu), intern(suite), intern(test))
+        occurrence = seen_get(base, 0)
+        seen[base] = occurrence + 1
+        index[base + (occurrence,)] = (bool(passed), nrc)
+        result.old_records += 1
+
+    pop = index.pop
+    # (suite, test, occurrence) -> ECU of the old run, built on the first new result of an unknown ECU
+    by_test = None
+    seen.clear()
+    for ecu, suite, test, passed, nrc in new:
+        result.new_records += 1
+        base = (ecu, suite, test)
+        occurrence = seen_get(base, 0)
+        seen[base] = occurrence + 1
+        key = base + (occurrence,)
+        passed = bool(passed)
+        previous = pop(key, None)
+        if previous is None:
+            previous = pop((None, suite, test, occurrence), None)
+        if previous is None and ecu == UNKNOWN_ECU:
+            if by_test is None:
+                by_test = {(s, t, o): e for e, s, t, o in index}
+            old_ecu = by_test.get((suite, test, occurrence))
+            previous = pop((old_ecu, suite, test, occurrence), None)
+            if previous is not None:
+                key = (old_ecu, suite, test, occurrence)
+        if previous is None:
+            result.add('added', key, None, {'passed': passed, 'nrc': nrc})
+            continue
+        result.compared += 1
+        old_passed, old_nrc = previous
+        if old_passed == passed and old_nrc == nrc:
+            continue
+        if old_passed and not passed:
+            category = 'newly_failing'
+        elif passed and not old_passed:
+            category = 'newly_passing'
+        else:
+            category = 'changed_nrc'
+        result.add(category, key, {'passed': old_passed, 'nrc': old_nrc}, {'passed': passed, 'nrc': nrc})
+    for (ecu, suite, test, occurrence), (passed, nrc) in index.items():
+        result.add('removed', (ecu or UNKNOWN_ECU, suite, test, occurrence), {'passed': passed, 'nrc': nrc}, None)
+    return result
+
+def _format_outcome(outcome: Optional[Dict]) -> str:
+    if outcome is None:
+        return "-"
+    text = "PASS" if outcome['passed'] else "FAIL"
+    if outcome['nrc'] is not None:
+        text += f" NRC 0x{outcome['nrc']:02X}"
+    return text
+
+def print_diff(result: RunDiff, limit: int = 50):
+    """Print the diff grouped by ECU and service"""
+    labels = {'newly_failing': "Newly failing", 'newly_passing': "Newly passing",
+              'changed_nrc': "Changed NRC", 'added': "Added", 'removed': "Removed"}
+    print(f"Compared {result.compared} results: " +
+          ", ".join(f"{labels[c].lower()} {result.counts[c]}" for c in RunDiff.CATEGORIES))
+    for (ecu, suite), changes in sorted(result.groups.items()):
+        print(f"\n{ecu} / {suite}")
+        for category in RunDiff.CATEGORIES:
+            entries = changes[category]
+            if not entries:
+                continue
+            print(f"  {labels[category]} ({len(entries)}):")
+            for entry in entries[:limit]:
+                repeat = f" #{entry['occurrence'] + 1}" if entry['occurrence'] else ""
+                print(f"    {entry['test']}{repeat}: {_format_outcome(entry['old'])} -> {_format_outcome(entry['new'])}")
+            if len(entries) > limit:
+                print(f"    ... {len(entries) - limit} more")
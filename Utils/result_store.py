@@ -0,0 +1,216 @@
+# Utils/result_store.py
+"""
+SQLite store for historical test results
+Every run, suite and test result is kept with the ECU identity so pass rate
+and latency can be tracked per ECU software version over time. Results are
+written by a report sink in one transaction per suite.
+"""
+
+import time
+import socket
+import sqlite3
+from typing import Dict, List, Optional
+
+from Utils.report_sinks import ReportSink
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    host TEXT,
+    shard TEXT,
+    vin TEXT,
+    software_number TEXT,
+    spare_part_number TEXT,
+    total INTEGER,
+    passed INTEGER,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS suites (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    suite TEXT NOT NULL,
+    sid INTEGER,
+    status TEXT,
+    total INTEGER,
+    passed INTEGER,
+    duration REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    suite TEXT NOT NULL,
+    sid INTEGER,
+    test TEXT NOT NULL,
+    case_name TEXT,
+    passed INTEGER NOT NULL,
+    details TEXT,
+    nrc INTEGER,
+    timestamp REAL NOT NULL,
+    duration REAL,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_ecu ON runs(software_number, vin);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS idx_suites_run ON suites(run_id);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results(run_id);
+CREATE INDEX IF NOT EXISTS idx_results_sid ON results(sid, run_id);
+CREATE INDEX IF NOT EXISTS idx_results_test ON results(suite, test, run_id);
+CREATE INDEX IF NOT EXISTS idx_results_time ON results(timestamp);
+"""
+
+class ResultStore:
+    """Historical results database with trend, flaky-test and regression queries"""
+
+    def __init__(self, path: str = "uds_results.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # WAL lets report queries read while a run writes; NORMAL sync is durable at checkpoints
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def start_run(self, ecu: Optional[Dict] = None, shard: Optional[str] = None,
+                  started: Optional[float] = None) -> int:
+        """Create a run row and return its id"""
+        ecu = ecu or {}
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started, host, shard, vin, software_number, spare_part_number) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (started or time.time(), socket.gethostname(), shard,
+                 ecu.get('vin'), ecu.get('software_number'), ecu.get('spare_part_number')))
+        return cursor.lastrowid
+
+    def add_suite(self, run_id: int, suite: str, sid: Optional[int], summary: Dict, records: List[Dict]):
+        """Insert a suite summary and its test results in one transaction"""
+        rows = [
+            (run_id, suite, sid, r['test'], r.get('case'), int(bool(r['passed'])), r.get('details'),
+             r.get('nrc'), r['timestamp'], r.get('duration'), r.get('latency'))
+            for r in records
+        ]
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO suites (run_id, suite, sid, status, total, passed, duration, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, suite, sid, summary.get('status'), summary.get('total'), summary.get('passed'),
+                 summary.get('duration'), summary.get('error')))
+            self.conn.executemany(
+                "INSERT INTO results (run_id, suite, sid, test, case_name, passed, details, nrc, "
+                "timestamp, duration, latency) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def finish_run(self, run_id: int, summary: Dict):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE runs SET finished = ?, total = ?, passed = ?, duration = ? WHERE id = ?",
+                (time.time(), summary.get('total'), summary.get('passed'), summary.get('duration'), run_id))
+
+    def pass_rate_trend(self, software_number: Optional[str] = None, sid: Optional[int] = None,
+                        limit: int = 50) -> List[Dict]:
+        """Pass rate and mean test duration/ECU latency per run, newest first"""
+        where, params = self._filters(software_number=software_number, sid=sid)
+        rows = self.conn.execute(
+            f"SELECT runs.id AS run_id, runs.started, runs.software_number, COUNT(*) AS total, "
+            f"SUM(results.passed) AS passed, 100.0 * SUM(results.passed) / COUNT(*) AS pass_rate, "
+            f"AVG(results.duration) AS mean_duration, AVG(results.latency) AS mean_latency "
+            f"FROM results JOIN runs ON runs.id = results.run_id {where} "
+            f"GROUP BY runs.id ORDER BY runs.id DESC LIMIT ?", params + [limit])
+        return [dict(row) for row in rows]
+
+    def software_trend(self, sid: Optional[int] = None, test: Optional[str] = None) -> List[Dict]:
+        """Pass rate and latency aggregated per ECU software version, oldest version first"""
+        where, params = self._filters(sid=sid, test=test)
+        rows = self.conn.execute(
+            f"SELECT runs.software_number, COUNT(DISTINCT runs.id) AS runs, COUNT(*) AS results, "
+            f"100.0 * SUM(results.passed) / COUNT(*) AS pass_rate, AVG(results.duration) AS mean_duration, "
+            f"MAX(results.duration) AS max_duration, AVG(results.latency) AS mean_latency, "
+            f"MIN(runs.started) AS first_seen "
+            f"FROM results JOIN runs ON runs.id = results.run_id {where} "
+            f"GROUP BY runs.software_number ORDER BY first_seen", params)
+        return [dict(row) for row in rows]
+
+    def flaky_tests(self, last_runs: int = 20, min_runs: int = 3) -> List[Dict]:
+        """Tests with both outcomes on the same software version within the last runs.
+
+        flips counts pass/fail changes between consecutive runs, so an
+        intermittent test ranks above one that broke once and stayed broken.
+        """
+        rows = self.conn.execute(
+            "WITH recent AS (SELECT id, software_number FROM runs ORDER BY id DESC LIMIT ?), "
+            "outcomes AS ("
+            "  SELECT results.suite, results.test, recent.software_number, results.run_id, "
+            "         MIN(results.passed) AS passed "
+            "  FROM results JOIN recent ON recent.id = results.run_id "
+            "  GROUP BY results.suite, results.test, results.run_id), "
+            "ordered AS ("
+            "  SELECT *, LAG(passed) OVER (PARTITION BY suite, test, software_number ORDER BY run_id) AS previous "
+            "  FROM outcomes) "
+            "SELECT suite, test, software_number, COUNT(*) AS runs, SUM(passed) AS passed_runs, "
+            "       SUM(previous IS NOT NULL AND previous != passed) AS flips "
+            "FROM ordered GROUP BY suite, test, software_number "
+            "HAVING runs >= ? AND passed_runs BETWEEN 1 AND runs - 1 "
+            "ORDER BY flips DESC, runs DESC", (last_runs, min_runs))
+        return [dict(row) for row in rows]
+
+    def first_failing_run(self, suite: str, test: str, vin: Optional[str] = None) -> Optional[Dict]:
+        """First run of the current failure streak of a test (None if it last passed)"""
+        where, params = self._filters(vin=vin)
+        where = f"{where} {'AND' if where else 'WHERE'} results.suite = ? AND results.test = ?"
+        params += [suite, test]
+        row = self.conn.execute(
+            f"WITH history AS (SELECT results.run_id, MIN(results.passed) AS passed "
+            f"  FROM results JOIN runs ON runs.id = results.run_id {where} GROUP BY results.run_id) "
+            f"SELECT runs.*, history.run_id AS run_id FROM history JOIN runs ON runs.id = history.run_id "
+            f"WHERE history.passed = 0 AND history.run_id > "
+            f"  COALESCE((SELECT MAX(run_id) FROM history WHERE passed = 1), 0) "
+            f"ORDER BY history.run_id LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _filters(**filters) -> tuple:
+        columns = {'software_number': 'runs.software_number', 'vin': 'runs.vin',
+                   'sid': 'results.sid', 'test': 'results.test'}
+        clauses, params = [], []
+        for key, value in filters.items():
+            if value is not None:
+                clauses.append(f"{columns[key]} = ?")
+                params.append(value)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def close(self):
+        self.conn.close()
+
+class ResultStoreSink(ReportSink):
+    """Report sink buffering each suite's results and writing them as one transaction"""
+
+    needs_ecu_identity = True
+
+    def __init__(self, store_or_path, sids: Optional[Dict[str, int]] = None):
+        self.store = store_or_path if isinstance(store_or_path, ResultStore) else ResultStore(store_or_path)
+        self.sids = sids or {}
+        self.run_id = None
+        self._pending: Dict[str, List[Dict]] = {}
+
+    def on_run_start(self, info: Dict):
+        self.run_id = self.store.start_run(info.get('ecu'), info.get('shard'), info.get('started'))
+
+    def on_test_result(self, suite: Optional[str], record: Dict):
+        # Keep only the stored columns until the suite's transaction
+        self._pending.setdefault(suite, []).append({
+            'test': record['test'], 'passed': record['passed'], 'details': record.get('details'),
+            'case': record.get('case'), 'nrc': record.get('nrc'), 'timestamp': record['timestamp'],
+            'duration': record.get('duration'), 'latency': record.get('latency'),
+        })
+
+    def on_suite_summary(self, suite: str, summary: Dict):
+        if self.run_id is None:
+            self.on_run_start({})
+        self.store.add_suite(self.run_id, suite, self.sids.get(suite), summary, self._pending.pop(suite, []))
+
+    def on_run_summary(self, summary: Dict):
+        if self.run_id is not None:
+            self.store.finish_run(self.run_id, summary)
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,262 @@
+# Utils/runner_daemon.py
+"""
+Long-lived test runner daemon
+Keeps imported suites, DoIP transports and ECU session state warm between
+jobs. Jobs are JSON requests sent over a Unix domain socket (accessible to
+the daemon user only); results are streamed back to the client as JSON
+lines while the job runs.
+"""
+
+import os
+import json
+import stat
+import queue
+import socket
+import tempfile
+import threading
+import socketserver
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from Utils.doip_handler import DoIPHandler
+from Utils.ecu_simulator import ECUSimulator
+from Utils.report_sinks import JSONLReportSink
+from Utils.test_scheduler import ECUStateController
+
+def default_socket_path() -> str:
+    """Socket path in the user's runtime directory, or in a per-user directory under /tmp"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = os.path.join(tempfile.gettempdir(), f"uds_runner-{os.getuid()}")
+    return os.path.join(runtime_dir, "uds_runner.sock")
+
+DEFAULT_SOCKET_PATH = default_socket_path()
+
+class DaemonError(Exception):
+    """The daemon cannot take over its socket path"""
+
+class WarmTransport:
+    """A pooled transport with its state controller and an exclusive-use lock"""
+
+    def __init__(self, key: Tuple, send_request: Callable[[bytes], bytes], handler=None):
+        self.key = key
+        self.handler = handler
+        self.send_request = send_request
+        self.controller = ECUStateController(send_request)
+        self.lock = threading.Lock()
+        self.jobs_served = 0
+
+class TransportPool:
+    """Creates transports on first use and keeps them connected across jobs"""
+
+    def __init__(self):
+        self._transports: Dict[Tuple, WarmTransport] = {}
+        self._lock = threading.Lock()
+
+    def get(self, target: Optional[Dict] = None) -> WarmTransport:
+        """Return the warm transport for a job target (None: local simulator)"""
+        if not target:
+            key = ('simulator',)
+        else:
+            key = ('doip', target['ip'], target.get('port', 13400),
+                   target.get('source_addr', 0x0E00), target.get('target_addr', 0x1234))
+
+        with self._lock:
+            transport = self._transports.get(key)
+            if transport is None:
+                transport = self._create(key)
+                self._transports[key] = transport
+
+        if transport.handler is not None and not transport.handler.connected:
+            # Reconnect lazily; the ECU session state is unknown after a drop
+            if not transport.handler.connect():
+                raise ConnectionError(f"DoIP connection to {key[1]}:{key[2]} failed")
+            transport.controller.notify_unknown()
+        return transport
+
+    @staticmethod
+    def _create(key: Tuple) -> WarmTransport:
+        if key[0] == 'simulator':
+            return WarmTransport(key, ECUSimulator().send_request)
+        handler = DoIPHandler(key[1], key[2], source_addr=key[3], target_addr=key[4])
+        if not handler.connect():
+            raise ConnectionError(f"DoIP connection to {key[1]}:{key[2]} failed")
+        return WarmTransport(key, handler.send_diagnostic_message, handler)
+
+    def close(self):
+        with self._lock:
+            for transport in self._transports.values():
+                if transport.handler is not None:
+                    transport.handler.disconnect()
+            self._transports.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"/".join(str(k) for k in key): t.jobs_served for key, t in self._transports.items()}
+
+def results_path(results_dir: Optional[str], name: str) -> str:
+    """Path of a job's results document: a plain file name inside the daemon's results directory"""
+    if results_dir is None:
+        raise ValueError("Results documents are disabled (start the daemon with --results-dir)")
+    if os.path.basename(name) != name or name in ('', '.', '..'):
+        raise ValueError(f"results_json must be a file name, got {name!r}")
+    return os.path.join(results_dir, name)
+
+class ClientSink(JSONLReportSink):
+    """JSONL sink streaming to a client connection; a disconnected client only stops the streaming"""
+
+    def __init__(self, stream):
+        super().__init__(stream=stream, flush_every=1)
+        self.disconnected = False
+
+    def _guarded(self, write, *args):
+        if self.disconnected:
+            return
+        try:
+            write(*args)
+        except OSError:
+            # The job keeps running; its results still reach the other sinks and the results document
+            self.disconnected = True
+
+    def on_run_start(self, info: Dict):
+        self._guarded(super().on_run_start, info)
+
+    def on_test_result(self, suite: Optional[str], record: Dict):
+        self._guarded(super().on_test_result, suite, record)
+
+    def on_suite_summary(self, suite: str, summary: Dict):
+        self._guarded(super().on_suite_summary, suite, summary)
+
+    def on_run_summary(self, summary: Dict):
+        self._guarded(super().on_run_summary, summary)
+
+    def send(self, message: Dict):
+        """Write a protocol message and flush it to the client"""
+        self._guarded(self._write, message)
+        self.flush()
+
+    def flush(self):
+        self._guarded(self.file.flush)
+
+class _Job:
+    def __init__(self, request: Dict, sink: ClientSink):
+        self.request = request
+        self.sink = sink
+        self.done = threading.Event()
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request line, then streams the job's JSON lines back"""
+
+    def handle(self):
+        daemon = self.server.daemon
+        line = self.rfile.readline()
+        stream = open(self.connection.fileno(), 'w', encoding='utf-8', closefd=False)
+        sink = ClientSink(stream)
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            sink.send({'type': 'error', 'error': f"Invalid job request: {e}"})
+            return
+
+        command = request.get('command', 'run')
+        if command == 'ping':
+            sink.send({'type': 'pong', 'queued': daemon.jobs.qsize(), 'transports': daemon.pool.stats()})
+        elif command == 'shutdown':
+            sink.send({'type': 'shutdown'})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            job = _Job(request, sink)
+            daemon.jobs.put(job)
+            sink.send({'type': 'queued', 'position': daemon.jobs.qsize()})
+            job.done.wait()
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class RunnerDaemon:
+    """Accepts test-run jobs over a Unix socket and runs them on warm transports.
+
+    run_job(request, sink, transport) executes one job and returns its
+    summary dict; workers > 1 runs jobs for different transports in parallel
+    (jobs on the same transport are serialized by its lock).
+    """
+
+    def __init__(self, run_job: Callable[[Dict, ClientSink, WarmTransport], Dict],
+                 socket_path: str = DEFAULT_SOCKET_PATH, workers: int = 1):
+        self.run_job = run_job
+        self.socket_path = socket_path
+        self.workers = workers
+        self.pool = TransportPool()
+        self.jobs: "queue.Queue[_Job]" = queue.Queue()
+        self.server = None
+
+    def _worker(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                transport = self.pool.get(job.request.get('target'))
+                with transport.lock:
+                    transport.jobs_served += 1
+                    summary = self.run_job(job.request, job.sink, transport)
+                job.sink.send({'type': 'job', 'status': 'done', **summary})
+            except Exception as e:
+                job.sink.send({'type': 'job', 'status': 'error', 'error': str(e)})
+            finally:
+                job.done.set()
+
+    def serve_forever(self):
+        """Bind the socket and serve jobs until a shutdown command arrives"""
+        self._prepare_socket_path()
+        # Bound with mode 0600: jobs run with the daemon user's rights
+        umask = os.umask(0o177)
+        try:
+            self.server = _UnixServer(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self.server.daemon = self
+        threads = [threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        print(f"UDS runner daemon listening on {self.socket_path} with {self.workers} worker(s)")
+        try:
+            self.server.serve_forever()
+        finally:
+            for _ in threads:
+                self.jobs.put(None)
+            self.server.server_close()
+            self.pool.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _prepare_socket_path(self):
+        """Create the socket directory and remove a stale socket; refuse anything else"""
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.stat(directory)
+        # Another user could otherwise swap the socket; shared directories need the sticky bit
+        if not info.st_mode & stat.S_ISVTX and (info.st_uid != os.getuid() or info.st_mode & 0o022):
+            raise DaemonError(f"{directory} can be modified by other users")
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise DaemonError(f"{self.socket_path} exists and is not a socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)  # Left behind by a daemon that did not shut down
+                return
+        raise DaemonError(f"A runner daemon is already listening on {self.socket_path}")
+
+def submit_job(request: Dict, socket_path: str = DEFAULT_SOCKET_PATH) -> Iterator[Dict]:
+    """Send a job to the daemon and yield its streamed JSON lines"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        with sock.makefile('r', encoding='utf-8') as stream:
+            for line in stream:
+                yield json.loads(line)
@@ -0,0 +1,136 @@
+# Utils/sharding.py
+"""
+Deterministic test sharding and result merging
+Test cases are split across worker hosts either by a stable hash of the
+case key or, when a previous run's timings are available, by duration-aware
+greedy balancing. Shard result documents can be merged back into a single
+report equivalent to a single-host run.
+"""
+
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from Utils.uds_utils import timing_summary
+
+RESULTS_FORMAT = "uds-results/1"
+
+# Status precedence when the same suite reports different states across shards
+STATUS_PRIORITY = {'COMPLETED': 0, 'CACHED': 0, 'TIMEOUT': 2, 'ERROR': 3}
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse a 1-based 'i/N' shard specification"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {spec!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard index must be within 1..{count}, got {spec!r}")
+    return index, count
+
+def stable_hash(key: str) -> int:
+    """Process-independent hash (Python's hash() is salted per interpreter)"""
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big')
+
+def assign_shards(keys: List[str], shard_count: int, timings: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Map every case key to a 1-based shard number.
+
+    Without timings the shard is the stable hash modulo N. With timings the
+    cases are balanced longest-first onto the least loaded shard; unknown
+    cases are weighted with the median known duration. Every host computes
+    the same assignment from the same inputs.
+    """
+    if not timings:
+        return {key: stable_hash(key) % shard_count + 1 for key in keys}
+
+    known = sorted(timings[key] for key in keys if key in timings)
+    default = known[len(known) // 2] if known else 1.0
+    weighted = sorted(((timings.get(key, default), key) for key in keys), key=lambda item: (-item[0], item[1]))
+
+    loads = [0.0] * shard_count
+    assignment = {}
+    for duration, key in weighted:
+        shard = min(range(shard_count), key=lambda i: (loads[i], i))
+        loads[shard] += duration
+        assignment[key] = shard + 1
+    return assignment
+
+def select_shard(cases: List, shard_index: int, shard_count: int, timings: Optional[Dict[str, float]] = None) -> List:
+    """Return the cases (objects with a .key) that belong to one shard, keeping their order"""
+    assignment = assign_shards([case.key for case in cases], shard_count, timings)
+    return [case for case in cases if assignment[case.key] == shard_index]
+
+def load_results(path: str) -> Dict:
+    """Load a results document written with --results-json"""
+    with open(path, 'r', encoding='utf-8') as f:
+        doc = json.load(f)
+    if doc.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path} is not a {RESULTS_FORMAT} results document")
+    return doc
+
+def write_results(path: str, doc: Dict):
+    """Write a results document"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(doc, f, indent=1, default=str)
+
+def load_timings(path: str) -> Dict[str, float]:
+    """Per-case durations from a previous (possibly merged) results document"""
+    return {case['key']: case['duration'] for case in load_results(path).get('cases', [])}
+
+def summarize_tests(tests: List[Dict]) -> Dict:
+    """Recompute suite counters and timing from individual test records"""
+    total = len(tests)
+    passed = sum(1 for t in tests if t['passed'])
+    durations = {}
+    latencies = []
+    for t in tests:
+        if 'duration' in t:
+            durations.setdefault(t['test'], []).append(t['duration'])
+            latencies.extend((response - request) / 1e9 for request, response in t.get('exchanges', []))
+    return {
+        'total': total,
+        'passed': passed,
+        'failed': total - passed,
+        'pass_rate': (passed / total * 100) if total > 0 else 0,
+        'timing': timing_summary(durations, latencies),
+    }
+
+def merge_results(docs: List[Dict]) -> Dict:
+    """Merge shard result documents into one document equal to a single-host run"""
+    suites = {}
+    cases = {}
+    for doc in docs:
+        for suite in doc['suites']:
+            merged = suites.setdefault(suite['name'], {
+                'name': suite['name'], 'tests': [], 'duration': 0.0,
+                'status': 'COMPLETED', 'error': None, 'errors': [],
+            })
+            merged['tests'].extend(suite.get('tests', []))
+            merged['duration'] += suite.get('duration', 0.0)
+            if STATUS_PRIORITY.get(suite['status'], 1) > STATUS_PRIORITY.get(merged['status'], 1):
+                merged['status'] = suite['status']
+            if suite.get('error'):
+                merged['errors'].append(suite['error'])
+        for case in doc.get('cases', []):
+            cases[case['key']] = case
+
+    # Restore declared case order inside each suite
+    case_index = {key: case['index'] for key, case in cases.items()}
+    for suite in suites.values():
+        suite['tests'].sort(key=lambda t: case_index.get(f"{suite['name']}::{t.get('case')}", 0))
+        suite.update(summarize_tests(suite['tests']))
+        suite['error'] = "; ".join(suite.pop('errors')) or None
+
+    # Suites keep the run order (every shard lists all selected suites), not alphabetical order
+    suite_order = {name: i for i, name in enumerate(suites)}
+    return {
+        'format': RESULTS_FORMAT,
+        'created': time.time(),
+        'shard': None,
+        'merged_from': [doc.get('shard') for doc in docs],
+        'ecu': next((doc['ecu'] for doc in docs if doc.get('ecu')), {}),
+        'duration': max((doc.get('duration', 0.0) for doc in docs), default=0.0),
+        'suites': list(suites.values()),
+        'cases': sorted(cases.values(), key=lambda c: (suite_order.get(c['suite'], len(suite_order)), c['index'])),
+    }
@@ -0,0 +1,166 @@
+# Utils/suite_registry.py
+"""
+Lazy test suite registry
+Maps UDS services to their test classes without importing the test modules.
+A suite module is only imported when the suite is selected and loaded.
+"""
+
+import re
+import importlib
+from typing import Dict, List, Optional
+
+# Third-party suites can register themselves through this entry point group,
+# e.g. in their pyproject.toml:
+#   [project.entry-points."uds_testsuite.suites"]
+#   "My Service (0x85)" = "my_pkg.test_my_service:MyServiceTest"
+ENTRY_POINT_GROUP = "uds_testsuite.suites"
+
+# Selectors like 0x22 or 22 name a service; "(0x85)" in a suite name gives suites registered without a SID one
+HEX_SELECTOR = re.compile(r"(0x)?[0-9a-f]+")
+NAME_SID = re.compile(r"\(0x([0-9a-fA-F]{2})\)")
+
+class SuiteSpec:
+    """Registry entry describing a test suite class by import path"""
+
+    def __init__(self, name: str, target: str, sid: Optional[int] = None, group: str = "core"):
+        self.name = name
+        self.target = target
+        self.sid = sid
+        self.group = group
+        self._test_class = None
+
+    @property
+    def module(self) -> str:
+        """Dotted module path of the suite"""
+        return self.target.split(":", 1)[0]
+
+    @property
+    def class_name(self) -> str:
+        """Class name of the suite inside its module"""
+        return self.target.split(":", 1)[1]
+
+    def load(self):
+        """Import the suite module (once) and return the test class"""
+        if self._test_class is None:
+            module = importlib.import_module(self.module)
+            self._test_class = getattr(module, self.class_name)
+        return self._test_class
+
+    @property
+    def service_id(self) -> Optional[int]:
+        """Registered SID, or the one in the name (e.g. "My Service (0x85)" of an entry point suite)"""
+        if self.sid is not None:
+            return self.sid
+        match = NAME_SID.search(self.name)
+        return int(match.group(1), 16) if match else None
+
+    def matches(self, selector: str) -> bool:
+        """Check if a CLI selector (SID, group, module or name) refers to this suite.
+
+        Hex selectors match the SID only; others match the group, the module,
+        the class or part of the name.
+        """
+        selector = selector.strip().lower()
+        if HEX_SELECTOR.fullmatch(selector):
+            return int(selector, 16) == self.service_id
+        short_module = self.module.rsplit(".", 1)[-1]
+        return selector in (self.group, short_module.lower(), short_module[5:].lower(), self.class_name.lower()) \
+            or selector in self.name.lower()
+
+    def __repr__(self) -> str:
+        return f"SuiteSpec({self.name!r}, {self.target!r})"
+
+_REGISTRY: Dict[str, SuiteSpec] = {}
+_entry_points_loaded = False
+
+def register_suite(name: str, target: str, sid: Optional[int] = None, group: str = "core") -> SuiteSpec:
+    """Register a test suite by 'module:Class' import path"""
+    if ":" not in target:
+        raise ValueError(f"Suite target must be 'module:Class', got {target!r}")
+    spec = SuiteSpec(name, target, sid, group)
+    _REGISTRY[name] = spec
+    return spec
+
+def _load_entry_point_suites():
+    """Register suites advertised through package entry points (without importing them)"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        selected = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        selected = eps.get(ENTRY_POINT_GROUP, [])
+
+    for ep in selected:
+        if ep.name not in _REGISTRY:
+            register_suite(ep.name, ep.value, group="plugin")
+
+def get_suites(selectors: Optional[List[str]] = None, groups: Optional[List[str]] = None) -> List[SuiteSpec]:
+    """Return registered suites in registration order, optionally filtered"""
+    # Scanning installed distributions for entry points costs more than importing
+    # every built-in suite, so skip it when the selection is already satisfied
+    if not selectors or not all(any(spec.matches(s) for spec in _REGISTRY.values()) for s in selectors):
+        _load_entry_point_suites()
+    specs = [spec for spec in _REGISTRY.values() if groups is None or spec.group in groups]
+    if not selectors:
+        return specs
+
+    selected = [spec for spec in specs if any(spec.matches(s) for s in selectors)]
+    if not selected:
+        raise ValueError(f"No test suite matches {', '.join(selectors)}")
+    return selected
+
+def get_suite(name: str) -> SuiteSpec:
+    """Return a registered suite by its display name"""
+    _load_entry_point_suites()
+    return _REGISTRY[name]
+
+# Built-in ISO 14229 service suites (order is the default execution order)
+register_suite("Diagnostic Session Control (0x10)", "test_services.test_diagnostic_session_control_new:DiagnosticSessionControlTest", 0x10)
+register_suite("ECU Reset (0x11)", "test_services.test_ecu_reset:ECUResetTest", 0x11)
+register_suite("Clear Diagnostic Information (0x14)", "test_services.test_clear_diagnostic_information:ClearDiagnosticInformationTest", 0x14)
+register_suite("Read DTC Information (0x19)", "test_services.test_read_dtc_information:ReadDTCInformationTest", 0x19)
+register_suite("Read Data By Identifier (0x22)", "test_services.test_read_data_by_identifier:ReadDataByIdentifierTest", 0x22)
+register_suite("Communication Control (0x28)", "test_services.test_communication_control:CommunicationControlTest", 0x28)
+register_suite("Write Data By Identifier (0x2E)", "test_services.test_write_data_by_identifier:WriteDataByIdentifierTest", 0x2E)
+register_suite("Input Output Control (0x2F)", "test_services.test_input_output_control:InputOutputControlTest", 0x2F)
+register_suite("Routine Control (0x31)", "test_services.test_routine_control:RoutineControlTest", 0x31)
+register_suite("Request Download (0x34)", "test_services.test_request_download:RequestDownloadTest", 0x34)
+register_suite("Transfer Data (0x36)", "test_services.test_transfer_data:TransferDataTest", 0x36)
+register_suite("Request Transfer Exit (0x37)", "test_services.test_request_transfer_exit:RequestTransferExitTest", 0x37)
+register_suite("Tester Present (0x3E)", "test_services.test_tester_present:TesterPresentTest", 0x3E)
+register_suite("Security Access (0x27)", "test_services.test_security_access:SecurityAccessTest", 0x27)
+
+# Transport integration suites (not part of the default service run)
+register_suite("DoIP/DoSOAD Integration", "test_services.test_doip_integration:DoIPIntegrationTest", group="transport")
+register_suite("DoIP Final", "test_services.test_doip_final:DoIPFinalTest", group="transport")
+register_suite("DoIP Handler", "test_services.test_doip_handler:DoIPHandlerTest", group="transport")
+
+# Suites of the tester's own engines (flashing, memory reads, periodic streaming, DID polling, dynamic
+# DIDs) and runner machinery against the local ECU simulator; run when selected, all of them with
+# -s simulator or one with e.g. -s 0x23
+register_suite("Resumable Flash", "test_services.test_flash_resume:FlashResumeTest", group="simulator")
+register_suite("Read Memory By Address (0x23)", "test_services.test_read_memory_by_address:ReadMemoryByAddressTest", 0x23,
+               group="simulator")
+register_suite("Read Data By Periodic Identifier (0x2A)",
+               "test_services.test_read_data_by_periodic_identifier:ReadDataByPeriodicIdentifierTest", 0x2A,
+               group="simulator")
+register_suite("Multi-Rate DID Polling", "test_services.test_did_poller:DIDPollerTest", group="simulator")
+register_suite("Dynamically Define Data Identifier (0x2C)",
+               "test_services.test_dynamically_define_data_identifier:DynamicallyDefineDataIdentifierTest", 0x2C,
+               group="simulator")
+register_suite("Watchdog Deadlines", "test_services.test_watchdog:WatchdogTest", group="simulator")
+register_suite("Sharding and Merge", "test_services.test_sharding:ShardingTest", group="simulator")
+register_suite("Test Logger", "test_services.test_test_logger:TestLoggerTest", group="simulator")
+register_suite("Result Diff", "test_services.test_result_diff:ResultDiffTest", group="simulator")
+register_suite("Flash Compression", "test_services.test_flash_compression:FlashCompressionTest", group="simulator")
+register_suite("Delta Flashing", "test_services.test_flash_delta:DeltaFlashTest", group="simulator")
+register_suite("Download Checksums", "test_services.test_checksums:ChecksumTest", group="simulator")
+register_suite("Memory Upload", "test_services.test_memory_upload:MemoryUploadTest", group="simulator")
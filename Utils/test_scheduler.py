@@ -0,0 +1,284 @@
+# Utils/test_scheduler.py
+"""
+Dependency-aware test scheduler
+Test cases declare the ECU state they need (session, security level) and
+whether they disturb it (ECU reset, session change). The scheduler orders
+cases to cover all preconditions with the fewest 0x10/0x27 transitions and
+skips dependents as soon as a precondition cannot be established.
+"""
+
+import time
+import itertools
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SESSION = 0x01
+DEFAULT_STATE = (DEFAULT_SESSION, 0)
+UNKNOWN_STATE = (None, 0)
+
+# Groups up to this size are ordered exhaustively, larger sets greedily
+MAX_EXHAUSTIVE_GROUPS = 7
+
+class Precondition:
+    """ECU state required by a test case and its side effects"""
+
+    __slots__ = ('session', 'security_level', 'causes_reset', 'changes_state')
+
+    def __init__(self, session: int = DEFAULT_SESSION, security_level: int = 0,
+                 causes_reset: bool = False, changes_state: bool = False):
+        self.session = session
+        self.security_level = security_level
+        self.causes_reset = causes_reset
+        self.changes_state = changes_state
+
+    @property
+    def state(self) -> Tuple[int, int]:
+        return (self.session, self.security_level)
+
+    @property
+    def disruptive(self) -> bool:
+        """True if the ECU state after the case differs from its precondition"""
+        return self.causes_reset or self.changes_state
+
+    def exit_state(self) -> Tuple[Optional[int], int]:
+        """ECU state after the case has run"""
+        if self.causes_reset:
+            return DEFAULT_STATE
+        if self.changes_state:
+            return UNKNOWN_STATE
+        return self.state
+
+DEFAULT_PRECONDITION = Precondition()
+
+def precondition(session: int = DEFAULT_SESSION, security_level: int = 0,
+                 causes_reset: bool = False, changes_state: bool = False):
+    """Decorator declaring the ECU state a test method needs"""
+    def decorator(func):
+        func.uds_precondition = Precondition(session, security_level, causes_reset, changes_state)
+        return func
+    return decorator
+
+class TestCase:
+    """A single test method of a suite instance"""
+
+    __test__ = False  # Not a pytest test class
+
+    def __init__(self, suite_name: str, suite_instance, method_name: str):
+        self.suite_name = suite_name
+        self.suite_instance = suite_instance
+        self.method_name = method_name
+        method = getattr(type(suite_instance), method_name)
+        self.precondition = getattr(method, 'uds_precondition', DEFAULT_PRECONDITION)
+
+    @property
+    def key(self) -> str:
+        """Stable identifier of the case across runs"""
+        return f"{self.suite_name}::{self.method_name}"
+
+    def run(self):
+        getattr(self.suite_instance, self.method_name)()
+
+    def __repr__(self) -> str:
+        return f"TestCase({self.key!r})"
+
+def collect_test_cases(suite_name: str, suite_instance) -> List[TestCase]:
+    """Collect test_* methods in definition order (the order run_all_tests uses)"""
+    return [
+        TestCase(suite_name, suite_instance, name)
+        for name, attr in vars(type(suite_instance)).items()
+        if name.startswith('test_') and callable(attr)
+    ]
+
+def transition_cost(from_state: Tuple, to_state: Tuple) -> int:
+    """Number of session changes and unlocks needed to go from one state to another"""
+    session_change = from_state[0] != to_state[0]
+    cost = 1 if session_change else 0
+    if to_state[1] and (session_change or from_state[1] != to_state[1]):
+        cost += 1
+    return cost
+
+def count_transitions(cases: List[TestCase], start_state: Tuple = DEFAULT_STATE) -> int:
+    """Transitions needed to run cases in the given order"""
+    state = start_state
+    total = 0
+    for case in cases:
+        total += transition_cost(state, case.precondition.state)
+        state = case.precondition.exit_state()
+    return total
+
+class ECUStateController:
+    """Drives the ECU into a requested session/security state"""
+
+    def __init__(self, send_request: Callable[[bytes], bytes], key_function=None):
+        if key_function is None:
+            # Imported here: suites import this module for precondition() and need no simulator
+            from Utils.ecu_simulator import default_key_function
+            key_function = default_key_function
+        self.send_request = send_request
+        self.key_function = key_function
+        self.state = DEFAULT_STATE
+        self.transition_count = 0
+        self.transition_time = 0.0
+        self.listeners = []
+
+    def add_listener(self, callback: Callable[[str, Tuple], None]):
+        """Register a callback notified with ('session'|'reset', new_state)"""
+        self.listeners.append(callback)
+
+    def _notify(self, event: str):
+        for callback in self.listeners:
+            callback(event, self.state)
+
+    def _timed(self, transition: Callable[[], bool]) -> bool:
+        """Run one transition, counting it and its duration"""
+        start = time.perf_counter()
+        try:
+            return transition()
+        finally:
+            self.transition_count += 1
+            self.transition_time += time.perf_counter() - start
+
+    def enter_session(self, session: int) -> bool:
+        """Send 0x10 and track the session (security relocks on any change)"""
+        return self._timed(lambda: self._enter_session(session))
+
+    def unlock(self, level: int) -> bool:
+        """Run the 0x27 seed/key exchange for a security level"""
+        return self._timed(lambda: self._unlock(level))
+
+    def _enter_session(self, session: int) -> bool:
+        response = self.send_request(bytes([0x10, session]))
+        if not response or response[:2] != bytes([0x50, session]):
+            self.state = UNKNOWN_STATE
+            return False
+        self.state = (session, 0)
+        self._notify('session')
+        return True
+
+    def _unlock(self, level: int) -> bool:
+        seed_sub_function = level * 2 - 1
+        seed_response = self.send_request(bytes([0x27, seed_sub_function]))
+        if not seed_response or seed_response[:2] != bytes([0x67, seed_sub_function]):
+            return False
+        seed = seed_response[2:]
+        if not any(seed):  # Zero seed: level already unlocked
+            self.state = (self.state[0], level)
+            return True
+
+        key_response = self.send_request(bytes([0x27, seed_sub_function + 1]) + self.key_function(seed, level))
+        if not key_response or key_response[:2] != bytes([0x67, seed_sub_function + 1]):
+            return False
+        self.state = (self.state[0], level)
+        return True
+
+    def transition_to(self, target: Tuple[int, int]) -> bool:
+        """Establish a (session, security_level) state with minimal exchanges"""
+        session, level = target
+        if self.state[0] != session:
+            if not self.enter_session(session):
+                return False
+        if level and self.state[1] != level:
+            return self.unlock(level)
+        return True
+
+    def notify_reset(self):
+        """A test case reset the ECU: back to default session, locked"""
+        self.state = DEFAULT_STATE
+        self._notify('reset')
+
+    def notify_unknown(self):
+        """A test case changed the ECU state itself"""
+        self.state = UNKNOWN_STATE
+
+class TestScheduler:
+    """Orders test cases by precondition and runs them with minimal transitions"""
+
+    __test__ = False
+
+    def __init__(self, controller: ECUStateController, case_runner: Optional[Callable[[TestCase], None]] = None):
+        self.controller = controller
+        # Hook to run a case, e.g. under a watchdog deadline
+        self.case_runner = case_runner or TestCase.run
+
+    @staticmethod
+    def _group(cases: List[TestCase]) -> Dict[Tuple, List[TestCase]]:
+        """Group cases by required state; disruptive cases run last in a group"""
+        groups = {}
+        for case in cases:
+            groups.setdefault(case.precondition.state, []).append(case)
+        # Resets leave a known (default) state, so they go before cases leaving an unknown one
+        for state, members in groups.items():
+            groups[state] = sorted(members, key=lambda c: (c.precondition.disruptive, not c.precondition.causes_reset))
+        return groups
+
+    def plan(self, cases: List[TestCase], start_state: Tuple = DEFAULT_STATE) -> List[TestCase]:
+        """Return cases ordered to minimize session/security transitions"""
+        groups = self._group(cases)
+        states = list(groups)
+
+        if len(states) <= MAX_EXHAUSTIVE_GROUPS:
+            best_order, best_cost = states, None
+            for order in itertools.permutations(states):
+                cost = count_transitions([c for state in order for c in groups[state]], start_state)
+                if best_cost is None or cost < best_cost:
+                    best_order, best_cost = order, cost
+        else:
+            # Greedy nearest neighbour on the group entry cost
+            best_order, state, remaining = [], start_state, list(states)
+            while remaining:
+                nearest = min(remaining, key=lambda s: transition_cost(state, s))
+                remaining.remove(nearest)
+                best_order.append(nearest)
+                state = groups[nearest][-1].precondition.exit_state()
+
+        return [case for state in best_order for case in groups[state]]
+
+    def run(self, cases: List[TestCase], reorder: bool = True) -> Dict:
+        """Run cases in planned (or given) order; skip cases whose precondition fails"""
+        planned = self.plan(cases, self.controller.state) if reorder else list(cases)
+        naive_transitions = count_transitions(cases, self.controller.state)
+        planned_transitions = count_transitions(planned, self.controller.state)
+
+        start_count = self.controller.transition_count
+        start_time = self.controller.transition_time
+        failed_states = set()
+        skipped = []
+        errors = {}
+        durations = {}
+
+        for case in planned:
+            state = case.precondition.state
+            if state in failed_states or not self.controller.transition_to(state):
+                failed_states.add(state)
+                skipped.append(case)
+                print(f"[SKIP] {case.key}: precondition session=0x{state[0]:02X} "
+                      f"security={state[1]} could not be established")
+                continue
+
+            case_start = time.perf_counter()
+            try:
+                self.case_runner(case)
+            except Exception as e:
+                errors[case.key] = str(e)
+                print(f"ERROR in {case.key}: {e}")
+            finally:
+                durations[case.key] = time.perf_counter() - case_start
+                if case.precondition.causes_reset:
+                    self.controller.notify_reset()
+                elif case.precondition.changes_state:
+                    self.controller.notify_unknown()
+
+        transitions = self.controller.transition_count - start_count
+        transition_time = self.controller.transition_time - start_time
+        avg_transition = transition_time / transitions if transitions else 0.0
+        return {
+            'order': [case.key for case in planned],
+            'skipped': [case.key for case in skipped],
+            'errors': errors,
+            'durations': durations,
+            'naive_transitions': naive_transitions,
+            'planned_transitions': planned_transitions,
+            'transitions': transitions,
+            'transitions_saved': naive_transitions - planned_transitions,
+            'transition_time': transition_time,
+            'time_saved': max(naive_transitions - planned_transitions, 0) * avg_transition,
+        }
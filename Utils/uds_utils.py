@@ -1,6 +1,9 @@
 # utils/uds_utils.py
 import time
-from typing import Dict, List, Optional
+import random
+from array import array
+from collections import deque
+from typing import Callable, Dict, List, Optional
 
 # Complete NRC dictionary from ISO 14229
 NRC_DESCRIPTIONS = {
@@ -76,35 +79,312 @@ def retry_on_pending(func, max_retries: int = 5, delay: float = 0.1):
         return None
     return wrapper
 
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(-(-pct * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+class Reservoir:
+    """Uniform sample of at most capacity values of a stream (algorithm R).
+
+    Count, total and maximum stay exact; percentiles come from the sample.
+    """
+    
+    __slots__ = ('capacity', 'sample', 'count', 'total', 'max')
+    
+    def __init__(self, capacity: int, values=()):
+        self.capacity = capacity
+        self.sample = array('d')
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        for value in values:
+            self.append(value)
+    
+    def append(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if len(self.sample) < self.capacity:
+            self.sample.append(value)
+        else:
+            slot = int(random.random() * self.count)
+            if slot < self.capacity:
+                self.sample[slot] = value
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __iter__(self):
+        return iter(self.sample)
+
+def distribution(values) -> Dict:
+    """p50/p90/p99/max/mean of a sequence of durations (or of a Reservoir)"""
+    if isinstance(values, Reservoir):
+        ordered = sorted(values.sample)
+        return {
+            'count': values.count,
+            'p50': percentile(ordered, 50),
+            'p90': percentile(ordered, 90),
+            'p99': percentile(ordered, 99),
+            'max': values.max,
+            'mean': values.total / values.count if values.count else 0.0,
+            'total': values.total,
+        }
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'p50': percentile(ordered, 50),
+        'p90': percentile(ordered, 90),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1] if ordered else 0.0,
+        'mean': sum(ordered) / len(ordered) if ordered else 0.0,
+        'total': sum(ordered),
+    }
+
+# Test names timed separately in ring-buffer mode; further names share one entry
+MAX_TIMED_TESTS = 256
+OTHER_TESTS = "(other tests)"
+
+def timing_summary(durations: Dict[str, List[float]], latencies: List[float], overall=None) -> Dict:
+    """Suite timing: overall and per-test duration percentiles plus ECU round-trip latency.
+
+    overall holds all durations when the per-test ones are sampled (Reservoir).
+    """
+    if overall is None:
+        overall = [d for values in durations.values() for d in values]
+    return {
+        'duration': distribution(overall),
+        'latency': distribution(latencies),
+        'tests': {name: distribution(values) for name, values in durations.items()},
+    }
+
+class TestRecord:
+    """Single test result with a fixed layout; reads and writes like the former result dict"""
+    
+    __slots__ = ('test', 'passed', 'details', 'timestamp', 'case', 'nrc', 'start_ns', 'end_ns', 'exchanges', 'extra')
+    FIELDS = ('test', 'passed', 'details', 'timestamp')
+    TIMING_FIELDS = ('start_ns', 'end_ns', 'duration', 'latency', 'exchanges')
+    
+    def __init__(self, test: str, passed: bool, details: str = "", timestamp: float = 0.0, case: Optional[str] = None):
+        self.test = test
+        self.passed = passed
+        self.details = details
+        self.timestamp = timestamp
+        self.case = case
+        self.nrc = None  # NRC of the last negative response seen during the test
+        # perf_counter_ns() at test start/end and (request, response) pairs of each ECU exchange
+        self.start_ns = None
+        self.end_ns = None
+        self.exchanges = ()
+        self.extra = None  # Additional keys only allocate a dict when used
+    
+    @property
+    def duration(self) -> float:
+        """Test duration in seconds"""
+        return (self.end_ns - self.start_ns) / 1e9
+    
+    @property
+    def latency(self) -> float:
+        """Time spent waiting for the ECU in seconds"""
+        return sum(response - request for request, response in self.exchanges) / 1e9
+    
+    def keys(self) -> List[str]:
+        keys = list(self.FIELDS)
+        if self.case is not None:
+            keys.append('case')
+        if self.nrc is not None:
+            keys.append('nrc')
+        if self.start_ns is not None:
+            keys.extend(self.TIMING_FIELDS)
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+    
+    def __getitem__(self, key: str):
+        if key in self.FIELDS or (key in ('case', 'nrc') and getattr(self, key) is not None):
+            return getattr(self, key)
+        if key in self.TIMING_FIELDS and self.start_ns is not None:
+            if key == 'exchanges':
+                return [list(exchange) for exchange in self.exchanges]
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key: str, value):
+        if key in self.FIELDS or key in ('case', 'nrc', 'start_ns', 'end_ns', 'exchanges'):
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self.keys()}
+    
+    def __repr__(self) -> str:
+        return f"TestRecord({self.to_dict()!r})"
+
 class TestLogger:
-    """Simple test result logger"""
+    """Simple test result logger.
+    
+    Pass/fail counters are kept as results are logged, so get_summary() is
+    O(1). With max_records set only the most recent records stay in memory
+    (ring buffer); older ones are written to spill_path as JSON lines, and
+    durations and latencies are kept as samples of max_records values for
+    at most MAX_TIMED_TESTS test names.
+    
+    Each record is timed with perf_counter_ns from the end of the previous
+    result (or begin_test()) to log_test(); ECU exchanges made through a
+    send function wrapped with instrument() are attached to it, together
+    with the NRC of the last response if it was negative.
+    """
+    
+    __test__ = False  # Not a pytest test class
     
-    def __init__(self):
+    def __init__(self, max_records: Optional[int] = None, spill_path: Optional[str] = None):
         self.results = []
+        self.total = 0
+        self.passed = 0
+        self.suite = None
+        self.case = None  # Set by the runner while a single test case runs
+        self.sinks = []
+        self.max_records = None
+        self.spill_sink = None
+        self.spilled = 0
+        self.durations: Dict[str, array] = {}
+        self.latencies = array('d')
+        # All durations, only kept separately once durations are sampled
+        self.all_durations = None
+        self._test_start_ns = time.perf_counter_ns()
+        self._exchanges = []
+        self._last_nrc = None
+        if max_records is not None:
+            self.limit_records(max_records, spill_path)
+    
+    def add_sink(self, sink, suite: Optional[str] = None):
+        """Stream every logged result to a report sink (see Utils.report_sinks)"""
+        self.sinks.append(sink)
+        if suite is not None:
+            self.suite = suite
+    
+    def limit_records(self, max_records: int, spill_path: Optional[str] = None):
+        """Keep only the last max_records results in memory, spilling older ones to a JSONL file"""
+        if max_records < 1:
+            raise ValueError("max_records must be at least 1")
+        self.max_records = max_records
+        if spill_path is not None:
+            from Utils.report_sinks import JSONLReportSink
+            self.spill_sink = JSONLReportSink(spill_path)
+        self.results = deque(self.results, maxlen=max_records)
+        self.all_durations = Reservoir(max_records, (d for values in self.durations.values() for d in values))
+        durations, self.durations = self.durations, {}
+        for name, values in durations.items():
+            if len(self.durations) < MAX_TIMED_TESTS:
+                self.durations[name] = Reservoir(max_records, values)
+            else:
+                other = self.durations.setdefault(OTHER_TESTS, Reservoir(max_records))
+                for value in values:
+                    other.append(value)
+        self.latencies = Reservoir(max_records, self.latencies)
+    
+    def begin_test(self):
+        """Mark the start of the next test (otherwise the previous result's end is used)"""
+        self._test_start_ns = time.perf_counter_ns()
+        self._exchanges = []
+        self._last_nrc = None
+    
+    def instrument(self, send_request: Callable[[bytes], bytes]) -> Callable[[bytes], bytes]:
+        """Wrap a send function so each request/response is timed into the current test"""
+        def timed_send_request(request: bytes) -> bytes:
+            request_ns = time.perf_counter_ns()
+            response = None
+            try:
+                response = send_request(request)
+                return response
+            finally:
+                self._exchanges.append((request_ns, time.perf_counter_ns()))
+                self._last_nrc = response[2] if response and len(response) >= 3 and response[0] == 0x7F else None
+        timed_send_request.__wrapped__ = send_request
+        return timed_send_request
     
     def log_test(self, test_name: str, passed: bool, details: str = ""):
         """Log test result"""
-        result = {
-            'test': test_name,
-            'passed': passed,
-            'details': details,
-            'timestamp': time.time()
-        }
+        end_ns = time.perf_counter_ns()
+        result = TestRecord(test_name, passed, details, time.time(), self.case)
+        result.start_ns = self._test_start_ns
+        result.end_ns = end_ns
+        result.exchanges = tuple(self._exchanges)
+        result.nrc = self._last_nrc
+        self._test_start_ns = end_ns
+        self._exchanges = []
+        self._last_nrc = None
+        durations = self.durations.get(test_name)
+        if durations is None:
+            if self.max_records is None:
+                durations = self.durations[test_name] = array('d')
+            elif len(self.durations) < MAX_TIMED_TESTS:
+                durations = self.durations[test_name] = Reservoir(self.max_records)
+            else:
+                durations = self.durations.setdefault(OTHER_TESTS, Reservoir(self.max_records))
+        durations.append(result.duration)
+        if self.all_durations is not None:
+            self.all_durations.append(result.duration)
+        for request_ns, response_ns in result.exchanges:
+            self.latencies.append((response_ns - request_ns) / 1e9)
+        if self.max_records is not None and len(self.results) == self.max_records:
+            evicted = self.results[0]
+            self.spilled += 1
+            if self.spill_sink is not None:
+                self.spill_sink.on_test_result(self.suite, evicted)
         self.results.append(result)
+        self.total += 1
+        if passed:
+            self.passed += 1
+        for sink in list(self.sinks):
+            try:
+                sink.on_test_result(self.suite, result)
+            except OSError as e:
+                # A failing sink (closed client socket, full disk) must not fail the test run
+                self.sinks.remove(sink)
+                print(f"Report sink {type(sink).__name__} detached: {e}")
         status = "PASS" if passed else "FAIL"
         print(f"[{status}] {test_name}: {details}")
     
     def get_summary(self) -> Dict:
         """Get test summary"""
-        total = len(self.results)
-        passed = sum(1 for r in self.results if r['passed'])
         return {
-            'total': total,
-            'passed': passed,
-            'failed': total - passed,
-            'pass_rate': (passed / total * 100) if total > 0 else 0
+            'total': self.total,
+            'passed': self.passed,
+            'failed': self.total - self.passed,
+            'pass_rate': (self.passed / self.total * 100) if self.total > 0 else 0
         }
     
+    def get_timing_summary(self) -> Dict:
+        """Duration percentiles overall and per test name, and ECU latency percentiles"""
+        return timing_summary(self.durations, self.latencies, self.all_durations)
+    
+    def close(self):
+        """Flush the spill file (ring-buffer mode)"""
+        if self.spill_sink is not None:
+            self.spill_sink.close()
+    
     def print_summary(self):
         """Print test summary"""
         summary = self.get_summary()
@@ -0,0 +1,146 @@
+# Utils/watchdog.py
+"""
+Watchdog timeouts and cooperative cancellation for test suites
+A suite runs in a worker thread while the runner enforces a suite deadline
+and a per-test deadline (time without a new logged result). On expiry the
+suite's transports are cancelled: sockets are shut down to unblock recv,
+asyncio tasks are cancelled on their own loop.
+"""
+
+import socket
+import asyncio
+import threading
+import time
+from typing import Callable, List, Optional
+
+# How long a cancelled suite gets to unwind before it is abandoned
+CANCEL_GRACE_PERIOD = 2.0
+POLL_INTERVAL = 0.05
+
+class SuiteTimeout(Exception):
+    """Raised when a suite or test exceeds its deadline"""
+
+class CancellationToken:
+    """Cancellation flag with callbacks that unblock pending I/O"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run callback on cancellation (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel once and run all callbacks; callback errors are ignored"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        """Raise SuiteTimeout if cancelled (for cooperative checks in long loops)"""
+        if self._event.is_set():
+            raise SuiteTimeout(self.reason)
+
+    def register_socket(self, sock: socket.socket):
+        """Shut the socket down on cancellation so a blocked recv returns"""
+        def shutdown():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.add_callback(shutdown)
+
+    def register_task(self, loop: asyncio.AbstractEventLoop, task: asyncio.Future):
+        """Cancel an asyncio task from the watchdog thread"""
+        self.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+
+    def register_transport(self, transport):
+        """Register whatever cancellation the transport object supports"""
+        if transport is None:
+            return
+        if isinstance(transport, socket.socket):
+            self.register_socket(transport)
+        elif isinstance(transport, asyncio.Future):
+            self.register_task(transport.get_loop(), transport)
+        elif callable(getattr(transport, 'cancel', None)):
+            self.add_callback(transport.cancel)
+        elif isinstance(getattr(transport, 'socket', None), socket.socket):
+            self.register_socket(transport.socket)
+
+def run_with_watchdog(target: Callable, token: CancellationToken,
+                      suite_timeout: Optional[float] = None,
+                      test_timeout: Optional[float] = None,
+                      progress: Optional[Callable[[], int]] = None) -> Optional[str]:
+    """Run target in a worker thread under deadlines.
+
+    target may be a plain callable or a coroutine function; coroutines run on
+    a private event loop whose main task is cancelled on timeout. progress
+    returns a counter that increases with every finished test. Returns None
+    on completion or the timeout reason; exceptions from target are re-raised.
+    """
+    outcome = {}
+
+    def worker():
+        try:
+            if asyncio.iscoroutinefunction(target):
+                loop = asyncio.new_event_loop()
+                try:
+                    task = loop.create_task(target())
+                    token.register_task(loop, task)
+                    loop.run_until_complete(task)
+                finally:
+                    loop.close()
+            else:
+                target()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=worker, name="suite-worker", daemon=True)
+    start = last_progress_time = time.monotonic()
+    last_progress = progress() if progress else 0
+    thread.start()
+
+    reason = None
+    while thread.is_alive():
+        thread.join(POLL_INTERVAL)
+        now = time.monotonic()
+        if progress:
+            current = progress()
+            if current != last_progress:
+                last_progress, last_progress_time = current, now
+        if suite_timeout is not None and now - start > suite_timeout:
+            reason = f"Suite exceeded {suite_timeout:.1f}s deadline"
+        elif test_timeout is not None and now - last_progress_time > test_timeout:
+            reason = f"No test result within {test_timeout:.1f}s"
+        if reason:
+            token.cancel(reason)
+            thread.join(CANCEL_GRACE_PERIOD)
+            if thread.is_alive():
+                reason += " (worker abandoned, did not unwind after cancellation)"
+            return reason
+
+    if 'error' in outcome:
+        if token.cancelled:
+            return token.reason
+        raise outcome['error']
+    return None
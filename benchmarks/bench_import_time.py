@@ -0,0 +1,83 @@
+# benchmarks/bench_import_time.py
+"""
+Import-time benchmark for the UDS test runners
+Measures module import cost with `python -X importtime` for a full run
+versus a single selected service.
+"""
+
+import sys
+import os
+import subprocess
+import argparse
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each scenario imports what the runner would import for that selection
+SCENARIOS = [
+    ("Registry only", "import Utils.suite_registry"),
+    ("Runner startup", "import run_complete_tests"),
+    ("Single service (0x22)",
+     "import run_complete_tests; [s.load() for s in run_complete_tests.get_suites(['0x22'])]"),
+    ("All 14 services",
+     "import run_complete_tests; [s.load() for s in run_complete_tests.get_suites(groups=['core'])]"),
+]
+
+def measure_import_time(statement: str) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """Run a statement under -X importtime and return (total_us, module_count, top modules)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark statement failed: {proc.stderr.strip().splitlines()[-1]}")
+
+    total_us = 0
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        self_us = int(fields[0])
+        cumulative_us = int(fields[1])
+        name = fields[2].rstrip()
+        total_us += self_us
+        # Top-level imports are not indented below the "imported package" column
+        if not name.startswith("  "):
+            modules.append((cumulative_us, name.strip()))
+
+    modules.sort(reverse=True)
+    return total_us, len(proc.stderr.splitlines()) - 1, modules
+
+def run_benchmarks(repeat: int = 5, top: int = 5) -> Dict[str, int]:
+    """Run every scenario and print the best-of-N import time"""
+    print(f"{'Scenario':<28} {'Best [ms]':<12} {'Modules':<8}")
+    print("-" * 50)
+
+    results = {}
+    details = {}
+    for name, statement in SCENARIOS:
+        runs = [measure_import_time(statement) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r[0])
+        results[name] = best[0]
+        details[name] = best[2][:top]
+        print(f"{name:<28} {best[0] / 1000:<12.2f} {best[1]:<8}")
+
+    print("\nSLOWEST TOP-LEVEL IMPORTS:")
+    for name, modules in details.items():
+        print(f"  {name}:")
+        for cumulative_us, module in modules:
+            print(f"    {cumulative_us / 1000:>8.2f} ms  {module}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure UDS runner import time")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario (best is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports to list per scenario")
+    args = parser.parse_args()
+    run_benchmarks(args.repeat, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_test_logger.py
+"""
+TestLogger memory and summary-cost benchmark
+Compares the slotted records with running counters against plain result
+dicts with a recomputed summary, and shows the ring-buffer mode bound.
+"""
+
+import sys
+import os
+import io
+import time
+import argparse
+import tracemalloc
+import contextlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+
+def log_records(logger: TestLogger, count: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count):
+            logger.log_test(f"Soak iteration {i}", i % 97 != 0, "Positive response")
+
+def dict_records(count: int) -> list:
+    """The former representation: one dict per result"""
+    return [{'test': f"Soak iteration {i}", 'passed': i % 97 != 0, 'details': "Positive response",
+             'timestamp': time.time()} for i in range(count)]
+
+def measure_memory(build) -> int:
+    tracemalloc.start()
+    keep = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TestLogger memory and summary cost")
+    parser.add_argument("-n", "--records", type=int, default=100000, help="Results to log")
+    parser.add_argument("--keep", type=int, default=1000, help="Ring-buffer size for the bounded logger")
+    args = parser.parse_args()
+
+    def build_logger():
+        logger = TestLogger()
+        log_records(logger, args.records)
+        return logger
+
+    def build_bounded():
+        logger = TestLogger(max_records=args.keep)
+        log_records(logger, args.records)
+        return logger
+
+    dict_bytes = measure_memory(lambda: dict_records(args.records))
+    slot_bytes = measure_memory(build_logger)
+    ring_bytes = measure_memory(build_bounded)
+
+    records = dict_records(args.records)
+    start = time.perf_counter()
+    passed = sum(1 for r in records if r['passed'])
+    recompute_us = (time.perf_counter() - start) * 1e6
+
+    logger = build_logger()
+    start = time.perf_counter()
+    logger.get_summary()
+    counter_us = (time.perf_counter() - start) * 1e6
+
+    print(f"{args.records} results")
+    print(f"{'Representation':<32} {'Memory':>12} {'Summary':>12}")
+    print(f"{'dict per result':<32} {dict_bytes / 1024:>10.0f}KB {recompute_us:>10.1f}us")
+    print(f"{'TestRecord (__slots__)':<32} {slot_bytes / 1024:>10.0f}KB {counter_us:>10.1f}us")
+    print(f"{f'ring buffer (last {args.keep})':<32} {ring_bytes / 1024:>10.0f}KB {counter_us:>10.1f}us")
+    assert passed == logger.passed
+
+if __name__ == "__main__":
+    main()
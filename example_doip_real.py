@@ -11,6 +11,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from Utils.doip_handler import DoIPHandler, DoSOADHandler
 from uds_validator_extended import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.dtc_decoder import decode_dtc_response, status_names
 
 class RealDoIPTest:
     """Example class for real DoIP ECU testing"""
@@ -78,14 +79,20 @@ class RealDoIPTest:
             
             # Test 4: Read DTCs
             print("\n4. Testing Read DTC Information...")
-            request = bytes([0x19, 0x02, 0x00])  # Report DTCs by status mask
+            request = bytes([0x19, 0x02, 0xFF])  # Report DTCs by status mask (all status bits)
             response = self.doip_handler.send_diagnostic_message(request)
             
             if response:
                 result = self.validator.validate_read_dtc_information(response, 0x02)
                 if result['positive']:
-                    dtc_data = response[3:] if len(response) > 3 else b''
-                    self.logger.log_test("DoIP Read DTCs", result['valid'], f"DTC data: {dtc_data.hex().upper()}")
+                    try:
+                        report = decode_dtc_response(response)
+                    except ValueError as e:
+                        self.logger.log_test("DoIP Read DTCs", False, str(e))
+                    else:
+                        for code, status in zip(report.display_codes(), report.records['status']):
+                            print(f"   {code}  status 0x{int(status):02X}: {', '.join(status_names(int(status)))}")
+                        self.logger.log_test("DoIP Read DTCs", result['valid'], f"{len(report)} DTCs")
                 else:
                     self.logger.log_test("DoIP Read DTCs", False, result['message'])
             else:
@@ -12,33 +12,21 @@ from typing import List, Dict
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import all test modules
-from test_services.test_diagnostic_session_control_new import DiagnosticSessionControlTest
-from test_services.test_ecu_reset import ECUResetTest
-from test_services.test_read_data_by_identifier import ReadDataByIdentifierTest
-from test_services.test_write_data_by_identifier import WriteDataByIdentifierTest
-from test_services.test_routine_control import RoutineControlTest
-from test_services.test_tester_present import TesterPresentTest
-from test_services.test_security_access import SecurityAccessTest
+from Utils.suite_registry import get_suites
 from Utils.uds_utils import TestLogger
 
 class UDSTestSuite:
     """Master UDS Test Suite Runner"""
     
+    SERVICES = ["0x10", "0x11", "0x22", "0x2E", "0x31", "0x3E", "0x27"]
+    
     def __init__(self):
         self.master_logger = TestLogger()
-        self.test_classes = [
-            ("Diagnostic Session Control (0x10)", DiagnosticSessionControlTest),
-            ("ECU Reset (0x11)", ECUResetTest),
-            ("Read Data By Identifier (0x22)", ReadDataByIdentifierTest),
-            ("Write Data By Identifier (0x2E)", WriteDataByIdentifierTest),
-            ("Routine Control (0x31)", RoutineControlTest),
-            ("Tester Present (0x3E)", TesterPresentTest),
-            ("Security Access (0x27)", SecurityAccessTest),
-        ]
+        # Suites are resolved through the registry and only imported when run
+        self.test_classes = [(spec.name, spec) for spec in get_suites(self.SERVICES)]
         self.results = {}
     
-    def run_single_test_suite(self, name: str, test_class) -> Dict:
+    def run_single_test_suite(self, name: str, suite_spec) -> Dict:
         """Run a single test suite and capture results"""
         print(f"\n{'='*80}")
         print(f"RUNNING: {name}")
@@ -48,6 +36,7 @@ class UDSTestSuite:
         
         try:
             # Create test instance and run tests
+            test_class = suite_spec.load()
             test_instance = test_class()
             test_instance.run_all_tests()
             
@@ -82,8 +71,8 @@ class UDSTestSuite:
         overall_start = time.time()
         
         # Run each test suite
-        for name, test_class in self.test_classes:
-            self.results[name] = self.run_single_test_suite(name, test_class)
+        for name, suite_spec in self.test_classes:
+            self.results[name] = self.run_single_test_suite(name, suite_spec)
         
         overall_duration = time.time() - overall_start
         
@@ -6,8 +6,11 @@ Executes comprehensive UDS service tests with proper encoding handling
 
 import sys
 import os
+import json
 import time
-from typing import List, Dict
+import argparse
+import threading
+from typing import List, Dict, Optional
 
 # Fix Windows console encoding issues
 if sys.platform == "win32":
@@ -18,47 +21,126 @@ if sys.platform == "win32":
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import all test modules
-from test_services.test_diagnostic_session_control_new import DiagnosticSessionControlTest
-from test_services.test_ecu_reset import ECUResetTest
-from test_services.test_clear_diagnostic_information import ClearDiagnosticInformationTest
-from test_services.test_read_dtc_information import ReadDTCInformationTest
-from test_services.test_read_data_by_identifier import ReadDataByIdentifierTest
-from test_services.test_communication_control import CommunicationControlTest
-from test_services.test_write_data_by_identifier import WriteDataByIdentifierTest
-from test_services.test_input_output_control import InputOutputControlTest
-from test_services.test_routine_control import RoutineControlTest
-from test_services.test_request_download import RequestDownloadTest
-from test_services.test_transfer_data import TransferDataTest
-from test_services.test_request_transfer_exit import RequestTransferExitTest
-from test_services.test_tester_present import TesterPresentTest
-from test_services.test_security_access import SecurityAccessTest
+from Utils.suite_registry import get_suites, get_suite
 from Utils.uds_utils import TestLogger
+from Utils.result_cache import ResultCache, read_ecu_identity, suite_source_hash
+from Utils.test_scheduler import ECUStateController, TestScheduler, collect_test_cases
+from Utils.sharding import (RESULTS_FORMAT, parse_shard, select_shard, load_timings,
+                            load_results, write_results, merge_results)
+# Report sinks, the watchdog, the daemon, history, diff and the flash stack are imported
+# by the options and subcommands using them, so a plain run starts without them
 
 class CompleteUDSTestSuite:
     """Complete UDS Test Suite Runner - All ISO 14229 Services"""
     
-    def __init__(self):
+    def __init__(self, services: Optional[List[str]] = None, cache: Optional[ResultCache] = None,
+                 force: bool = False, identity_source=None, schedule: bool = False, state_transport=None,
+                 sinks: Optional[List] = None, suite_timeout: Optional[float] = None,
+                 test_timeout: Optional[float] = None, shard: Optional[str] = None,
+                 shard_timings: Optional[Dict[str, float]] = None,
+                 state_controller: Optional[ECUStateController] = None,
+                 max_records: Optional[int] = None, spill_dir: Optional[str] = None,
+                 record_identity: bool = False):
         self.master_logger = TestLogger()
-        self.test_classes = [
-            ("Diagnostic Session Control (0x10)", DiagnosticSessionControlTest),
-            ("ECU Reset (0x11)", ECUResetTest),
-            ("Clear Diagnostic Information (0x14)", ClearDiagnosticInformationTest),
-            ("Read DTC Information (0x19)", ReadDTCInformationTest),
-            ("Read Data By Identifier (0x22)", ReadDataByIdentifierTest),
-            ("Communication Control (0x28)", CommunicationControlTest),
-            ("Write Data By Identifier (0x2E)", WriteDataByIdentifierTest),
-            ("Input Output Control (0x2F)", InputOutputControlTest),
-            ("Routine Control (0x31)", RoutineControlTest),
-            ("Request Download (0x34)", RequestDownloadTest),
-            ("Transfer Data (0x36)", TransferDataTest),
-            ("Request Transfer Exit (0x37)", RequestTransferExitTest),
-            ("Tester Present (0x3E)", TesterPresentTest),
-            ("Security Access (0x27)", SecurityAccessTest),
-        ]
+        # Suites are resolved through the registry and only imported when run
+        # Simulator suites are only run when selected explicitly
+        groups = ["core", "plugin"] + (["simulator"] if services else [])
+        self.test_classes = [(spec.name, spec) for spec in get_suites(services, groups=groups)]
         self.results = {}
+        self.cache = cache
+        self.force = force
+        self.identity_source = identity_source
+        self.ecu_identity = {}
+        # A results document is written: its ECU identity keys run-to-run diffs
+        self.record_identity = record_identity
+        self.schedule = schedule
+        self.state_transport = state_transport
+        # A controller kept by the daemon carries the known ECU state over between jobs
+        self.state_controller = state_controller
+        # Soak runs keep only the last max_records results per suite in memory
+        self.max_records = max_records
+        self.spill_dir = spill_dir
+        self._bounded_loggers = []
+        self.schedule_report = None
+        self._source_hashes = {}
+        self.sinks = sinks or []
+        self.suite_timeout = suite_timeout
+        self.test_timeout = test_timeout
+        self._timed_out_cases = set()
+        # Case-level runs: time spent in each suite's cases, checked against suite_timeout
+        self._suite_elapsed = {}
+        self.shard = parse_shard(shard) if shard else None
+        self.shard_timings = shard_timings
+        self.test_records = {}
+        self.case_results = []
+        self._case_index = {}
+        self.total_duration = 0.0
     
-    def run_single_test_suite(self, name: str, test_class) -> Dict:
+    def _attach_sinks(self, name: str, test_instance):
+        """Stream the results of a suite instance to the report sinks and time its ECU exchanges"""
+        if callable(getattr(test_instance, 'send_request', None)):
+            test_instance.send_request = test_instance.logger.instrument(test_instance.send_request)
+        for sink in self.sinks:
+            test_instance.logger.add_sink(sink, suite=name)
+        if self.max_records is not None:
+            spill_path = None
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                spill_path = os.path.join(self.spill_dir, f"{test_instance.__class__.__name__}.jsonl")
+            test_instance.logger.suite = name
+            test_instance.logger.limit_records(self.max_records, spill_path)
+            self._bounded_loggers.append(test_instance.logger)
+    
+    # Attributes under which suites keep their transports
+    TRANSPORT_ATTRIBUTES = ('connection', 'doip_handler', 'transport')
+    
+    def _run_guarded(self, target, test_instance, suite_timeout: Optional[float]) -> Optional[str]:
+        """Run target under the watchdog; return the timeout reason or None"""
+        from Utils.watchdog import CancellationToken, run_with_watchdog
+        token = CancellationToken()
+        test_instance.cancel_token = token  # Suites may poll token.check() in long loops
+        for attribute in self.TRANSPORT_ATTRIBUTES:
+            token.register_transport(getattr(test_instance, attribute, None))
+        
+        reason = run_with_watchdog(target, token, suite_timeout, self.test_timeout,
+                                   progress=lambda: test_instance.logger.total)
+        if reason:
+            # An abandoned worker must not keep streaming into the reports
+            test_instance.logger.sinks = []
+        return reason
+    
+    def _emit_suite_summary(self, name: str, summary: Dict):
+        for sink in self.sinks:
+            sink.on_suite_summary(name, summary)
+    
+    def _default_identity_source(self):
+        """Send function of the ECU the suites talk to (mock ECU of the 0x22 suite)"""
+        return get_suites(["0x22"])[0].load()().send_request
+    
+    def read_ecu_identity(self) -> Dict:
+        """Read ECU identification DIDs once at the start of the run"""
+        send_request = self.identity_source or self._default_identity_source()
+        try:
+            self.ecu_identity = read_ecu_identity(send_request)
+        except Exception as e:
+            print(f"Could not read ECU identity, result cache disabled: {e}")
+            self.ecu_identity = {}
+        return self.ecu_identity
+    
+    def lookup_cached_result(self, name: str, suite_spec) -> Optional[Dict]:
+        """Return the cached summary of a suite on unchanged ECU software, if any"""
+        source_hash = suite_source_hash(suite_spec.module)
+        self._source_hashes[name] = source_hash
+        if self.force:
+            return None
+        cached = self.cache.lookup(name, self.ecu_identity, source_hash)
+        if cached is not None:
+            cached['status'] = 'CACHED'
+            cached['error'] = None
+            print(f"\n[CACHED] {name}: {cached['passed']}/{cached['total']} passed on unchanged ECU software")
+        return cached
+    
+    def run_single_test_suite(self, name: str, suite_spec) -> Dict:
         """Run a single test suite and capture results"""
         print(f"\n{'='*80}")
         print(f"RUNNING: {name}")
@@ -67,13 +149,25 @@ class CompleteUDSTestSuite:
         start_time = time.time()
         
         try:
+            test_class = suite_spec.load()
             test_instance = test_class()
-            test_instance.run_all_tests()
+            self._attach_sinks(name, test_instance)
+            self.test_records[name] = test_instance.logger.results
+            test_instance.logger.begin_test()
+            if self.suite_timeout is None and self.test_timeout is None:
+                test_instance.run_all_tests()
+                timeout_reason = None
+            else:
+                timeout_reason = self._run_guarded(test_instance.run_all_tests, test_instance, self.suite_timeout)
             
+            # Partial results are kept when the suite timed out
             summary = test_instance.logger.get_summary()
+            summary['timing'] = test_instance.logger.get_timing_summary()
             summary['duration'] = time.time() - start_time
-            summary['status'] = 'COMPLETED'
-            summary['error'] = None
+            summary['status'] = 'TIMEOUT' if timeout_reason else 'COMPLETED'
+            summary['error'] = timeout_reason
+            if timeout_reason:
+                print(f"TIMEOUT in {name}: {timeout_reason}")
             
         except Exception as e:
             summary = {
@@ -89,6 +183,120 @@ class CompleteUDSTestSuite:
         
         return summary
     
+    def _run_case(self, case):
+        """Run one test case (under the per-test and remaining suite deadline if set) and record its results"""
+        logger = case.suite_instance.logger
+        logger.case = case.method_name
+        logger.begin_test()
+        # Cases of a suite may be interleaved with others, so its deadline counts only its own cases
+        remaining = None
+        if self.suite_timeout is not None:
+            remaining = self.suite_timeout - self._suite_elapsed.get(case.suite_name, 0.0)
+        start = time.perf_counter()
+        try:
+            if remaining is not None and remaining <= 0:
+                from Utils.watchdog import SuiteTimeout
+                self._timed_out_cases.add(case.key)
+                raise SuiteTimeout(f"Suite exceeded {self.suite_timeout:.1f}s deadline, case cancelled")
+            if self.test_timeout is None and remaining is None:
+                case.run()
+            else:
+                deadline = min(limit for limit in (self.test_timeout, remaining) if limit is not None)
+                reason = self._run_guarded(case.run, case.suite_instance, deadline)
+                if reason:
+                    from Utils.watchdog import SuiteTimeout
+                    if deadline == remaining and reason.startswith("Suite exceeded"):
+                        reason = f"Suite exceeded {self.suite_timeout:.1f}s deadline" + reason.partition(" deadline")[2]
+                    self._timed_out_cases.add(case.key)
+                    raise SuiteTimeout(reason)
+        finally:
+            logger.case = None
+            self._suite_elapsed[case.suite_name] = \
+                self._suite_elapsed.get(case.suite_name, 0.0) + time.perf_counter() - start
+            self.case_results.append({
+                'key': case.key,
+                'suite': case.suite_name,
+                'method': case.method_name,
+                'index': self._case_index[case.key],
+                'duration': time.perf_counter() - start,
+            })
+    
+    def run_case_level(self, suites: List) -> Dict[str, Dict]:
+        """Run individual test cases of several suites (scheduled and/or sharded)"""
+        mode = []
+        if self.schedule:
+            mode.append("ordered by session/security preconditions")
+        if self.shard:
+            mode.append(f"shard {self.shard[0]}/{self.shard[1]}")
+        print(f"\n{'='*80}")
+        print(f"RUNNING CASES: {len(suites)} suites {', '.join(mode)}")
+        print(f"{'='*80}")
+        
+        results = {}
+        instances = {}
+        cases = []
+        for name, suite_spec in suites:
+            try:
+                instances[name] = suite_spec.load()()
+                self._attach_sinks(name, instances[name])
+                self.test_records[name] = instances[name].logger.results
+                cases.extend(collect_test_cases(name, instances[name]))
+            except Exception as e:
+                results[name] = {'total': 0, 'passed': 0, 'failed': 0, 'pass_rate': 0,
+                                 'duration': 0.0, 'status': 'ERROR', 'error': str(e)}
+                print(f"ERROR in {name}: {e}")
+        
+        # Declared position of each case inside its suite, used to order merged shard results
+        per_suite = {}
+        for case in cases:
+            self._case_index[case.key] = per_suite.get(case.suite_name, 0)
+            per_suite[case.suite_name] = self._case_index[case.key] + 1
+        if self.shard:
+            selected = select_shard(cases, self.shard[0], self.shard[1], self.shard_timings)
+            print(f"Shard {self.shard[0]}/{self.shard[1]}: {len(selected)} of {len(cases)} test cases")
+            cases = selected
+        
+        controller = self.state_controller
+        if controller is None:
+            if self.state_transport is None:
+                from Utils.ecu_simulator import ECUSimulator
+                self.state_transport = ECUSimulator().send_request
+            controller = ECUStateController(self.state_transport)
+        report = TestScheduler(controller, case_runner=self._run_case).run(cases, reorder=self.schedule)
+        if self.schedule:
+            self.schedule_report = report
+        
+        for name, instance in instances.items():
+            prefix = f"{name}::"
+            summary = instance.logger.get_summary()
+            summary['timing'] = instance.logger.get_timing_summary()
+            summary['duration'] = sum(d for key, d in report['durations'].items() if key.startswith(prefix))
+            summary['skipped'] = sum(1 for key in report['skipped'] if key.startswith(prefix))
+            errors = [f"{key[len(prefix):]}: {msg}" for key, msg in report['errors'].items() if key.startswith(prefix)]
+            if any(key.startswith(prefix) for key in self._timed_out_cases):
+                summary['status'] = 'TIMEOUT'
+            else:
+                summary['status'] = 'ERROR' if errors else 'COMPLETED'
+            summary['error'] = "; ".join(errors) if errors else None
+            results[name] = summary
+        return results
+    
+    def results_document(self) -> Dict:
+        """Machine-readable results of this run (input for 'merge' and --shard-timings)"""
+        suites = []
+        for name, summary in self.results.items():
+            tests = [record.to_dict() for record in self.test_records.get(name, [])]
+            suites.append({'name': name, **summary, 'tests': tests})
+        return {
+            'format': RESULTS_FORMAT,
+            'created': time.time(),
+            'shard': f"{self.shard[0]}/{self.shard[1]}" if self.shard else None,
+            'ecu': self.ecu_identity,
+            'duration': self.total_duration,
+            'suites': suites,
+            'cases': self.case_results,
+        }
+    
     def run_all_tests(self):
         """Run all UDS test suites"""
         print("="*80)
@@ -99,12 +307,76 @@ class CompleteUDSTestSuite:
         
         overall_start = time.time()
         
-        for name, test_class in self.test_classes:
-            self.results[name] = self.run_single_test_suite(name, test_class)
+        if self.cache is not None and self.shard:
+            print("Result cache is ignored for sharded runs (suite results are partial)")
+            self.cache = None
+        
+        if self.cache is not None or self.record_identity or any(sink.needs_ecu_identity for sink in self.sinks):
+            identity = self.read_ecu_identity()
+            print(f"ECU identity: VIN={identity.get('vin')} SW={identity.get('software_number')} "
+                  f"PartNo={identity.get('spare_part_number')}")
+        
+        run_info = {'ecu': self.ecu_identity, 'started': overall_start,
+                    'shard': f"{self.shard[0]}/{self.shard[1]}" if self.shard else None}
+        for sink in self.sinks:
+            sink.on_run_start(run_info)
+        
+        results = {}
+        to_run = []
+        for name, suite_spec in self.test_classes:
+            cached = self.lookup_cached_result(name, suite_spec) if self.cache is not None else None
+            if cached is not None:
+                results[name] = cached
+                self._emit_suite_summary(name, cached)
+            else:
+                to_run.append((name, suite_spec))
+        
+        if self.schedule or self.shard:
+            case_level = self.run_case_level(to_run)
+            for name, _ in to_run:
+                results[name] = case_level[name]
+                self._emit_suite_summary(name, case_level[name])
+        else:
+            for name, suite_spec in to_run:
+                results[name] = self.run_single_test_suite(name, suite_spec)
+                self._emit_suite_summary(name, results[name])
+        
+        # Report in registry order regardless of execution order
+        self.results = {name: results[name] for name, _ in self.test_classes}
+        
+        if self.cache is not None:
+            for name, _ in to_run:
+                self.cache.store(name, self.ecu_identity, self._source_hashes[name], self.results[name])
+            self.cache.save()
+        
+        for logger in self._bounded_loggers:
+            logger.close()
         
         overall_duration = time.time() - overall_start
+        self.total_duration = overall_duration
         self.generate_final_report(overall_duration)
     
+    def print_timing_report(self, slowest: int = 10):
+        """Per-service duration percentiles and the slowest individual tests"""
+        timed = [(name, result['timing']) for name, result in self.results.items()
+                 if result.get('timing') and result['status'] != 'CACHED' and result['timing']['duration']['count']]
+        if not timed:
+            return
+        
+        print(f"\nTIMING (ms):")
+        print(f"{'Service':<40} {'Total':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'ECU p50':>8} {'ECU p99':>8}")
+        for name, timing in sorted(timed, key=lambda item: -item[1]['duration']['total']):
+            duration, latency = timing['duration'], timing['latency']
+            print(f"{name:<40} {duration['total'] * 1e3:>9.2f} {duration['p50'] * 1e3:>8.3f} "
+                  f"{duration['p90'] * 1e3:>8.3f} {duration['p99'] * 1e3:>8.3f} "
+                  f"{latency['p50'] * 1e3:>8.3f} {latency['p99'] * 1e3:>8.3f}")
+        
+        tests = [(stats['max'], name, test, stats) for name, timing in timed for test, stats in timing['tests'].items()]
+        print(f"\nSLOWEST TESTS (ms):")
+        for _, name, test, stats in sorted(tests, key=lambda item: item[0], reverse=True)[:slowest]:
+            runs = f" x{stats['count']} p50={stats['p50'] * 1e3:.3f}" if stats['count'] > 1 else ""
+            print(f"  {stats['max'] * 1e3:>9.3f}  {name}: {test}{runs}")
+    
     def generate_final_report(self, total_duration: float):
         """Generate comprehensive test report"""
         print("\n" + "="*80)
@@ -116,6 +388,7 @@ class CompleteUDSTestSuite:
         total_failed = 0
         completed_suites = 0
         error_suites = 0
+        cached_suites = 0
         
         print(f"{'Service':<40} {'Tests':<8} {'Passed':<8} {'Failed':<8} {'Rate':<8} {'Status':<12}")
         print("-" * 80)
@@ -125,12 +398,14 @@ class CompleteUDSTestSuite:
             total_passed += result['passed']
             total_failed += result['failed']
             
-            if result['status'] == 'COMPLETED':
+            if result['status'] in ('COMPLETED', 'CACHED'):
                 completed_suites += 1
             else:
                 error_suites += 1
+            if result['status'] == 'CACHED':
+                cached_suites += 1
             
-            if result['status'] == 'COMPLETED' and result['pass_rate'] == 100:
+            if result['status'] in ('COMPLETED', 'CACHED') and result['pass_rate'] == 100:
                 status_indicator = "[PASS]"
             elif result['status'] == 'COMPLETED':
                 status_indicator = "[WARN]"
@@ -141,43 +416,53 @@ class CompleteUDSTestSuite:
         
         print("-" * 80)
         overall_pass_rate = (total_passed / total_tests * 100) if total_tests > 0 else 0
+        for sink in self.sinks:
+            sink.on_run_summary({
+                'total': total_tests, 'passed': total_passed, 'failed': total_failed,
+                'pass_rate': overall_pass_rate, 'suites': len(self.results),
+                'completed_suites': completed_suites, 'error_suites': error_suites,
+                'duration': total_duration,
+            })
         print(f"{'TOTAL':<40} {total_tests:<8} {total_passed:<8} {total_failed:<8} {overall_pass_rate:<7.1f}%")
         
         print(f"\nCOMPLETE TEST SUMMARY:")
         print(f"* Total UDS Services Tested: {len(self.test_classes)}")
         print(f"* Services Completed Successfully: {completed_suites}")
         print(f"* Services Failed with Errors: {error_suites}")
+        if self.cache is not None:
+            print(f"* Services Served From Cache: {cached_suites}")
         print(f"* Total Individual Tests: {total_tests}")
         print(f"* Overall Pass Rate: {overall_pass_rate:.1f}%")
         print(f"* Total Execution Time: {total_duration:.2f} seconds")
         
         # Service coverage report
         print(f"\nUDS SERVICE COVERAGE:")
-        services_tested = [
-            "0x10 - Diagnostic Session Control",
-            "0x11 - ECU Reset", 
-            "0x14 - Clear Diagnostic Information",
-            "0x19 - Read DTC Information",
-            "0x22 - Read Data By Identifier",
-            "0x27 - Security Access",
-            "0x28 - Communication Control",
-            "0x2E - Write Data By Identifier", 
-            "0x2F - Input Output Control",
-            "0x31 - Routine Control",
-            "0x34 - Request Download",
-            "0x36 - Transfer Data",
-            "0x37 - Request Transfer Exit",
-            "0x3E - Tester Present"
-        ]
-        
-        for service in services_tested:
-            print(f"  [X] {service}")
+        for name, suite_spec in sorted(self.test_classes, key=lambda item: getattr(item[1], 'sid', None) or 0x100):
+            if getattr(suite_spec, 'sid', None) is not None:
+                service_name = name.rsplit(" (", 1)[0]
+                print(f"  [X] 0x{suite_spec.sid:02X} - {service_name}")
+            else:
+                print(f"  [X] {name}")
+        
+        self.print_timing_report()
+        
+        if self.schedule_report is not None:
+            report = self.schedule_report
+            print(f"\nSCHEDULER:")
+            print(f"* State Transitions (declared order): {report['naive_transitions']}")
+            print(f"* State Transitions (scheduled order): {report['planned_transitions']}")
+            print(f"* Transitions Saved: {report['transitions_saved']}")
+            print(f"* Time in Transitions: {report['transition_time']:.3f} seconds")
+            print(f"* Estimated Time Saved: {report['time_saved']:.3f} seconds")
+            print(f"* Cases Skipped (failed precondition): {len(report['skipped'])}")
+            for key in report['skipped']:
+                print(f"  - {key}")
         
         if error_suites > 0:
             print(f"\nERROR DETAILS:")
             for name, result in self.results.items():
-                if result['status'] == 'ERROR':
-                    print(f"* {name}: {result['error']}")
+                if result['status'] in ('ERROR', 'TIMEOUT'):
+                    print(f"* {name}: [{result['status']}] {result['error']}")
         
         print(f"\nCOMPLIANCE ASSESSMENT:")
         if overall_pass_rate == 100:
@@ -193,16 +478,496 @@ class CompleteUDSTestSuite:
         
         print("="*80)
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Complete UDS Test Suite Runner - All ISO 14229 Services")
+    parser.add_argument("-s", "--service", action="append", dest="services", metavar="SERVICE",
+                        help="Run only the given service (SID like 0x22, module or name); repeatable")
+    parser.add_argument("--list", action="store_true", help="List registered test suites and exit")
+    
+    parser.add_argument("--schedule", action="store_true",
+                        help="Order test cases by session/security preconditions to minimize 0x10/0x27 transitions")
+    
+    watchdog_group = parser.add_argument_group("watchdog")
+    watchdog_group.add_argument("--suite-timeout", type=float, metavar="SECONDS",
+                                help="Abort a suite that runs longer than this and mark it TIMEOUT "
+                                     "(with --schedule/--shard: cancel its remaining cases)")
+    watchdog_group.add_argument("--test-timeout", type=float, metavar="SECONDS",
+                                help="Abort a suite when no test result is logged for this long")
+    
+    report_group = parser.add_argument_group("streaming reports")
+    report_group.add_argument("--jsonl", metavar="PATH", help="Append one JSON line per test result and suite summary")
+    report_group.add_argument("--junit", metavar="PATH", help="Stream JUnit XML results")
+    
+    report_group.add_argument("--db", metavar="PATH",
+                              help="Record results in a SQLite history database (see 'history')")
+    report_group.add_argument("--keep-records", type=int, metavar="N",
+                              help="Keep only the last N results per suite in memory (long soak runs)")
+    report_group.add_argument("--spill-dir", metavar="DIR",
+                              help="With --keep-records, write older results to DIR/<suite class>.jsonl")
+    
+    shard_group = parser.add_argument_group("sharding")
+    shard_group.add_argument("--shard", metavar="i/N",
+                             help="Run only test cases of shard i of N (stable hash of the case key)")
+    shard_group.add_argument("--shard-timings", metavar="RESULTS_JSON",
+                             help="Balance shards by the case durations of a previous results document")
+    shard_group.add_argument("--results-json", metavar="PATH",
+                             help="Write the full results document (input for 'merge' and --shard-timings)")
+    
+    cache_group = parser.add_argument_group("result cache")
+    cache_group.add_argument("--cache", action="store_true",
+                             help="Skip suites with a cached passing result for the same ECU software and suite source")
+    cache_group.add_argument("--force", action="store_true",
+                             help="Run every suite even if cached (passing results still refresh the cache)")
+    cache_group.add_argument("--invalidate-cache", nargs="?", const="", default=None, metavar="VIN",
+                             help="Drop cached results (all, or only those for VIN) before running")
+    cache_group.add_argument("--cache-dir", default=None, help="Result cache directory (default: .uds_cache)")
+    return parser.parse_args(argv)
+
+def merge_main(argv: List[str]):
+    """Merge shard results documents into one report"""
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py merge",
+                                     description="Merge --results-json documents of several shards")
+    parser.add_argument("inputs", nargs="+", help="Shard results documents")
+    parser.add_argument("-o", "--output", help="Write the merged results document here")
+    args = parser.parse_args(argv)
+    
+    merged = merge_results([load_results(path) for path in args.inputs])
+    if args.output:
+        write_results(args.output, merged)
+    
+    suite = CompleteUDSTestSuite([])
+    suite.test_classes = []
+    for entry in merged['suites']:
+        try:
+            spec = get_suite(entry['name'])
+        except KeyError:
+            spec = None
+        suite.test_classes.append((entry['name'], spec))
+        suite.results[entry['name']] = {k: v for k, v in entry.items() if k not in ('name', 'tests')}
+    print(f"Merged {len(args.inputs)} result documents (shards: {', '.join(str(s) for s in merged['merged_from'])})")
+    suite.generate_final_report(merged['duration'])
+
+def run_daemon_job(request: Dict, sink, transport, cache: Optional[ResultCache] = None,
+                   results_dir: Optional[str] = None) -> Dict:
+    """Run one daemon job on a warm transport, streaming results into sink"""
+    from Utils.runner_daemon import results_path
+    
+    # Checked before running: clients only name the document, it is written inside results_dir
+    output = results_path(results_dir, request['results_json']) if request.get('results_json') else None
+    timings = request.get('shard_timings')
+    suite = CompleteUDSTestSuite(request.get('services'), cache=cache if request.get('cache') else None,
+                                 force=request.get('force', False), identity_source=transport.send_request,
+                                 schedule=request.get('schedule', False), sinks=[sink],
+                                 suite_timeout=request.get('suite_timeout'),
+                                 test_timeout=request.get('test_timeout'), shard=request.get('shard'),
+                                 shard_timings=load_timings(timings) if timings else None,
+                                 state_controller=transport.controller,
+                                 record_identity=output is not None)
+    suite.run_all_tests()
+    if output:
+        write_results(output, suite.results_document())
+    total = sum(r['total'] for r in suite.results.values())
+    passed = sum(r['passed'] for r in suite.results.values())
+    return {'total': total, 'passed': passed, 'failed': total - passed,
+            'duration': suite.total_duration, 'ecu_state': list(transport.controller.state)}
+
+def daemon_main(argv: List[str]):
+    """Serve test jobs from a long-lived process with warm suites and transports"""
+    from Utils.runner_daemon import DEFAULT_SOCKET_PATH, DaemonError, RunnerDaemon
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py daemon",
+                                     description="Run a daemon accepting test jobs over a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"Socket path (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Jobs run in parallel (jobs on the same transport are still serialized)")
+    parser.add_argument("--cache-dir", default=None, help="Result cache directory used by jobs with 'cache'")
+    parser.add_argument("--results-dir", metavar="DIR",
+                        help="Directory for results documents requested by jobs (disabled without it)")
+    parser.add_argument("--no-preload", action="store_true", help="Import suites on first use instead of at startup")
+    args = parser.parse_args(argv)
+    
+    if not args.no_preload:
+        start = time.perf_counter()
+        for spec in get_suites(groups=["core", "plugin", "simulator"]):
+            spec.load()
+        print(f"Preloaded test suites in {(time.perf_counter() - start) * 1000:.1f}ms")
+    cache = ResultCache(args.cache_dir) if args.cache_dir else ResultCache()
+    cache_lock = threading.Lock()
+    
+    if args.results_dir:
+        os.makedirs(args.results_dir, exist_ok=True)
+    
+    def run_job(request, sink, transport):
+        if not request.get('cache'):
+            return run_daemon_job(request, sink, transport, results_dir=args.results_dir)
+        with cache_lock:
+            return run_daemon_job(request, sink, transport, cache, args.results_dir)
+    
+    try:
+        RunnerDaemon(run_job, args.socket, args.workers).serve_forever()
+    except DaemonError as e:
+        print(f"Daemon not started: {e}")
+        sys.exit(1)
+
+def submit_main(argv: List[str]):
+    """Submit a job to a running daemon and print its streamed results"""
+    from Utils.runner_daemon import DEFAULT_SOCKET_PATH, submit_job
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py submit",
+                                     description="Submit a test job to a running daemon")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help=f"Socket path (default: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument("-s", "--service", action="append", dest="services", metavar="SERVICE",
+                        help="Run only the given service; repeatable")
+    parser.add_argument("--schedule", action="store_true", help="Order test cases by preconditions")
+    parser.add_argument("--shard", metavar="i/N", help="Run only shard i of N")
+    parser.add_argument("--cache", action="store_true", help="Use the daemon's result cache")
+    parser.add_argument("--suite-timeout", type=float, metavar="SECONDS")
+    parser.add_argument("--test-timeout", type=float, metavar="SECONDS")
+    parser.add_argument("--results-json", metavar="NAME",
+                        help="Have the daemon write the results document as NAME in its --results-dir")
+    parser.add_argument("--doip", metavar="IP", help="Run state transitions against this DoIP ECU instead of the simulator")
+    parser.add_argument("--jsonl", action="store_true", help="Print the raw JSON lines instead of a summary")
+    parser.add_argument("command", nargs="?", choices=["run", "ping", "shutdown"], default="run")
+    args = parser.parse_args(argv)
+    
+    request = {'command': args.command, 'services': args.services, 'schedule': args.schedule,
+               'shard': args.shard, 'cache': args.cache, 'suite_timeout': args.suite_timeout,
+               'test_timeout': args.test_timeout, 'results_json': args.results_json,
+               'target': {'ip': args.doip} if args.doip else None}
+    failed = 0
+    for message in submit_job(request, args.socket):
+        if args.jsonl:
+            print(json.dumps(message))
+        elif message['type'] == 'test' and not message['passed']:
+            print(f"[FAIL] {message['suite']}: {message['test']} - {message.get('details', '')}")
+        elif message['type'] == 'suite':
+            print(f"{message['suite']:<40} {message['status']:<10} {message['passed']}/{message['total']}")
+        elif message['type'] in ('job', 'pong', 'shutdown', 'error'):
+            print(json.dumps(message))
+        if message['type'] == 'job':
+            failed = message.get('failed', 0) if message['status'] == 'done' else 1
+    sys.exit(1 if failed else 0)
+
+def history_main(argv: List[str]):
+    """Query the SQLite result history"""
+    from Utils.result_store import ResultStore
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py history",
+                                     description="Trend, flaky-test and regression queries on a --db database")
+    parser.add_argument("query", choices=["runs", "software", "flaky", "first-fail"])
+    parser.add_argument("--db", default="uds_results.db", help="History database (default: uds_results.db)")
+    parser.add_argument("--sid", type=lambda value: int(value, 16), help="Only this service, e.g. 0x22")
+    parser.add_argument("--software", help="Only this ECU software number (F188)")
+    parser.add_argument("--suite", help="Suite name (first-fail)")
+    parser.add_argument("--test", help="Test name (first-fail, software)")
+    parser.add_argument("--vin", help="Only this VIN (first-fail)")
+    parser.add_argument("--last", type=int, default=20, help="Runs to consider (runs, flaky)")
+    args = parser.parse_args(argv)
+    
+    store = ResultStore(args.db)
+    try:
+        if args.query == "runs":
+            rows = store.pass_rate_trend(args.software, args.sid, args.last)
+        elif args.query == "software":
+            rows = store.software_trend(args.sid, args.test)
+        elif args.query == "flaky":
+            rows = store.flaky_tests(args.last)
+        else:
+            if not (args.suite and args.test):
+                parser.error("first-fail needs --suite and --test")
+            row = store.first_failing_run(args.suite, args.test, args.vin)
+            rows = [row] if row else []
+            if not row:
+                print(f"{args.suite}: {args.test} is not currently failing")
+    finally:
+        store.close()
+    for row in rows:
+        print(json.dumps(row))
+
+def diff_main(argv: List[str]):
+    """Compare two runs and list regressions"""
+    from Utils.result_diff import diff_runs, iter_source, print_diff
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py diff",
+                                     description="Compare two runs: newly failing, newly passing and changed NRC")
+    parser.add_argument("old", help="Baseline: results JSON, JSONL report, directory of reports or history.db@RUN_ID")
+    parser.add_argument("new", help="Run to compare against the baseline (same forms)")
+    parser.add_argument("--json", action="store_true", help="Print the diff as JSON")
+    parser.add_argument("--limit", type=int, default=50, help="Entries shown per group and category")
+    args = parser.parse_args(argv)
+    
+    start = time.perf_counter()
+    result = diff_runs(iter_source(args.old), iter_source(args.new))
+    if args.json:
+        print(json.dumps(result.to_dict(), indent=1))
+    else:
+        print_diff(result, args.limit)
+        print(f"\nDiff computed in {time.perf_counter() - start:.2f} seconds")
+    if result.disjoint:
+        print(f"Warning: none of the {result.old_records} baseline and {result.new_records} new results "
+              f"matched (different ECUs or suites?)", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(1 if result.regressed else 0)
+
+def flash_main(argv: List[str]):
+    """Download an image with 0x34/0x36/0x37"""
+    from Utils.ecu_simulator import ECUSimulator
+    from Utils.flash_engine import FlashEngine, FlashError
+    from Utils.flash_compression import COMPRESSION_METHODS, get_compression
+    from Utils.flash_delta import DeltaFlasher, DEFAULT_SECTOR_SIZE
+    from Utils.flash_resume import ResumableFlasher, MAX_RESUMES
+    from Utils.checksums import CHECKSUMS, get_checksum
+    from Utils.doip_handler import DoIPHandler
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py flash",
+                                     description="Flash an image (memory-mapped) to the ECU or the local simulator")
+    parser.add_argument("image", help="Binary image file")
+    parser.add_argument("--address", type=lambda value: int(value, 0), default=0, help="Memory address, e.g. 0x08000000")
+    parser.add_argument("--doip", metavar="IP", help="Flash this DoIP ECU instead of the local simulator")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Frame the next TransferData block while the current one is in flight")
+    parser.add_argument("--max-block-length", type=int, default=4096,
+                        help="maxNumberOfBlockLength reported by the simulator")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulator round-trip time per request in seconds")
+    parser.add_argument("--compress", choices=sorted(COMPRESSION_METHODS),
+                        help="Compress the image on the fly (sets the compressionMethod of RequestDownload)")
+    parser.add_argument("--level", type=int, help="Compression level/preset")
+    parser.add_argument("--checksum", choices=sorted(CHECKSUMS),
+                        help="Send this digest of each download with RequestTransferExit")
+    parser.add_argument("--verify", action="store_true",
+                        help="Also let the ECU check the memory against the digest (checkMemory routine)")
+    parser.add_argument("--previous", metavar="IMAGE",
+                        help="Delta flash: download only sectors that differ from this image "
+                             "(preloaded into the simulator)")
+    parser.add_argument("--ecu-hashes", action="store_true",
+                        help="Delta flash: compare with per-sector digests read from the ECU")
+    parser.add_argument("--sector-size", type=int, default=DEFAULT_SECTOR_SIZE, help="Erase sector size for delta flashing")
+    parser.add_argument("--merge-gap", type=int, default=0,
+                        help="Join changed regions separated by up to this many unchanged sectors")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="Persist the acknowledged position and resume after link loss (and on rerun)")
+    parser.add_argument("--reset-type", type=lambda value: int(value, 0), metavar="TYPE",
+                        help="ECU reset (0x11) before resuming, e.g. 0x01")
+    parser.add_argument("--max-resumes", type=int, default=MAX_RESUMES, help="Resume attempts before giving up")
+    parser.add_argument("--drop-every", type=int, default=0, metavar="N",
+                        help="Simulator: drop the link after every Nth TransferData block")
+    args = parser.parse_args(argv)
+    
+    compression = get_compression(args.compress, args.level) if args.compress else None
+    options = {'pipelined': args.pipelined, 'compression': compression, 'verify_memory': args.verify,
+               'checksum': get_checksum(args.checksum or "crc32") if args.checksum or args.verify else None}
+    handler = None
+    if args.doip:
+        handler = DoIPHandler(args.doip)
+        if not handler.connect():
+            sys.exit(1)
+        reconnect = handler.reconnect
+        engine = FlashEngine(handler.send_diagnostic_message, send_request_parts=handler.send_diagnostic_message_parts,
+                             receive_response=handler.receive_diagnostic_message, **options)
+    else:
+        simulator = ECUSimulator(max_block_length=args.max_block_length, latency=args.latency)
+        if args.previous:
+            with open(args.previous, 'rb') as f:
+                simulator.write_memory(args.address, f.read())
+        simulator.link_drop_every = args.drop_every
+        reconnect = simulator.reconnect
+        engine = FlashEngine(simulator.send_request, receive_response=simulator.receive_response, **options)
+    try:
+        # Programming session with security access
+        controller = ECUStateController(engine.send_request)
+        if not controller.transition_to((0x02, 1)):
+            print("Could not enter the programming session with security access")
+            sys.exit(1)
+        if args.previous or args.ecu_hashes:
+            flasher = DeltaFlasher(engine, sector_size=args.sector_size, merge_gap=args.merge_gap)
+            report = flasher.flash_file(args.image, args.address, None if args.ecu_hashes else args.previous)
+        elif args.checkpoint:
+            flasher = ResumableFlasher(engine, args.checkpoint, controller, reconnect=reconnect,
+                                       reset_type=args.reset_type, max_resumes=args.max_resumes)
+            report = flasher.flash_file(args.image, args.address)
+        else:
+            report = engine.flash_file(args.image, args.address)
+        report.print_summary()
+    except FlashError as e:
+        print(f"Flash failed at {e}")
+        sys.exit(1)
+    finally:
+        if handler is not None:
+            handler.disconnect()
+
+def upload_main(argv: List[str]):
+    """Dump ECU memory with 0x35/0x36/0x37"""
+    from Utils.ecu_simulator import ECUSimulator
+    from Utils.flash_engine import FlashError
+    from Utils.checksums import CHECKSUMS, get_checksum
+    from Utils.memory_upload import UploadEngine
+    from Utils.doip_handler import DoIPHandler
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py upload",
+                                     description="Dump a memory range (RequestUpload) into a file")
+    parser.add_argument("output", help="Output file (pre-sized, written block by block)")
+    parser.add_argument("--address", type=lambda value: int(value, 0), required=True, help="Memory address")
+    parser.add_argument("--size", type=lambda value: int(value, 0), required=True, help="Number of bytes")
+    parser.add_argument("--doip", metavar="IP", help="Dump this DoIP ECU instead of the local simulator")
+    parser.add_argument("--checksum", choices=sorted(CHECKSUMS), help="Print a digest of the dump")
+    parser.add_argument("--preload", metavar="IMAGE", help="Simulator: memory contents at --address")
+    parser.add_argument("--max-block-length", type=int, default=4096,
+                        help="maxNumberOfBlockLength reported by the simulator")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulator round-trip time per request in seconds")
+    args = parser.parse_args(argv)
+    
+    checksum = get_checksum(args.checksum) if args.checksum else None
+    handler = None
+    if args.doip:
+        handler = DoIPHandler(args.doip)
+        if not handler.connect():
+            sys.exit(1)
+        engine = UploadEngine(handler.send_diagnostic_message, receive_response=handler.receive_diagnostic_message,
+                              checksum=checksum)
+    else:
+        simulator = ECUSimulator(max_block_length=args.max_block_length, latency=args.latency)
+        if args.preload:
+            with open(args.preload, 'rb') as f:
+                simulator.write_memory(args.address, f.read())
+        engine = UploadEngine(simulator.send_request, receive_response=simulator.receive_response,
+                              checksum=checksum)
+    try:
+        if not ECUStateController(engine.send_request).transition_to((0x02, 1)):
+            print("Could not enter the programming session with security access")
+            sys.exit(1)
+        engine.upload_to_file(args.output, args.address, args.size).print_summary()
+    except FlashError as e:
+        print(f"Upload failed at {e}")
+        sys.exit(1)
+    finally:
+        if handler is not None:
+            handler.disconnect()
+
+def read_memory_main(argv: List[str]):
+    """Read ECU memory with 0x23 in adaptively sized chunks"""
+    from Utils.ecu_simulator import ECUSimulator
+    from Utils.flash_engine import FlashError
+    from Utils.memory_reader import MemoryReader, ReadSizeCache, DEFAULT_READ_SIZE_CACHE, DEFAULT_MAX_PROBE
+    from Utils.doip_handler import DoIPHandler
+    
+    parser = argparse.ArgumentParser(prog="run_complete_tests.py read-memory",
+                                     description="Read a memory range (ReadMemoryByAddress) into a file")
+    parser.add_argument("output", help="Output file (pre-sized, unreadable ranges stay zero-filled)")
+    parser.add_argument("--address", type=lambda value: int(value, 0), required=True, help="Memory address")
+    parser.add_argument("--size", type=lambda value: int(value, 0), required=True, help="Number of bytes")
+    parser.add_argument("--doip", metavar="IP", help="Read from this DoIP ECU instead of the local simulator")
+    parser.add_argument("--connections", type=int, default=1,
+                        help="Concurrent connections, one outstanding request each (DoIP: consecutive tester addresses)")
+    parser.add_argument("--session", type=lambda value: int(value, 0), default=0x03,
+                        help="Diagnostic session entered on every connection")
+    parser.add_argument("--security-level", type=int, default=0, help="Security level unlocked on every connection")
+    parser.add_argument("--chunk-size", type=int, help="Fixed read size instead of the probed one")
+    parser.add_argument("--max-probe", type=int, default=DEFAULT_MAX_PROBE, help="Largest read size probed")
+    parser.add_argument("--size-cache", default=DEFAULT_READ_SIZE_CACHE,
+                        help="JSON file caching the probed read size per ECU software version")
+    parser.add_argument("--preload", metavar="IMAGE", help="Simulator: memory contents at --address")
+    parser.add_argument("--max-read-length", type=int, default=1024,
+                        help="Largest read the simulator accepts")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulator round-trip time per request in seconds")
+    args = parser.parse_args(argv)
+    
+    handlers = []
+    if args.doip:
+        for index in range(args.connections):
+            handler = DoIPHandler(args.doip, source_addr=0x0E00 + index)
+            if not handler.connect():
+                for connected in handlers:
+                    connected.disconnect()
+                sys.exit(1)
+            handlers.append(handler)
+        send_requests = [handler.send_diagnostic_message for handler in handlers]
+        receive_responses = [handler.receive_diagnostic_message for handler in handlers]
+    else:
+        simulator = ECUSimulator(latency=args.latency)
+        simulator.max_read_length = args.max_read_length
+        if args.preload:
+            with open(args.preload, 'rb') as f:
+                simulator.write_memory(args.address, f.read())
+        send_requests = [simulator.send_request] * args.connections
+        receive_responses = [simulator.receive_response] * args.connections
+    try:
+        for send_request in send_requests:
+            if not ECUStateController(send_request).transition_to((args.session, args.security_level)):
+                print(f"Could not enter session 0x{args.session:02X}")
+                sys.exit(1)
+        software_version = read_ecu_identity(send_requests[0])['software_number']
+        reader = MemoryReader(send_requests, receive_responses, cache=ReadSizeCache(args.size_cache),
+                              software_version=software_version, chunk_size=args.chunk_size,
+                              max_probe=args.max_probe)
+        reader.read_to_file(args.output, args.address, args.size).print_summary()
+    except FlashError as e:
+        print(f"Read failed at {e}")
+        sys.exit(1)
+    finally:
+        for handler in handlers:
+            handler.disconnect()
+
 def main():
     """Main execution function"""
+    subcommands = {"merge": merge_main, "daemon": daemon_main, "submit": submit_main, "history": history_main,
+                   "diff": diff_main, "flash": flash_main, "upload": upload_main,
+                   "read-memory": read_memory_main}
+    if len(sys.argv) > 1 and sys.argv[1] in subcommands:
+        subcommands[sys.argv[1]](sys.argv[2:])
+        return
+    
+    args = parse_args()
+    
+    if args.list:
+        for spec in get_suites(groups=["core", "plugin", "simulator"]):
+            print(f"{spec.name:<40} {spec.target}")
+        return
+    
+    cache = None
+    if args.cache or args.force or args.invalidate_cache is not None:
+        cache = ResultCache(args.cache_dir) if args.cache_dir else ResultCache()
+        if args.invalidate_cache is not None:
+            removed = cache.invalidate(args.invalidate_cache or None)
+            cache.save()
+            print(f"Invalidated {removed} cached suite result(s)")
+            if not (args.cache or args.force):
+                return
+    
+    sinks = []
+    if args.jsonl:
+        from Utils.report_sinks import JSONLReportSink
+        sinks.append(JSONLReportSink(args.jsonl))
+    if args.junit:
+        from Utils.report_sinks import JUnitXMLReportSink
+        sinks.append(JUnitXMLReportSink(args.junit))
+    store_sink = None
+    if args.db:
+        from Utils.result_store import ResultStoreSink
+        store_sink = ResultStoreSink(args.db)
+        sinks.append(store_sink)
+    
     try:
-        suite = CompleteUDSTestSuite()
+        suite = CompleteUDSTestSuite(args.services, cache=cache, force=args.force, schedule=args.schedule,
+                                     sinks=sinks, suite_timeout=args.suite_timeout,
+                                     test_timeout=args.test_timeout, shard=args.shard,
+                                     shard_timings=load_timings(args.shard_timings) if args.shard_timings else None,
+                                     max_records=args.keep_records, spill_dir=args.spill_dir,
+                                     record_identity=bool(args.results_json))
+        if store_sink is not None:
+            # SIDs of the suites selected for this run, including groups that only run when selected (e.g. 0x23)
+            store_sink.sids = {name: spec.sid for name, spec in suite.test_classes}
         suite.run_all_tests()
+        if args.results_json:
+            write_results(args.results_json, suite.results_document())
     except KeyboardInterrupt:
         print("\n\nTest execution interrupted by user.")
     except Exception as e:
         print(f"\nFatal error during test execution: {e}")
         sys.exit(1)
+    finally:
+        for sink in sinks:
+            sink.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+# test_services/test_checksums.py
+import sys
+import os
+import random
+import hashlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.test_scheduler import ECUStateController
+from Utils.flash_engine import FlashEngine, FlashError
+from Utils.flash_compression import ZlibCompression
+from Utils.checksums import (CHECKSUMS, CRC32Checksum, CRC16Checksum, SHA256Checksum, checksum_of,
+                             checksum_for_digest, get_checksum)
+
+IMAGE_ADDRESS = 0x08000000
+# 40 blocks of 4094 bytes plus a partial block
+IMAGE = random.Random(0x42).randbytes(40 * 4094 + 777)
+CHECK_INPUT = b"123456789"
+
+class ChecksumTest:
+    """Test suite for incremental download checksums verified by the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+
+    @staticmethod
+    def _simulator() -> ECUSimulator:
+        """Simulator in the programming session with security access"""
+        simulator = ECUSimulator()
+        ECUStateController(simulator.send_request).transition_to((0x02, 1))
+        return simulator
+
+    @staticmethod
+    def _engine(send_request, simulator: ECUSimulator, checksum, **options) -> FlashEngine:
+        return FlashEngine(send_request, receive_response=simulator.receive_response, checksum=checksum, **options)
+
+    def test_check_values(self):
+        """Test the standard check values of each method for "123456789" """
+        values = {name: checksum_of(CHECK_INPUT, method).hex().upper() for name, method in CHECKSUMS.items()}
+        passed = values == {'crc32': "CBF43926", 'crc16': "29B1",
+                            'sha256': hashlib.sha256(CHECK_INPUT).hexdigest().upper()}
+        details = ", ".join(f"{name} {value[:8]}" for name, value in values.items())
+        self.logger.log_test("Check Values", passed, details)
+
+    def test_incremental_equals_whole(self):
+        """Test that updating block by block from memoryview slices gives the whole-buffer digest"""
+        rng = random.Random(1)
+        cuts = sorted(rng.sample(range(1, len(IMAGE)), 50))
+        matches = []
+        with memoryview(IMAGE) as view:
+            for method in CHECKSUMS.values():
+                checksum = method()
+                for start, end in zip([0] + cuts, cuts + [len(IMAGE)]):
+                    with view[start:end] as part:
+                        checksum.update(part)
+                digest = checksum.digest()
+                matches.append(digest == checksum_of(IMAGE, method) and len(digest) == method.size)
+        passed = all(matches)
+        details = f"{sum(matches)} of {len(matches)} methods match over {len(cuts) + 1} uneven parts"
+        self.logger.log_test("Incremental Equals Whole", passed, details)
+
+    def test_verified_downloads(self):
+        """Test serial, pipelined and compressed downloads verified by RequestTransferExit and checkMemory"""
+        modes = {'serial': {}, 'pipelined': {'pipelined': True}, 'compressed': {'compression': ZlibCompression()}}
+        verified = []
+        try:
+            for method in CHECKSUMS.values():
+                for mode, options in modes.items():
+                    simulator = self._simulator()
+                    engine = self._engine(simulator.send_request, simulator, method, verify_memory=True, **options)
+                    report = engine.flash_buffer(IMAGE, IMAGE_ADDRESS)
+                    if report.checksum == checksum_of(IMAGE, method) and report.memory_checked \
+                            and report.checksum_method == method.name:
+                        verified.append(f"{method.name}/{mode}")
+            passed = len(verified) == len(CHECKSUMS) * len(modes)
+            details = f"{len(verified)} of {len(CHECKSUMS) * len(modes)} downloads verified"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Verified Downloads", passed, details)
+
+    def test_corrupted_block_detected(self):
+        """Test that a block corrupted on the way fails RequestTransferExit with 0x72"""
+        simulator = self._simulator()
+        blocks = [0]
+
+        def corrupting(request: bytes) -> bytes:
+            if request[0] == 0x36:
+                blocks[0] += 1
+                if blocks[0] == 17:
+                    request = request[:100] + bytes([request[100] ^ 0x01]) + request[101:]
+            return simulator.send_request(request)
+
+        try:
+            self._engine(corrupting, simulator, CRC16Checksum).flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed, details = False, "Corrupted download accepted"
+        except FlashError as e:
+            passed = e.nrc == 0x72 and "RequestTransferExit" in str(e)
+            details = str(e)
+        self.logger.log_test("Corrupted Block Detected", passed, details)
+
+    def test_check_memory_mismatch(self):
+        """Test that checkMemory reports memory changed after the transfer"""
+        simulator = self._simulator()
+
+        def overwriting(request: bytes) -> bytes:
+            response = simulator.send_request(request)
+            if request[0] == 0x37:
+                simulator.write_memory(IMAGE_ADDRESS + 5000, b"\x00\x00")
+            return response
+
+        try:
+            engine = self._engine(overwriting, simulator, SHA256Checksum, verify_memory=True)
+            engine.flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed, details = False, "Mismatch not reported"
+        except FlashError as e:
+            passed = "checksum mismatch" in str(e)
+            details = str(e)
+        self.logger.log_test("Check Memory Mismatch", passed, details)
+
+    def test_offset_download(self):
+        """Test that a download continued at an offset is checksummed over the sent range only"""
+        simulator = self._simulator()
+        offset = 12 * 4094
+        try:
+            engine = self._engine(simulator.send_request, simulator, CRC32Checksum, verify_memory=True)
+            report = engine.flash_buffer(IMAGE, IMAGE_ADDRESS, offset=offset)
+            passed = report.checksum == checksum_of(IMAGE[offset:]) and report.memory_checked \
+                and simulator.read_memory(IMAGE_ADDRESS + offset, len(IMAGE) - offset) == IMAGE[offset:]
+            details = f"CRC32 {report.checksum.hex().upper()} over {report.size} bytes from offset {offset}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Offset Download", passed, details)
+
+    def test_method_lookup(self):
+        """Test looking methods up by name and by received digest length"""
+        try:
+            get_checksum("md5")
+            rejected = False
+        except ValueError:
+            rejected = True
+        passed = get_checksum("crc16") is CRC16Checksum and rejected \
+            and [checksum_for_digest(bytes(n)) for n in (2, 4, 32, 16)] == [CRC16Checksum, CRC32Checksum,
+                                                                             SHA256Checksum, None]
+        details = f"Unknown name rejected: {rejected}, digest lengths {sorted(c.size for c in CHECKSUMS.values())}"
+        self.logger.log_test("Method Lookup", passed, details)
+
+    def run_all_tests(self):
+        """Run all checksum tests"""
+        print("\n" + "="*60)
+        print("DOWNLOAD CHECKSUM TESTS")
+        print("="*60)
+
+        self.test_check_values()
+        self.test_incremental_equals_whole()
+        self.test_verified_downloads()
+        self.test_corrupted_block_detected()
+        self.test_check_memory_mismatch()
+        self.test_offset_download()
+        self.test_method_lookup()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = ChecksumTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
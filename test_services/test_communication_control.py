@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class CommunicationControlTest:
     """Test suite for UDS Service 0x28 - Communication Control"""
@@ -32,6 +33,7 @@ class CommunicationControlTest:
         else:
             return bytes([0x7F, 0x28, 0x12])  # Sub-function not supported
     
+    @precondition(session=0x03)
     def test_enable_rx_tx(self):
         """Test enable Rx and Tx (0x00)"""
         request = bytes([0x28, 0x00])
@@ -46,6 +48,7 @@ class CommunicationControlTest:
             "Normal communication enabled"
         )
     
+    @precondition(session=0x03)
     def test_enable_rx_disable_tx(self):
         """Test enable Rx, disable Tx (0x01)"""
         request = bytes([0x28, 0x01])
@@ -60,6 +63,7 @@ class CommunicationControlTest:
             "Receive enabled, transmit disabled"
         )
     
+    @precondition(session=0x03)
     def test_disable_rx_enable_tx(self):
         """Test disable Rx, enable Tx (0x02)"""
         request = bytes([0x28, 0x02])
@@ -74,6 +78,7 @@ class CommunicationControlTest:
             "Receive disabled, transmit enabled"
         )
     
+    @precondition(session=0x03)
     def test_disable_rx_tx(self):
         """Test disable Rx and Tx (0x03)"""
         request = bytes([0x28, 0x03])
@@ -88,6 +93,7 @@ class CommunicationControlTest:
             "All communication disabled"
         )
     
+    @precondition(session=0x03)
     def test_invalid_control_type(self):
         """Test invalid control type (0xFF)"""
         request = bytes([0x28, 0xFF])
@@ -1,10 +1,12 @@
 # test_services/test_diagnostic_session_control.py
 import time
 from uds_validator import UDSValidator
-import udsoncan
-from udsoncan.connections import IsoTPSocketConnection
 
 def test_diagnostic_session_control():
+    # udsoncan is heavy to import, so only load it when this test actually runs
+    import udsoncan
+    from udsoncan.connections import IsoTPSocketConnection
+
     conn = IsoTPSocketConnection('192.168.0.10', 13400)  # DOIP
     validator = UDSValidator()
 
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger, retry_on_pending
+from Utils.test_scheduler import precondition
 
 class DiagnosticSessionControlTest:
     """Test suite for UDS Service 0x10 - Diagnostic Session Control"""
@@ -56,6 +57,7 @@ class DiagnosticSessionControlTest:
             return bytes([0x12, 0x34, 0x80, 0x01, 0x00, len(uds_response) + 8, 0x00, 0x01, 0x01, 0x00, 0x00, 0x00]) + uds_response
         return bytes()
     
+    @precondition(changes_state=True)
     def test_default_session(self):
         """Test default diagnostic session (0x01)"""
         request = bytes([0x10, 0x01])
@@ -70,6 +72,7 @@ class DiagnosticSessionControlTest:
             f"Session changed to default, timing: {result.get('timing', 'N/A')}"
         )
     
+    @precondition(changes_state=True)
     def test_programming_session(self):
         """Test programming diagnostic session (0x02)"""
         request = bytes([0x10, 0x02])
@@ -84,6 +87,7 @@ class DiagnosticSessionControlTest:
             f"Session changed to programming, timing: {result.get('timing', 'N/A')}"
         )
     
+    @precondition(changes_state=True)
     def test_extended_session(self):
         """Test extended diagnostic session (0x03)"""
         request = bytes([0x10, 0x03])
@@ -0,0 +1,176 @@
+# test_services/test_did_poller.py
+import sys
+import os
+import math
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.did_poller import DIDPoller
+
+# Periods of the polled identification DIDs, shortened to keep the suite fast
+SCHEDULE = {0xF190: 0.02, 0xF187: 0.05, 0xF188: 0.1}
+RUN_SECONDS = 0.5
+
+class ConcurrencyProbe:
+    """send_request wrapper recording the most requests an ECU had outstanding at once"""
+
+    def __init__(self, send_request):
+        self.send_request = send_request
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.max_outstanding = 0
+
+    def __call__(self, request: bytes) -> bytes:
+        with self.lock:
+            self.outstanding += 1
+            self.max_outstanding = max(self.max_outstanding, self.outstanding)
+        try:
+            return self.send_request(request)
+        finally:
+            with self.lock:
+                self.outstanding -= 1
+
+class PendingECU:
+    """Simulator answering every Nth request with 0x78 response pending; the final response follows later"""
+
+    def __init__(self, simulator: ECUSimulator, every: int, delay: float = 0.002):
+        self.simulator = simulator
+        self.every = every
+        self.delay = delay
+        self.requests = 0
+        self.pending = None
+
+    def send_request(self, request: bytes) -> bytes:
+        self.requests += 1
+        response = self.simulator.send_request(request)
+        if self.requests % self.every:
+            return response
+        self.pending = response
+        return bytes([0x7F, request[0], 0x78])
+
+    def receive_response(self) -> bytes:
+        time.sleep(self.delay)
+        response, self.pending = self.pending, None
+        return response
+
+class DIDPollerTest:
+    """Test suite for multi-rate Read Data By Identifier polling of many ECUs in the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+
+    @staticmethod
+    def _poller(simulators: dict) -> tuple:
+        probes = {name: ConcurrencyProbe(simulator.send_request) for name, simulator in simulators.items()}
+        poller = DIDPoller(probes)
+        for name in simulators:
+            for did, period in SCHEDULE.items():
+                poller.add(name, [did], period)
+        return poller, probes
+
+    @staticmethod
+    def _slots(stats) -> int:
+        """Grid slots a DID used up: sampled, answered with an error or lost, or skipped as missed"""
+        return stats.samples + stats.lost + sum(stats.errors.values()) + stats.missed
+
+    def _slots_accounted(self, stats, duration: float) -> bool:
+        """Every grid slot of the run was polled or counted as missed, however loaded the machine is.
+
+        No poll is issued after RUN_SECONDS (one queued slot may be left), and missed slots are
+        counted up to the last response, which may arrive after it.
+        """
+        return int(RUN_SECONDS / stats.period) - 1 <= self._slots(stats) <= math.ceil(duration / stats.period) + 1
+
+    @staticmethod
+    def _answered(report) -> int:
+        """Responses of all kinds; busy responses do not use up a slot"""
+        return sum(stats.samples + stats.busy + stats.lost + sum(stats.errors.values()) for stats in report.stats)
+
+    def test_multi_rate_polling(self):
+        """Test polling three rates from 20 ECUs with one outstanding request per ECU"""
+        simulators = {f"ECU{index:02d}": ECUSimulator(latency=0.0005) for index in range(20)}
+        poller, probes = self._poller(simulators)
+        report = poller.run(RUN_SECONDS)
+        accounted = all(self._slots_accounted(stats, report.duration) for stats in report.stats)
+        single = max(probe.max_outstanding for probe in probes.values()) == 1
+        passed = accounted and single and self._answered(report) == report.requests \
+            and all(stats.samples and not stats.lost and not stats.errors for stats in report.stats) \
+            and poller.values[("ECU07", 0xF190)] == simulators["ECU07"].dids[0xF190]
+        missed = sum(stats.missed for stats in report.stats)
+        details = f"{report.requests} requests, {missed} missed slots, all slots accounted: {accounted}, " \
+                  f"one outstanding: {single}"
+        self.logger.log_test("Multi-Rate Polling", passed, details)
+
+    def test_busy_backoff(self):
+        """Test backing off on 0x21 busy responses without losing polls"""
+        simulator = ECUSimulator(latency=0.0005)
+        simulator.busy_every = 4
+        poller, _ = self._poller({"ECU": simulator})
+        report = poller.run(RUN_SECONDS)
+        busy = sum(stats.busy for stats in report.stats)
+        # Every fourth request is answered busy and its slot polled again
+        passed = busy == report.requests // 4 and self._answered(report) == report.requests \
+            and all(stats.samples and not stats.errors and self._slots_accounted(stats, report.duration)
+                    for stats in report.stats)
+        details = f"{busy} busy responses in {report.requests} requests, samples " + \
+                  ", ".join(f"0x{stats.did:04X} {stats.samples}" for stats in report.stats)
+        self.logger.log_test("Busy Backoff", passed, details)
+
+    def test_overloaded_ecu(self):
+        """Test that a slow ECU misses slots without delaying the other ECUs"""
+        simulators = {"SLOW": ECUSimulator(latency=0.03), "FAST": ECUSimulator(latency=0.0005)}
+        poller, probes = self._poller(simulators)
+        report = poller.run(RUN_SECONDS)
+        slow = [stats for stats in report.stats if stats.ecu == "SLOW"]
+        fast = [stats for stats in report.stats if stats.ecu == "FAST"]
+        # 30ms per request cannot serve 80 polls/s, whereas the fast ECU keeps up on its own worker
+        slow_missed = sum(stats.missed for stats in slow)
+        fast_missed = sum(stats.missed for stats in fast)
+        passed = slow_missed > fast_missed and sum(stats.samples for stats in fast) > sum(stats.samples for stats in slow) \
+            and all(self._slots_accounted(stats, report.duration) for stats in report.stats) \
+            and probes["SLOW"].max_outstanding == 1
+        details = f"Slow ECU missed {slow_missed} slots, fast ECU {fast_missed}; samples slow " \
+                  f"{sum(stats.samples for stats in slow)}, fast {sum(stats.samples for stats in fast)}"
+        self.logger.log_test("Overloaded ECU", passed, details)
+
+    def test_response_pending(self):
+        """Test that the final response after 0x78 is paired with its own request"""
+        simulator = ECUSimulator(latency=0.0005)
+        ecu = PendingECU(simulator, every=3)
+        poller, _ = self._poller({"ECU": simulator})
+        poller.ecus = {"ECU": ecu.send_request}
+        poller.receive_responses = {"ECU": ecu.receive_response}
+        mismatched = []
+        poller.on_sample = lambda name, did, timestamp, data: \
+            data == simulator.dids[did] or mismatched.append(did)
+        report = poller.run(RUN_SECONDS)
+        pending = ecu.requests // ecu.every
+        passed = pending > 0 and not mismatched and all(stats.samples and not stats.errors and not stats.lost
+                                                        for stats in report.stats)
+        details = f"{pending} response pending, {sum(stats.samples for stats in report.stats)} samples, " \
+                  f"{len(mismatched)} paired with the wrong DID"
+        self.logger.log_test("Response Pending", passed, details)
+
+    def run_all_tests(self):
+        """Run all DID poller tests"""
+        print("\n" + "="*60)
+        print("MULTI-RATE DID POLLING TESTS (0x22)")
+        print("="*60)
+
+        self.test_multi_rate_polling()
+        self.test_busy_backoff()
+        self.test_overloaded_ecu()
+        self.test_response_pending()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = DIDPollerTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# test_services/test_doip_handler.py
+import sys
+import os
+import socket
+import struct
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.doip_handler import DoIPHandler
+from Utils.flash_engine import final_response
+
+TESTER_ADDRESS = 0x0E00
+ECU_ADDRESS = 0x1234
+
+class DoIPPeer:
+    """ECU end of a socket pair: queues DoIP messages and reads what the handler sent"""
+
+    def __init__(self):
+        self.socket, tester = socket.socketpair()
+        self.socket.settimeout(1.0)
+        tester.settimeout(1.0)
+        self.handler = DoIPHandler("socketpair", source_addr=TESTER_ADDRESS, target_addr=ECU_ADDRESS)
+        self.handler.socket = tester
+        self.handler.connected = True
+
+    @staticmethod
+    def message(payload_type: int, payload: bytes) -> bytes:
+        return struct.pack('>BBHI', DoIPHandler.DOIP_VERSION, DoIPHandler.DOIP_INVERSE_VERSION,
+                           payload_type, len(payload)) + payload
+
+    def diagnostic(self, uds_data: bytes) -> bytes:
+        return self.message(DoIPHandler.DOIP_DIAG_MESSAGE, struct.pack('>HH', ECU_ADDRESS, TESTER_ADDRESS) + uds_data)
+
+    def ack(self) -> bytes:
+        return self.message(DoIPHandler.DOIP_DIAG_MESSAGE_ACK, struct.pack('>HHB', ECU_ADDRESS, TESTER_ADDRESS, 0x00))
+
+    def nack(self, code: int) -> bytes:
+        return self.message(DoIPHandler.DOIP_DIAG_MESSAGE_NACK, struct.pack('>HHB', ECU_ADDRESS, TESTER_ADDRESS, code))
+
+    def send(self, *messages: bytes):
+        self.socket.sendall(b"".join(messages))
+
+    def receive(self) -> tuple:
+        """Next message the handler sent: (payload type, payload)"""
+        header = self.socket.recv(8, socket.MSG_WAITALL)
+        _, _, payload_type, length = struct.unpack('>BBHI', header)
+        return payload_type, self.socket.recv(length, socket.MSG_WAITALL) if length else b""
+
+    def close(self):
+        self.handler.disconnect()
+        self.socket.close()
+
+class DoIPHandlerTest:
+    """Test suite for the DoIP handler's message handling over a local socket pair"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+
+    def test_response_after_ack(self):
+        """Test that the diagnostic message after the ACK is returned as the response"""
+        peer = DoIPPeer()
+        try:
+            response = bytes([0x62, 0xF1, 0x90]) + b"DOIP_VIN_SOCKET_123"
+            peer.send(peer.ack(), peer.diagnostic(response))
+            received = peer.handler.send_diagnostic_message(bytes([0x22, 0xF1, 0x90]))
+            payload_type, payload = peer.receive()
+            passed = received == response and payload_type == DoIPHandler.DOIP_DIAG_MESSAGE \
+                and payload == struct.pack('>HH', TESTER_ADDRESS, ECU_ADDRESS) + bytes([0x22, 0xF1, 0x90])
+            details = f"Response {received.hex().upper() if received else None}"
+        finally:
+            peer.close()
+        self.logger.log_test("Response After ACK", passed, details)
+
+    def test_final_response_after_pending(self):
+        """Test reading the final response after 0x78 response pending"""
+        peer = DoIPPeer()
+        try:
+            peer.send(peer.ack(), peer.diagnostic(bytes([0x7F, 0x31, 0x78])),
+                      peer.diagnostic(bytes([0x7F, 0x31, 0x78])), peer.diagnostic(bytes([0x71, 0x01, 0xFF, 0x00, 0x00])))
+            first = peer.handler.send_diagnostic_message(bytes([0x31, 0x01, 0xFF, 0x00]))
+            final = final_response(first, 0x31, peer.handler.receive_diagnostic_message)
+            passed = first == bytes([0x7F, 0x31, 0x78]) and final == bytes([0x71, 0x01, 0xFF, 0x00, 0x00])
+            details = f"Final response {final.hex().upper() if final else None}"
+        finally:
+            peer.close()
+        self.logger.log_test("Final Response After Pending", passed, details)
+
+    def test_unsolicited_messages(self):
+        """Test receiving periodic frames without a request, and a quiet timeout when none follow"""
+        peer = DoIPPeer()
+        try:
+            frames = [bytes([0x6A, 0x01, 0x0C, 0x8A]), bytes([0x6A, 0x02, 0x1F, 0x40])]
+            peer.send(*(peer.diagnostic(frame) for frame in frames))
+            received = [peer.handler.receive_diagnostic_message(timeout=0.2) for _ in frames]
+            silent = peer.handler.receive_diagnostic_message(timeout=0.05)
+            passed = received == frames and silent is None
+            details = f"{sum(frame is not None for frame in received)} periodic frames, then {silent}"
+        finally:
+            peer.close()
+        self.logger.log_test("Unsolicited Messages", passed, details)
+
+    def test_negative_acknowledgement(self):
+        """Test that a NACK (0x8003) answers the request with None"""
+        peer = DoIPPeer()
+        try:
+            peer.send(peer.nack(0x03))
+            received = peer.handler.send_diagnostic_message(bytes([0x22, 0xF1, 0x90]))
+            passed = received is None
+            details = f"Response {received}"
+        finally:
+            peer.close()
+        self.logger.log_test("Negative Acknowledgement", passed, details)
+
+    def test_alive_check(self):
+        """Test answering an alive check request while waiting for a response"""
+        peer = DoIPPeer()
+        try:
+            peer.send(peer.ack(), peer.message(DoIPHandler.DOIP_ALIVE_CHECK_REQUEST, b""),
+                      peer.diagnostic(bytes([0x7E, 0x00])))
+            received = peer.handler.send_diagnostic_message(bytes([0x3E, 0x00]))
+            peer.receive()  # The request itself
+            payload_type, payload = peer.receive()
+            passed = received == bytes([0x7E, 0x00]) and payload_type == DoIPHandler.DOIP_ALIVE_CHECK_RESPONSE \
+                and payload == struct.pack('>H', TESTER_ADDRESS)
+            details = f"Alive check response 0x{payload_type:04X} from 0x{int.from_bytes(payload, 'big'):04X}"
+        finally:
+            peer.close()
+        self.logger.log_test("Alive Check", passed, details)
+
+    def test_fragmented_message(self):
+        """Test a response arriving a few bytes at a time"""
+        peer = DoIPPeer()
+        response = bytes([0x62, 0xF1, 0x87]) + bytes(range(200))
+        data = peer.ack() + peer.diagnostic(response)
+
+        def dribble():
+            for offset in range(0, len(data), 7):
+                peer.socket.sendall(data[offset:offset + 7])
+                time.sleep(0.0005)
+
+        writer = threading.Thread(target=dribble)
+        try:
+            writer.start()
+            received = peer.handler.send_diagnostic_message(bytes([0x22, 0xF1, 0x87]))
+            writer.join()
+            passed = received == response
+            details = f"{len(received) if received else 0} of {len(response)} bytes in 7-byte segments"
+        finally:
+            peer.close()
+        self.logger.log_test("Fragmented Message", passed, details)
+
+    def run_all_tests(self):
+        """Run all DoIP handler tests"""
+        print("\n" + "="*60)
+        print("DOIP HANDLER SOCKET TESTS")
+        print("="*60)
+
+        self.test_response_after_ack()
+        self.test_final_response_after_pending()
+        self.test_unsolicited_messages()
+        self.test_negative_acknowledgement()
+        self.test_alive_check()
+        self.test_fragmented_message()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = DoIPHandlerTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
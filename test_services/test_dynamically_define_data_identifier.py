@@ -0,0 +1,147 @@
+# test_services/test_dynamically_define_data_identifier.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.did_catalog import DIDCatalog
+from Utils.dynamic_did import DynamicDIDReader, DynamicDIDError
+from Utils.test_scheduler import ECUStateController
+
+# 30 measurement DIDs of 8 bytes with five signals each
+SOURCE_DIDS = list(range(0x0200, 0x0200 + 30))
+DEFINITION = {"length": 8, "fields": [
+    {"name": "speed", "bit_offset": 0, "bit_length": 16, "scale": 0.01},
+    {"name": "temperature", "bit_offset": 16, "bit_length": 8, "offset": -40},
+    {"name": "state", "bit_offset": 24, "bit_length": 3, "enum": {"0": "OFF", "1": "ON", "2": "FAULT"}},
+    {"name": "torque", "bit_offset": 27, "bit_length": 13, "type": "signed", "scale": 0.5},
+    {"name": "counter", "bit_offset": 56, "bit_length": 8},
+]}
+# 50 signals spread over all 30 DIDs
+SIGNALS = [(did, "speed") for did in SOURCE_DIDS] + [(did, "torque") for did in SOURCE_DIDS[:10]] + \
+          [(did, "counter") for did in SOURCE_DIDS[10:20]]
+
+class DynamicallyDefineDataIdentifierTest:
+    """Test suite for signal polling through Dynamically Define Data Identifier (0x2C) in the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self.catalog = DIDCatalog({f"{did:04X}": DEFINITION for did in SOURCE_DIDS})
+
+    def _simulator(self) -> ECUSimulator:
+        records = {did: bytes((did * 7 + i * 29) & 0xFF for i in range(8)) for did in SOURCE_DIDS}
+        return ECUSimulator(dids=records)
+
+    def _expected(self, simulator: ECUSimulator) -> dict:
+        """Signals decoded from single reads of the source DIDs"""
+        return {(did, name): self.catalog.decode(did, simulator.dids[did])[name] for did, name in SIGNALS}
+
+    def test_packed_read(self):
+        """Test packing 50 signals of 30 DIDs into few dynamic DIDs and decoding them"""
+        simulator = self._simulator()
+        try:
+            reader = DynamicDIDReader(simulator.send_request, self.catalog, SIGNALS)
+            values = reader.read()
+            requests = reader.requests
+            reader.read()
+            per_cycle = reader.requests - requests
+            passed = values == self._expected(simulator) and per_cycle == len(reader.plan) < reader.source_dids
+            details = f"{len(SIGNALS)} signals of {reader.source_dids} DIDs in {len(reader.plan)} dynamic DIDs, " \
+                      f"{per_cycle} requests per cycle"
+        except DynamicDIDError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Packed Signal Read", passed, details)
+
+    def test_redefine_after_session_change(self):
+        """Test that definitions are renewed after session changes and resets of the state controller"""
+        simulator = self._simulator()
+        controller = ECUStateController(simulator.send_request)
+        try:
+            reader = DynamicDIDReader(simulator.send_request, self.catalog, SIGNALS, controller=controller)
+            reader.read()
+            controller.enter_session(0x03)
+            in_session = reader.read()
+            simulator.send_request(bytes([0x11, 0x01]))
+            controller.notify_reset()
+            after_reset = reader.read()
+            passed = reader.definitions == 3 and in_session == after_reset == self._expected(simulator)
+            details = f"{reader.definitions} definitions for 3 reads across a session change and a reset"
+        except DynamicDIDError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Redefine After Session Change", passed, details)
+
+    def test_redefine_after_unseen_reset(self):
+        """Test recovering when the ECU dropped the definitions without the reader being told"""
+        simulator = self._simulator()
+        try:
+            reader = DynamicDIDReader(simulator.send_request, self.catalog, SIGNALS)
+            reader.read()
+            simulator.power_cycle()
+            values = reader.read()
+            passed = reader.definitions == 2 and values == self._expected(simulator)
+            details = f"Redefined after 0x31, {reader.definitions} definitions"
+        except DynamicDIDError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Redefine After Unseen Reset", passed, details)
+
+    def test_ecu_length_limit(self):
+        """Test that a plan exceeding the ECU's dynamic DID length is refused and a fitting one is read"""
+        simulator = self._simulator()
+        simulator.max_dynamic_did_length = 16
+        try:
+            DynamicDIDReader(simulator.send_request, self.catalog, SIGNALS).read()
+            refused = False
+        except DynamicDIDError:
+            refused = True
+        try:
+            reader = DynamicDIDReader(simulator.send_request, self.catalog, SIGNALS, max_length=16)
+            passed = refused and reader.read() == self._expected(simulator)
+            details = f"Refused at 64 bytes: {refused}, {len(reader.plan)} dynamic DIDs at 16 bytes"
+        except DynamicDIDError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("ECU Length Limit", passed, details)
+
+    def test_response_pending(self):
+        """Test definitions and reads answered with 0x78 response pending before the final response"""
+        simulator = self._simulator()
+        held = []
+
+        def pending_every_second(request: bytes) -> bytes:
+            response = simulator.send_request(request)
+            if len(held) % 2:
+                held.append(response)
+                return bytes([0x7F, request[0], 0x78])
+            held.append(None)
+            return response
+
+        try:
+            reader = DynamicDIDReader(pending_every_second, self.catalog, SIGNALS,
+                                      receive_response=lambda: held[-1])
+            passed = reader.read() == self._expected(simulator) and reader.requests == len(held)
+            details = f"{len(held) // 2} response pending in {reader.requests} requests"
+        except DynamicDIDError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Response Pending", passed, details)
+
+    def run_all_tests(self):
+        """Run all dynamically define data identifier tests"""
+        print("\n" + "="*60)
+        print("DYNAMICALLY DEFINE DATA IDENTIFIER TESTS (0x2C)")
+        print("="*60)
+
+        self.test_packed_read()
+        self.test_redefine_after_session_change()
+        self.test_redefine_after_unseen_reset()
+        self.test_ecu_length_limit()
+        self.test_response_pending()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = DynamicallyDefineDataIdentifierTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class ECUResetTest:
     """Test suite for UDS Service 0x11 - ECU Reset"""
@@ -27,6 +28,7 @@ class ECUResetTest:
         else:
             return bytes([0x7F, 0x11, 0x13])  # Incorrect message length
     
+    @precondition(causes_reset=True)
     def test_hard_reset(self):
         """Test hard reset (0x01)"""
         request = bytes([0x11, 0x01])
@@ -41,6 +43,7 @@ class ECUResetTest:
             "ECU hard reset acknowledged"
         )
     
+    @precondition(causes_reset=True)
     def test_key_off_on_reset(self):
         """Test key off on reset (0x02)"""
         request = bytes([0x11, 0x02])
@@ -55,6 +58,7 @@ class ECUResetTest:
             "ECU key off on reset acknowledged"
         )
     
+    @precondition(causes_reset=True)
     def test_soft_reset(self):
         """Test soft reset (0x03)"""
         request = bytes([0x11, 0x03])
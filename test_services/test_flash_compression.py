@@ -0,0 +1,227 @@
+# test_services/test_flash_compression.py
+import sys
+import os
+import zlib
+import random
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.test_scheduler import ECUStateController
+from Utils.flash_engine import FlashEngine, FlashError, DEMO_ENCRYPTION_FORMAT, demo_cipher
+from Utils.flash_compression import (ZlibCompression, LzmaCompression, CompressionStage, rechunk,
+                                     get_compression, DEFAULT_CHUNK_SIZE)
+
+IMAGE_ADDRESS = 0x08000000
+# Repetitive like real firmware (code and padding), so it compresses well
+IMAGE = b"".join(bytes([i & 0xFF]) * 64 + bytes(range(32)) for i in range(6000))
+RANDOM_IMAGE = random.Random(0x39).randbytes(5 * DEFAULT_CHUNK_SIZE + 123)
+
+class FailingCompression:
+    """compressionMethod 3 whose compressor fails after the first chunk"""
+
+    method = 0x3
+    name = "failing"
+
+    def compressor(self):
+        calls = []
+
+        class Compressor:
+            def compress(self, data):
+                calls.append(len(data))
+                if len(calls) > 1:
+                    raise zlib.error("compressor ran out of memory")
+                return zlib.compress(bytes(data))
+
+            def flush(self):
+                return b""
+
+        return Compressor()
+
+class FlashCompressionTest:
+    """Test suite for the streaming compression stage of downloads to the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+
+    @staticmethod
+    def _simulator() -> ECUSimulator:
+        """Simulator in the programming session with security access"""
+        simulator = ECUSimulator(data_decoders={DEMO_ENCRYPTION_FORMAT: demo_cipher})
+        ECUStateController(simulator.send_request).transition_to((0x02, 1))
+        return simulator
+
+    def _flash(self, simulator: ECUSimulator, image: bytes, data_format: int = 0x00, **options):
+        formats = []
+
+        def send_request(request: bytes) -> bytes:
+            if request[0] == 0x34:
+                formats.append(request[1])
+            return simulator.send_request(request)
+
+        engine = FlashEngine(send_request, receive_response=simulator.receive_response, **options)
+        return engine.flash_buffer(image, IMAGE_ADDRESS, data_format), formats
+
+    def test_zlib_download(self):
+        """Test a zlib-compressed download: fewer bytes on the wire, the image in memory"""
+        simulator = self._simulator()
+        try:
+            report, formats = self._flash(simulator, IMAGE, compression=ZlibCompression())
+            passed = simulator.read_memory(IMAGE_ADDRESS, len(IMAGE)) == IMAGE and formats == [0x10] \
+                and report.transferred < len(IMAGE) // 4 and report.compression == "zlib" \
+                and report.compression_ratio > 4
+            details = f"{report.transferred} of {len(IMAGE)} bytes sent (ratio {report.compression_ratio:.1f}), " \
+                      f"dataFormatIdentifier 0x{formats[0]:02X}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Zlib Download", passed, details)
+
+    def test_lzma_pipelined_encrypted(self):
+        """Test LZMA with pipelined blocks and encryption applied after compression"""
+        simulator = self._simulator()
+        try:
+            report, formats = self._flash(simulator, IMAGE, compression=LzmaCompression(preset=1), pipelined=True,
+                                          block_transform=demo_cipher, data_format=DEMO_ENCRYPTION_FORMAT)
+            passed = simulator.read_memory(IMAGE_ADDRESS, len(IMAGE)) == IMAGE \
+                and formats == [0x20 | DEMO_ENCRYPTION_FORMAT] and report.pipelined and report.blocks >= 1
+            details = f"{report.blocks} blocks, {report.transferred} bytes, dataFormatIdentifier 0x{formats[0]:02X}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("LZMA Pipelined Encrypted", passed, details)
+
+    def test_unsupported_method_rejected(self):
+        """Test that the simulator rejects a compression method it cannot decode"""
+        simulator = self._simulator()
+        try:
+            self._flash(simulator, IMAGE, compression=FailingCompression())
+            passed, details = False, "Download accepted"
+        except FlashError as e:
+            passed = e.nrc == 0x31 and simulator.transfer is None
+            details = str(e)
+        self.logger.log_test("Unsupported Method Rejected", passed, details)
+
+    def test_rechunk_block_sizes(self):
+        """Test that compressed chunks of any size are re-cut into exact TransferData payloads"""
+        rng = random.Random(7)
+        chunks = [rng.randbytes(rng.randrange(0, 9000)) for _ in range(40)]
+        data = b"".join(chunks)
+        results = []
+        for block_size in (1, 511, 4094, len(data), len(data) + 1):
+            payloads = list(rechunk(iter(chunks), block_size))
+            results.append(b"".join(payloads) == data and all(len(p) == block_size for p in payloads[:-1])
+                           and 0 < len(payloads[-1]) <= block_size)
+        passed = all(results) and list(rechunk(iter([b"", b""]), 16)) == []
+        details = f"{sum(results)} of {len(results)} block sizes exact over {len(data)} bytes in {len(chunks)} chunks"
+        self.logger.log_test("Rechunk Block Sizes", passed, details)
+
+    def test_bounded_queue(self):
+        """Test that the compressor waits for the transfer once its queue is full"""
+        view = memoryview(RANDOM_IMAGE)
+        stage = CompressionStage(view, ZlibCompression(level=1), chunk_size=4096, queue_depth=2).start()
+        try:
+            chunks = iter(stage)
+            first = next(chunks)
+            stage._thread.join(0.2)
+            # Incompressible input: about one queued chunk per input chunk
+            ahead = stage.consumed
+            output = first + b"".join(chunks)
+            passed = ahead < len(RANDOM_IMAGE) // 4 and zlib.decompress(output) == RANDOM_IMAGE \
+                and stage.produced == len(output)
+            details = f"Compressor {ahead} of {len(RANDOM_IMAGE)} bytes ahead with queue depth 2"
+        finally:
+            stage.close()
+            view.release()
+        self.logger.log_test("Bounded Queue", passed, details)
+
+    def test_close_releases_input(self):
+        """Test that closing a stage mid-stream stops the worker and leaves the input unexported"""
+        buffer = bytearray(RANDOM_IMAGE)
+        view = memoryview(buffer)
+        stage = CompressionStage(view, ZlibCompression(), chunk_size=4096, queue_depth=1).start()
+        next(iter(stage))
+        stage.close()
+        view.release()
+        try:
+            buffer.extend(b"resized")  # Fails with BufferError while a slice is still exported
+            released = True
+        except BufferError:
+            released = False
+        passed = not stage._thread.is_alive() and released and stage.consumed < len(RANDOM_IMAGE)
+        details = f"Worker stopped after {stage.consumed} bytes, input released: {released}"
+        self.logger.log_test("Close Releases Input", passed, details)
+
+    def test_compressor_error_raised(self):
+        """Test that a compressor failure reaches the transfer loop as the original error"""
+        view = memoryview(RANDOM_IMAGE)
+        stage = CompressionStage(view, FailingCompression(), chunk_size=4096).start()
+        try:
+            chunks = sum(1 for _ in stage)
+            passed, details = False, f"{chunks} chunks without an error"
+        except zlib.error as e:
+            passed, details = str(e) == "compressor ran out of memory", f"Raised: {e}"
+        finally:
+            stage.close()
+            view.release()
+        self.logger.log_test("Compressor Error Raised", passed, details)
+
+    def test_chunk_observer(self):
+        """Test that on_chunk sees the whole uncompressed input in order on the worker thread"""
+        crc = [0]
+        threads = set()
+
+        def on_chunk(chunk: memoryview):
+            crc[0] = zlib.crc32(chunk, crc[0])
+            threads.add(threading.current_thread().name)
+
+        view = memoryview(IMAGE)
+        stage = CompressionStage(view, ZlibCompression(), chunk_size=10000, on_chunk=on_chunk).start()
+        try:
+            output = b"".join(stage)
+        finally:
+            stage.close()
+            view.release()
+        passed = crc[0] == zlib.crc32(IMAGE) and threads == {"flash-compressor"} \
+            and zlib.decompress(output) == IMAGE and stage.consumed == len(IMAGE)
+        details = f"CRC32 {crc[0]:08X} on {', '.join(sorted(threads))}"
+        self.logger.log_test("Chunk Observer", passed, details)
+
+    def test_get_compression(self):
+        """Test selecting methods by name with a level, and rejecting unknown names"""
+        zlib_method = get_compression("zlib", 9)
+        lzma_method = get_compression("lzma")
+        try:
+            get_compression("brotli")
+            rejected = False
+        except ValueError:
+            rejected = True
+        passed = zlib_method.level == 9 and lzma_method.preset == 6 and rejected \
+            and (zlib_method.method, lzma_method.method) == (0x1, 0x2)
+        details = f"zlib level {zlib_method.level}, lzma preset {lzma_method.preset}, unknown rejected: {rejected}"
+        self.logger.log_test("Get Compression", passed, details)
+
+    def run_all_tests(self):
+        """Run all compression stage tests"""
+        print("\n" + "="*60)
+        print("FLASH COMPRESSION TESTS")
+        print("="*60)
+
+        self.test_zlib_download()
+        self.test_lzma_pipelined_encrypted()
+        self.test_unsupported_method_rejected()
+        self.test_rechunk_block_sizes()
+        self.test_bounded_queue()
+        self.test_close_releases_input()
+        self.test_compressor_error_raised()
+        self.test_chunk_observer()
+        self.test_get_compression()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = FlashCompressionTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
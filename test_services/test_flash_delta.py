@@ -0,0 +1,198 @@
+# test_services/test_flash_delta.py
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.test_scheduler import ECUStateController
+from Utils.flash_engine import FlashEngine, FlashError, ROUTINE_ERASE_MEMORY, ROUTINE_REGION_HASHES
+from Utils.flash_delta import DeltaFlasher, merge_sectors
+
+IMAGE_ADDRESS = 0x08000000
+SECTOR = 4096
+SECTORS = 32
+OLD_IMAGE = random.Random(0x40).randbytes(SECTORS * SECTOR)
+
+def patched(image: bytes, sectors, tail: bytes = b"") -> bytes:
+    """Copy of image with one byte changed in each of the given sectors, plus tail appended"""
+    data = bytearray(image)
+    for sector in sectors:
+        data[sector * SECTOR + 100] ^= 0xFF
+    return bytes(data) + tail
+
+class DeltaFlashTest:
+    """Test suite for delta flashing of changed sectors to the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_flash_delta_")
+        self.directory = self._directory.name
+
+    @staticmethod
+    def _simulator(preload: bytes = OLD_IMAGE) -> ECUSimulator:
+        """Simulator holding preload, in the programming session with security access"""
+        simulator = ECUSimulator()
+        simulator.write_memory(IMAGE_ADDRESS, preload)
+        ECUStateController(simulator.send_request).transition_to((0x02, 1))
+        return simulator
+
+    @staticmethod
+    def _flasher(simulator: ECUSimulator, requests: list, **options) -> DeltaFlasher:
+        """Delta flasher whose requests are recorded as (SID, routine or None)"""
+        def send_request(request: bytes) -> bytes:
+            routine = int.from_bytes(request[2:4], 'big') if request[0] == 0x31 else None
+            requests.append((request[0], routine))
+            return simulator.send_request(request)
+
+        engine = FlashEngine(send_request, receive_response=simulator.receive_response)
+        return DeltaFlasher(engine, sector_size=SECTOR, **options)
+
+    @staticmethod
+    def _flashed(simulator: ECUSimulator, image: bytes) -> bool:
+        return simulator.read_memory(IMAGE_ADDRESS, len(image)) == image
+
+    def test_delta_against_previous_image(self):
+        """Test that only the changed sectors are erased and downloaded"""
+        simulator = self._simulator()
+        image = patched(OLD_IMAGE, [3, 4, 10])
+        requests = []
+        try:
+            report = self._flasher(simulator, requests).flash_buffer(image, IMAGE_ADDRESS, OLD_IMAGE)
+            erases = requests.count((0x31, ROUTINE_ERASE_MEMORY))
+            passed = self._flashed(simulator, image) and report.plan.regions == [(3 * SECTOR, 2 * SECTOR),
+                                                                                  (10 * SECTOR, SECTOR)] \
+                and report.downloaded == 3 * SECTOR and erases == requests.count((0x34, None)) == 2 \
+                and report.plan.source == 'image'
+            details = f"{len(report.regions)} regions, {report.downloaded} of {len(image)} bytes downloaded"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Delta Against Previous Image", passed, details)
+
+    def test_delta_against_ecu_digests(self):
+        """Test planning from sector digests read back from the ECU in batches"""
+        simulator = self._simulator()
+        image = patched(OLD_IMAGE, [0, 31])
+        requests = []
+        try:
+            report = self._flasher(simulator, requests, hash_batch=5).flash_buffer(image, IMAGE_ADDRESS)
+            hash_calls = requests.count((0x31, ROUTINE_REGION_HASHES))
+            passed = self._flashed(simulator, image) and report.plan.source == 'ecu' \
+                and report.plan.regions == [(0, SECTOR), (31 * SECTOR, SECTOR)] and hash_calls == -(-SECTORS // 5)
+            details = f"{hash_calls} digest reads, regions at sectors " \
+                      f"{[offset // SECTOR for offset, _ in report.plan.regions]}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Delta Against ECU Digests", passed, details)
+
+    def test_merge_gap(self):
+        """Test joining regions separated by few unchanged sectors"""
+        offsets = [s * SECTOR for s in (1, 2, 4, 8)]
+        separate = merge_sectors(iter(offsets), SECTOR, SECTORS * SECTOR)
+        joined = merge_sectors(iter(offsets), SECTOR, SECTORS * SECTOR, merge_gap=1)
+        simulator = self._simulator()
+        image = patched(OLD_IMAGE, [1, 2, 4, 8])
+        requests = []
+        try:
+            report = self._flasher(simulator, requests, merge_gap=3).flash_buffer(image, IMAGE_ADDRESS, OLD_IMAGE)
+            passed = separate == [(SECTOR, 2 * SECTOR), (4 * SECTOR, SECTOR), (8 * SECTOR, SECTOR)] \
+                and joined == [(SECTOR, 4 * SECTOR), (8 * SECTOR, SECTOR)] \
+                and report.plan.regions == [(SECTOR, 8 * SECTOR)] and self._flashed(simulator, image) \
+                and requests.count((0x34, None)) == 1
+            details = f"Gap 0: {len(separate)} regions, gap 1: {len(joined)}, gap 3: {len(report.plan.regions)}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Merge Gap", passed, details)
+
+    def test_grown_image(self):
+        """Test an image longer than the previous one ending in a partial sector"""
+        simulator = self._simulator()
+        tail = bytes(range(256)) * 6  # 1.5 sectors beyond the previous image
+        image = patched(OLD_IMAGE, [], tail)
+        requests = []
+        try:
+            report = self._flasher(simulator, requests).flash_buffer(image, IMAGE_ADDRESS, OLD_IMAGE)
+            passed = self._flashed(simulator, image) \
+                and report.plan.regions == [(SECTORS * SECTOR, len(tail))] and report.downloaded == len(tail)
+            details = f"Regions {report.plan.regions}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Grown Image", passed, details)
+
+    def test_unchanged_image(self):
+        """Test that an unchanged image sends no download at all"""
+        simulator = self._simulator()
+        requests = []
+        try:
+            report = self._flasher(simulator, requests).flash_buffer(OLD_IMAGE, IMAGE_ADDRESS)
+            passed = report.regions == [] and report.skipped == len(OLD_IMAGE) \
+                and {sid for sid, _ in requests} == {0x31} and self._flashed(simulator, OLD_IMAGE)
+            details = f"{len(requests)} requests (digest reads only), {report.skipped} bytes skipped"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Unchanged Image", passed, details)
+
+    def test_short_digest_record(self):
+        """Test that a region hash record with missing digests fails the plan"""
+        simulator = self._simulator()
+
+        def truncated(request: bytes) -> bytes:
+            response = simulator.send_request(request)
+            hashes = request[0] == 0x31 and int.from_bytes(request[2:4], 'big') == ROUTINE_REGION_HASHES
+            return response[:-32] if hashes else response
+
+        engine = FlashEngine(truncated, receive_response=simulator.receive_response)
+        flasher = DeltaFlasher(engine, sector_size=SECTOR)
+        try:
+            flasher.flash_buffer(patched(OLD_IMAGE, [5]), IMAGE_ADDRESS)
+            passed, details = False, "Flashed with a short digest record"
+        except FlashError as e:
+            passed = "Expected" in str(e) and self._flashed(simulator, OLD_IMAGE)
+            details = str(e)
+        self.logger.log_test("Short Digest Record", passed, details)
+
+    def test_delta_from_files(self):
+        """Test delta flashing memory-mapped files, including an empty previous image"""
+        image = patched(OLD_IMAGE, [7])
+        paths = {}
+        for name, content in (("new.bin", image), ("old.bin", OLD_IMAGE), ("empty.bin", b"")):
+            paths[name] = os.path.join(self.directory, name)
+            with open(paths[name], 'wb') as f:
+                f.write(content)
+        try:
+            simulator = self._simulator()
+            delta = self._flasher(simulator, []).flash_file(paths["new.bin"], IMAGE_ADDRESS, paths["old.bin"])
+            full_simulator = self._simulator(b"")
+            full = self._flasher(full_simulator, []).flash_file(paths["new.bin"], IMAGE_ADDRESS, paths["empty.bin"])
+            passed = self._flashed(simulator, image) and delta.downloaded == SECTOR \
+                and self._flashed(full_simulator, image) and full.downloaded == len(image)
+            details = f"Delta {delta.downloaded} bytes, against an empty image {full.downloaded} bytes"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Delta From Files", passed, details)
+
+    def run_all_tests(self):
+        """Run all delta flashing tests"""
+        print("\n" + "="*60)
+        print("DELTA FLASHING TESTS")
+        print("="*60)
+
+        self.test_delta_against_previous_image()
+        self.test_delta_against_ecu_digests()
+        self.test_merge_gap()
+        self.test_grown_image()
+        self.test_unchanged_image()
+        self.test_short_digest_record()
+        self.test_delta_from_files()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = DeltaFlashTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
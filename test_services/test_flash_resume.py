@@ -0,0 +1,243 @@
+# test_services/test_flash_resume.py
+import sys
+import os
+import json
+import random
+import tempfile
+import traceback
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.test_scheduler import ECUStateController
+from Utils.flash_engine import FlashEngine, FlashError, DEMO_ENCRYPTION_FORMAT, demo_cipher
+from Utils.flash_compression import ZlibCompression
+from Utils.flash_resume import ResumableFlasher
+
+IMAGE_ADDRESS = 0x08000000
+# 64 blocks of 4094 bytes plus a partial block
+IMAGE = bytes((i * 7 + (i >> 12)) & 0xFF for i in range(64 * 4094 + 100))
+# Random bytes stay about their size compressed, so the compressed download has several blocks
+RANDOM_IMAGE = random.Random(0x34).randbytes(16 * 4094)
+
+class FlashResumeTest:
+    """Test suite for resumable downloads (0x34/0x36/0x37) with link drops in the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_flash_resume_")
+        self.directory = self._directory.name
+
+    def _simulator(self, link_drop_every: int = 0):
+        """Simulator in the programming session with security access, and its state controller"""
+        simulator = ECUSimulator(data_decoders={DEMO_ENCRYPTION_FORMAT: demo_cipher})
+        simulator.link_drop_every = link_drop_every
+        controller = ECUStateController(simulator.send_request)
+        controller.transition_to((0x02, 1))
+        return simulator, controller
+
+    def _flasher(self, simulator, controller, name: str, **options) -> ResumableFlasher:
+        engine = FlashEngine(options.pop('send_request', simulator.send_request),
+                             receive_response=simulator.receive_response,
+                             pipelined=options.pop('pipelined', False),
+                             block_transform=options.pop('block_transform', None),
+                             compression=options.pop('compression', None))
+        return ResumableFlasher(engine, os.path.join(self.directory, name), controller,
+                                reconnect=simulator.reconnect, **options)
+
+    def _flashed(self, simulator) -> bool:
+        return simulator.read_memory(IMAGE_ADDRESS, len(IMAGE)) == IMAGE
+
+    def test_resume_after_link_drop(self):
+        """Test resuming after link drops without resending acknowledged blocks"""
+        simulator, controller = self._simulator(link_drop_every=20)
+        try:
+            report = self._flasher(simulator, controller, "drop.json").flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed = self._flashed(simulator) and report.resumes == 3 and report.blocks == 65
+            details = f"{report.resumes} resumes, {report.blocks} blocks acknowledged"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Resume After Link Drop", passed, details)
+
+    def test_resume_pipelined_encrypted(self):
+        """Test resuming a pipelined, encrypted download (fresh cipher per RequestDownload)"""
+        simulator, controller = self._simulator(link_drop_every=25)
+        flasher = self._flasher(simulator, controller, "encrypted.json", pipelined=True, block_transform=demo_cipher)
+        try:
+            report = flasher.flash_buffer(IMAGE, IMAGE_ADDRESS, DEMO_ENCRYPTION_FORMAT)
+            passed = self._flashed(simulator) and report.resumes == 2
+            details = f"{report.resumes} resumes, image verified: {self._flashed(simulator)}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Resume Pipelined Encrypted", passed, details)
+
+    def test_resume_with_ecu_reset(self):
+        """Test resuming with an ECU reset (0x11 0x01) before re-entering the programming session"""
+        simulator, controller = self._simulator(link_drop_every=30)
+        flasher = self._flasher(simulator, controller, "reset.json", reset_type=0x01)
+        try:
+            report = flasher.flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed = self._flashed(simulator) and simulator.reset_count == report.resumes == 2
+            details = f"{report.resumes} resumes, {simulator.reset_count} ECU resets"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Resume With ECU Reset", passed, details)
+
+    def test_checkpoint_across_runs(self):
+        """Test continuing from a persisted checkpoint after the tester gave up"""
+        path = os.path.join(self.directory, "rerun.json")
+        simulator, controller = self._simulator(link_drop_every=40)
+        try:
+            self._flasher(simulator, controller, "rerun.json", max_resumes=0).flash_buffer(IMAGE, IMAGE_ADDRESS)
+            self.logger.log_test("Checkpoint Across Runs", False, "Link drop was not reported")
+            return
+        except FlashError:
+            pass
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+
+        # Next run: new link, same image
+        simulator.link_drop_every = 0
+        simulator.reconnect()
+        controller.notify_unknown()
+        controller.transition_to((0x02, 1))
+        try:
+            report = self._flasher(simulator, controller, "rerun.json").flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed = self._flashed(simulator) and saved['offset'] == 39 * 4094 and \
+                report.resumed_from == saved['offset'] and not os.path.exists(path)
+            details = f"Checkpoint at offset {saved['offset']} (BSC 0x{saved['bsc']:02X}), " \
+                      f"rerun sent {report.size} bytes"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Checkpoint Across Runs", passed, details)
+
+    def test_checkpoint_other_image(self):
+        """Test that a checkpoint of a different image is not resumed"""
+        path = os.path.join(self.directory, "other.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': "0" * 64, 'size': len(IMAGE), 'address': IMAGE_ADDRESS,
+                       'data_format': 0, 'offset': 4094 * 10, 'bsc': 10, 'resumes': 1}, f)
+        simulator, controller = self._simulator()
+        try:
+            report = self._flasher(simulator, controller, "other.json").flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed = self._flashed(simulator) and report.resumed_from == 0 and report.size == len(IMAGE)
+            details = f"Started at offset {report.resumed_from}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Checkpoint Of Other Image", passed, details)
+
+    def test_final_nrc_not_resumed(self):
+        """Test that a general programming failure (0x72) fails the download without a resume"""
+        simulator, controller = self._simulator()
+        downloads = []
+
+        def rejecting(request: bytes) -> bytes:
+            if request[0] == 0x34:
+                downloads.append(request)
+            if request[0] == 0x36 and request[1] == 10:
+                return bytes([0x7F, 0x36, 0x72])
+            return simulator.send_request(request)
+
+        flasher = self._flasher(simulator, controller, "final.json", send_request=rejecting)
+        try:
+            flasher.flash_buffer(IMAGE, IMAGE_ADDRESS)
+            passed, details = False, "Download did not fail"
+        except FlashError as e:
+            passed = e.nrc == 0x72 and len(downloads) == 1
+            details = f"{e} after {len(downloads)} RequestDownload"
+        self.logger.log_test("Final NRC Not Resumed", passed, details)
+
+    def test_compressed_restart(self):
+        """Test that an interrupted compressed download restarts at offset 0 without a checkpoint"""
+        simulator, controller = self._simulator(link_drop_every=6)
+        path = os.path.join(self.directory, "compressed.json")
+        saved = []
+
+        def drop_once(request: bytes) -> bytes:
+            # Every restart sends the same blocks again, so a periodic drop would hit each one
+            response = simulator.send_request(request)
+            if not simulator.link_up:
+                simulator.link_drop_every = 0
+            return response
+
+        flasher = self._flasher(simulator, controller, "compressed.json", send_request=drop_once,
+                                compression=ZlibCompression(), checkpoint_every=1)
+        save = flasher.checkpoint.save
+        flasher.checkpoint.save = lambda: saved.append(save())
+        try:
+            report = flasher.flash_buffer(RANDOM_IMAGE, IMAGE_ADDRESS)
+            flashed = simulator.read_memory(IMAGE_ADDRESS, len(RANDOM_IMAGE)) == RANDOM_IMAGE
+            passed = flashed and report.restarted and report.resumes >= 1 \
+                and not saved and not os.path.exists(path)
+            details = f"{report.resumes} restarts from offset 0, {len(saved)} checkpoint writes"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Compressed Download Restart", passed, details)
+
+    def test_flash_file_failure(self):
+        """Test that failed downloads of mapped image files raise their own error with its traceback"""
+        path = os.path.join(self.directory, "image.bin")
+        with open(path, 'wb') as f:
+            f.write(IMAGE)
+        simulator, _ = self._simulator()
+        transfers = []
+
+        def rejecting(request: bytes) -> bytes:
+            # General programming failure for the third TransferData block
+            if request[0] == 0x36:
+                transfers.append(request[1])
+                if len(transfers) == 3:
+                    return bytes([0x7F, 0x36, 0x72])
+            return simulator.send_request(request)
+
+        errors = []
+        try:
+            FlashEngine(rejecting).flash_file(path, IMAGE_ADDRESS)
+        except FlashError as e:
+            errors.append(e)
+        simulator, controller = self._simulator(link_drop_every=20)
+        try:
+            self._flasher(simulator, controller, "file.json", max_resumes=1).flash_file(path, IMAGE_ADDRESS)
+        except FlashError as e:
+            errors.append(e)
+
+        def failing(request: bytes) -> bytes:
+            if request[0] == 0x36 and request[1] == 3:
+                raise RuntimeError("Transport failed")
+            return simulator.send_request(request)
+
+        simulator, _ = self._simulator()
+        try:
+            FlashEngine(failing, pipelined=True).flash_file(path, IMAGE_ADDRESS)
+            raised_from = None
+        except RuntimeError as e:
+            # The traceback still reaches the frame that failed
+            raised_from = traceback.extract_tb(e.__traceback__)[-1].name
+        passed = len(errors) == 2 and errors[0].nrc == 0x72 and raised_from == "failing"
+        details = "; ".join(str(e) for e in errors) + f"; transport error raised from {raised_from}"
+        self.logger.log_test("Flash File Failure", passed, details)
+
+    def run_all_tests(self):
+        """Run all resumable flash tests"""
+        print("\n" + "="*60)
+        print("RESUMABLE FLASH TESTS (0x34/0x36/0x37)")
+        print("="*60)
+
+        self.test_resume_after_link_drop()
+        self.test_resume_pipelined_encrypted()
+        self.test_resume_with_ecu_reset()
+        self.test_checkpoint_across_runs()
+        self.test_checkpoint_other_image()
+        self.test_final_nrc_not_resumed()
+        self.test_compressed_restart()
+        self.test_flash_file_failure()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = FlashResumeTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
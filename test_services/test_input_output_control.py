@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class InputOutputControlTest:
     """Test suite for UDS Service 0x2F - Input Output Control By Identifier"""
@@ -32,6 +33,7 @@ class InputOutputControlTest:
         else:
             return bytes([0x7F, 0x2F, 0x33])  # Security access denied
     
+    @precondition(session=0x03, security_level=1)
     def test_return_control_to_ecu(self):
         """Test return control to ECU (control parameter 0x00)"""
         request = bytes([0x2F, 0xF0, 0x10, 0x00])
@@ -46,6 +48,7 @@ class InputOutputControlTest:
             "Control returned to ECU"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_reset_to_default(self):
         """Test reset to default (control parameter 0x01)"""
         request = bytes([0x2F, 0xF0, 0x10, 0x01])
@@ -60,6 +63,7 @@ class InputOutputControlTest:
             "Parameter reset to default"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_freeze_current_state(self):
         """Test freeze current state (control parameter 0x02)"""
         request = bytes([0x2F, 0xF0, 0x10, 0x02])
@@ -74,6 +78,7 @@ class InputOutputControlTest:
             "Current state frozen"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_short_term_adjustment(self):
         """Test short term adjustment (control parameter 0x03)"""
         control_data = bytes([0x12, 0x34])  # Example control data
@@ -89,6 +94,7 @@ class InputOutputControlTest:
             f"Short term adjustment applied with data: {control_data.hex().upper()}"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_invalid_control_parameter(self):
         """Test invalid control parameter (0xFF)"""
         request = bytes([0x2F, 0xF0, 0x10, 0xFF])
@@ -104,6 +110,7 @@ class InputOutputControlTest:
             f"Correctly rejected with NRC 0x31: {result['message']}"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_invalid_did(self):
         """Test invalid DID (0xFFFF)"""
         request = bytes([0x2F, 0xFF, 0xFF, 0x00])
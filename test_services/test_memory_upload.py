@@ -0,0 +1,165 @@
+# test_services/test_memory_upload.py
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.test_scheduler import ECUStateController
+from Utils.flash_engine import FlashError
+from Utils.memory_upload import UploadEngine
+from Utils.checksums import CRC32Checksum, checksum_of
+
+MEMORY_ADDRESS = 0x00F80000
+# 24 blocks of 4094 bytes plus a partial block
+MEMORY = random.Random(0x43).randbytes(24 * 4094 + 1000)
+
+class MemoryUploadTest:
+    """Test suite for streaming memory dumps with RequestUpload (0x35/0x36/0x37) from the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_memory_upload_")
+        self.directory = self._directory.name
+
+    @staticmethod
+    def _simulator(max_block_length: int = 4096, unlocked: bool = True) -> ECUSimulator:
+        """Simulator holding MEMORY, in the programming session with security access unless not unlocked"""
+        simulator = ECUSimulator(max_block_length=max_block_length)
+        simulator.write_memory(MEMORY_ADDRESS, MEMORY)
+        if unlocked:
+            ECUStateController(simulator.send_request).transition_to((0x02, 1))
+        return simulator
+
+    @staticmethod
+    def _engine(simulator: ECUSimulator, send_request=None, **options) -> UploadEngine:
+        return UploadEngine(send_request or simulator.send_request, receive_response=simulator.receive_response,
+                            **options)
+
+    def test_upload_into_buffer(self):
+        """Test dumping memory into a buffer with a CRC32 of the received data"""
+        simulator = self._simulator()
+        buffer = bytearray(len(MEMORY))
+        try:
+            report = self._engine(simulator, checksum=CRC32Checksum).upload_into(buffer, MEMORY_ADDRESS)
+            passed = bytes(buffer) == MEMORY and report.blocks == 25 and report.received == len(MEMORY) \
+                and report.block_size == 4094 and report.checksum == checksum_of(MEMORY) \
+                and simulator.transfer is None
+            details = f"{report.received} bytes in {report.blocks} blocks, CRC32 {report.checksum.hex().upper()}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Upload Into Buffer", passed, details)
+
+    def test_upload_to_file(self):
+        """Test writing every block at its offset into a pre-sized file"""
+        simulator = self._simulator()
+        path = os.path.join(self.directory, "dump.bin")
+        progress = []
+        try:
+            engine = self._engine(simulator, progress=lambda received, total: progress.append(received))
+            report = engine.upload_to_file(path, MEMORY_ADDRESS, len(MEMORY))
+            with open(path, 'rb') as f:
+                dumped = f.read()
+            passed = dumped == MEMORY and progress[-1] == len(MEMORY) and len(progress) == report.blocks \
+                and progress == sorted(progress)
+            details = f"{os.path.getsize(path)} bytes written, {len(progress)} progress updates"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Upload To File", passed, details)
+
+    def test_transfer_faults_recovered(self):
+        """Test recovering from lost responses, 0x73 and 0x78 without duplicating or skipping data"""
+        simulator = self._simulator()
+        simulator.lose_response_every = 5
+        simulator.wrong_sequence_every = 7
+        simulator.response_pending_every = 3
+        buffer = bytearray(len(MEMORY))
+        try:
+            report = self._engine(simulator).upload_into(buffer, MEMORY_ADDRESS)
+            passed = bytes(buffer) == MEMORY and report.blocks == 25 and report.retransmissions > 0 \
+                and report.response_pending > 0
+            details = f"{report.retransmissions} retransmissions, {report.response_pending} response pending"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Transfer Faults Recovered", passed, details)
+
+    def test_block_counter_wraps(self):
+        """Test more than 255 blocks: the counter wraps from 0xFF to 0x00"""
+        simulator = self._simulator(max_block_length=34)
+        size = 32 * 300
+        buffer = bytearray(size)
+        try:
+            report = self._engine(simulator).upload_into(buffer, MEMORY_ADDRESS)
+            passed = bytes(buffer) == MEMORY[:size] and report.blocks == 300 and report.block_size == 32
+            details = f"{report.blocks} blocks of {report.block_size} bytes"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Block Counter Wraps", passed, details)
+
+    def test_oversized_block_rejected(self):
+        """Test that a block longer than announced fails before it is written, removing the dump file"""
+        simulator = self._simulator()
+        path = os.path.join(self.directory, "oversized.bin")
+
+        def padded(request: bytes) -> bytes:
+            response = simulator.send_request(request)
+            return response + b"\x00" if request[:2] == bytes([0x36, 0x03]) else response
+
+        try:
+            self._engine(simulator, padded).upload_to_file(path, MEMORY_ADDRESS, len(MEMORY))
+            passed, details = False, "Oversized block accepted"
+        except FlashError as e:
+            passed = "4095 bytes received at offset 8188" in str(e) and not os.path.exists(path)
+            details = str(e)
+        self.logger.log_test("Oversized Block Rejected", passed, details)
+
+    def test_link_lost(self):
+        """Test giving up after the retransmission limit when the link stays down"""
+        simulator = self._simulator()
+        simulator.link_drop_every = 10
+        path = os.path.join(self.directory, "lost.bin")
+        try:
+            self._engine(simulator, max_retransmissions=2).upload_to_file(path, MEMORY_ADDRESS, len(MEMORY))
+            passed, details = False, "Upload completed without a link"
+        except FlashError as e:
+            passed = str(e).startswith("TransferData block 10") and not os.path.exists(path)
+            details = str(e)
+        self.logger.log_test("Link Lost", passed, details)
+
+    def test_upload_requires_unlock(self):
+        """Test that RequestUpload outside the programming session is rejected with its NRC"""
+        simulator = self._simulator(unlocked=False)
+        buffer = bytearray(16)
+        try:
+            self._engine(simulator).upload_into(buffer, MEMORY_ADDRESS)
+            passed, details = False, "Upload accepted in the default session"
+        except FlashError as e:
+            passed = e.nrc == 0x22 and buffer == bytearray(16)
+            details = str(e)
+        self.logger.log_test("Upload Requires Unlock", passed, details)
+
+    def run_all_tests(self):
+        """Run all memory upload tests"""
+        print("\n" + "="*60)
+        print("MEMORY UPLOAD TESTS")
+        print("="*60)
+
+        self.test_upload_into_buffer()
+        self.test_upload_to_file()
+        self.test_transfer_faults_recovered()
+        self.test_block_counter_wraps()
+        self.test_oversized_block_rejected()
+        self.test_link_lost()
+        self.test_upload_requires_unlock()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = MemoryUploadTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.did_batch import BatchDIDReader
+from Utils.did_catalog import DIDCatalog
+
+# Signal DID used by the batch decoding test: 16-bit speed, 3-bit gear enum, 13-bit signed torque
+SIGNAL_DID = 0x0100
+SIGNAL_DEFINITION = {"name": "Drivetrain", "fields": [
+    {"name": "speed", "bit_offset": 0, "bit_length": 16, "scale": 0.01, "unit": "km/h"},
+    {"name": "gear", "bit_offset": 16, "bit_length": 3, "enum": {"0": "P", "1": "R", "2": "N", "3": "D"}},
+    {"name": "torque", "bit_offset": 19, "bit_length": 13, "type": "signed", "scale": 0.5, "unit": "Nm"},
+]}
 
 class ReadDataByIdentifierTest:
     """Test suite for UDS Service 0x22 - Read Data By Identifier"""
@@ -13,9 +23,14 @@ class ReadDataByIdentifierTest:
         self.validator = UDSValidator()
         self.logger = TestLogger()
         self.connection = connection
+        self.catalog = DIDCatalog({f"{SIGNAL_DID:04X}": SIGNAL_DEFINITION})
     
     def send_request(self, request: bytes) -> bytes:
         """Send UDS request - mock implementation"""
+        if len(request) > 3 and len(request) % 2 == 1:  # Several DIDs: unsupported ones are left out
+            records = [self.send_request(request[:1] + request[i:i + 2]) for i in range(1, len(request), 2)]
+            records = [record[1:] for record in records if record[0] == 0x62]
+            return bytes([0x62]) + b"".join(records) if records else bytes([0x7F, 0x22, 0x31])
         if request == bytes([0x22, 0xF1, 0x90]):  # VIN
             return bytes([0x62, 0xF1, 0x90]) + b"1HGBH41JXMN109186"
         elif request == bytes([0x22, 0xF1, 0x86]):  # Active diagnostic session
@@ -38,7 +53,7 @@ class ReadDataByIdentifierTest:
         self.validator.log_test_result("Read VIN", request, response, validation_result=result)
         
         if result['positive'] and 'data' in result:
-            vin = result['data'].decode('ascii', errors='ignore')
+            vin = self.catalog.decode(0xF190, result['data'])['vin']
             self.logger.log_test(
                 "Read VIN (0xF190)",
                 result['valid'],
@@ -56,12 +71,11 @@ class ReadDataByIdentifierTest:
         self.validator.log_test_result("Read Active Session", request, response, validation_result=result)
         
         if result['positive'] and 'data' in result:
-            session = result['data'][0] if result['data'] else 0
-            session_names = {1: "Default", 2: "Programming", 3: "Extended"}
+            session = self.catalog.decode(0xF186, result['data'])['session']
             self.logger.log_test(
                 "Read Active Session (0xF186)",
                 result['valid'],
-                f"Active session: {session_names.get(session, f'Unknown (0x{session:02X})')}"
+                f"Active session: {session if isinstance(session, str) else f'Unknown (0x{session:02X})'}"
             )
         else:
             self.logger.log_test("Read Active Session (0xF186)", False, result['message'])
@@ -117,6 +131,62 @@ class ReadDataByIdentifierTest:
             f"Correctly rejected with NRC 0x31: {result['message']}"
         )
     
+    def test_read_multiple_dids(self):
+        """Test reading several DIDs in one request, split by their known data lengths"""
+        dids = [0xF190, 0xFFFF, 0xF187, 0xF188]
+        request = bytes([0x22]) + b"".join(did.to_bytes(2, 'big') for did in dids)
+        response = self.send_request(request)
+        
+        lengths = {0xF190: 17, 0xF187: 13, 0xF188: 14}
+        result = self.validator.validate_read_multiple_data_by_identifier(response, dids, lengths)
+        self.validator.log_test_result("Read Multiple DIDs", request, response, validation_result=result)
+        
+        if result['valid']:
+            passed = result['data'][0xF188] == b"39990-TBA-A030" and result['missing'] == [0xFFFF]
+            self.logger.log_test(
+                "Read Multiple DIDs",
+                passed,
+                f"{len(result['data'])} records, unsupported: {', '.join(f'0x{did:04X}' for did in result['missing'])}"
+            )
+        else:
+            self.logger.log_test("Read Multiple DIDs", False, result['message'])
+    
+    def test_batched_read(self):
+        """Test batching 120 DIDs by the maximum response length of the ECU simulator"""
+        # Imported here: loading the simulator (flash stack) would slow down every run of this suite
+        from Utils.ecu_simulator import ECUSimulator
+        dids = {0xF100 + i: bytes([i]) * (8 + i % 24) for i in range(120)}
+        simulator = ECUSimulator(dids=dids)
+        simulator.max_response_length = 512
+        reader = BatchDIDReader(simulator.send_request, max_response_length=512)
+        
+        first = reader.read(list(dids))
+        second = reader.read(list(dids))
+        passed = first.values == dids and second.values == dids and second.requests < 10
+        self.logger.log_test(
+            "Batched Read (120 DIDs)",
+            passed,
+            f"{first.requests} requests while learning lengths, {second.requests} requests with the catalog"
+        )
+    
+    def test_batch_decode(self):
+        """Test decoding a batch of signal DID records in one call against single-record decoding"""
+        records = []
+        for i in range(1000):
+            torque = (i * 37) % 8192 - 4096
+            word = (i % 4) << 13 | (torque & 0x1FFF)
+            records.append((i * 25).to_bytes(2, 'big') + word.to_bytes(2, 'big'))
+        
+        batch = self.catalog.decode_batch(SIGNAL_DID, records)
+        single = [self.catalog.decode(SIGNAL_DID, record) for record in records]
+        matches = all(list(batch[name]) == [values[name] for values in single] for name in single[0])
+        passed = matches and single[3] == {'speed': 0.75, 'gear': 'D', 'torque': (111 - 4096) * 0.5}
+        self.logger.log_test(
+            "Batch Decode Signals",
+            passed,
+            f"{len(records)} records, first: {single[0]}"
+        )
+    
     def run_all_tests(self):
         """Run all read data by identifier tests"""
         print("\n" + "="*60)
@@ -128,6 +198,9 @@ class ReadDataByIdentifierTest:
         self.test_read_spare_part_number()
         self.test_read_software_number()
         self.test_invalid_did()
+        self.test_read_multiple_dids()
+        self.test_batched_read()
+        self.test_batch_decode()
         
         self.logger.print_summary()
 
@@ -0,0 +1,144 @@
+# test_services/test_read_data_by_periodic_identifier.py
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.did_catalog import DIDCatalog
+from Utils.periodic_receiver import PeriodicReceiver, PeriodicError
+
+# Simulator periods of transmissionMode slow/medium/fast, shortened to keep the suite fast
+PERIODS = {'slow': 0.02, 'medium': 0.01, 'fast': 0.002}
+PERIODIC_DIDS = {
+    0xF201: bytes.fromhex("0C8A7B4100000001"),
+    0xF202: bytes.fromhex("1F40"),
+}
+DEFINITION = {"fields": [
+    {"name": "rpm", "bit_offset": 0, "bit_length": 16, "scale": 0.25},
+    {"name": "coolant", "bit_offset": 16, "bit_length": 8, "offset": -40},
+    {"name": "mil", "bit_offset": 63, "bit_length": 1},
+]}
+
+class ReadDataByPeriodicIdentifierTest:
+    """Test suite for periodic streaming with Read Data By Periodic Identifier (0x2A) in the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+
+    def _simulator(self) -> ECUSimulator:
+        simulator = ECUSimulator(dids=PERIODIC_DIDS)
+        simulator.periodic_periods = {0x01: PERIODS['slow'], 0x02: PERIODS['medium'], 0x03: PERIODS['fast']}
+        return simulator
+
+    def _receiver(self, simulator: ECUSimulator, **options) -> PeriodicReceiver:
+        return PeriodicReceiver(simulator.send_request, simulator.receive_message, list(PERIODIC_DIDS),
+                                periods=PERIODS, **options)
+
+    def test_periodic_stream(self):
+        """Test streaming two DIDs at fast rate into ring buffers and stopping"""
+        simulator = self._simulator()
+        try:
+            receiver = self._receiver(simulator)
+            report = receiver.run(0.2)
+            receiver.stop()
+            timestamps, records = receiver.buffers[0xF201].samples()
+            values = receiver.decode(DIDCatalog({"F201": DEFINITION}))[0xF201][1]
+            ordered = all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+            # Counted against the frames the simulator sent, so a loaded host only lowers both
+            counts = list(report.samples.values())
+            slots = len(PERIODIC_DIDS) * (int(report.duration / PERIODS['fast']) + 1)
+            passed = report.rate == 'fast' and sum(counts) == simulator.periodic_frames <= slots \
+                and min(counts) > 0 and max(counts) - min(counts) <= 1 and bytes(records[-1]) == PERIODIC_DIDS[0xF201] and ordered and list(values['rpm'])[0] == 802.5 \
+                and simulator.receive_message(0.01) is None
+            rates = ", ".join(f"0x{did:04X} {rate:.0f}/s" for did, rate in report.achieved_rates().items())
+            details = f"{sum(report.samples.values())} samples ({rates}), stopped: {not simulator.periodic}"
+        except PeriodicError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Periodic Stream", passed, details)
+
+    def test_ring_buffer_wrap(self):
+        """Test that a full ring keeps the newest samples in order and counts the overwritten ones"""
+        simulator = self._simulator()
+        try:
+            receiver = self._receiver(simulator, capacity=16)
+            receiver.run(0.1)
+            ring = receiver.buffers[0xF202]
+            timestamps, records = ring.samples()
+            passed = len(ring) == 16 and ring.dropped == ring.count - 16 > 0 \
+                and all(a <= b for a, b in zip(timestamps, timestamps[1:])) \
+                and all(bytes(record) == PERIODIC_DIDS[0xF202] for record in records)
+            details = f"{ring.count} samples, {len(ring)} kept, {ring.dropped} overwritten"
+        except PeriodicError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Ring Buffer Wrap", passed, details)
+
+    def test_rate_fallback(self):
+        """Test falling back to a slower rate when the ECU rejects the fast rate"""
+        simulator = self._simulator()
+        simulator.periodic_modes = (0x01, 0x02)
+        try:
+            receiver = self._receiver(simulator)
+            report = receiver.run(0.1)
+            passed = report.rate == 'medium' and report.rate_changes == 1 and all(report.samples.values())
+            details = f"Streaming at {report.rate} rate after {report.rate_changes} rate change"
+        except PeriodicError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Rate Fallback", passed, details)
+
+    def test_restart_after_stall(self):
+        """Test requesting DIDs again when the ECU stops streaming"""
+        simulator = self._simulator()
+        simulator.periodic_stop_after = 20
+        try:
+            receiver = self._receiver(simulator)
+            report = receiver.run(0.2)
+            passed = report.restarts >= 1 and report.rate == 'fast' and all(count > 20 for count in report.samples.values())
+            details = f"{report.restarts} restarts, {sum(report.samples.values())} samples"
+        except PeriodicError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Restart After Stall", passed, details)
+
+    def test_rate_lowered_after_stalls(self):
+        """Test lowering the rate when requesting stalled DIDs again brings no frames"""
+        simulator = self._simulator()
+        send_request = simulator.send_request
+
+        def fast_rate_silent(request: bytes) -> bytes:
+            # The ECU accepts the fast rate but never sends at it
+            response = send_request(request)
+            if request[:2] == bytes([0x2A, 0x03]):
+                simulator.periodic.clear()
+            return response
+
+        try:
+            receiver = PeriodicReceiver(fast_rate_silent, simulator.receive_message, list(PERIODIC_DIDS),
+                                        periods=PERIODS)
+            report = receiver.run(0.3)
+            passed = report.rate == 'medium' and report.rate_changes == 1 and all(report.samples.values())
+            details = f"{report.restarts} restarts, streaming at {report.rate} rate"
+        except PeriodicError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Rate Lowered After Stalls", passed, details)
+
+    def run_all_tests(self):
+        """Run all read data by periodic identifier tests"""
+        print("\n" + "="*60)
+        print("READ DATA BY PERIODIC IDENTIFIER TESTS (0x2A)")
+        print("="*60)
+
+        self.test_periodic_stream()
+        self.test_ring_buffer_wrap()
+        self.test_rate_fallback()
+        self.test_restart_after_stall()
+        self.test_rate_lowered_after_stalls()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = ReadDataByPeriodicIdentifierTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
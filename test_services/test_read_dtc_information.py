@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.dtc_decoder import decode_dtc_response, CONFIRMED_DTC, TEST_FAILED_SINCE_LAST_CLEAR
 
 class ReadDTCInformationTest:
     """Test suite for UDS Service 0x19 - Read DTC Information"""
@@ -22,13 +23,15 @@ class ReadDTCInformationTest:
         sub_func = request[1]
         
         if sub_func == 0x01:  # Report number of DTCs by status mask
-            return bytes([0x59, 0x01, 0x00, 0x03, 0x02])  # 3 DTCs, format 0x02
+            return bytes([0x59, 0x01, 0xFF, 0x01, 0x00, 0x02])  # Availability mask, ISO 14229-1 format, 2 DTCs
         elif sub_func == 0x02:  # Report DTCs by status mask
-            return bytes([0x59, 0x02, 0x00, 0x12, 0x34, 0x56, 0x08, 0x78, 0x9A, 0xBC, 0x10])
-        elif sub_func == 0x06:  # Report DTCs by severity mask
-            return bytes([0x59, 0x06, 0x00, 0x12, 0x34, 0x56, 0x08, 0x20])
+            return bytes([0x59, 0x02, 0xFF, 0x12, 0x34, 0x56, 0x08, 0x78, 0x9A, 0xBC, 0x10])
+        elif sub_func == 0x06:  # Report DTC extended data records by DTC number
+            return bytes([0x59, 0x06, 0x12, 0x34, 0x56, 0x08, 0x01, 0x05])
+        elif sub_func == 0x08:  # Report DTCs by severity mask record
+            return bytes([0x59, 0x08, 0xFF, 0x20, 0x01, 0x12, 0x34, 0x56, 0x08])
         elif sub_func == 0x0A:  # Report supported DTCs
-            return bytes([0x59, 0x0A, 0x12, 0x34, 0x56, 0x00, 0x78, 0x9A, 0xBC, 0x00])
+            return bytes([0x59, 0x0A, 0xFF, 0x12, 0x34, 0x56, 0x00, 0x78, 0x9A, 0xBC, 0x00])
         else:
             return bytes([0x7F, 0x19, 0x12])  # Sub-function not supported
     
@@ -40,49 +43,66 @@ class ReadDTCInformationTest:
         result = self.validator.validate_service_response(request, response, bytes([0x59, 0x01]))
         self.validator.log_test_result("Report Number of DTCs", request, response, validation_result=result)
         
-        if result['positive'] and len(response) >= 5:
-            dtc_count = response[3]
-            format_id = response[4]
+        if result['positive'] and len(response) == 6:
+            report = decode_dtc_response(response)
             self.logger.log_test(
                 "Report Number of DTCs",
-                result['valid'],
-                f"Found {dtc_count} DTCs, format: 0x{format_id:02X}"
+                result['valid'] and report.count == 2,
+                f"Found {report.count} DTCs, format: 0x{report.dtc_format:02X}"
             )
         else:
             self.logger.log_test("Report Number of DTCs", False, result['message'])
     
     def test_report_dtcs_by_status(self):
         """Test report DTCs by status mask (0x02)"""
-        request = bytes([0x19, 0x02, 0x00])  # All DTCs
+        request = bytes([0x19, 0x02, 0xFF])  # All DTCs
         response = self.send_request(request)
         
         result = self.validator.validate_service_response(request, response, bytes([0x59, 0x02]))
         self.validator.log_test_result("Report DTCs by Status", request, response, validation_result=result)
         
         if result['positive'] and len(response) > 3:
-            dtc_data = response[3:]
+            report = decode_dtc_response(response)
+            codes = report.display_codes()
             self.logger.log_test(
                 "Report DTCs by Status",
-                result['valid'],
-                f"DTC data: {dtc_data.hex().upper()}"
+                result['valid'] and codes == ["P1234-56", "C389A-BC"],
+                f"DTCs: {', '.join(f'{code} (0x{status:02X})' for code, status in zip(codes, report.records['status']))}"
             )
         else:
             self.logger.log_test("Report DTCs by Status", False, result['message'])
     
     def test_report_dtcs_by_severity(self):
-        """Test report DTCs by severity mask (0x06)"""
-        request = bytes([0x19, 0x06, 0x00])  # All severities
+        """Test report DTCs by severity mask record (0x08)"""
+        request = bytes([0x19, 0x08, 0xE0, 0xFF])  # All severities, all status bits
         response = self.send_request(request)
         
-        result = self.validator.validate_service_response(request, response, bytes([0x59, 0x06]))
+        result = self.validator.validate_service_response(request, response, bytes([0x59, 0x08]))
         self.validator.log_test_result("Report DTCs by Severity", request, response, validation_result=result)
         
+        report = decode_dtc_response(response) if result['valid'] else None
         self.logger.log_test(
             "Report DTCs by Severity",
-            result['positive'] and result['valid'],
+            result['positive'] and result['valid'] and report.to_dict()['dtcs'] == [
+                {'severity': 0x20, 'functional_unit': 0x01, 'dtc': 0x123456, 'status': 0x08, 'code': "P1234-56"}],
             "DTCs reported by severity mask"
         )
     
+    def test_report_dtc_extended_data(self):
+        """Test report DTC extended data records by DTC number (0x06)"""
+        request = bytes([0x19, 0x06, 0x12, 0x34, 0x56, 0xFF])  # All extended data records
+        response = self.send_request(request)
+        
+        result = self.validator.validate_service_response(request, response, bytes([0x59, 0x06]))
+        self.validator.log_test_result("Report DTC Extended Data", request, response, validation_result=result)
+        
+        report = decode_dtc_response(response) if result['valid'] else None
+        self.logger.log_test(
+            "Report DTC Extended Data",
+            result['valid'] and report.display_codes() == ["P1234-56"] and report.extended_data == bytes([0x01, 0x05]),
+            f"Extended data: {report.extended_data.hex().upper()}" if report else result['message']
+        )
+    
     def test_report_supported_dtcs(self):
         """Test report supported DTCs (0x0A)"""
         request = bytes([0x19, 0x0A])
@@ -91,12 +111,28 @@ class ReadDTCInformationTest:
         result = self.validator.validate_service_response(request, response, bytes([0x59, 0x0A]))
         self.validator.log_test_result("Report Supported DTCs", request, response, validation_result=result)
         
+        report = decode_dtc_response(response) if result['valid'] else None
         self.logger.log_test(
             "Report Supported DTCs",
-            result['positive'] and result['valid'],
+            result['positive'] and result['valid'] and len(report) == 2,
             "Supported DTCs reported"
         )
     
+    def test_filter_by_status(self):
+        """Test status bit filtering of decoded DTC records"""
+        report = decode_dtc_response(self.send_request(bytes([0x19, 0x02, 0xFF])))
+        confirmed = decode_dtc_response(bytes([0x59, 0x02, 0xFF]) + bytes(
+            b for dtc, status in ((0x123456, 0x08), (0x789ABC, 0x10), (0xC10100, 0x29))
+            for b in dtc.to_bytes(3, 'big') + bytes([status]))).filter(CONFIRMED_DTC | TEST_FAILED_SINCE_LAST_CLEAR,
+                                                                      all_bits=True)
+        codes = report.filter(CONFIRMED_DTC)['dtc']
+        passed = list(codes) == [0x123456] and list(confirmed['dtc']) == [0xC10100]
+        self.logger.log_test(
+            "Filter DTCs by Status",
+            passed,
+            f"{len(codes)} confirmed of {len(report)} DTCs"
+        )
+    
     def test_unsupported_sub_function(self):
         """Test unsupported sub-function (0xFF)"""
         request = bytes([0x19, 0xFF])
@@ -121,7 +157,9 @@ class ReadDTCInformationTest:
         self.test_report_number_of_dtcs()
         self.test_report_dtcs_by_status()
         self.test_report_dtcs_by_severity()
+        self.test_report_dtc_extended_data()
         self.test_report_supported_dtcs()
+        self.test_filter_by_status()
         self.test_unsupported_sub_function()
         
         self.logger.print_summary()
@@ -0,0 +1,141 @@
+# test_services/test_read_memory_by_address.py
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.flash_engine import FlashError
+from Utils.memory_reader import MemoryReader, ReadSizeCache
+
+MEMORY_ADDRESS = 0x08000000
+MEMORY = bytes((i * 13 + (i >> 10)) & 0xFF for i in range(256 * 1024 + 77))
+
+class ReadMemoryByAddressTest:
+    """Test suite for adaptive bulk reads with Read Memory By Address (0x23) in the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_read_memory_")
+        self.directory = self._directory.name
+
+    def _simulator(self, max_read_length: int = 1024) -> ECUSimulator:
+        simulator = ECUSimulator()
+        simulator.write_memory(MEMORY_ADDRESS, MEMORY)
+        simulator.max_read_length = max_read_length
+        return simulator
+
+    def test_probe_read_size(self):
+        """Test probing the largest read size for 0x31 and 0x14 rejections"""
+        results = []
+        for nrc, limit in ((0x31, 1024), (0x14, 777)):
+            simulator = self._simulator(limit)
+            simulator.read_length_nrc = nrc
+            try:
+                size, requests, limit = MemoryReader([simulator.send_request]).probe(MEMORY_ADDRESS)
+                results.append((size, requests, limit))
+            except FlashError as e:
+                results.append((str(e), 0, False))
+        passed = [(size, limit) for size, _, limit in results] == [(1024, True), (777, True)]
+        details = ", ".join(f"{size} bytes in {requests} requests" for size, requests, _ in results)
+        self.logger.log_test("Probe Read Size", passed, details)
+
+    def test_cached_read_size(self):
+        """Test that the probed size is cached per software version and reused"""
+        path = os.path.join(self.directory, "read_sizes.json")
+        simulator = self._simulator(2000)
+        try:
+            first = MemoryReader([simulator.send_request], cache=ReadSizeCache(path),
+                                 software_version="SW-1").read_into(bytearray(8192), MEMORY_ADDRESS)
+            second = MemoryReader([simulator.send_request], cache=ReadSizeCache(path),
+                                  software_version="SW-1").read_into(bytearray(8192), MEMORY_ADDRESS)
+            other = MemoryReader([simulator.send_request], cache=ReadSizeCache(path),
+                                 software_version="SW-2").read_into(bytearray(8192), MEMORY_ADDRESS)
+            passed = (first.chunk_source, second.chunk_source, other.chunk_source) == ('probe', 'cache', 'probe') \
+                and second.chunk_size == 2000 and second.probe_requests == 0
+            details = f"First run {first.probe_requests} probe requests, second run from cache ({second.chunk_size})"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Cached Read Size", passed, details)
+
+    def test_probe_bounded_by_range(self):
+        """Test that sizes bounded by a protected range or by the requested size are not cached"""
+        path = os.path.join(self.directory, "bounded_sizes.json")
+        results = []
+        for nrc in (0x33, 0x31):
+            simulator = self._simulator()
+            simulator.protected_ranges = [(MEMORY_ADDRESS + 200, 16)]
+            simulator.protected_range_nrc = nrc
+            buffer = bytearray(4096)
+            try:
+                report = MemoryReader([simulator.send_request], cache=ReadSizeCache(path),
+                                      software_version=f"SW-{nrc:02X}").read_into(buffer, MEMORY_ADDRESS)
+                # Only the chunk holding the protected range is split; the rest is read in full chunks
+                readable = buffer[:200] == MEMORY[:200] and buffer[400:] == MEMORY[400:4096]
+                results.append((report.chunk_size, readable, ReadSizeCache(path).get(f"SW-{nrc:02X}")))
+            except FlashError as e:
+                results.append((str(e), False, None))
+        simulator = self._simulator()
+        small = MemoryReader([simulator.send_request], cache=ReadSizeCache(path),
+                             software_version="SW-SMALL").read_into(bytearray(10), MEMORY_ADDRESS)
+        passed = results == [(200, True, None), (200, True, None)] and small.probe_requests == 1 \
+            and ReadSizeCache(path).get("SW-SMALL") is None
+        details = ", ".join(f"0x{nrc:02X}: {size}-byte chunks, cached {cached}" for nrc, (size, _, cached)
+                            in zip((0x33, 0x31), results)) + f"; 10-byte read probed in {small.probe_requests} request"
+        self.logger.log_test("Probe Bounded By Range", passed, details)
+
+    def test_concurrent_read(self):
+        """Test a read over four connections with lost responses"""
+        simulator = self._simulator()
+        simulator.latency = 0.0002
+        simulator.lose_read_every = 17
+        buffer = bytearray(len(MEMORY))
+        try:
+            report = MemoryReader([simulator.send_request] * 4).read_into(buffer, MEMORY_ADDRESS)
+            passed = buffer == MEMORY and report.retransmissions > 0 and not report.unreadable
+            details = f"{report.requests} requests, {report.retransmissions} retransmissions, " \
+                      f"data verified: {buffer == MEMORY}"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Concurrent Read", passed, details)
+
+    def test_unreadable_range(self):
+        """Test splitting chunks around a protected range and reporting it as unreadable"""
+        simulator = self._simulator()
+        # Aligned to the minimum chunk size, so splitting isolates it exactly
+        simulator.protected_ranges = [(MEMORY_ADDRESS + 5008, 64)]
+        path = os.path.join(self.directory, "dump.bin")
+        try:
+            report = MemoryReader([simulator.send_request], chunk_size=1024).read_to_file(
+                path, MEMORY_ADDRESS, len(MEMORY))
+            with open(path, 'rb') as f:
+                dump = f.read()
+            passed = report.unreadable == [(5008, 64)] and dump[:5008] == MEMORY[:5008] \
+                and dump[5072:] == MEMORY[5072:] and dump[5008:5072] == bytes(64)
+            details = f"Unreadable {report.unreadable} after {report.splits} splits"
+        except FlashError as e:
+            passed, details = False, str(e)
+        self.logger.log_test("Unreadable Range", passed, details)
+
+    def run_all_tests(self):
+        """Run all read memory by address tests"""
+        print("\n" + "="*60)
+        print("READ MEMORY BY ADDRESS TESTS (0x23)")
+        print("="*60)
+
+        self.test_probe_read_size()
+        self.test_cached_read_size()
+        self.test_probe_bounded_by_range()
+        self.test_concurrent_read()
+        self.test_unreadable_range()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = ReadMemoryByAddressTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class RequestDownloadTest:
     """Test suite for UDS Service 0x34 - Request Download"""
@@ -30,6 +31,7 @@ class RequestDownloadTest:
         else:
             return bytes([0x7F, 0x34, 0x22])  # Conditions not correct
     
+    @precondition(session=0x02, security_level=1)
     def test_valid_download_request(self):
         """Test valid download request"""
         # Format: dataFormatIdentifier=0x00, addressAndLengthFormatIdentifier=0x44
@@ -51,6 +53,7 @@ class RequestDownloadTest:
         else:
             self.logger.log_test("Valid Download Request", False, result['message'])
     
+    @precondition(session=0x02, security_level=1)
     def test_invalid_data_format(self):
         """Test invalid data format identifier"""
         request = bytes([0x34, 0xFF, 0x44, 0x12, 0x34, 0x56, 0x78, 0x00, 0x00, 0x10, 0x00])
@@ -66,6 +69,7 @@ class RequestDownloadTest:
             f"Correctly rejected with NRC 0x31: {result['message']}"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_invalid_address_format(self):
         """Test invalid address and length format"""
         request = bytes([0x34, 0x00, 0xFF, 0x12, 0x34, 0x56, 0x78])
@@ -81,6 +85,7 @@ class RequestDownloadTest:
             f"Correctly rejected with NRC 0x22: {result['message']}"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_insufficient_length(self):
         """Test insufficient message length"""
         request = bytes([0x34, 0x00])  # Missing required parameters
@@ -5,6 +5,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
+from Utils.checksums import CRC16Checksum, CRC32Checksum, checksum_of
+
+# Data assumed to have been transferred before the exit (four 0x36 blocks)
+TRANSFERRED_DATA = bytes(range(256)) * 4
 
 class RequestTransferExitTest:
     """Test suite for UDS Service 0x37 - Request Transfer Exit"""
@@ -24,6 +29,7 @@ class RequestTransferExitTest:
         else:
             return bytes([0x7F, 0x37, 0x13])  # Incorrect message length
     
+    @precondition(session=0x02, security_level=1)
     def test_simple_transfer_exit(self):
         """Test simple transfer exit without parameters"""
         request = bytes([0x37])
@@ -38,9 +44,10 @@ class RequestTransferExitTest:
             "Transfer session terminated successfully"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_transfer_exit_with_checksum(self):
         """Test transfer exit with checksum parameter"""
-        checksum = bytes([0x12, 0x34, 0x56, 0x78])  # Example checksum
+        checksum = checksum_of(TRANSFERRED_DATA, CRC32Checksum)
         request = bytes([0x37]) + checksum
         response = self.send_request(request)
         
@@ -57,6 +64,7 @@ class RequestTransferExitTest:
         else:
             self.logger.log_test("Transfer Exit with Checksum", False, result['message'])
     
+    @precondition(session=0x02, security_level=1)
     def test_transfer_exit_with_signature(self):
         """Test transfer exit with signature parameter"""
         signature = bytes([0xAA, 0xBB, 0xCC, 0xDD, 0xEE, 0xFF, 0x00, 0x11])
@@ -76,9 +84,10 @@ class RequestTransferExitTest:
         else:
             self.logger.log_test("Transfer Exit with Signature", False, result['message'])
     
+    @precondition(session=0x02, security_level=1)
     def test_transfer_exit_with_crc(self):
         """Test transfer exit with CRC parameter"""
-        crc = bytes([0xFF, 0xEE])  # Example CRC
+        crc = checksum_of(TRANSFERRED_DATA, CRC16Checksum)  # CRC16-CCITT
         request = bytes([0x37]) + crc
         response = self.send_request(request)
         
@@ -0,0 +1,191 @@
+# test_services/test_result_diff.py
+import sys
+import os
+import io
+import time
+import contextlib
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.report_sinks import JSONLReportSink
+from Utils.result_store import ResultStoreSink
+from Utils.sharding import RESULTS_FORMAT, write_results
+from Utils.result_diff import diff_runs, iter_source, UNKNOWN_ECU
+
+SUITE = "Soak Read (0x22)"
+READS = 5
+ECU = {'vin': "1HGBH41JXMN109186", 'software_number': "39990-TBA-A030"}
+OTHER_ECU = {'vin': "WVWZZZ1JZXW000001", 'software_number': "39990-TBA-A030"}
+UNKNOWN_DID = 0xABCD
+
+class ResultDiffTest:
+    """Test suite for run-to-run diffs of soak runs against the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_result_diff_")
+        self.directory = self._directory.name
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _soak_run(simulator: ECUSimulator, sinks: list, ecu=None, reads: int = READS, fail_read=None,
+                  extra_test: bool = False) -> list:
+        """Read the VIN reads times and an unknown DID once, streaming results into sinks.
+
+        fail_read makes that read (0-based) fail by removing the VIN first.
+        Returns the logged records.
+        """
+        logger = TestLogger()
+        send_request = logger.instrument(simulator.send_request)
+        for sink in sinks:
+            logger.add_sink(sink, SUITE)
+            sink.on_run_start({'ecu': ecu or {}, 'started': time.time()})
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(reads):
+                if i == fail_read:
+                    simulator.dids.pop(0xF190)
+                response = send_request(bytes([0x22, 0xF1, 0x90]))
+                logger.log_test("Read VIN", response[0] == 0x62, response.hex().upper())
+            response = send_request(bytes([0x22]) + UNKNOWN_DID.to_bytes(2, 'big'))
+            logger.log_test("Read Unknown DID", response[0] == 0x62, response.hex().upper())
+            if extra_test:
+                response = send_request(bytes([0x3E, 0x00]))
+                logger.log_test("Tester Present", response[0] == 0x7E, response.hex().upper())
+        for sink in sinks:
+            sink.on_suite_summary(SUITE, {**logger.get_summary(), 'status': 'COMPLETED'})
+            sink.on_run_summary(logger.get_summary())
+            sink.close()
+        return list(logger.results)
+
+    def _results_json(self, name: str, records: list, ecu=None) -> str:
+        path = self._path(name)
+        write_results(path, {'format': RESULTS_FORMAT, 'ecu': ecu or {}, 'suites': [
+            {'name': SUITE, 'tests': [record.to_dict() for record in records]}]})
+        return path
+
+    def test_occurrence_keys(self):
+        """Test that only the repeated result that changed is reported, with its occurrence"""
+        self._soak_run(ECUSimulator(), [JSONLReportSink(self._path("old.jsonl"))], ECU)
+        self._soak_run(ECUSimulator(), [JSONLReportSink(self._path("new.jsonl"))], ECU, fail_read=3)
+        result = diff_runs(iter_source(self._path("old.jsonl")), iter_source(self._path("new.jsonl")))
+        failing = result.groups[(ECU['vin'], SUITE)]['newly_failing']
+        passed = result.compared == READS + 1 and result.counts['newly_failing'] == 2 \
+            and [(entry['test'], entry['occurrence']) for entry in failing] == [("Read VIN", 3), ("Read VIN", 4)] \
+            and failing[0]['new'] == {'passed': False, 'nrc': 0x31} and not result.counts['added']
+        details = f"Newly failing occurrences {[entry['occurrence'] + 1 for entry in failing]} of {READS}"
+        self.logger.log_test("Occurrence Keys", passed, details)
+
+    def test_sources_agree(self):
+        """Test that the same run read as results JSON, JSONL and SQLite history compares equal"""
+        jsonl, db = self._path("same.jsonl"), self._path("same.db")
+        records = self._soak_run(ECUSimulator(), [JSONLReportSink(jsonl), ResultStoreSink(db)], ECU)
+        sources = [self._results_json("same.json", records, ECU), jsonl, db]
+        clean = []
+        for old in sources:
+            for new in sources:
+                result = diff_runs(iter_source(old), iter_source(new))
+                clean.append(result.compared == READS + 1 and not any(result.counts.values()))
+        passed = all(clean)
+        details = f"{sum(clean)} of {len(clean)} source pairs identical"
+        self.logger.log_test("Sources Agree", passed, details)
+
+    def test_changed_nrc(self):
+        """Test a still-failing result whose NRC changed"""
+        self._soak_run(ECUSimulator(), [JSONLReportSink(self._path("nrc_old.jsonl"))], ECU)
+        # The DID now exists but its response exceeds the ECU's response length limit
+        simulator = ECUSimulator()
+        simulator.dids[UNKNOWN_DID] = bytes(64)
+        simulator.max_response_length = 32
+        self._soak_run(simulator, [JSONLReportSink(self._path("nrc_new.jsonl"))], ECU)
+        result = diff_runs(iter_source(self._path("nrc_old.jsonl")), iter_source(self._path("nrc_new.jsonl")))
+        changed = result.groups.get((ECU['vin'], SUITE), {}).get('changed_nrc', [])
+        passed = result.counts['changed_nrc'] == 1 and changed[0]['old']['nrc'] == 0x31 \
+            and changed[0]['new']['nrc'] == 0x14 and not result.regressed
+        details = f"{len(changed)} changed: " + ", ".join(
+            f"{e['test']} 0x{e['old']['nrc']:02X} -> 0x{e['new']['nrc']:02X}" for e in changed)
+        self.logger.log_test("Changed NRC", passed, details)
+
+    def test_added_and_removed(self):
+        """Test results only in one of the runs: a new test and fewer repetitions"""
+        self._soak_run(ECUSimulator(), [JSONLReportSink(self._path("short_old.jsonl"))], ECU)
+        self._soak_run(ECUSimulator(), [JSONLReportSink(self._path("short_new.jsonl"))], ECU,
+                       reads=READS - 2, extra_test=True)
+        result = diff_runs(iter_source(self._path("short_old.jsonl")), iter_source(self._path("short_new.jsonl")))
+        group = result.groups[(ECU['vin'], SUITE)]
+        passed = [e['test'] for e in group['added']] == ["Tester Present"] \
+            and [(e['test'], e['occurrence']) for e in group['removed']] == [("Read VIN", 3), ("Read VIN", 4)] \
+            and result.compared == READS - 1
+        details = f"{result.counts['added']} added, {result.counts['removed']} removed, {result.compared} compared"
+        self.logger.log_test("Added And Removed", passed, details)
+
+    def test_unknown_ecu_matches(self):
+        """Test that a run without an ECU identity is matched against an identified run"""
+        records = self._soak_run(ECUSimulator(), [], ECU)
+        failing = self._soak_run(ECUSimulator(), [], fail_read=4)
+        result = diff_runs(iter_source(self._results_json("known.json", records, ECU)),
+                           iter_source(self._results_json("unknown.json", failing)))
+        passed = result.compared == READS + 1 and result.counts['newly_failing'] == 1 \
+            and list(result.groups) == [(ECU['vin'], SUITE)] and not result.disjoint
+        details = f"{result.compared} compared, groups {[ecu for ecu, _ in result.groups]}"
+        self.logger.log_test("Unknown ECU Matches", passed, details)
+
+    def test_other_ecu_disjoint(self):
+        """Test that runs of two identified ECUs are not compared with each other"""
+        records = self._soak_run(ECUSimulator(), [])
+        result = diff_runs(iter_source(self._results_json("ecu_a.json", records, ECU)),
+                           iter_source(self._results_json("ecu_b.json", records, OTHER_ECU)))
+        passed = result.disjoint and result.counts['added'] == result.counts['removed'] == READS + 1
+        details = f"Disjoint: {result.disjoint}, {result.counts['added']} added, {result.counts['removed']} removed"
+        self.logger.log_test("Other ECU Disjoint", passed, details)
+
+    def test_reused_jsonl_path(self):
+        """Test that writing a second run to the same JSONL path replaces the first"""
+        path = self._path("reused.jsonl")
+        self._soak_run(ECUSimulator(), [JSONLReportSink(path)], ECU, fail_read=0)
+        self._soak_run(ECUSimulator(), [JSONLReportSink(path)], ECU)
+        self._soak_run(ECUSimulator(), [JSONLReportSink(self._path("baseline.jsonl"))], ECU)
+        result = diff_runs(iter_source(self._path("baseline.jsonl")), iter_source(path))
+        passed = result.new_records == READS + 1 and not any(result.counts.values())
+        details = f"{result.new_records} records in the reused report"
+        self.logger.log_test("Reused JSONL Path", passed, details)
+
+    def test_store_run_selection(self):
+        """Test selecting runs of the SQLite history with path@RUN_ID"""
+        db = self._path("history.db")
+        self._soak_run(ECUSimulator(), [ResultStoreSink(db)], ECU)
+        self._soak_run(ECUSimulator(), [ResultStoreSink(db)], ECU, fail_read=2)
+        latest = diff_runs(iter_source(f"{db}@1"), iter_source(db))
+        same = diff_runs(iter_source(f"{db}@1"), iter_source(f"{db}@1"))
+        passed = latest.counts['newly_failing'] == 3 and same.compared == READS + 1 \
+            and not any(same.counts.values()) and UNKNOWN_ECU not in {ecu for ecu, _ in latest.groups}
+        details = f"Run 1 -> latest: {latest.counts['newly_failing']} newly failing"
+        self.logger.log_test("Store Run Selection", passed, details)
+
+    def run_all_tests(self):
+        """Run all result diff tests"""
+        print("\n" + "="*60)
+        print("RESULT DIFF TESTS")
+        print("="*60)
+
+        self.test_occurrence_keys()
+        self.test_sources_agree()
+        self.test_changed_nrc()
+        self.test_added_and_removed()
+        self.test_unknown_ecu_matches()
+        self.test_other_ecu_disjoint()
+        self.test_reused_jsonl_path()
+        self.test_store_run_selection()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = ResultDiffTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
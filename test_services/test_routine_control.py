@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class RoutineControlTest:
     """Test suite for UDS Service 0x31 - Routine Control"""
@@ -34,6 +35,7 @@ class RoutineControlTest:
         
         return bytes([0x7F, 0x31, 0x13])  # Incorrect message length
     
+    @precondition(session=0x03, security_level=1)
     def test_start_routine(self):
         """Test start routine (sub-function 0x01)"""
         request = bytes([0x31, 0x01, 0x02, 0x03])  # Start routine 0x0203
@@ -48,6 +50,7 @@ class RoutineControlTest:
             "Routine started successfully"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_stop_routine(self):
         """Test stop routine (sub-function 0x02)"""
         request = bytes([0x31, 0x02, 0x02, 0x03])  # Stop routine 0x0203
@@ -62,6 +65,7 @@ class RoutineControlTest:
             "Routine stopped successfully"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_request_routine_results(self):
         """Test request routine results (sub-function 0x03)"""
         request = bytes([0x31, 0x03, 0x02, 0x03])  # Request results for routine 0x0203
@@ -80,6 +84,7 @@ class RoutineControlTest:
         else:
             self.logger.log_test("Request Routine Results (0x0203)", False, result['message'])
     
+    @precondition(session=0x03, security_level=1)
     def test_invalid_routine(self):
         """Test invalid routine ID (0xFFFF)"""
         request = bytes([0x31, 0x01, 0xFF, 0xFF])  # Start invalid routine
@@ -95,6 +100,7 @@ class RoutineControlTest:
             f"Correctly rejected with NRC 0x31: {result['message']}"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_invalid_sub_function(self):
         """Test invalid sub-function (0x04)"""
         request = bytes([0x31, 0x04, 0x02, 0x03])  # Invalid sub-function
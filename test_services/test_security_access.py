@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class SecurityAccessTest:
     """Test suite for UDS Service 0x27 - Security Access"""
@@ -40,6 +41,7 @@ class SecurityAccessTest:
         
         return bytes([0x7F, 0x27, 0x13])  # Incorrect message length
     
+    @precondition(session=0x03)
     def test_request_seed_level1(self):
         """Test request seed for security level 1"""
         request = bytes([0x27, 0x01])
@@ -58,6 +60,7 @@ class SecurityAccessTest:
         else:
             self.logger.log_test("Request Seed Level 1", False, result['message'])
     
+    @precondition(session=0x03, changes_state=True)
     def test_send_valid_key_level1(self):
         """Test sending valid key for security level 1"""
         # First get seed
@@ -78,6 +81,7 @@ class SecurityAccessTest:
             "Security access granted"
         )
     
+    @precondition(session=0x03, changes_state=True)
     def test_send_invalid_key_level1(self):
         """Test sending invalid key for security level 1"""
         invalid_key = bytes([0x00, 0x00, 0x00, 0x00])
@@ -94,6 +98,7 @@ class SecurityAccessTest:
             f"Correctly rejected with NRC 0x35: {result['message']}"
         )
     
+    @precondition(session=0x03)
     def test_request_seed_level2(self):
         """Test request seed for security level 2"""
         request = bytes([0x27, 0x03])
@@ -112,6 +117,7 @@ class SecurityAccessTest:
         else:
             self.logger.log_test("Request Seed Level 2", False, result['message'])
     
+    @precondition(session=0x03)
     def test_invalid_sub_function(self):
         """Test invalid sub-function (0x05)"""
         request = bytes([0x27, 0x05])
@@ -0,0 +1,158 @@
+# test_services/test_sharding.py
+import sys
+import os
+import io
+import logging
+import contextlib
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.suite_registry import get_suites
+from Utils.test_scheduler import collect_test_cases
+from Utils.sharding import (parse_shard, assign_shards, select_shard, merge_results, write_results,
+                            load_results, load_timings)
+
+# Service suites run in every shard test; the state controller drives the local ECU simulator
+SERVICES = ["0x10", "0x22", "0x27", "0x3E"]
+SHARD_COUNT = 3
+
+class ShardingTest:
+    """Test suite for test case sharding and shard result merging on runs against the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_sharding_")
+        self.directory = self._directory.name
+
+    @staticmethod
+    def _cases() -> list:
+        cases = []
+        for spec in get_suites(SERVICES):
+            cases.extend(collect_test_cases(spec.name, spec.load()()))
+        return cases
+
+    @staticmethod
+    def _run(**options):
+        """Run the selected suites quietly and return the runner"""
+        from run_complete_tests import CompleteUDSTestSuite
+        suite = CompleteUDSTestSuite(SERVICES, **options)
+        logging.disable(logging.CRITICAL)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                suite.run_all_tests()
+        finally:
+            logging.disable(logging.NOTSET)
+        return suite
+
+    @staticmethod
+    def _outcomes(doc: dict) -> dict:
+        """(test name, passed) of every result per suite, in report order"""
+        return {suite['name']: [(t['test'], t['passed']) for t in suite['tests']] for suite in doc['suites']}
+
+    def test_parse_shard(self):
+        """Test i/N parsing and rejection of malformed or out-of-range shards"""
+        rejected = []
+        for spec in ("0/3", "4/3", "1/0", "a/b", "3"):
+            try:
+                parse_shard(spec)
+            except ValueError:
+                rejected.append(spec)
+        passed = parse_shard("2/3") == (2, 3) and len(rejected) == 5
+        details = f"Rejected {', '.join(rejected)}"
+        self.logger.log_test("Parse Shard", passed, details)
+
+    def test_hash_assignment_stable(self):
+        """Test that every case lands in exactly one shard, the same one on every host"""
+        cases = self._cases()
+        keys = [case.key for case in cases]
+        assignment = assign_shards(keys, SHARD_COUNT)
+        # A second process sees freshly collected case objects and must agree
+        again = assign_shards([case.key for case in self._cases()], SHARD_COUNT)
+        shards = [select_shard(cases, i, SHARD_COUNT) for i in range(1, SHARD_COUNT + 1)]
+        selected = [case.key for shard in shards for case in shard]
+        passed = assignment == again and sorted(selected) == sorted(keys) and len(set(selected)) == len(keys) \
+            and all(shards)
+        details = f"{len(keys)} cases over shards of {', '.join(str(len(shard)) for shard in shards)}"
+        self.logger.log_test("Hash Assignment Stable", passed, details)
+
+    def test_timing_balanced_assignment(self):
+        """Test that timings balance shard loads to within the longest case"""
+        keys = [case.key for case in self._cases()]
+        timings = {key: 0.01 * (i % 7 + 1) for i, key in enumerate(keys)}
+        timings[keys[0]] = 0.5  # One slow case gets a shard of its own
+        del timings[keys[-1]]   # Unknown cases are weighted with the median
+        assignment = assign_shards(keys, SHARD_COUNT, timings)
+        default = sorted(timings.values())[len(timings) // 2]
+        loads = [sum(timings.get(key, default) for key, shard in assignment.items() if shard == i)
+                 for i in range(1, SHARD_COUNT + 1)]
+        alone = [key for key, shard in assignment.items() if shard == assignment[keys[0]]] == [keys[0]]
+        passed = alone and max(loads) - min(loads) <= 0.5 and set(assignment) == set(keys)
+        details = f"Shard loads {', '.join(f'{load:.2f}s' for load in loads)}"
+        self.logger.log_test("Timing Balanced Assignment", passed, details)
+
+    def test_merge_equals_single_run(self):
+        """Test that merged shard results report what a single-host run reports"""
+        single = self._run(shard="1/1").results_document()
+        shards = [self._run(shard=f"{i}/{SHARD_COUNT}").results_document() for i in range(1, SHARD_COUNT + 1)]
+        merged = merge_results(shards)
+        expected = self._outcomes(single)
+        totals = {suite['name']: (suite['total'], suite['passed']) for suite in merged['suites']}
+        passed = self._outcomes(merged) == expected and merged['merged_from'] == ["1/3", "2/3", "3/3"] \
+            and totals == {suite['name']: (suite['total'], suite['passed']) for suite in single['suites']} \
+            and [case['key'] for case in merged['cases']] == [case['key'] for case in single['cases']]
+        details = f"{sum(total for total, _ in totals.values())} results in {len(totals)} suites from " \
+                  f"{SHARD_COUNT} shards of {', '.join(str(len(doc['cases'])) for doc in shards)} cases"
+        self.logger.log_test("Merge Equals Single Run", passed, details)
+
+    def test_merge_status_precedence(self):
+        """Test that a timeout or error in one shard marks the merged suite"""
+        def shard(name: str, status: str, error=None) -> dict:
+            return {'shard': name, 'duration': 1.0, 'cases': [],
+                    'suites': [{'name': "Tester Present (0x3E)", 'status': status, 'error': error,
+                                'duration': 0.5, 'tests': [{'test': name, 'passed': status == 'COMPLETED'}]}]}
+
+        merged = merge_results([shard("1/3", 'COMPLETED'), shard("2/3", 'TIMEOUT', "Suite exceeded 1.0s deadline"),
+                                shard("3/3", 'ERROR', "test_x: boom")])
+        suite = merged['suites'][0]
+        passed = suite['status'] == 'ERROR' and suite['error'] == "Suite exceeded 1.0s deadline; test_x: boom" \
+            and suite['total'] == 3 and suite['passed'] == 1 and suite['duration'] == 1.5
+        details = f"Status {suite['status']}, error {suite['error']!r}"
+        self.logger.log_test("Merge Status Precedence", passed, details)
+
+    def test_merged_timings_rebalance(self):
+        """Test that a merged document written to disk feeds --shard-timings"""
+        merged = merge_results([self._run(shard=f"{i}/2").results_document() for i in (1, 2)])
+        path = os.path.join(self.directory, "merged.json")
+        write_results(path, merged)
+        timings = load_timings(path)
+        balanced = self._run(shard="1/2", shard_timings=timings).results_document()
+        passed = load_results(path)['merged_from'] == ["1/2", "2/2"] \
+            and set(timings) == {case.key for case in self._cases()} \
+            and {case['key'] for case in balanced['cases']} \
+            == {key for key, shard in assign_shards(list(timings), 2, timings).items() if shard == 1}
+        details = f"{len(timings)} case timings, shard 1/2 ran {len(balanced['cases'])} cases"
+        self.logger.log_test("Merged Timings Rebalance", passed, details)
+
+    def run_all_tests(self):
+        """Run all sharding tests"""
+        print("\n" + "="*60)
+        print("SHARDING AND MERGE TESTS")
+        print("="*60)
+
+        self.test_parse_shard()
+        self.test_hash_assignment_stable()
+        self.test_timing_balanced_assignment()
+        self.test_merge_equals_single_run()
+        self.test_merge_status_precedence()
+        self.test_merged_timings_rebalance()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = ShardingTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
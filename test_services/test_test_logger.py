@@ -0,0 +1,176 @@
+# test_services/test_test_logger.py
+import sys
+import os
+import io
+import json
+import contextlib
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger, TestRecord, Reservoir, MAX_TIMED_TESTS, OTHER_TESTS
+from Utils.ecu_simulator import ECUSimulator
+from Utils.report_sinks import ReportSink
+
+# Results logged into the loggers under test; their [PASS]/[FAIL] lines are not printed
+RESULTS = 500
+KEEP = 64
+
+class FailingSink(ReportSink):
+    """Sink whose client went away after the first result"""
+
+    def __init__(self):
+        self.received = 0
+
+    def on_test_result(self, suite, record):
+        self.received += 1
+        if self.received > 1:
+            raise BrokenPipeError("client disconnected")
+
+class TestLoggerTest:
+    """Test suite for TestLogger counters, ring-buffer mode and timing of exchanges with the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+        self._directory = tempfile.TemporaryDirectory(prefix="uds_test_logger_")
+        self.directory = self._directory.name
+
+    @staticmethod
+    def _fill(logger: TestLogger, count: int = RESULTS, names: int = 5):
+        """Log count results quietly; every third one fails"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(count):
+                logger.log_test(f"Test {i % names}", i % 3 != 0, f"result {i}")
+
+    def test_running_counters(self):
+        """Test that summary counters match the logged results without rescanning them"""
+        logger = TestLogger()
+        self._fill(logger)
+        summary = logger.get_summary()
+        expected_passed = sum(1 for i in range(RESULTS) if i % 3 != 0)
+        passed = summary['total'] == RESULTS and summary['passed'] == expected_passed \
+            and summary['failed'] == RESULTS - expected_passed and len(logger.results) == RESULTS \
+            and sum(1 for r in logger.results if r['passed']) == expected_passed
+        details = f"{summary['total']} total, {summary['passed']} passed, {summary['pass_rate']:.1f}%"
+        self.logger.log_test("Running Counters", passed, details)
+
+    def test_ring_buffer_spill(self):
+        """Test that only the last results stay in memory and evicted ones are spilled in order"""
+        path = os.path.join(self.directory, "spill.jsonl")
+        logger = TestLogger(max_records=KEEP, spill_path=path)
+        logger.suite = "Ring Buffer"
+        self._fill(logger)
+        logger.close()
+        with open(path, 'r', encoding='utf-8') as f:
+            spilled = [json.loads(line) for line in f]
+        kept = [record['details'] for record in logger.results]
+        passed = logger.total == RESULTS and logger.spilled == RESULTS - KEEP == len(spilled) \
+            and kept == [f"result {i}" for i in range(RESULTS - KEEP, RESULTS)] \
+            and [r['details'] for r in spilled] == [f"result {i}" for i in range(RESULTS - KEEP)] \
+            and all(r['type'] == 'test' and r['suite'] == "Ring Buffer" for r in spilled) \
+            and logger.get_summary()['passed'] == sum(1 for i in range(RESULTS) if i % 3 != 0)
+        details = f"{len(kept)} kept, {len(spilled)} spilled of {logger.total}"
+        self.logger.log_test("Ring Buffer Spill", passed, details)
+
+    def test_limit_records_mid_run(self):
+        """Test switching to ring-buffer mode after results were logged"""
+        logger = TestLogger()
+        self._fill(logger, KEEP * 2)
+        logger.limit_records(KEEP)
+        self._fill(logger, KEEP // 2)
+        timing = logger.get_timing_summary()
+        passed = len(logger.results) == KEEP and logger.total == KEEP * 2 + KEEP // 2 \
+            and logger.results[-1]['details'] == f"result {KEEP // 2 - 1}" \
+            and timing['duration']['count'] == logger.total \
+            and sum(entry['count'] for entry in timing['tests'].values()) == logger.total
+        details = f"{len(logger.results)} kept of {logger.total}, {timing['duration']['count']} durations counted"
+        try:
+            logger.limit_records(0)
+            passed, details = False, details + ", limit 0 accepted"
+        except ValueError:
+            pass
+        self.logger.log_test("Limit Records Mid Run", passed, details)
+
+    def test_bounded_timing_samples(self):
+        """Test that ring-buffer mode bounds duration samples and test names but keeps exact counts"""
+        logger = TestLogger(max_records=KEEP)
+        names = MAX_TIMED_TESTS + 10
+        self._fill(logger, names * 3, names)
+        other = logger.durations[OTHER_TESTS]
+        sampled = all(isinstance(values, Reservoir) and len(values.sample) <= KEEP
+                      for values in logger.durations.values())
+        timing = logger.get_timing_summary()
+        passed = len(logger.durations) == MAX_TIMED_TESTS + 1 and sampled and other.count == 10 * 3 \
+            and timing['duration']['count'] == names * 3 and len(logger.all_durations.sample) == KEEP
+        details = f"{len(logger.durations)} timed names, {other.count} results under {OTHER_TESTS!r}"
+        self.logger.log_test("Bounded Timing Samples", passed, details)
+
+    def test_instrumented_exchanges(self):
+        """Test that exchanges with the simulator are timed into the current record with their NRC"""
+        simulator = ECUSimulator(latency=0.002)
+        logger = TestLogger()
+        send_request = logger.instrument(simulator.send_request)
+        with contextlib.redirect_stdout(io.StringIO()):
+            logger.begin_test()
+            send_request(bytes([0x22, 0xF1, 0x90]))
+            send_request(bytes([0x3E, 0x00]))
+            logger.log_test("Positive", True)
+            send_request(bytes([0x22, 0xAB, 0xCD]))
+            logger.log_test("Negative", True)
+        positive, negative = logger.results
+        passed = len(positive.exchanges) == 2 and positive.nrc is None and positive.latency >= 0.004 \
+            and positive.duration >= positive.latency and len(negative.exchanges) == 1 and negative['nrc'] == 0x31 \
+            and send_request.__wrapped__ == simulator.send_request \
+            and logger.get_timing_summary()['latency']['count'] == 3
+        details = f"{len(positive.exchanges)} + {len(negative.exchanges)} exchanges, " \
+                  f"latency {positive.latency * 1000:.1f}ms, NRC 0x{negative['nrc']:02X}"
+        self.logger.log_test("Instrumented Exchanges", passed, details)
+
+    def test_record_mapping(self):
+        """Test that slotted records still read and write like result dicts"""
+        record = TestRecord("Mapping", True, "ok", 1.0, case="test_mapping")
+        record['retries'] = 2
+        plain = TestRecord("Plain", False)
+        passed = record['test'] == "Mapping" and record.get('nrc') is None and 'duration' not in record \
+            and record.to_dict() == {'test': "Mapping", 'passed': True, 'details': "ok", 'timestamp': 1.0,
+                                     'case': "test_mapping", 'retries': 2} \
+            and list(plain) == ['test', 'passed', 'details', 'timestamp'] and plain.extra is None
+        details = f"Keys {list(record)}"
+        self.logger.log_test("Record Mapping", passed, details)
+
+    def test_failing_sink_detached(self):
+        """Test that a sink raising OSError is detached and logging carries on"""
+        logger = TestLogger()
+        sink = FailingSink()
+        logger.add_sink(sink, "Sinks")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for i in range(3):
+                logger.log_test(f"Test {i}", True)
+        passed = sink.received == 2 and logger.sinks == [] and logger.total == 3 \
+            and "FailingSink detached: client disconnected" in output.getvalue()
+        details = f"Sink got {sink.received} results before it was detached"
+        self.logger.log_test("Failing Sink Detached", passed, details)
+
+    def run_all_tests(self):
+        """Run all TestLogger tests"""
+        print("\n" + "="*60)
+        print("TEST LOGGER TESTS")
+        print("="*60)
+
+        self.test_running_counters()
+        self.test_ring_buffer_spill()
+        self.test_limit_records_mid_run()
+        self.test_bounded_timing_samples()
+        self.test_instrumented_exchanges()
+        self.test_record_mapping()
+        self.test_failing_sink_detached()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = TestLoggerTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class TransferDataTest:
     """Test suite for UDS Service 0x36 - Transfer Data"""
@@ -30,6 +31,7 @@ class TransferDataTest:
         else:
             return bytes([0x76, block_seq_counter])  # Echo back counter
     
+    @precondition(session=0x02, security_level=1)
     def test_first_data_block(self):
         """Test transfer first data block"""
         test_data = bytes([0xAA, 0xBB, 0xCC, 0xDD] * 16)  # 64 bytes of test data
@@ -45,6 +47,7 @@ class TransferDataTest:
             f"Transferred {len(test_data)} bytes, block sequence: 0x01"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_second_data_block(self):
         """Test transfer second data block"""
         test_data = bytes([0x11, 0x22, 0x33, 0x44] * 32)  # 128 bytes of test data
@@ -60,6 +63,7 @@ class TransferDataTest:
             f"Transferred {len(test_data)} bytes, block sequence: 0x02"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_wrong_sequence_counter(self):
         """Test wrong block sequence counter"""
         test_data = bytes([0xFF] * 10)
@@ -76,6 +80,7 @@ class TransferDataTest:
             f"Correctly rejected with NRC 0x73: {result['message']}"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_large_data_block(self):
         """Test transfer large data block"""
         test_data = bytes(range(256)) * 4  # 1024 bytes of test data
@@ -91,6 +96,7 @@ class TransferDataTest:
             f"Transferred {len(test_data)} bytes, block sequence: 0x03"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_empty_data_block(self):
         """Test transfer empty data block"""
         request = bytes([0x36, 0x04])  # No data
@@ -105,6 +111,7 @@ class TransferDataTest:
             "Empty data block accepted"
         )
     
+    @precondition(session=0x02, security_level=1)
     def test_invalid_length(self):
         """Test invalid message length"""
         request = bytes([0x36])  # Missing block sequence counter
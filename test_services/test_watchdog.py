@@ -0,0 +1,184 @@
+# test_services/test_watchdog.py
+import sys
+import os
+import socket
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils.uds_utils import TestLogger
+from Utils.ecu_simulator import ECUSimulator
+from Utils.report_sinks import ReportSink
+from Utils.watchdog import CancellationToken, SuiteTimeout, run_with_watchdog
+
+# Deadlines are short to keep the suite fast; a blocked worker would otherwise hang for BLOCKED_FOR
+DEADLINE = 0.2
+BLOCKED_FOR = 10.0
+
+class StalledSuite:
+    """Suite stand-in that blocks on its transport socket before logging anything"""
+
+    def __init__(self):
+        self.logger = TestLogger()
+        self.logger.add_sink(ReportSink(), "Stalled")
+        self.transport, self.peer = socket.socketpair()
+
+    def run_all_tests(self):
+        self.transport.recv(1)  # The peer never writes
+
+class WatchdogTest:
+    """Test suite for suite and test deadlines with transport cancellation against the local ECU simulator"""
+
+    def __init__(self, connection=None):
+        self.logger = TestLogger()
+        self.connection = connection
+
+    def test_completes_within_deadline(self):
+        """Test that a suite finishing in time reports no timeout"""
+        simulator = ECUSimulator()
+        token = CancellationToken()
+        responses = []
+        reason = run_with_watchdog(lambda: responses.append(simulator.send_request(bytes([0x3E, 0x00]))),
+                                   token, suite_timeout=BLOCKED_FOR, test_timeout=BLOCKED_FOR)
+        passed = reason is None and responses == [bytes([0x7E, 0x00])] and not token.cancelled
+        details = f"Reason {reason}, {len(responses)} response(s)"
+        self.logger.log_test("Completes Within Deadline", passed, details)
+
+    def test_suite_deadline_cancels_loop(self):
+        """Test that a request loop polling token.check() stops at the suite deadline"""
+        simulator = ECUSimulator(latency=0.01)
+        token = CancellationToken()
+
+        def request_loop():
+            while True:
+                token.check()
+                simulator.send_request(bytes([0x22, 0xF1, 0x90]))
+
+        start = time.monotonic()
+        reason = run_with_watchdog(request_loop, token, suite_timeout=DEADLINE)
+        elapsed = time.monotonic() - start
+        requests = simulator.request_count
+        time.sleep(0.05)
+        passed = reason is not None and "deadline" in reason and "abandoned" not in reason \
+            and elapsed < DEADLINE + 1.0 and simulator.request_count == requests > 0
+        details = f"{reason} after {elapsed:.2f}s and {requests} requests"
+        self.logger.log_test("Suite Deadline Cancels Loop", passed, details)
+
+    def test_blocked_socket_unblocked(self):
+        """Test that cancellation shuts down a socket the suite is blocked on"""
+        tester, ecu = socket.socketpair()
+        token = CancellationToken()
+        token.register_transport(tester)
+        errors = []
+
+        def blocked_read():
+            try:
+                tester.recv(1)
+            except OSError as e:
+                errors.append(e)
+
+        try:
+            start = time.monotonic()
+            reason = run_with_watchdog(blocked_read, token, suite_timeout=DEADLINE)
+            elapsed = time.monotonic() - start
+        finally:
+            ecu.close()
+        # The shut-down socket either returns EOF or raises, but the worker must have unwound
+        passed = reason is not None and "abandoned" not in reason and elapsed < DEADLINE + 1.0
+        details = f"{reason} after {elapsed:.2f}s" + (f" ({errors[0].__class__.__name__})" if errors else "")
+        self.logger.log_test("Blocked Socket Unblocked", passed, details)
+
+    def test_test_deadline_without_progress(self):
+        """Test the per-test deadline: results reset it, a stall after them trips it"""
+        simulator = ECUSimulator(latency=0.02)
+        token = CancellationToken()
+        results = []
+
+        def suite():
+            # Together the tests take longer than the per-test deadline allows one test to take
+            for _ in range(12):
+                results.append(simulator.send_request(bytes([0x3E, 0x00])))
+            while True:
+                token.check()
+                time.sleep(0.01)
+
+        reason = run_with_watchdog(suite, token, test_timeout=DEADLINE, progress=lambda: len(results))
+        passed = reason is not None and reason.startswith("No test result") and len(results) == 12
+        details = f"{reason} after {len(results)} results"
+        self.logger.log_test("Test Deadline Without Progress", passed, details)
+
+    def test_coroutine_cancelled(self):
+        """Test that a coroutine suite's task is cancelled on its own event loop"""
+        token = CancellationToken()
+        state = {}
+
+        async def suite():
+            try:
+                await asyncio.sleep(BLOCKED_FOR)
+            except asyncio.CancelledError:
+                state['cancelled'] = True
+                raise
+
+        start = time.monotonic()
+        reason = run_with_watchdog(suite, token, suite_timeout=DEADLINE)
+        elapsed = time.monotonic() - start
+        passed = reason is not None and state.get('cancelled', False) and elapsed < DEADLINE + 1.0
+        details = f"{reason} after {elapsed:.2f}s, task cancelled: {state.get('cancelled', False)}"
+        self.logger.log_test("Coroutine Cancelled", passed, details)
+
+    def test_error_reraised(self):
+        """Test that an error in a suite that did not time out is re-raised"""
+        simulator = ECUSimulator()
+        token = CancellationToken()
+
+        def suite():
+            response = simulator.send_request(bytes([0x22, 0xAB, 0xCD]))
+            raise ValueError(f"Unexpected response {response.hex().upper()}")
+
+        try:
+            reason = run_with_watchdog(suite, token, suite_timeout=BLOCKED_FOR)
+            passed, details = False, f"Returned {reason}"
+        except ValueError as e:
+            passed, details = str(e) == "Unexpected response 7F2231", f"Re-raised: {e}"
+        except SuiteTimeout as e:
+            passed, details = False, f"Timed out: {e}"
+        self.logger.log_test("Error Re-raised", passed, details)
+
+    def test_runner_cancels_suite_transport(self):
+        """Test that the runner registers a suite's transport and stops its reports on timeout"""
+        from run_complete_tests import CompleteUDSTestSuite
+        runner = CompleteUDSTestSuite(["0x3E"])
+        stalled = StalledSuite()
+        try:
+            start = time.monotonic()
+            reason = runner._run_guarded(stalled.run_all_tests, stalled, DEADLINE)
+            elapsed = time.monotonic() - start
+        finally:
+            stalled.peer.close()
+        passed = reason is not None and "abandoned" not in reason and elapsed < DEADLINE + 1.0 \
+            and stalled.logger.sinks == [] and stalled.cancel_token.cancelled
+        details = f"{reason} after {elapsed:.2f}s, sinks detached: {stalled.logger.sinks == []}"
+        self.logger.log_test("Runner Cancels Suite Transport", passed, details)
+
+    def run_all_tests(self):
+        """Run all watchdog tests"""
+        print("\n" + "="*60)
+        print("WATCHDOG DEADLINE TESTS")
+        print("="*60)
+
+        self.test_completes_within_deadline()
+        self.test_suite_deadline_cancels_loop()
+        self.test_blocked_socket_unblocked()
+        self.test_test_deadline_without_progress()
+        self.test_coroutine_cancelled()
+        self.test_error_reraised()
+        self.test_runner_cancels_suite_transport()
+
+        self.logger.print_summary()
+
+def main():
+    test_suite = WatchdogTest()
+    test_suite.run_all_tests()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from uds_validator import UDSValidator
 from Utils.uds_utils import TestLogger
+from Utils.test_scheduler import precondition
 
 class WriteDataByIdentifierTest:
     """Test suite for UDS Service 0x2E - Write Data By Identifier"""
@@ -25,6 +26,7 @@ class WriteDataByIdentifierTest:
                 return bytes([0x7F, 0x2E, 0x31])  # Request out of range
         return bytes([0x7F, 0x2E, 0x13])  # Incorrect message length
     
+    @precondition(session=0x03, security_level=1)
     def test_write_valid_did(self):
         """Test writing to valid writable DID (0xF110)"""
         test_data = b"TEST_DATA_123"
@@ -40,6 +42,7 @@ class WriteDataByIdentifierTest:
             f"Successfully wrote {len(test_data)} bytes"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_write_readonly_did(self):
         """Test writing to read-only DID (0xF190 - VIN)"""
         test_data = b"1HGBH41JXMN109186"
@@ -56,6 +59,7 @@ class WriteDataByIdentifierTest:
             f"Correctly rejected with NRC 0x33: {result['message']}"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_write_invalid_did(self):
         """Test writing to invalid DID (0xF1FF)"""
         test_data = b"INVALID"
@@ -72,6 +76,7 @@ class WriteDataByIdentifierTest:
             f"Correctly rejected with NRC 0x31: {result['message']}"
         )
     
+    @precondition(session=0x03, security_level=1)
     def test_write_empty_data(self):
         """Test writing empty data"""
         request = bytes([0x2E, 0xF1, 0x10])  # No data
@@ -157,6 +157,47 @@ class UDSValidator:
             result['data'] = response[3:]
         return result
     
+    def validate_read_multiple_data_by_identifier(self, response: bytes, dids: List[int],
+                                                  lengths: Dict[int, int]) -> Dict:
+        """Validate a 0x22 response to several DIDs, split into records by the known data length of each DID.
+
+        DIDs the ECU does not support are left out of the response and listed
+        in result['missing']; only the last DID may have an unknown length.
+        """
+        result = self.validate_service_response(None, response, bytes([0x62]))
+        if not result['valid']:
+            return result
+        data, missing = {}, []
+        position = 1
+        for index, did in enumerate(dids):
+            if response[position:position + 2] != did.to_bytes(2, 'big'):
+                missing.append(did)
+                continue
+            length = lengths.get(did)
+            if length is None and index != len(dids) - 1:
+                result.update(valid=False, message=f"Unknown data length of DID 0x{did:04X}")
+                return result
+            end = len(response) if length is None else position + 2 + length
+            data[did] = response[position + 2:end]
+            position = end
+        if position != len(response) or not data:
+            result.update(valid=False, message=f"Records do not match the DID lengths "
+                                               f"({len(response) - position} bytes left)")
+            return result
+        result['data'] = data
+        result['missing'] = missing
+        return result
+    
+    def validate_read_data_by_periodic_identifier(self, response: bytes) -> Dict:
+        """Validate 0x2A Read Data By Periodic Identifier response (periodic data follows unsolicited)"""
+        return self.validate_service_response(None, response, bytes([0x6A]))
+    
+    def validate_dynamically_define_data_identifier(self, response: bytes, sub_function: int,
+                                                    did: Optional[int] = None) -> Dict:
+        """Validate 0x2C Dynamically Define Data Identifier response"""
+        expected_prefix = bytes([0x6C, sub_function]) + (did.to_bytes(2, 'big') if did is not None else b"")
+        return self.validate_service_response(None, response, expected_prefix)
+    
     def validate_write_data_by_identifier(self, response: bytes, did: int) -> Dict:
         """Validate 0x2E Write Data By Identifier response"""
         expected_prefix = bytes([0x6E]) + did.to_bytes(2, 'big')